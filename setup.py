@@ -101,7 +101,7 @@ if build:
 # Required packages
 required = [
     'bumps>=0.7.5.9', 'periodictable>=1.5.0', 'pyparsing>=2.0.0',
-    'lxml',
+    'lxml', 'cloudpickle',
 ]
 
 if os.name == 'nt':
@@ -26,6 +26,11 @@ sasview [flags] -c "python statements" [args...]
 sasview -V
     *Print sasview version and exit.*
 
+sasview fit [options] datafile...
+    *Fit a model from a saved fit page or given on the command line to each
+    data file, writing a table of results as the fits complete. Use
+    "sasview fit -h" for the options.*
+
 **Flags:**
 
     -i, --interactive. *Enter an interactive session after command/module/script.*
@@ -116,6 +121,13 @@ def main(logging="production"):
     if "-i" in sys.argv[1:] or "-o" in sys.argv[1:]:
         console.setup_console()
 
+    # Headless fitting has its own set of options
+    if sys.argv[1:2] == ['fit']:
+        log.production()
+        lib.setup_sasmodels()
+        from sas.sascalc.fit.cli import main as fit_main
+        return fit_main(sys.argv[2:])
+
     # Eventually argument processing might affect logger or config, so do it first
     cli = parse_cli(sys.argv)
 
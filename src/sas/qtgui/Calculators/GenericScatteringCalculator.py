@@ -6,7 +6,6 @@ from PySide6.QtGui import QIcon
 from matplotlib.figure import Figure
 import numpy
 import logging
-import time
 import timeit
 import math
 
@@ -29,9 +28,11 @@ from sas.qtgui.Utilities.TabbedModelEditor import TabbedModelEditor
 from sas.qtgui.Utilities.GenericReader import GenReader
 from sasdata.dataloader.data_info import Detector, Source
 from sas.system.version import __version__
+from sas.system import config
 from sas.sascalc.calculator import sas_gen
+from sas.sascalc.calculator.sld_cache import SLDFileCache
 from sas.sascalc.fit import models
-from sas.sascalc.calculator.geni import radius_of_gyration, create_beta_plot, f_of_q
+from sas.sascalc.calculator.geni import radius_of_gyration, create_beta_plot, f_of_q, CalculationCancelled
 import sas.sascalc.calculator.gsc_model as gsc_model
 from sas.qtgui.Plotting.PlotterBase import PlotterBase
 from sas.qtgui.Plotting.Plotter2D import Plotter2D
@@ -67,6 +68,14 @@ class GenericScatteringCalculator(QtWidgets.QDialog, Ui_GenericScatteringCalcula
         self.sld_reader = sas_gen.SLDReader()
         self.pdb_reader = sas_gen.PDBReader()
         self.vtk_reader = sas_gen.VTKReader()
+        # parsed structures are kept on disk, within the configured budget,
+        # so reloading a file is fast
+        self.sld_cache = None
+        if config.GSC_SLD_CACHE_MB > 0:
+            try:
+                self.sld_cache = SLDFileCache(max_disk_bytes=int(config.GSC_SLD_CACHE_MB*2**20))
+            except OSError as exc:
+                logging.warning("Generic SAS Calculator: no SLD file cache: %s", exc)
         self.reader = None
         # sld data for nuclear and magnetic cases
         self.nuc_sld_data = None
@@ -759,7 +768,7 @@ class GenericScatteringCalculator(QtWidgets.QDialog, Ui_GenericScatteringCalcula
                 self.communicator.statusBarUpdateSignal.emit(
                     "Loading File {}".format(os.path.basename(
                         str(self.datafile))))
-                self.reader = GenReader(path=str(self.datafile), loader=loader,
+                self.reader = GenReader(path=str(self.datafile), loader=loader, cache=self.sld_cache,
                                         completefn=lambda data=None: self.complete_loading_ex(data=data, load_nuc=load_nuc),
                                         updatefn=self.load_update)
                 self.reader.queue()
@@ -1456,8 +1465,9 @@ class GenericScatteringCalculator(QtWidgets.QDialog, Ui_GenericScatteringCalcula
 
         Gen compute complete function
 
-        This function separates the range of q or (qx,qy) into chunks and then
-        calculates each chunk with calls to the model.
+        The model splits the calculation into blocks itself (row blocks of
+        the Debye sum in 1D, tiles of the q grid in 2D) and reports progress
+        and checks for cancellation between blocks.
 
         :param input: input list [qx_data, qy_data, i_out]
         :type input: list
@@ -1466,38 +1476,26 @@ class GenericScatteringCalculator(QtWidgets.QDialog, Ui_GenericScatteringCalcula
         update_rate = 1.0       # seconds between updates
         next_update = timer() + update_rate if update is not None else numpy.inf
         nq = len(input[0])
-        chunk_size = 32 if self.is_avg else 256
-        out = []
-        # the 1D AUSAXS calculator cannot be chunked
-        if self.is_avg and not len(input[1]):
+        def progress(percentage):
+            nonlocal next_update
+            t = timer()
+            if t > next_update:
+                update(time=t, percentage=percentage)
+                next_update = t + update_rate
+        self.model.set_callbacks(progress=progress if update is not None else None,
+                                 abort=lambda: self.cancelCalculation)
+        try:
             self.data_to_plot = self.model.runXY(input)
-
-        # chunk the other calculations to allow cancellation        
-        else:
-            for ind in range(0, nq, chunk_size):
-                t = timer()
-                if t > next_update:
-                    update(time=t, percentage=100*ind/nq)
-                    time.sleep(0.01)
-                    next_update = t + update_rate
-                if self.is_avg:
-                    inputi = [input[0][ind:ind + chunk_size], []]
-                    outi = self.model.run(inputi)
-                else:
-                    inputi = [input[0][ind:ind + chunk_size],
-                            input[1][ind:ind + chunk_size]]
-                    outi = self.model.runXY(inputi)
-                out.append(outi)
-                if self.cancelCalculation:
-                    update(time=t, percentage=100*(ind + chunk_size)/nq) # ensure final progress shown
-                    self.data_to_plot = numpy.full(nq, numpy.nan)
-                    self.data_to_plot[:ind + chunk_size] = numpy.hstack(out)
-                    logging.info('Gen computation cancelled.')
-                    break
-            else:
-                out = numpy.hstack(out)
-                self.data_to_plot = out
-                logging.info('Gen computation completed.')
+            logging.info('Gen computation completed.')
+        except CalculationCancelled as exc:
+            # keep the part of the 2D pattern finished before the cancel
+            self.data_to_plot = exc.partial
+            logging.info('Gen computation cancelled.')
+        except KeyboardInterrupt:
+            self.data_to_plot = numpy.full(nq, numpy.nan)
+            logging.info('Gen computation cancelled.')
+        finally:
+            self.model.set_callbacks()
 
         # if Beta(Q) Calculation has been requested, run calculation
         if self.is_beta:
@@ -1,6 +1,5 @@
 
 import numpy as np
-import math
 
 # global
 from PySide6.QtGui import QStandardItem, QDoubleValidator
@@ -31,30 +30,63 @@ from sas.qtgui.Utilities.Reports import ReportBase
 from sas.qtgui.Plotting.PlotterData import Data1D
 
 from sas.sascalc.corfunc.corfunc_calculator import CorfuncCalculator, CalculationError
+from sas.sascalc.corfunc.batch import batch_corfunc, default_extrapolation_parameters
+from sas.sascalc.corfunc.transform_thread import CorfuncThread
 
 from sas.sascalc.corfunc.calculation_data import (
     TransformedData,  TangentMethod, LongPeriodMethod,
-    GuinierData, PorodData,
+    GuinierData, PorodData, SettableExtrapolationParameters,
     ExtrapolationParameters, ExtrapolationInteractionState)
 
 from .UI.CorfuncPanel import Ui_CorfuncDialog
 from .util import WIDGETS, safe_float
 from .SaveExtrapolatedPopup import SaveExtrapolatedPopup
 from ..perspective import Perspective
+from ..batch_analysis import BatchAnalysis
 
 
-class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
+class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective, BatchAnalysis):
     """Displays the correlation function analysis of sas data."""
 
     name = "Corfunc"
     ext = "crf"
 
+    batch_analysis = "correlation function analysis"
+    batch_title = "Batch Corfunc Results"
+    # Column keys of sas.sascalc.corfunc.batch, with their headers
+    batch_columns = [('long_period', 'Long period [Å]'),
+                     ('hard_block_thickness', 'Average hard block thickness [Å]'),
+                     ('soft_block_thickness', 'Average soft block thickness [Å]'),
+                     ('interface_thickness', 'Average interface thickness [Å]'),
+                     ('core_thickness', 'Average core thickness [Å]'),
+                     ('local_crystallinity', 'Local crystallinity'),
+                     ('polydispersity_ryan', 'Polydispersity (Ryan)'),
+                     ('polydispersity_stribeck', 'Polydispersity (Stribeck)'),
+                     ('background', 'Background [1/cm]'),
+                     ('guinier_A', 'Guinier A'), ('guinier_B', 'Guinier B'),
+                     ('porod_K', 'Porod K'), ('porod_sigma', 'Porod sigma'),
+                     ('tangent_point_z', 'Tangent point z [Å]'),
+                     ('tangent_point_gamma', 'Tangent point γ'),
+                     ('tangent_gradient', 'Tangent gradient [1/Å]'),
+                     ('first_minimum_z', 'First minimum z [Å]'),
+                     ('first_minimum_gamma', 'First minimum γ'),
+                     ('first_maximum_z', 'First maximum z [Å]'),
+                     ('first_maximum_gamma', 'First maximum γ'),
+                     ('hard_block_z', 'Hard block z [Å]'),
+                     ('hard_block_gamma', 'Hard block γ'),
+                     ('interface_z', 'Interface z [Å]'),
+                     ('core_z', 'Core z [Å]'),
+                     ('error', 'Error')]
+    batch_help = "/user/qtgui/Perspectives/Corfunc/corfunc_help.html"
+
     @property
     def title(self):
         """ Window title """
         return "Corfunc Perspective"
 
     trigger = QtCore.Signal(TransformedData)
+    calculationProgressSignal = QtCore.Signal(float, str)
+    calculationCompleteSignal = QtCore.Signal(dict)
 
 # pylint: disable=unused-argument
     def __init__(self, parent=None):
@@ -81,7 +113,9 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
         self._tangent_method: Optional[TangentMethod] = None
 
         self._calculator: Optional[CorfuncCalculator] = None
+        self._thread: Optional[CorfuncThread] = None
         self._running = False
+        self._cancelling = False
 
         # Add slider widget
         self.slider = CorfuncSlider()
@@ -148,6 +182,8 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
         """Connect the buttons to their appropriate slots."""
 
         self.cmdExtract.clicked.connect(self._run)
+        self.calculationProgressSignal.connect(self._show_progress)
+        self.calculationCompleteSignal.connect(self._calculation_completed)
         self.cmdExtract.setEnabled(False)
 
         self.cmdSave.clicked.connect(self.on_save_transformed)
@@ -244,6 +280,7 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
         """Remove the existing data reference from the Invariant Persepective"""
         if not data_list or self._model_item not in data_list:
             return
+        self._stop()
         # Clear data plots
         self._q_space_plot.data = None
         self._q_space_plot.extrap = None
@@ -282,10 +319,13 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
     def _run(self):
 
         if self._running:
+            # The button cancels the running calculation
+            self._stop()
             return
 
         self._running = True
-        self.cmdExtract.setText("Calculating...")
+        self._cancelling = False
+        self.cmdExtract.setText("Cancel")
         self.cmdExtract.repaint()
 
         # Set up calculator
@@ -316,14 +356,43 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
 
             calculator.porod = porod
 
-        try:
+        # The thread calls back from its own thread, so the results go
+        # through signals to update the page in the main thread
+        self._thread = CorfuncThread(
+            calculator,
+            updatefn=lambda fraction, msg: self.calculationProgressSignal.emit(fraction, msg),
+            completefn=lambda **kwargs: self.calculationCompleteSignal.emit(kwargs))
+        self._thread.queue()
+
+    def _stop(self):
+        """ Stop the running calculation, if any """
+        if self._thread is not None and self._thread.isrunning():
+            self._thread.stop()
+            self._cancelling = True
+            self.cmdExtract.setText("Cancelling...")
+            self.cmdExtract.repaint()
+
+    def _calculation_completed(self, result: dict):
+        """ Show the results of the calculation thread """
+        self._thread = None
+        self._running = False
+        self._cancelling = False
+        self.cmdExtract.setText("Go")
+        self.cmdExtract.repaint()
+
+        if result.get('cancelled', False):
+            logging.info("Corfunc calculation cancelled.")
+            return
 
-            try:
+        calculator = result['calculator']
+        error = result['error']
 
-                calculator.run()
+        try:
 
-            except CalculationError as e:
-                logging.error("CorfuncCalculator could not complete. " + e.msg)
+            if isinstance(error, CalculationError):
+                logging.error("CorfuncCalculator could not complete. " + error.msg)
+            elif error is not None:
+                raise error
 
             self._calculator = calculator
 
@@ -379,11 +448,48 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
             self.cmdSaveExtrapolation.setEnabled(False)
             self.set_background_warning()
 
-        self.cmdExtract.setText("Go")
-        self.cmdExtract.repaint()
 
-        self._running = False
+    def _show_progress(self, fraction, msg):
+        """ Show the progress of the transforms on the button """
+        if self._running and not self._cancelling:
+            self.cmdExtract.setText("Cancel (%d%%)" % (100*fraction))
+            self.cmdExtract.repaint()
+
+    def batchSettings(self):
+        """
+        Return the settings of the page as arguments of
+        sas.sascalc.corfunc.batch.batch_corfunc
 
+        The extrapolation points and the fixed values of the page are used
+        when it holds data, otherwise every frame gets its default points
+        and all the values are fitted.
+        """
+        settings = dict(extrapolation_parameters=None,
+                        tangent_method=self._tangent_method,
+                        long_period_method=self._long_period_method)
+        if not self.has_data:
+            return settings
+
+        settings['extrapolation_parameters'] = SettableExtrapolationParameters(
+            safe_float(self.model.item(WIDGETS.W_QMIN).text()),
+            safe_float(self.model.item(WIDGETS.W_QMAX).text()),
+            safe_float(self.model.item(WIDGETS.W_QCUTOFF).text()))
+        if not self.fitBackground.isChecked():
+            settings['background'] = safe_float(self.txtBackground.text())
+        if not self.fitGuinier.isChecked():
+            settings['guinier'] = GuinierData(A=safe_float(self.txtGuinierA.text()),
+                                              B=safe_float(self.txtGuinierB.text()))
+        if not self.fitPorod.isChecked():
+            settings['porod'] = PorodData(K=safe_float(self.txtPorodK.text()),
+                                          sigma=safe_float(self.txtPorodSigma.text()))
+        return settings
+
+    def batchResults(self, frames, settings):
+        """
+        Perform the correlation function analysis of a batch on a pool of processes.
+        """
+        return [dict(result.row(), error=result.error)
+                for result in batch_corfunc(frames, n_workers=None, **settings)]
 
     def setup_mapper(self):
         """Creating mapping between model and gui elements."""
@@ -427,9 +533,10 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
 
     def allowBatch(self):
         """
-        We cannot perform corfunc analysis in batch at this time.
+        Tell the caller that we accept multiple data instances, analysed
+        as a batch
         """
-        return False
+        return True
 
     def allowSwap(self):
         """
@@ -454,7 +561,10 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
         Obtain a QStandardItem object and dissect it to get Data1D/2D
         Pass it over to the calculator
         """
-
+        if is_batch and isinstance(data_item, list) and len(data_item) > 1:
+            # Batch results go to a table and leave the page as it is
+            self.calculateBatch(data_item)
+            return
 
         if self.has_data:
             msg = "Data is already loaded into the Corfunc perspective. Sending a new data set "
@@ -465,6 +575,8 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
             if retval == QtWidgets.QMessageBox.Cancel:
                 return
 
+        self._stop()
+
         model_item = data_item[0]
         data = GuiUtils.dataFromItem(model_item)
         self.data = data
@@ -489,20 +601,15 @@ class CorfuncWindow(QtWidgets.QDialog, Ui_CorfuncDialog, Perspective):
         self._q_space_plot.extrap = None
 
         # Put the slider in sensible places
-        log_data_min = math.log(min(self.data.x))
-        log_data_max = math.log(max(self.data.x))
-
         self.cmdExtract.setEnabled(True)
 
-        def fractional_position(f):
-            return math.exp(f*log_data_max + (1-f)*log_data_min)
-
+        points = default_extrapolation_parameters(self.data.x)
         self.model.setItem(WIDGETS.W_QMIN,
-                           QtGui.QStandardItem("%.7g"%fractional_position(0.2)))
+                           QtGui.QStandardItem("%.7g"%points.point_1))
         self.model.setItem(WIDGETS.W_QMAX,
-                           QtGui.QStandardItem("%.7g"%fractional_position(0.7)))
+                           QtGui.QStandardItem("%.7g"%points.point_2))
         self.model.setItem(WIDGETS.W_QCUTOFF,
-                           QtGui.QStandardItem("%.7g"%fractional_position(0.8)))
+                           QtGui.QStandardItem("%.7g"%points.point_3))
 
 
         # Reconnect model
@@ -12,6 +12,7 @@ from sas.qtgui.Plotting.PlotterData import Data1D
 from sasdata.dataloader.loader import Loader
 from sas.qtgui.MainWindow.DataManager import DataManager
 import sas.qtgui.Utilities.GuiUtils as GuiUtils
+from sas.qtgui.UnitTesting.TestUtils import sendBatch
 
 
 class CorfuncTest:
@@ -173,6 +174,21 @@ class CorfuncTest:
         widget.removeData([self.fakeData])
         self.testDefaults()
 
+    def testBatchSettings(self, widget, mocker):
+        """ Batch mode sends every 1D data set to the batch calculation """
+        settings = sendBatch(widget, self.fakeData, mocker)
+        # Without data on the page every frame gets its own defaults
+        assert settings['extrapolation_parameters'] is None
+        assert 'background' not in settings
+        # The page is not changed by a batch
+        assert not widget.has_data
+
+        widget.setData([self.fakeData])
+        widget.fitBackground.setChecked(False)
+        settings = widget.batchSettings()
+        assert settings['extrapolation_parameters'].point_1 == float(widget.txtLowerQMax.text())
+        assert settings['background'] == float(widget.txtBackground.text())
+
     def checkFakeDataState(self, widget):
         assert widget.txtFilename.text() == 'data'
         assert widget.txtLowerQMin.text() == '0.0'
@@ -5,6 +5,7 @@ import traceback
 import logging
 
 from sas.sascalc.data_util.calcthread import CalcThread
+from sas.sascalc.fit.batch import batch_workers, fit_batch
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +33,8 @@ class FitThread(CalcThread):
                  updatefn=None,
                  yieldtime=0.03,
                  worktime=0.03,
-                 reset_flag=False):
+                 reset_flag=False,
+                 n_workers=1):
         CalcThread.__init__(self,
                             completefn,
                             updatefn,
@@ -48,6 +50,10 @@ class FitThread(CalcThread):
         self.updatefn = updatefn
         #Relative error desired in the sum of squares.
         self.reset_flag = reset_flag
+        # Number of processes for independent fits; 0 for one per CPU
+        self.n_workers = n_workers
+        # Fraction complete of each fit of a parallel batch fit
+        self.batch_fractions = {}
 
     def isquit(self):
         """
@@ -59,6 +65,20 @@ class FitThread(CalcThread):
             msg = "Fitting: terminated by the user."
             raise KeyboardInterrupt(msg)
 
+    def batchProgress(self, k, n):
+        """
+        Report the number of completed fits of a parallel batch fit
+        """
+        logger.info("Batch fitting: %d of %d fits complete", k, n)
+
+    def batchStepProgress(self, index, current, expected):
+        """
+        Report the progress within the fits of a parallel batch fit
+        """
+        self.batch_fractions[index] = min(current/expected, 1.0) if expected else 0.0
+        if self.handler is not None:
+            self.handler.progress(sum(self.batch_fractions.values()), len(self.fitter))
+
     def compute(self):
         """
         Perform a fit
@@ -66,17 +86,26 @@ class FitThread(CalcThread):
         msg = ""
         try:
             fitter_size = len(self.fitter)
-            list_handler = [self.handler]*fitter_size
-            list_curr_thread = [self]*fitter_size
-            list_reset_flag = [self.reset_flag]*fitter_size
-            list_map_get_attr = [map_getattr]*fitter_size
-            list_fit_function = ['fit']*fitter_size
-            list_q = [None]*fitter_size
-
-            inputs = list(zip(list_map_get_attr, self.fitter, list_fit_function,
-                         list_q, list_q, list_handler, list_curr_thread,
-                         list_reset_flag))
-            result = list(map(map_apply, inputs))
+            if batch_workers(self.n_workers, fitter_size) > 1:
+                # Independent fits run on a pool of processes
+                result = fit_batch(self.fitter,
+                                   n_workers=self.n_workers,
+                                   reset_flag=self.reset_flag,
+                                   isquit=self.isquit,
+                                   progress=self.batchProgress,
+                                   step_progress=self.batchStepProgress)
+            else:
+                list_handler = [self.handler]*fitter_size
+                list_curr_thread = [self]*fitter_size
+                list_reset_flag = [self.reset_flag]*fitter_size
+                list_map_get_attr = [map_getattr]*fitter_size
+                list_fit_function = ['fit']*fitter_size
+                list_q = [None]*fitter_size
+
+                inputs = list(zip(list_map_get_attr, self.fitter, list_fit_function,
+                             list_q, list_q, list_handler, list_curr_thread,
+                             list_reset_flag))
+                result = list(map(map_apply, inputs))
             results = (result, time.time()-self.starttime)
             if self.handler:
                 self.completefn(results)
@@ -46,7 +46,7 @@ class FittingOptions(PreferencesWidget, Ui_FittingOptions):
         self.setupUi(self)
 
         self.config = config
-        self.config_params = ['FITTING_DEFAULT_OPTIMIZER']
+        self.config_params = ['FITTING_DEFAULT_OPTIMIZER', 'FITTING_BATCH_WORKERS']
 
         # Fill up the algorithm combo, based on what BUMPS says is available
         self.active_fitters = [n.name for n in fitters.FITTERS if n.id in fitters.FIT_ACTIVE_IDS and 'least' not in n.id]
@@ -63,12 +63,16 @@ class FittingOptions(PreferencesWidget, Ui_FittingOptions):
         # previous algorithm choice
         self.previous_index = default_index
 
+        self.sbBatchWorkers.setValue(sasview_config.FITTING_BATCH_WORKERS)
+
         # Assign appropriate validators
         self.assignValidators()
 
         # To prevent errors related to parent, connect the combo box changes once the widget is instantiated
         self.cbAlgorithm.currentIndexChanged.connect(self.onAlgorithmChange)
         self.cbAlgorithmDefault.currentIndexChanged.connect(self.onDefaultAlgorithmChange)
+        self.sbBatchWorkers.valueChanged.connect(
+            lambda value: self._stageChange('FITTING_BATCH_WORKERS', value))
 
     #
     # Preference Widget required methods
@@ -79,6 +83,7 @@ class FittingOptions(PreferencesWidget, Ui_FittingOptions):
     def _toggleBlockAllSignaling(self, toggle: bool):
         self.cbAlgorithm.blockSignals(toggle)
         self.cbAlgorithmDefault.blockSignals(toggle)
+        self.sbBatchWorkers.blockSignals(toggle)
 
     def _restoreFromConfig(self):
         optimizer_key = sasview_config.FITTING_DEFAULT_OPTIMIZER
@@ -87,6 +92,7 @@ class FittingOptions(PreferencesWidget, Ui_FittingOptions):
         name = [n.name for n in fitters.FITTERS if n.id == self.current_fitter_id][0]
         self.cbAlgorithm.setCurrentIndex(self.cbAlgorithm.findText(name))
         self._algorithm_change(self.cbAlgorithm.currentIndex())
+        self.sbBatchWorkers.setValue(sasview_config.FITTING_BATCH_WORKERS)
 
     def assignValidators(self):
         """
@@ -1957,6 +1957,10 @@ class FittingWidget(QtWidgets.QWidget, Ui_FittingWidgetUI):
 
         # Create the fitting thread, based on the fitter
         completefn = self.batchFittingCompleted if self.is_batch_fitting else self.fittingCompleted
+        # Chain fits depend on the previous result, so only plain batch fits run in parallel
+        n_workers = 1
+        if self.is_batch_fitting and not self.is_chain_fitting:
+            n_workers = config.FITTING_BATCH_WORKERS
 
         self.calc_fit = FitThread(handler=handler,
                                   fn=fitters,
@@ -1965,7 +1969,8 @@ class FittingWidget(QtWidgets.QWidget, Ui_FittingWidgetUI):
                                   page_id=[[self.page_id]],
                                   updatefn=updater,
                                   completefn=completefn,
-                                  reset_flag=self.is_chain_fitting)
+                                  reset_flag=self.is_chain_fitting,
+                                  n_workers=n_workers)
 
         if config.USING_TWISTED:
             # start the trhrhread with twisted
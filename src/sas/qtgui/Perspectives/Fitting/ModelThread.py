@@ -7,6 +7,7 @@ import numpy
 import math
 from sas.sascalc.data_util.calcthread import CalcThread
 from sas.sascalc.fit.MultiplicationModel import MultiplicationModel
+from sas.sascalc.fit.model_cache import calculate_Iq, evalDistribution
 from sas import config
 
 class Calc2D(CalcThread):
@@ -87,7 +88,7 @@ class Calc2D(CalcThread):
             value = fn.get_value()
         else:
             # calculation w/o smearing
-            value = self.model.evalDistribution([
+            value = evalDistribution(self.model, [
                 self.data.qx_data[index_model],
                 self.data.qy_data[index_model]
             ])
@@ -186,7 +187,7 @@ class Calc1D(CalcThread):
                 mask = self.data.x[first_bin:last_bin+1]
                 unsmeared_output = numpy.zeros((len(self.data.x)))
 
-            return_data = self.model.calculate_Iq(mask)
+            return_data = calculate_Iq(self.model, mask)
             if isinstance(return_data, tuple):
                 # see sasmodels beta_approx: SasviewModel.calculate_Iq
                 # TODO: implement intermediate results in smearers
@@ -210,7 +211,7 @@ class Calc1D(CalcThread):
                 unsmeared_data=unsmeared_data[index]
                 unsmeared_error=unsmeared_error
         else:
-            return_data = self.model.calculate_Iq(self.data.x[index])
+            return_data = calculate_Iq(self.model, self.data.x[index])
             if isinstance(return_data, tuple):
                 # see sasmodels beta_approx: SasviewModel.calculate_Iq
                 return_data, intermediate_results = return_data
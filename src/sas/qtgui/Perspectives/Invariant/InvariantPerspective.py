@@ -11,11 +11,13 @@ from twisted.internet import reactor
 
 # sas-global
 from sas.sascalc.invariant import invariant
+from sas.sascalc.invariant.batch import batch_invariant
 from sas.qtgui.Plotting.PlotterData import Data1D, DataRole
 import sas.qtgui.Utilities.GuiUtils as GuiUtils
 
 # local
 from ..perspective import Perspective
+from ..batch_analysis import BatchAnalysis
 from .UI.TabbedInvariantUI import Ui_tabbedInvariantUI
 from .InvariantDetails import DetailsDialog
 from .InvariantUtils import WIDGETS
@@ -34,7 +36,7 @@ BG_WHITE = "background-color: rgb(255, 255, 255);"
 BG_RED = "background-color: rgb(244, 170, 164);"
 
 
-class InvariantWindow(QtWidgets.QDialog, Ui_tabbedInvariantUI, Perspective):
+class InvariantWindow(QtWidgets.QDialog, Ui_tabbedInvariantUI, Perspective, BatchAnalysis):
     # The controller which is responsible for managing signal slots connections
     # for the gui and providing an interface to the data model.
 
@@ -42,6 +44,18 @@ class InvariantWindow(QtWidgets.QDialog, Ui_tabbedInvariantUI, Perspective):
     name = "Invariant"
     ext = 'inv'
 
+    batch_analysis = "invariant calculation"
+    batch_title = "Batch Invariant Results"
+    # Result keys of sas.sascalc.invariant.batch, with their headers
+    batch_columns = [('qstar', 'Q* [1/(cm Å^3)]'), ('qstar_err', 'Q* (Err)'),
+                     ('qstar_data', 'Q* data'), ('qstar_low', 'Q* low-Q'),
+                     ('qstar_high', 'Q* high-Q'), ('power_low', 'Low-Q power'),
+                     ('power_high', 'High-Q power'), ('volume_fraction', 'Volume fraction'),
+                     ('volume_fraction_err', 'Volume fraction (Err)'),
+                     ('surface', 'Specific surface [1/Å]'),
+                     ('surface_err', 'Specific surface (Err)'), ('error', 'Error')]
+    batch_help = "/user/qtgui/Perspectives/Invariant/invariant_help.html"
+
     @property
     def title(self):
         """ Perspective name """
@@ -242,6 +256,39 @@ class InvariantWindow(QtWidgets.QDialog, Ui_tabbedInvariantUI, Perspective):
         d.addCallback(self.deferredPlot)
         d.addErrback(self.calculationFailed)
 
+    def batchSettings(self):
+        """
+        Return the settings of the page as arguments of
+        sas.sascalc.invariant.batch.compute_invariant
+        """
+        self.updateFromModel()
+
+        def limit(text):
+            try:
+                return float(text)
+            except ValueError:
+                return None
+
+        low = high = None
+        if self._low_extrapolate:
+            low = dict(npts=int(self._low_points),
+                       function="guinier" if self._low_guinier else "power_law",
+                       power=None if self._low_fit else self._low_power_value,
+                       q_limit=limit(self.txtExtrapolQMin.text()))
+        if self._high_extrapolate:
+            high = dict(npts=int(self._high_points), function="power_law",
+                        power=None if self._high_fit else self._high_power_value,
+                        q_limit=limit(self.txtExtrapolQMax.text()))
+        return dict(background=self._background, scale=self._scale,
+                    contrast=self._contrast, porod_const=self._porod,
+                    low=low, high=high)
+
+    def batchResults(self, frames, settings):
+        """
+        Perform the Invariant calculations of a batch on a pool of processes.
+        """
+        return batch_invariant(frames, n_workers=None, **settings)
+
     def calculationFailed(self, reason): # TODO: rename to on_calculation_failed
         print("calculation failed: ", reason) # TODO: Print to log
         self.allow_calculation()
@@ -925,6 +972,11 @@ class InvariantWindow(QtWidgets.QDialog, Ui_tabbedInvariantUI, Perspective):
         """
         assert data_item is not None
 
+        if is_batch and isinstance(data_item, list) and len(data_item) > 1:
+            # Batch results go to a table and leave the page as it is
+            self.calculateBatch(data_item)
+            return
+
         if self.txtName.text() == data_item[0].text():
             logging.info('This file is already loaded in Invariant panel.')
             return
@@ -1127,9 +1179,10 @@ class InvariantWindow(QtWidgets.QDialog, Ui_tabbedInvariantUI, Perspective):
 
     def allowBatch(self):
         """
-        Tell the caller that we don't accept multiple data instances
+        Tell the caller that we accept multiple data instances, computed
+        as a batch
         """
-        return False
+        return True
 
     def allowSwap(self):
         """
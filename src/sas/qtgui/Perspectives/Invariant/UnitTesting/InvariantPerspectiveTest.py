@@ -15,6 +15,7 @@ from sas.qtgui.Perspectives.Invariant.InvariantUtils import WIDGETS
 from sas.qtgui.Plotting.PlotterData import Data1D
 
 import sas.qtgui.Utilities.GuiUtils as GuiUtils
+from sas.qtgui.UnitTesting.TestUtils import sendBatch
 
 
 BG_COLOR_ERR = 'background-color: rgb(244, 170, 164);'
@@ -166,7 +167,7 @@ class InvariantPerspectiveTest:
     def checkControlDefaults(self, widget):
         # All values in this list should assert to False
         false_list = [
-            widget._allow_close, widget.allowBatch(),
+            widget._allow_close,
             # disabled buttons
             widget.cmdStatus.isEnabled(), widget.cmdCalculate.isEnabled(),
             # read only text boxes
@@ -211,6 +212,26 @@ class InvariantPerspectiveTest:
         assert widget.cmdCalculate.text() == 'Calculating...'
         assert not widget.cmdCalculate.isEnabled()
 
+    def testBatchSettings(self, widget, mocker):
+        """ Batch mode sends every 1D data set to the batch calculation """
+        settings = sendBatch(widget, self.fakeData, mocker)
+        assert settings['low'] is None and settings['high'] is None
+        # The page is not changed by a batch
+        assert widget._data is None
+
+        widget.chkLowQ.setChecked(True)
+        settings = widget.batchSettings()
+        assert settings['low']['function'] == 'guinier'
+        assert settings['low']['q_limit'] == float(widget.txtExtrapolQMin.text())
+
+    def testCalculateBatchThread(self, widget):
+        """ The results are paired with the data names, in order """
+        self.data.name = "frame"
+        results = widget.calculateBatchThread([self.data, self.data], widget.batchSettings())
+        assert [name for name, _ in results] == ["frame", "frame"]
+        assert results[0][1]['qstar'] > 0
+        assert results[0][1]['qstar'] == results[1][1]['qstar']
+
     def testUpdateFromModel(self, widget):
         """
         update the globals based on the data in the model
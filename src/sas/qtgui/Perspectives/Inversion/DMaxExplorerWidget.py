@@ -8,7 +8,6 @@ their distribution as a function of D_max.
 
 # global
 import logging
-import numpy as np
 from PySide6 import QtCore
 from PySide6 import QtGui
 from PySide6 import QtWidgets
@@ -18,6 +17,7 @@ from PySide6.QtGui import QIcon
 # sas-global
 from sas.qtgui.Plotting.PlotterData import Data1D
 from sas.qtgui.Plotting.Plotter import PlotterWidget
+from sas.sascalc.pr.distance_explorer import DistExplorer
 import sas.qtgui.Utilities.GuiUtils as GuiUtils
 
 # local
@@ -115,53 +115,30 @@ class DmaxWindow(QtWidgets.QDialog, Ui_DmaxExplorer):
         if not self.mapper:
             return
 
-        iq0 = []
-        rg = []
-        pos = []
-        pos_err = []
-        osc = []
-        bck = []
-        chi2 = []
-        plotable_xs = [] #Introducing this to make sure size of x and y for plotting is the same.8
         try:
             dmin = float(self.model.item(W.DMIN).text())
             dmax = float(self.model.item(W.DMAX).text())
             npts = int(self.model.item(W.NPTS).text())
-            xs = np.linspace(dmin, dmax, npts)
         except ValueError as e:
             msg = ("An input value is not correctly formatted. Please check {}"
-                   .format(e.message))
+                   .format(e))
             logger.error(msg)
+            return
 
-        original = self.pr_state.d_max
-
-        for x in xs:
-            self.pr_state.d_max = x
-            try:
-                out, cov = self.pr_state.invert(self.pr_state.nfunc)
-
-                iq0.append(self.pr_state.iq0(out))
-                rg.append(self.pr_state.rg(out))
-                pos.append(self.pr_state.get_positive(out))
-                pos_err.append(self.pr_state.get_pos_err(out, cov))
-                osc.append(self.pr_state.oscillations(out))
-                bck.append(self.pr_state.background)
-                chi2.append(self.pr_state.chi2)
-                plotable_xs.append(x)
-            except Exception as ex:
-                # This inversion failed, skip this D_max value
-                msg = "ExploreDialog: inversion failed "
-                msg += "for D_max=%s\n%s" % (str(x), ex)
-                logger.error(msg)
-
-        #Return the invertor to its original state
-        self.pr_state.d_max = original
-        try:
-            self.pr_state.invert(self.nfunc)
-        except RuntimeError as ex:
-            msg = "ExploreDialog: inversion failed "
-            msg += "for D_max=%s\n%s" % (str(x), ex)
+        # The D_max points are inverted in parallel on copies of pr_state,
+        # which is left unchanged
+        results = DistExplorer(self.pr_state)(dmin, dmax, npts)
+        for msg in results.errors:
             logger.error(msg)
+        # Only successful inversions are returned, so x and y have the same size
+        plotable_xs = results.d_max
+        iq0 = results.iq0
+        rg = results.rg
+        pos = results.pos
+        pos_err = results.pos_err
+        osc = results.osc
+        bck = results.bck
+        chi2 = results.chi2
 
         plotter = self.dependentVariable.currentText()
         x_label = "D_{max}"
@@ -1,5 +1,6 @@
 from typing import List, Tuple
 
+from PySide6.QtCore import Signal
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QFormLayout, QComboBox, QDoubleSpinBox
 
 from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import AngularDistribution
@@ -9,6 +10,10 @@ from sas.qtgui.Perspectives.ParticleEditor.GeodesicSampleSelector import Geodesi
 
 class ParametersForm(QWidget):
     """ Form that displays the parameters associated with the class (also responsible for generating the sampler)"""
+
+    # Emitted when a parameter changes
+    changed = Signal()
+
     def __init__(self, sampling_class: type, parent=None):
         super().__init__(parent=parent)
 
@@ -34,6 +39,8 @@ class ParametersForm(QWidget):
             else:
                 raise TypeError(f"Cannot create appropriate widget for parameter of type '{cls}'")
 
+            widget.valueChanged.connect(lambda _: self.changed.emit())
+
             self.layout.addRow(text, widget)
             self.parameter_callbacks.append((parameter_name, callback))
 
@@ -51,6 +58,9 @@ class ParametersForm(QWidget):
 class AngularSamplingMethodSelector(QWidget):
     """ Selects the method for doing angular sampling, and provides access to the parameters """
 
+    # Emitted when the method or its parameters change
+    changed = Signal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -72,6 +82,7 @@ class AngularSamplingMethodSelector(QWidget):
 
         for widget in self.entry_widgets:
             self.subwidget_layout.addWidget(widget)
+            widget.changed.connect(self.changed.emit)
             widget.hide()
 
         self.entry_widgets[0].show()
@@ -84,6 +95,8 @@ class AngularSamplingMethodSelector(QWidget):
 
         self.subwidget_layout.itemAt(self.combo.currentIndex()).widget().show()
 
+        self.changed.emit()
+
     def generate_sampler(self) -> AngularDistribution:
         """ Create the angular distribution sampler spectified by the current settings"""
         return self.subwidget_layout.itemAt(self.combo.currentIndex()).widget().generate_sampler()
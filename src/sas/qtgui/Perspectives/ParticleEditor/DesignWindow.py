@@ -4,7 +4,7 @@ from typing import Optional
 from datetime import datetime
 
 import numpy as np
-from PySide6 import QtWidgets
+from PySide6 import QtWidgets, QtCore
 from PySide6.QtWidgets import QSpacerItem, QSizePolicy
 from PySide6.QtCore import Qt
 
@@ -16,6 +16,8 @@ from sas.qtgui.Perspectives.ParticleEditor.OutputViewer import OutputViewer
 from sas.qtgui.Perspectives.ParticleEditor.CodeToolBar import CodeToolBar
 
 from sas.qtgui.Perspectives.ParticleEditor.Plots.QCanvas import QCanvas
+from sas.qtgui.Perspectives.ParticleEditor.Plots.RDFCanvas import RDFCanvas
+from sas.qtgui.Perspectives.ParticleEditor.Plots.CorrelationCanvas import CorrelationCanvas
 
 
 from sas.qtgui.Perspectives.ParticleEditor.function_processor import process_code, FunctionDefinitionFailed
@@ -25,7 +27,8 @@ from sas.qtgui.Perspectives.ParticleEditor.vectorise import vectorise_sld
 from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import (
 
     QSample, ScatteringCalculation, CalculationParameters, AngularDistribution, SpatialDistribution,
-    SLDDefinition, SLDFunction, MagnetismDefinition, ParticleDefinition, CoordinateSystemTransform, ScatteringOutput)
+    SLDDefinition, SLDFunction, MagnetismDefinition, ParticleDefinition, CoordinateSystemTransform, ScatteringOutput,
+    CalculationProgress, CalculationMethod)
 
 from sas.qtgui.Perspectives.ParticleEditor.ParameterFunctionality.ParameterTableModel import ParameterTableModel
 from sas.qtgui.Perspectives.ParticleEditor.ParameterFunctionality.ParameterTable import ParameterTable
@@ -38,7 +41,8 @@ from sas.qtgui.Perspectives.ParticleEditor.sampling.points import RandomCube as
 
 from sas.qtgui.Perspectives.ParticleEditor.util import format_time_estimate
 
-from sas.qtgui.Perspectives.ParticleEditor.calculations.calculate import calculate_scattering
+from sas.qtgui.Perspectives.ParticleEditor.calculations.calculate import calculation_size, calculation_terms
+from sas.qtgui.Perspectives.ParticleEditor.calculations.scattering_thread import ScatteringThread
 
 def safe_float(text: str):
     try:
@@ -49,6 +53,11 @@ def safe_float(text: str):
 
 class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
     """ Main window for the particle editor"""
+
+    # Results of the scattering thread, passed to the GUI thread
+    calculationProgressSignal = QtCore.Signal(object)
+    calculationCompleteSignal = QtCore.Signal(dict)
+
     def __init__(self, parent=None):
         super().__init__()
 
@@ -120,6 +129,8 @@ class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
 
         self.topLayout.addWidget(self.angularSamplingMethodSelector, 0, 1)
 
+        self.angularSamplingMethodSelector.changed.connect(self.onTimeEstimateParametersChanged)
+
         self.structureFactorCombo.addItem("None") # TODO: Structure Factor Options
 
 
@@ -130,6 +141,11 @@ class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
         for option in self.methodComboOptions:
             self.methodCombo.addItem(option)
 
+        for method in CalculationMethod:
+            self.calculationMethodCombo.addItem(method.value, method)
+
+        self.calculationMethodCombo.currentIndexChanged.connect(self.onTimeEstimateParametersChanged)
+
         # Spatial sampling changed
         self.nSamplePoints.valueChanged.connect(self.onTimeEstimateParametersChanged)
 
@@ -152,6 +168,17 @@ class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
 
         self.qSpaceTab.setLayout(outputLayout)
 
+        # Real space outputs, from the distance histogram method
+
+        self.rdfCanvas = RDFCanvas()
+        self.correlationCanvas = CorrelationCanvas()
+
+        realSpaceLayout = QtWidgets.QVBoxLayout()
+        realSpaceLayout.addWidget(self.rdfCanvas)
+        realSpaceLayout.addWidget(self.correlationCanvas)
+
+        self.realSpaceTab.setLayout(realSpaceLayout)
+
         #
         # Misc
         #
@@ -163,9 +190,13 @@ class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
 
         # Set up variables
 
-        self.last_calculation_time: Optional[float] = None
-        self.last_calculation_n_r: int = 0
-        self.last_calculation_n_q: int = 0
+        # Terms of the scattering calculation done per second, measured on the last calculation with each method
+        self.last_calculation_throughput: dict[CalculationMethod, float] = {}
+
+        self.calculationThread: Optional[ScatteringThread] = None
+        self.runningCalculation: Optional[ScatteringCalculation] = None
+        self.calculationProgressSignal.connect(self.onCalculationProgress)
+        self.calculationCompleteSignal.connect(self.onCalculationComplete)
 
         self.sld_function: Optional[SLDFunction] = None
         self.sld_coordinate_mapping: Optional[CoordinateSystemTransform] = None
@@ -177,20 +208,21 @@ class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
             self.sampleRadius.setValue(self.functionViewer.radius_control.radius())
 
     def onTimeEstimateParametersChanged(self):
-        """ Called when the number of samples changes """
+        """ Called when the number of spatial, angular or q samples changes """
 
-        # TODO: This needs to be updated based on the number of angular samples now
-        # Should have a n_points term
-        # Should have a n_points*n_angles
+        # The time is taken to be proportional to the number of terms in the sum over
+        # spatial points, orientations and q values, at the rate measured on the last calculation
 
-        # Update the estimate of time
-        # Assume the amount of time is just determined by the number of
-        # sample points (the sld calculation is the limiting factor)
+        method = self.calculationMethod()
 
-        if self.last_calculation_time is not None:
-            time_per_sample = self.last_calculation_time / self.last_calculation_n_r
+        if method in self.last_calculation_throughput:
+            n_terms = calculation_terms(
+                method,
+                int(self.nSamplePoints.value()),
+                self.angularDistribution().n_points,
+                int(self.qSamplesBox.value()))
 
-            est_time = time_per_sample * int(self.nSamplePoints.value()) * int(self.qSamplesBox.value())
+            est_time = n_terms / self.last_calculation_throughput[method]
 
             self.timeEstimateLabel.setText(f"Estimated Time: {format_time_estimate(est_time)}")
 
@@ -253,6 +285,10 @@ class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
         """ Get the AngularDistribution object that represents the GUI selected orientational distribution"""
         return self.angularSamplingMethodSelector.generate_sampler()
 
+    def calculationMethod(self) -> CalculationMethod:
+        """ Get the method used to calculate the scattering """
+        return self.calculationMethodCombo.currentData()
+
     def qSampling(self) -> QSample:
         q_min = float(self.qMinBox.text()) # TODO: Use better box
         q_max = float(self.qMaxBox.text())
@@ -309,8 +345,8 @@ class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
         """ Get a numpy vector representing the GUI specified polarisation vector"""
         return np.array([0,0,1])
 
-    def currentSeed(self):
-        return self.randomSeed
+    def currentSeed(self) -> Optional[int]:
+        return int(self.randomSeed.text()) if self.fixRandomSeed.isChecked() else None
 
     def scatteringCalculation(self) -> ScatteringCalculation:
         """ Get the ScatteringCalculation object that represents the calculation that
@@ -333,46 +369,98 @@ class DesignWindow(QtWidgets.QDialog, Ui_DesignWindow):
             polarisation_vector=polarisation_vector,
             seed=seed,
             bounding_surface_sld_check=bounding_surface_check,
-            sample_chunk_size_hint=100_000
+            sample_chunk_size_hint=100_000,
+            calculation_method=self.calculationMethod()
             )
 
     def doScatter(self):
-        """ Scatter functionality requested"""
+        """ Scatter functionality requested, or cancel the running calculation"""
+
+        if self.calculationThread is not None and self.calculationThread.isrunning():
+            self.codeText("Cancelling scattering calculation...")
+            self.calculationThread.stop()
+            return
 
         # attempt to build
         # don't do scattering if build fails
 
         build_success = self.doBuild()
 
-        self.codeText("Calculating scattering...")
-
         if build_success:
-            calc = self.scatteringCalculation()
             try:
-                scattering_result = calculate_scattering(calc)
-
-                # Time estimates
-                self.last_calculation_time = scattering_result.calculation_time
-                self.last_calculation_n_r = calc.spatial_sampling_method.n_points
+                calc = self.scatteringCalculation()
+            except Exception:
+                self.codeError(traceback.format_exc())
+                return
 
-                self.onTimeEstimateParametersChanged()
+            self.codeText("Calculating scattering...")
 
-                # Output info
-                self.codeText("Scattering calculation complete after %g seconds."%scattering_result.calculation_time)
-                self.display_calculation_result(scattering_result)
+            # The calculation runs in its own thread, the results come back to the GUI thread through signals
+            self.calculationThread = ScatteringThread(
+                updatefn=lambda progress: self.calculationProgressSignal.emit(progress),
+                completefn=lambda **kwargs: self.calculationCompleteSignal.emit(kwargs))
 
-            except Exception:
-                self.codeError(traceback.format_exc())
+            self.runningCalculation = calc
+            self.calculationThread.queue(calc)
 
+            self.codeToolBar.scatterButton.setText("Cancel")
 
         else:
             self.codeError("Build failed, scattering cancelled")
 
+    def updateThroughput(self, calc: ScatteringCalculation, fraction_done: float, elapsed_time: float):
+        """ Record the rate of the calculation for the time estimates """
+        if elapsed_time > 0 and fraction_done > 0:
+            self.last_calculation_throughput[calc.calculation_method] = fraction_done * calculation_size(calc) / elapsed_time
+
+    def onCalculationProgress(self, progress: CalculationProgress):
+        """ Show the scattering of the points done so far (GUI thread) """
+
+        if self.runningCalculation is None:
+            return
+
+        # Cancelled calculations still give a measure of the throughput
+        self.updateThroughput(self.runningCalculation, progress.fraction, progress.elapsed_time)
+
+        remaining_time = progress.elapsed_time * (1 - progress.fraction) / progress.fraction
+        self.timeEstimateLabel.setText(
+            f"{100 * progress.fraction:.0f}% done, {format_time_estimate(remaining_time)} remaining")
+
+        if progress.partial_result is not None:
+            self.outputCanvas.data = progress.partial_result
+
+    def onCalculationComplete(self, result: dict):
+        """ Called in the GUI thread when the scattering thread finishes """
+
+        self.codeToolBar.scatterButton.setText("Scatter")
+
+        self.runningCalculation = None
+
+        if result.get("cancelled", False):
+            self.codeWarning("Scattering calculation cancelled")
+
+        elif "error" in result:
+            self.codeError(result["error"])
+
+        else:
+            scattering_result = result["output"]
+
+            # Time estimates
+            self.updateThroughput(result["calculation"], 1.0, scattering_result.calculation_time)
+
+            # Output info
+            self.codeText("Scattering calculation complete after %g seconds."%scattering_result.calculation_time)
+            self.display_calculation_result(scattering_result)
+
+        self.onTimeEstimateParametersChanged()
+
     def display_calculation_result(self, scattering_result: ScatteringOutput):
         """ Update graphs and select tab"""
 
         # Plot
         self.outputCanvas.data = scattering_result
+        self.rdfCanvas.data = scattering_result
+        self.correlationCanvas.data = scattering_result
 
         self.tabWidget.setCurrentIndex(5)  # Move to output tab if complete
     def onFit(self):
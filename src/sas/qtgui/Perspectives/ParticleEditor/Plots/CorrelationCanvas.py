@@ -5,11 +5,11 @@ from typing import Optional
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
-from sas.qtgui.Perspectives.ParticleEditor.old_calculations import ScatteringOutput
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import ScatteringOutput
 
 
 class CorrelationCanvas(FigureCanvas):
-    """ Plot window for output from scattering calculations"""
+    """ Plot window for the correlation function from scattering calculations"""
 
     def __init__(self, parent=None, width=5, height=4, dpi=100):
         self.parent = parent
@@ -31,28 +31,16 @@ class CorrelationCanvas(FigureCanvas):
 
         self.axes.cla()
 
-        if self._data.q_space is not None:
-            if self._data.q_space.correlation_data is not None:
+        if self._data.correlation_function is not None:
 
-                plot_data = scattering_output.q_space.correlation_data
+            plot_data = self._data.correlation_function
 
-                r = plot_data.abscissa
-                rho = plot_data.ordinate
+            self.axes.plot(plot_data.abscissa, plot_data.ordinate)
 
-                self.axes.plot(r, rho)
+            if plot_data.upper_error is not None and plot_data.lower_error is not None:
+                self.axes.fill_between(plot_data.abscissa, plot_data.lower_error, plot_data.upper_error, alpha=0.3)
 
-                import numpy as np
+            self.axes.set_xlabel("r (Ang)")
+            self.axes.set_ylabel("Correlation")
 
-                R = 50
-
-                f1 = lambda r: 1 - (3 / 4) * (r / R) + (1 / 16) * (r / R) ** 3
-                def f(x):
-                    out = np.zeros_like(x)
-                    x_in = x[x <= 2 * R]
-                    out[x <= 2 * R] = f1(x_in)
-                    return out
-
-                self.axes.plot(r, f(r)/6)
-
-
-        self.draw()
\ No newline at end of file
+        self.draw()
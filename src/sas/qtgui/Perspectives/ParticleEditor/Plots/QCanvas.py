@@ -61,6 +61,9 @@ class QCanvas(FigureCanvas):
             else:
                 self.axes.semilogy(q_values, i_values)
 
+            if plot_data.upper_error is not None and plot_data.lower_error is not None:
+                self.axes.fill_between(q_values, plot_data.lower_error, plot_data.upper_error, alpha=0.3)
+
 
 
         self.draw()
\ No newline at end of file
@@ -5,11 +5,11 @@ from typing import Optional
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
-from sas.qtgui.Perspectives.ParticleEditor.old_calculations import ScatteringOutput
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import ScatteringOutput
 
 
 class RDFCanvas(FigureCanvas):
-    """ Plot window for output from scattering calculations"""
+    """ Plot window for the pair distance distribution from scattering calculations"""
 
     def __init__(self, parent=None, width=5, height=4, dpi=100):
         self.parent = parent
@@ -33,6 +33,14 @@ class RDFCanvas(FigureCanvas):
 
         if self._data.radial_distribution is not None:
 
-            self.axes.plot(self._data.radial_distribution[0], self._data.radial_distribution[1])
+            plot_data = self._data.radial_distribution
 
-        self.draw()
\ No newline at end of file
+            self.axes.plot(plot_data.abscissa, plot_data.ordinate)
+
+            if plot_data.upper_error is not None and plot_data.lower_error is not None:
+                self.axes.fill_between(plot_data.abscissa, plot_data.lower_error, plot_data.upper_error, alpha=0.3)
+
+            self.axes.set_xlabel("r (Ang)")
+            self.axes.set_ylabel("p(r)")
+
+        self.draw()
@@ -1,8 +1,14 @@
 import time
+from typing import Optional, Callable
+
+import numpy as np
 
 from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import \
-    ScatteringCalculation, QSpaceScattering, ScatteringOutput
+    ScatteringCalculation, QSpaceScattering, ScatteringOutput, CalculationProgress, CalculationMethod
 from sas.qtgui.Perspectives.ParticleEditor.calculations.fq import scattering_via_fq
+from sas.qtgui.Perspectives.ParticleEditor.calculations.debye import debye, DEFAULT_CHUNK_SIZE as DEBYE_CHUNK_SIZE
+from sas.qtgui.Perspectives.ParticleEditor.calculations.histogram import (
+    pair_distance_histogram, histogram_scattering, DEFAULT_CHUNK_SIZE as HISTOGRAM_CHUNK_SIZE)
 from sas.qtgui.Perspectives.ParticleEditor.calculations.boundary_check import (
     check_sld_continuity_at_boundary, check_mag_zero_at_boundary)
 
@@ -12,11 +18,56 @@ class SLDBoundaryMismatch(Exception):
 class MagBoundaryNonZero(Exception):
     pass
 
+class CalculationCancelled(Exception):
+    pass
+
+class AnisotropicDebyeCalculation(Exception):
+    pass
+
+
+def calculation_terms(method: CalculationMethod, n_points: int, n_angles: int, n_q: int) -> int:
+    """ Number of terms in a scattering calculation, used to estimate its duration """
+    if method == CalculationMethod.DEBYE:
+        return (n_points * (n_points + 1) // 2) * n_q
+    elif method == CalculationMethod.HISTOGRAM:
+        return n_points * (n_points + 1) // 2
+    else:
+        return n_points * n_angles * n_q
+
+
+def calculation_size(calculation: ScatteringCalculation) -> int:
+    """ Number of terms in the scattering calculation, used to estimate its duration """
+    return calculation_terms(
+        calculation.calculation_method,
+        calculation.spatial_sampling_method.n_points,
+        calculation.angular_sampling.n_points,
+        calculation.q_sampling.n_points)
+
+
+def calculate_scattering(
+        calculation: ScatteringCalculation,
+        progress_callback: Optional[Callable[[CalculationProgress], None]] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None) -> ScatteringOutput:
+    """ Calculate the scattering specified by a ScatteringCalculation
+
+    The Debye and histogram methods only calculate orientationally averaged scattering, which is
+    scaled to match the total weight of the angular distribution, as the sum of amplitudes is.
+    The histogram method also gives the pair distance distribution and the correlation function.
 
-def calculate_scattering(calculation: ScatteringCalculation) -> ScatteringOutput:
+    :param progress_callback: called after each chunk of sample points with a CalculationProgress,
+        which holds the scattering estimated from the points done so far
+    :param is_cancelled: polled after each chunk of sample points, the calculation
+        stops with CalculationCancelled when it returns True
+    """
 
     start_time = time.time()
 
+    orientationally_averaged = calculation.calculation_method in (CalculationMethod.DEBYE, CalculationMethod.HISTOGRAM)
+
+    if orientationally_averaged and not calculation.angular_sampling.is_isotropic:
+        raise AnisotropicDebyeCalculation(
+            f"The {calculation.calculation_method.value} method can only be used for orientationally averaged scattering")
+
     # If required, check that SLD/Mag at the boundary of the sample volume matches the rest of the space
     if calculation.bounding_surface_sld_check:
         if not check_sld_continuity_at_boundary(calculation):
@@ -33,36 +84,88 @@ def calculate_scattering(calculation: ScatteringCalculation) -> ScatteringOutput
     q_dist = calculation.q_sampling
     angular_dist = calculation.angular_sampling
 
-    scattering = scattering_via_fq(
-        sld_definition=sld_def,
-        magnetism_definition=mag_def,
-        parameters=params,
-        point_generator=spatial_dist,
-        q_sample=q_dist,
-        angular_distribution=angular_dist)
+    def chunk_done(points_done, n_points, partial_scattering):
+        if is_cancelled is not None and is_cancelled():
+            raise CalculationCancelled(f"Scattering calculation cancelled after {points_done} of {n_points} points")
 
-    q_data = QSpaceScattering(q_dist, scattering)
+        if progress_callback is not None:
+            elapsed_time = time.time() - start_time
+            partial_output = ScatteringOutput(
+                q_space=QSpaceScattering(q_dist, partial_scattering),
+                calculation_time=elapsed_time,
+                seed_used=None)
 
-    output = ScatteringOutput(
-        q_space=q_data,
-        calculation_time=time.time() - start_time,
-        seed_used=None)
-
-    return output
+            progress_callback(CalculationProgress(points_done, n_points, elapsed_time, partial_output))
 
+    scattering_error = None
+    radial_distribution = None
+    correlation_function = None
 
+    if orientationally_averaged:
+        _, direction_weights = angular_dist.sample_points_and_weights()
+        total_weight = np.sum(direction_weights)
 
+    if calculation.calculation_method == CalculationMethod.DEBYE:
 
+        def debye_chunk_done(pairs_done, n_pairs, partial_scattering):
+            chunk_done(pairs_done, n_pairs, total_weight * partial_scattering)
 
+        scattering = total_weight * debye(
+            sld_definition=sld_def,
+            magnetism_definition=mag_def,
+            parameters=params,
+            point_generator=spatial_dist,
+            q_sample=q_dist,
+            chunk_size=min(calculation.sample_chunk_size_hint, DEBYE_CHUNK_SIZE),
+            chunk_callback=debye_chunk_done)
 
+    elif calculation.calculation_method == CalculationMethod.HISTOGRAM:
 
+        q = q_dist()
 
+        def histogram_chunk_done(pairs_done, n_pairs, histogram):
+            chunk_done(pairs_done, n_pairs, total_weight * (n_pairs / pairs_done) * histogram.intensity(q))
 
+        histogram = pair_distance_histogram(
+            sld_definition=sld_def,
+            magnetism_definition=mag_def,
+            parameters=params,
+            point_generator=spatial_dist,
+            bin_count=calculation.bin_count,
+            chunk_size=min(calculation.sample_chunk_size_hint, HISTOGRAM_CHUNK_SIZE),
+            chunk_callback=histogram_chunk_done)
 
+        histogram_output = histogram_scattering(histogram, q, seed=calculation.seed)
 
+        scattering = total_weight * histogram_output.intensity
+        if histogram_output.intensity_error is not None:
+            scattering_error = total_weight * histogram_output.intensity_error
 
+        radial_distribution = histogram_output.radial_distribution
+        correlation_function = histogram_output.correlation_function
 
+    else:
 
+        scattering = scattering_via_fq(
+            sld_definition=sld_def,
+            magnetism_definition=mag_def,
+            parameters=params,
+            point_generator=spatial_dist,
+            q_sample=q_dist,
+            angular_distribution=angular_dist,
+            chunk_size=calculation.sample_chunk_size_hint,
+            chunk_callback=chunk_done)
 
+    if scattering_error is None:
+        q_data = QSpaceScattering(q_dist, scattering)
+    else:
+        q_data = QSpaceScattering(q_dist, scattering, scattering + scattering_error, scattering - scattering_error)
 
+    output = ScatteringOutput(
+        q_space=q_data,
+        calculation_time=time.time() - start_time,
+        seed_used=None,
+        radial_distribution=radial_distribution,
+        correlation_function=correlation_function)
 
+    return output
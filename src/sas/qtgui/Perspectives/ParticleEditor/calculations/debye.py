@@ -1,122 +1,179 @@
-from typing import Optional, Tuple
-import time
+""" Orientationally averaged scattering from the Debye formula
+
+    I(q) = sum_i sum_j sld_i sld_j sin(q r_ij) / (q r_ij)
+
+The sum is taken over pairs of chunks of sample points, so the points are never all held in
+memory at once, and only the chunks on and above the diagonal of the symmetric pair matrix
+are visited. With numba each pair of chunks is shared between threads, without it pairs of
+chunks are given to a pool of threads.
+"""
+from typing import Optional, Callable
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
 
 import numpy as np
-from scipy.interpolate import interp1d
-from scipy.special import jv as bessel
 from scipy.spatial.distance import cdist
 
 from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import (
-    ScatteringCalculation, ScatteringOutput, OrientationalDistribution, SamplingDistribution,
-    QSpaceScattering, QSpaceCalcDatum, RealSpaceScattering,
-    SLDDefinition, MagnetismDefinition, SpatialSample, QSample, CalculationParameters)
+    SLDDefinition, MagnetismDefinition, QSample, CalculationParameters)
 
-from sas.qtgui.Perspectives.ParticleEditor.sampling.chunking import SingleChunk, pairwise_chunk_iterator
+from sas.qtgui.Perspectives.ParticleEditor.sampling.chunking import Chunks
 from sas.qtgui.Perspectives.ParticleEditor.sampling.points import SpatialDistribution
 
 from sas.qtgui.Perspectives.ParticleEditor.calculations.run_function import run_sld, run_magnetism
 
+try:
+    if os.environ.get('SAS_NUMBA', '1').lower() in ('1', 'yes', 'true', 't'):
+        from numba import njit, prange, get_num_threads
+        USE_NUMBA = True
+    else:
+        raise ImportError("fail")
+except ImportError:
+    USE_NUMBA = False
+
+#: Default number of points in each chunk
+DEFAULT_CHUNK_SIZE = 2_000
+
+#: Upper limit on the memory of the temporaries used for each pair of chunks [bytes]
+DEFAULT_MAX_MEMORY = 64*2**20
+
+
 def debye(
         sld_definition: SLDDefinition,
         magnetism_definition: Optional[MagnetismDefinition],
         parameters: CalculationParameters,
         point_generator: SpatialDistribution,
         q_sample: QSample,
-        minor_chunk_size=1000,
-        preallocate=True):
-
-    q = q_sample()
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        chunk_callback: Optional[Callable[[int, int, np.ndarray], None]] = None,
+        n_workers: Optional[int] = None,
+        max_memory: int = DEFAULT_MAX_MEMORY) -> np.ndarray:
+    """ Orientationally averaged scattering intensity, from the pair distances of the sample points
+
+    :param chunk_size: number of points in each chunk of the pair matrix
+    :param chunk_callback: called after each pair of chunks with the number of point pairs done, the
+        total number of point pairs and the intensity estimated from the pairs done so far. It may raise
+        to stop the calculation.
+    :param n_workers: number of threads working on different pairs of chunks; defaults to the number
+        of CPUs without numba, and to one with numba, whose kernel is already parallel
+    :param max_memory: limit on the size of the temporaries for each pair of chunks, in bytes
+    """
+
+    if magnetism_definition is not None:
+        raise NotImplementedError("Magnetism not implemented yet")
+        # TODO: implement magnetism
+
+    q = np.ascontiguousarray(q_sample(), dtype=float)
+    chunks = Chunks(point_generator, chunk_size)
+
+    if n_workers is None:
+        n_workers = 1 if USE_NUMBA else (os.cpu_count() or 1)
+
+    # Pairs are counted in both orders, and with the self pairs
+    n_pairs = point_generator.n_points**2
+    pairs_done = 0
+
+    def evaluate(points):
+        """ Coordinates and SLD of a chunk, evaluated in the calling thread """
+        x, y, z = points
+        sld = run_sld(sld_definition, parameters, x, y, z)
+        return (np.ascontiguousarray(np.column_stack((x, y, z)), dtype=float),
+                np.array(np.broadcast_to(sld, x.shape), dtype=float))
+
+    def blocks():
+        for i in range(chunks.n_chunks):
+            row = evaluate(chunks.chunk(i))
+            yield row, row, True
+            for j in range(i + 1, chunks.n_chunks):
+                yield row, evaluate(chunks.chunk(j)), False
+
+    def run_block(row, column, diagonal):
+        n_block_pairs = len(row[1]) * len(column[1]) * (1 if diagonal else 2)
+        return n_block_pairs, _debye_block(row[0], row[1], column[0], column[1], q, diagonal, max_memory)
 
     output = np.zeros_like(q)
 
-
-    # First chunking layer, chunks for dealing with VERY large sample densities
-    # Uses less memory at the cost of using more processing power
-    for (x1_large, y1_large, z1_large), (x2_large, y2_large, z2_large) in SingleChunk(point_generator):
-        sld1 = run_sld(sld_definition, parameters, x1_large, y1_large, z1_large)
-        sld2 = run_sld(sld_definition, parameters, x2_large, y2_large, z2_large)
-
-        if magnetism_definition is None:
-
-            sld1_total_large = sld1
-            sld2_total_large = sld2
-
-        else:
-            raise NotImplementedError("Magnetism not implemented yet")
-            # TODO: implement magnetism
-
-
-
-        # TODO: Preallocation, do we want it
-        if preallocate:
-            r_data_1 = np.zeros((minor_chunk_size, minor_chunk_size))
-            r_data_2 = np.zeros((minor_chunk_size, minor_chunk_size))
-            rq_data = np.zeros((minor_chunk_size**2, q_sample.n_points))
-
-        for one, two in pairwise_chunk_iterator(
-                left_data=(x1_large, y1_large, z1_large, sld1_total_large),
-                right_data=(x2_large, y2_large, z2_large, sld2_total_large),
-                chunk_size=minor_chunk_size):
-
-            (x1, y1, z1, sld_total_1) = one
-            (x2, y2, z2, sld_total_2) = two
-
-            # Optimised calculation of euclidean distance, use pre-allocated memory
-
-            if preallocate:
-                n1 = len(x1)
-                n2 = len(x2)
-
-                r_data_1[:n1, :n2] = np.subtract.outer(x1, x2)
-                r_data_1 **= 2
-
-                r_data_2[:n1, :n2] = np.subtract.outer(y1, y2)
-                r_data_1[:n1, :n2] += r_data_2[:n1, :n2] ** 2
-
-                r_data_2[:n1, :n2] = np.subtract.outer(z1, z2)
-                r_data_1[:n1, :n2] += r_data_2[:n1, :n2] ** 2
-
-                np.sqrt(r_data_1, out=r_data_1) # in place sqrt
-
-                r_data_2[:n1, :n2] = np.multiply.outer(sld_total_1, sld_total_2)
-
-                # Build a table of r times q values
-
-                rq_data[:(n1 * n2), :] = np.multiply.outer(r_data_1[:n1, :n2].reshape(-1), q)
-
-                # Calculate sinc part
-                rq_data[:(n1 * n2), :] = np.sinc(rq_data[:(n1 * n2), :])
-
-
-                # Multiply by paired density
-                rq_data[:(n1 * n2), :] *= r_data_2[:n1, :n2].reshape(-1, 1)
-
-
-                # Multiply by r squared
-                np.multiply(r_data_1, r_data_1, out=r_data_1)
-                rq_data[:(n1 * n2), :] *= r_data_1[:n1, :n2].reshape(-1, 1)
-
-                # Add to q data
-                output += np.sum(rq_data, axis=0)
-
+    if n_workers == 1:
+        results = (run_block(*block) for block in blocks())
+    else:
+        executor = ThreadPoolExecutor(max_workers=n_workers)
+        results = _bounded_map(executor, run_block, blocks(), 2*n_workers)
+
+    try:
+        for n_block_pairs, intensity in results:
+            output += intensity
+            pairs_done += n_block_pairs
+            if chunk_callback is not None:
+                chunk_callback(pairs_done, n_pairs, (n_pairs / pairs_done) * output)
+    finally:
+        if n_workers != 1:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return output
+
+
+def _bounded_map(executor, function, arguments, max_pending):
+    """ Like executor.map, but with at most max_pending calls submitted ahead of the results """
+    pending = deque()
+    for args in arguments:
+        pending.append(executor.submit(function, *args))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+if USE_NUMBA:
+    @njit("f8[:](f8[:, :], f8[:], f8[:, :], f8[:], f8[:], b1, i8)", parallel=True, fastmath=True)
+    def _debye_block(xyz1, sld1, xyz2, sld2, q, diagonal, max_memory):
+        # Each thread accumulates into its own row so no locking is needed.
+        # Rows are dealt out round-robin to balance the triangular workload
+        # of the diagonal blocks.
+        n1, n2, n_q = len(sld1), len(sld2), len(q)
+        n_threads = get_num_threads()
+        partial = np.zeros((n_threads, n_q))
+        for t in prange(n_threads):
+            for a in range(t, n1, n_threads):
+                xa, ya, za, wa = xyz1[a, 0], xyz1[a, 1], xyz1[a, 2], sld1[a]
+                for b in range(a + 1 if diagonal else 0, n2):
+                    r = np.sqrt((xyz2[b, 0] - xa)**2 + (xyz2[b, 1] - ya)**2 + (xyz2[b, 2] - za)**2)
+                    w = wa*sld2[b]
+                    for k in range(n_q):
+                        qr = q[k]*r
+                        if qr > 0.0:
+                            partial[t, k] += w*np.sin(qr)/qr
+                        else:
+                            partial[t, k] += w
+        intensity = 2*partial.sum(axis=0)
+        if diagonal:
+            intensity += np.sum(sld1*sld1)
+        return intensity
+else:
+    def _debye_block(xyz1, sld1, xyz2, sld2, q, diagonal, max_memory):
+        # Rows of the block are taken a few at a time so that the pair x q
+        # sinc matrix and its argument fit in max_memory
+        n1, n2, n_q = len(sld1), len(sld2), len(q)
+        q_pi = q/np.pi  # np.sinc(x) = sin(pi x)/(pi x)
+        intensity = np.zeros(n_q)
+        row_block = max(max_memory // (2*8*n_q*max(n2, 1)), 1)
+        for start in range(0, n1, row_block):
+            stop = min(start + row_block, n1)
+            r = cdist(xyz1[start:stop], xyz2)
+            w = np.multiply.outer(sld1[start:stop], sld2)
+            if diagonal:
+                upper = np.arange(n2)[None, :] > np.arange(start, stop)[:, None]
+                r, w = r[upper], w[upper]
             else:
-
-                # Non optimised
-                r_squared = np.subtract.outer(x1, x2) ** 2 + \
-                                np.subtract.outer(y1, y2) ** 2 + \
-                                np.subtract.outer(z1, z2) ** 2
-
-                # print(r_squared.shape)
-
-                correl = sld_total_1.reshape(1, -1) * sld_total_2.reshape(-1, 1)
-                correl = correl.reshape(-1, 1)
-
-                rq = np.sqrt(r_squared.reshape(-1, 1)) * q.reshape(1,-1)
-
-                # print(rq.shape)
-
-                output += np.sum(r_squared.reshape(-1, 1) * correl * np.sinc(rq), axis=0)
-                # output += np.sum(r_squared.reshape(-1, 1) * correl * np.sinc(rq), axis=0)
-
-
-    return output
\ No newline at end of file
+                r, w = r.reshape(-1), w.reshape(-1)
+            intensity += np.sinc(np.multiply.outer(q_pi, r)) @ w
+        intensity *= 2
+        if diagonal:
+            intensity += np.sum(sld1*sld1)
+        return intensity
+_debye_block.__doc__ = """
+    Debye sum over the pairs of points of two chunks, counting each pair in both orders.
+
+    For a diagonal block (both chunks the same) only the pairs a < b are visited, and the
+    self terms are added.
+    """
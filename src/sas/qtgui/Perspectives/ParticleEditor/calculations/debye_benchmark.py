@@ -1,11 +1,23 @@
-import numpy as np
+""" Benchmark of the Debye and sum of amplitudes methods for orientationally averaged scattering
+
+Run as a script, optionally with the numbers of sample points to use, e.g.
+
+    python -m sas.qtgui.Perspectives.ParticleEditor.calculations.debye_benchmark 1000 4000 16000
+
+The time taken by each method is printed with the median relative difference between them,
+which comes from the finite angular sampling of the sum of amplitudes.
+"""
+import sys
 import time
-import matplotlib.pyplot as plt
 
-from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import SLDDefinition, CalculationParameters, QSample
+import numpy as np
+
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import (
+    SLDDefinition, ParticleDefinition, CalculationParameters, QSample, ScatteringCalculation, CalculationMethod)
 from sas.qtgui.Perspectives.ParticleEditor.sampling.points import Grid
+from sas.qtgui.Perspectives.ParticleEditor.sampling.angles import Uniform
 
-from sas.qtgui.Perspectives.ParticleEditor.calculations.debye import debye
+from sas.qtgui.Perspectives.ParticleEditor.calculations.calculate import calculate_scattering
 
 def sld(x, y, z):
     """ Cube sld """
@@ -30,28 +42,57 @@ calc_params = CalculationParameters(
                 sld_parameters={},
                 magnetism_parameters={})
 
-point_generator = Grid(100, 10_000)
-
 q = QSample(1e-3, 1, 101, True)
 
-for chunk_size in [1000]:
-    for preallocate in [False, True]:
+angular_distribution = Uniform(geodesic_divisions=6)
+
+
+def run(method: CalculationMethod, n_points: int):
+    """ Time taken by a calculation and its result """
+    calculation = ScatteringCalculation(
+        q_sampling=q,
+        angular_sampling=angular_distribution,
+        spatial_sampling_method=Grid(100, n_points),
+        particle_definition=ParticleDefinition(sld_def, None),
+        parameter_settings=calc_params,
+        polarisation_vector=None,
+        seed=None,
+        bounding_surface_sld_check=False,
+        calculation_method=method)
+
+    start_time = time.time()
+    output = calculate_scattering(calculation)
+    return time.time() - start_time, output.q_space.ordinate
+
+
+def main(point_counts=(1_000, 3_000, 10_000, 30_000), plot=True):
+
+    print("%d angular samples, %d q samples" % (angular_distribution.n_points, q.n_points))
+    print("%10s %12s %12s %12s" % ("points", "Debye / s", "F(q) / s", "median diff."))
+
+    results = []
+    for n_points in point_counts:
+        debye_time, debye_output = run(CalculationMethod.DEBYE, n_points)
+        fq_time, fq_output = run(CalculationMethod.FQ, n_points)
+
+        difference = np.median(np.abs(debye_output / fq_output - 1))
+        print("%10d %12.3g %12.3g %12.3g" % (n_points, debye_time, fq_time, difference))
 
-        print("Chunk size %i%s"%(chunk_size, ", preallocate" if preallocate else ""))
+        results.append((n_points, debye_output, fq_output))
 
-        start_time = time.time()
+    if plot:
+        import matplotlib.pyplot as plt
 
-        output = debye(
-            sld_definition=sld_def,
-            magnetism_definition=None,
-            parameters=calc_params,
-            point_generator=point_generator,
-            q_sample=q,
-            minor_chunk_size=chunk_size,
-            preallocate=preallocate)
+        for n_points, debye_output, fq_output in results:
+            plt.loglog(q(), debye_output, label=f"Debye, {n_points} points")
+            plt.loglog(q(), fq_output, linestyle="--", label=f"F(q), {n_points} points")
 
-        print(time.time() - start_time)
+        plt.legend()
+        plt.show()
 
-        plt.loglog(q(), output)
 
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main([int(arg) for arg in sys.argv[1:]])
+    else:
+        main()
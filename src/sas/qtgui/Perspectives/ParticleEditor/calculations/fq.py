@@ -1,11 +1,29 @@
-from typing import Optional, Tuple
+""" Scattering from the sum of the amplitudes of the sample points, F(q) = sum_r sld(r) exp(i q.r)
+
+The amplitudes of blocks of orientations are accumulated as separate real and imaginary
+parts, with a numba kernel when numba is available and blocked matrix products otherwise.
+As the SLD is real, F(-q) is the complex conjugate of F(q), so directions whose opposite is
+also sampled, as on the geodesic sphere, are only computed once.
+"""
+from typing import Optional, Tuple, Callable
+import os
 import time
 
 import numpy as np
 from scipy.interpolate import interp1d
 from scipy.special import jv as bessel
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import cdist
 
+try:
+    if os.environ.get('SAS_NUMBA', '1').lower() in ('1', 'yes', 'true', 't'):
+        from numba import njit, prange
+        USE_NUMBA = True
+    else:
+        raise ImportError("fail")
+except ImportError:
+    USE_NUMBA = False
+
 from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import (
     SLDDefinition, MagnetismDefinition, AngularDistribution, QSample, CalculationParameters)
 
@@ -14,6 +32,13 @@ from sas.qtgui.Perspectives.ParticleEditor.sampling.points import SpatialDistrib
 
 from sas.qtgui.Perspectives.ParticleEditor.calculations.run_function import run_sld, run_magnetism
 
+#: Upper limit on the memory of the temporaries used in the amplitude sums [bytes]
+DEFAULT_MAX_MEMORY = 64*2**20
+
+# Number of q values accumulated together by each thread of the numba kernel
+TILE_Q = 32
+
+
 def scattering_via_fq(
         sld_definition: SLDDefinition,
         magnetism_definition: Optional[MagnetismDefinition],
@@ -21,31 +46,122 @@ def scattering_via_fq(
         point_generator: SpatialDistribution,
         q_sample: QSample,
         angular_distribution: AngularDistribution,
-        chunk_size=1_000_000) -> np.ndarray:
+        chunk_size=1_000_000,
+        chunk_callback: Optional[Callable[[int, int, np.ndarray], None]] = None,
+        max_memory: int = DEFAULT_MAX_MEMORY) -> np.ndarray:
+    """ Orientationally averaged scattering intensity, from the amplitudes of the sample points
+
+    :param chunk_callback: called after each chunk of points with the number of points done, the
+        total number of points and the intensity estimated from the points done so far. It may raise
+        to stop the calculation.
+    :param max_memory: limit on the size of the temporaries of the amplitude sums, in bytes
+    """
 
-    q_magnitudes = q_sample()
+    q_magnitudes = np.ascontiguousarray(q_sample(), dtype=float)
+    n_points = point_generator.n_points
+    points_done = 0
 
     direction_vectors, direction_weights = angular_distribution.sample_points_and_weights()
-    fq = np.zeros((angular_distribution.n_points, q_sample.n_points), dtype=complex)  # Dictionary for fq for all angles
+    direction_vectors, direction_weights = fold_opposite_directions(direction_vectors, direction_weights)
+
+    # Real and imaginary parts of F(q) for each direction
+    shape = (len(direction_weights), len(q_magnitudes))
+    fq_real = np.zeros(shape)
+    fq_imag = np.zeros(shape)
 
     for x, y, z in PointGeneratorStepper(point_generator, chunk_size):
 
-        sld = run_sld(sld_definition, parameters, x, y, z).reshape(-1, 1)
+        sld = run_sld(sld_definition, parameters, x, y, z)
 
         # TODO: Magnetism
 
-        for direction_index, direction_vector in enumerate(direction_vectors):
-
-            projected_distance = x*direction_vector[0] + y*direction_vector[1] + z*direction_vector[2]
-
-            i_r_dot_q = np.multiply.outer(projected_distance, 1j*q_magnitudes)
-
-            if direction_index in fq:
-                fq[direction_index, :] = np.sum(sld*np.exp(i_r_dot_q), axis=0)
-            else:
-                fq[direction_index, :] += np.sum(sld*np.exp(i_r_dot_q), axis=0)
-
-    f_squared = fq.real**2 + fq.imag**2
+        _accumulate_fq(fq_real, fq_imag,
+                       np.ascontiguousarray(np.column_stack((x, y, z)), dtype=float),
+                       np.array(np.broadcast_to(sld, x.shape), dtype=float),
+                       direction_vectors, q_magnitudes, max_memory)
+
+        points_done += len(x)
+        if chunk_callback is not None:
+            # The amplitude of the points done so far, scaled up to all the points
+            chunk_callback(points_done, n_points,
+                           (n_points / points_done)**2 * _intensity(fq_real, fq_imag, direction_weights))
+
+    return _intensity(fq_real, fq_imag, direction_weights)
+
+
+def fold_opposite_directions(direction_vectors: np.ndarray, direction_weights: np.ndarray,
+                             tolerance: float = 1e-9) -> Tuple[np.ndarray, np.ndarray]:
+    """ Merge each direction with its opposite, if that is also sampled
+
+    |F(-q)|^2 = |F(q)|^2 for a real SLD, so only one of each opposite pair is needed,
+    with the sum of their weights.
+    """
+    direction_vectors = np.ascontiguousarray(direction_vectors, dtype=float)
+    direction_weights = np.asarray(direction_weights, dtype=float)
+
+    distance, opposite = cKDTree(direction_vectors).query(-direction_vectors)
+
+    keep = np.ones(len(direction_weights), dtype=bool)
+    weights = direction_weights.copy()
+    for index, (other, separation) in enumerate(zip(opposite, distance)):
+        if separation < tolerance and other > index and keep[index]:
+            weights[index] += weights[other]
+            keep[other] = False
+
+    return direction_vectors[keep], weights[keep]
+
+
+if USE_NUMBA:
+    @njit("void(f8[:, :], f8[:, :], f8[:, :], f8[:], f8[:, :], f8[:], i8)", parallel=True, fastmath=True)
+    def _accumulate_fq(fq_real, fq_imag, xyz, sld, directions, q, max_memory):
+        # Tiles of (direction, block of q) are shared between threads. Each tile
+        # projects the points on its direction once and accumulates the cos and sin
+        # sums in registers, so no point x q temporaries are needed.
+        n_directions, n_q, n_points = len(directions), len(q), len(sld)
+        n_q_blocks = (n_q + TILE_Q - 1) // TILE_Q
+        for tile in prange(n_directions * n_q_blocks):
+            direction = tile // n_q_blocks
+            start = (tile % n_q_blocks) * TILE_Q
+            stop = min(start + TILE_Q, n_q)
+            dx, dy, dz = directions[direction, 0], directions[direction, 1], directions[direction, 2]
+            real = np.zeros(stop - start)
+            imag = np.zeros(stop - start)
+            for p in range(n_points):
+                projected = xyz[p, 0]*dx + xyz[p, 1]*dy + xyz[p, 2]*dz
+                weight = sld[p]
+                for k in range(start, stop):
+                    phase = q[k]*projected
+                    real[k - start] += weight*np.cos(phase)
+                    imag[k - start] += weight*np.sin(phase)
+            for k in range(start, stop):
+                fq_real[direction, k] += real[k - start]
+                fq_imag[direction, k] += imag[k - start]
+else:
+    def _accumulate_fq(fq_real, fq_imag, xyz, sld, directions, q, max_memory):
+        # Blocks of points and directions are limited so that the point x (direction, q)
+        # phase matrix and its cosine or sine fit in max_memory
+        n_directions, n_q, n_points = len(directions), len(q), len(sld)
+        elements = max(max_memory // (2*8), 1)
+        point_block = min(max(elements // n_q, 1), n_points)
+        direction_block = min(max(elements // (point_block*n_q), 1), n_directions)
+        for p_start in range(0, n_points, point_block):
+            p_stop = min(p_start + point_block, n_points)
+            weight = sld[p_start:p_stop]
+            for d_start in range(0, n_directions, direction_block):
+                d_stop = min(d_start + direction_block, n_directions)
+                projected = xyz[p_start:p_stop] @ directions[d_start:d_stop].T
+                phase = np.multiply.outer(projected, q).reshape(p_stop - p_start, -1)
+                fq_real[d_start:d_stop] += (weight @ np.cos(phase)).reshape(-1, n_q)
+                fq_imag[d_start:d_stop] += (weight @ np.sin(phase)).reshape(-1, n_q)
+_accumulate_fq.__doc__ = """
+    Add the real and imaginary parts of sum_p sld[p] exp(i q (xyz[p].direction)) to
+    fq_real and fq_imag, for each direction and q.
+    """
+
+
+def _intensity(fq_real: np.ndarray, fq_imag: np.ndarray, direction_weights: np.ndarray) -> np.ndarray:
+    """ Weighted sum of |F(q)|^2 over the directions """
+    f_squared = fq_real**2 + fq_imag**2
     f_squared *= direction_weights.reshape(-1,1)
 
     return np.sum(f_squared, axis=0)
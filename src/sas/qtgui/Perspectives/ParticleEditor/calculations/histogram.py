@@ -0,0 +1,324 @@
+""" Scattering and real space distributions from an SLD weighted pair distance histogram
+
+The pairs of sample points are binned by distance in one pass over the chunks of the pair
+matrix, weighted by the product of their SLDs. The orientationally averaged intensity is then
+
+    I(q) = sum_k w_k sin(q r_k) / (q r_k)
+
+over the bins k, which costs the number of bins per q value rather than the number of pairs,
+and the histogram itself gives the pair distance distribution p(r) and the correlation function.
+
+When the point generator allows it (e.g. RandomCube), the points are split into sections and
+the histogram is kept for each pair of sections, so that the sections can be resampled to
+estimate the uncertainty of the results.
+"""
+from typing import Optional, Callable
+from dataclasses import dataclass
+import math
+import os
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import (
+    SLDDefinition, MagnetismDefinition, CalculationParameters, RealSpaceScattering)
+
+from sas.qtgui.Perspectives.ParticleEditor.sampling.chunking import Chunks
+from sas.qtgui.Perspectives.ParticleEditor.sampling.points import SpatialDistribution
+
+from sas.qtgui.Perspectives.ParticleEditor.calculations.run_function import run_sld
+
+try:
+    if os.environ.get('SAS_NUMBA', '1').lower() in ('1', 'yes', 'true', 't'):
+        from numba import njit, prange, get_num_threads
+        USE_NUMBA = True
+    else:
+        raise ImportError("fail")
+except ImportError:
+    USE_NUMBA = False
+
+#: Default number of points in each chunk
+DEFAULT_CHUNK_SIZE = 4_000
+
+#: Default number of sections the points are split into for bootstrapping
+DEFAULT_BOOTSTRAP_SECTIONS = 10
+
+#: Default number of bootstrap resamples used for the uncertainties
+DEFAULT_BOOTSTRAP_SAMPLES = 100
+
+#: Upper limit on the memory of the temporaries used for each pair of chunks [bytes]
+DEFAULT_MAX_MEMORY = 64*2**20
+
+
+@dataclass
+class PairDistanceHistogram:
+    """ SLD weighted histogram of the distances between pairs of sample points
+
+    Pairs are counted once, in the section pair (a, b) with a <= b holding their two points,
+    and the self terms sld_i^2 are kept separately for each section.
+    """
+    #: edges of the distance bins [Ang]
+    bin_edges: np.ndarray
+    #: |w| weighted mean distance of the pairs in each bin, or the bin centre for empty bins [Ang]
+    distance: np.ndarray
+    #: weights of the pairs in each pair of sections and bin, shape (n_section_pairs, n_bins)
+    section_weights: np.ndarray
+    #: self terms of each section
+    self_weights: np.ndarray
+    #: number of sample points per unit volume [Ang^-3]
+    point_density: float
+
+    @property
+    def n_sections(self) -> int:
+        return len(self.self_weights)
+
+    @property
+    def bin_centres(self) -> np.ndarray:
+        return (self.bin_edges[1:] + self.bin_edges[:-1]) / 2
+
+    def _section_pair_factors(self, counts: Optional[np.ndarray]) -> np.ndarray:
+        """ Multiplicity of each pair of sections when the sections are taken counts times """
+        if counts is None:
+            return np.ones(len(self.section_weights))
+        upper_a, upper_b = np.triu_indices(self.n_sections)
+        return counts[upper_a] * counts[upper_b]
+
+    def pair_weights(self, counts: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Weights of the pairs of distinct points in each bin, counting each pair in both orders
+
+        :param counts: number of times each section is taken, None for once each
+        """
+        return 2 * (self._section_pair_factors(counts) @ self.section_weights)
+
+    def self_weight(self, counts: Optional[np.ndarray] = None) -> float:
+        """ Sum of sld_i^2 over the points """
+        return float(np.sum(self.self_weights if counts is None else counts * self.self_weights))
+
+    def sinc_matrix(self, q: np.ndarray) -> np.ndarray:
+        """ sin(q r) / (q r) for each q and bin """
+        return np.sinc(np.multiply.outer(q / np.pi, self.distance))
+
+    def intensity(self, q: np.ndarray, counts: Optional[np.ndarray] = None) -> np.ndarray:
+        """ I(q) of the histogram """
+        return self.sinc_matrix(q) @ self.pair_weights(counts) + self.self_weight(counts)
+
+    def radial_distribution(self) -> np.ndarray:
+        """ Pair distance distribution p(r), the pair weight per unit distance """
+        return self.pair_weights() / np.diff(self.bin_edges)
+
+    def correlation_function(self, p_r: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Orientationally averaged SLD correlation function, normalised to 1 at r = 0
+
+        For points with density n, p(r) = 4 pi r^2 n^2 Gamma(r), where Gamma(0) = sum_i sld_i^2 / n
+        """
+        if p_r is None:
+            p_r = self.radial_distribution()
+        gamma_0 = self.self_weight(counts) * 4 * np.pi * self.point_density
+        return p_r / (gamma_0 * self.bin_centres**2) if gamma_0 != 0 else np.zeros_like(p_r)
+
+
+@dataclass
+class HistogramScattering:
+    """ Results of the histogram calculation, with their bootstrap uncertainties when available """
+    histogram: PairDistanceHistogram
+    intensity: np.ndarray
+    intensity_error: Optional[np.ndarray]
+    radial_distribution: RealSpaceScattering
+    correlation_function: RealSpaceScattering
+
+
+def pair_distance_histogram(
+        sld_definition: SLDDefinition,
+        magnetism_definition: Optional[MagnetismDefinition],
+        parameters: CalculationParameters,
+        point_generator: SpatialDistribution,
+        bin_count: int = 1_000,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        bootstrap_sections: int = DEFAULT_BOOTSTRAP_SECTIONS,
+        chunk_callback: Optional[Callable[[int, int, PairDistanceHistogram], None]] = None,
+        max_memory: int = DEFAULT_MAX_MEMORY) -> PairDistanceHistogram:
+    """ Accumulate the SLD weighted pair distance histogram of the sample points
+
+    :param bin_count: number of distance bins, which span the diagonal of the sampled cube
+    :param chunk_size: number of points in each chunk of the pair matrix
+    :param bootstrap_sections: number of sections the points are split into, if the point
+        generator allows bootstrapping
+    :param chunk_callback: called after each pair of chunks with the number of point pairs done,
+        the total number of point pairs and the histogram so far. It may raise to stop the calculation.
+    :param max_memory: limit on the size of the temporaries without numba, in bytes
+    """
+
+    if magnetism_definition is not None:
+        raise NotImplementedError("Magnetism not implemented yet")
+        # TODO: implement magnetism
+
+    n_points = point_generator.n_points
+    n_sections = max(min(bootstrap_sections, n_points), 1) if point_generator.allows_bootstrap else 1
+
+    # No pair is further apart than the diagonal of the cube of side 2*radius
+    max_distance = 2 * math.sqrt(3) * point_generator.radius
+    bin_edges = np.linspace(0, max_distance, bin_count + 1)
+    inv_width = bin_count / max_distance
+
+    # Position of the histogram of each pair of sections
+    section_pair_index = np.zeros((n_sections, n_sections), dtype=np.int64)
+    upper_a, upper_b = np.triu_indices(n_sections)
+    section_pair_index[upper_a, upper_b] = np.arange(len(upper_a))
+    section_pair_index[upper_b, upper_a] = np.arange(len(upper_a))
+
+    n_threads = get_num_threads() if USE_NUMBA else 1
+    weights = np.zeros((n_threads, len(upper_a), bin_count))
+    distance_sum = np.zeros((n_threads, bin_count))
+    distance_norm = np.zeros((n_threads, bin_count))
+    self_weights = np.zeros(n_sections)
+
+    chunks = Chunks(point_generator, chunk_size)
+
+    def evaluate(index):
+        """ Coordinates, SLD and section of the points of a chunk """
+        x, y, z = chunks.chunk(index)
+        sld = np.array(np.broadcast_to(run_sld(sld_definition, parameters, x, y, z), x.shape), dtype=float)
+        start = index * chunk_size
+        sections = (np.arange(start, start + len(x), dtype=np.int64) * n_sections) // n_points
+        return np.ascontiguousarray(np.column_stack((x, y, z)), dtype=float), sld, sections
+
+    def histogram():
+        return PairDistanceHistogram(
+            bin_edges=bin_edges,
+            distance=_mean_distance(distance_sum.sum(axis=0), distance_norm.sum(axis=0), bin_edges),
+            section_weights=weights.sum(axis=0),
+            self_weights=self_weights.copy(),
+            point_density=n_points / point_generator.sample_volume)
+
+    # Pairs are counted in both orders, and with the self pairs
+    n_pairs = n_points**2
+    pairs_done = 0
+
+    for i in range(chunks.n_chunks):
+        row = evaluate(i)
+        np.add.at(self_weights, row[2], row[1]**2)
+
+        for j in range(i, chunks.n_chunks):
+            column = row if j == i else evaluate(j)
+
+            _accumulate_pairs(weights, distance_sum, distance_norm,
+                              row[0], row[1], row[2], column[0], column[1], column[2],
+                              section_pair_index, j == i, inv_width, max_memory)
+
+            pairs_done += len(row[1]) * len(column[1]) * (1 if j == i else 2)
+            if chunk_callback is not None:
+                chunk_callback(pairs_done, n_pairs, histogram())
+
+    return histogram()
+
+
+def _mean_distance(distance_sum, distance_norm, bin_edges):
+    """ Weighted mean distance in each bin, or the bin centre for empty bins """
+    distance = (bin_edges[1:] + bin_edges[:-1]) / 2
+    filled = distance_norm > 0
+    distance[filled] = distance_sum[filled] / distance_norm[filled]
+    return distance
+
+
+def histogram_scattering(
+        histogram: PairDistanceHistogram,
+        q: np.ndarray,
+        bootstrap_samples: int = DEFAULT_BOOTSTRAP_SAMPLES,
+        seed: Optional[int] = None) -> HistogramScattering:
+    """ Intensity, pair distance distribution and correlation function of a histogram
+
+    The uncertainties are the standard deviations over bootstrap resamples of the sections of the
+    points, they are only given when the histogram has more than one section.
+    """
+    intensity = histogram.intensity(q)
+    p_r = histogram.radial_distribution()
+    correlation = histogram.correlation_function(p_r)
+    r = histogram.bin_centres
+
+    if histogram.n_sections < 2:
+        return HistogramScattering(
+            histogram=histogram,
+            intensity=intensity,
+            intensity_error=None,
+            radial_distribution=RealSpaceScattering(r, p_r),
+            correlation_function=RealSpaceScattering(r, correlation))
+
+    rng = np.random.default_rng(seed)
+    sinc = histogram.sinc_matrix(q)
+    bin_widths = np.diff(histogram.bin_edges)
+
+    intensity_samples = np.empty((bootstrap_samples, len(q)))
+    p_r_samples = np.empty((bootstrap_samples, len(r)))
+    correlation_samples = np.empty((bootstrap_samples, len(r)))
+    for sample in range(bootstrap_samples):
+        counts = np.bincount(rng.integers(0, histogram.n_sections, histogram.n_sections),
+                             minlength=histogram.n_sections)
+        pair_weights = histogram.pair_weights(counts)
+        intensity_samples[sample] = sinc @ pair_weights + histogram.self_weight(counts)
+        p_r_samples[sample] = pair_weights / bin_widths
+        correlation_samples[sample] = histogram.correlation_function(p_r_samples[sample], counts)
+
+    intensity_error = np.std(intensity_samples, axis=0)
+    p_r_error = np.std(p_r_samples, axis=0)
+    correlation_error = np.std(correlation_samples, axis=0)
+
+    return HistogramScattering(
+        histogram=histogram,
+        intensity=intensity,
+        intensity_error=intensity_error,
+        radial_distribution=RealSpaceScattering(r, p_r, p_r + p_r_error, p_r - p_r_error),
+        correlation_function=RealSpaceScattering(
+            r, correlation, correlation + correlation_error, correlation - correlation_error))
+
+
+if USE_NUMBA:
+    @njit("void(f8[:, :, :], f8[:, :], f8[:, :], f8[:, :], f8[:], i8[:], f8[:, :], f8[:], i8[:], i8[:, :], b1, f8, i8)",
+          parallel=True, fastmath=True)
+    def _accumulate_pairs(weights, distance_sum, distance_norm,
+                          xyz1, sld1, section1, xyz2, sld2, section2,
+                          section_pair_index, diagonal, inv_width, max_memory):
+        # Each thread accumulates into its own row so no locking is needed.
+        # Rows are dealt out round-robin to balance the triangular workload
+        # of the diagonal blocks.
+        n1, n2 = len(sld1), len(sld2)
+        n_threads, _, n_bins = weights.shape
+        for t in prange(n_threads):
+            for a in range(t, n1, n_threads):
+                xa, ya, za, wa, sa = xyz1[a, 0], xyz1[a, 1], xyz1[a, 2], sld1[a], section1[a]
+                for b in range(a + 1 if diagonal else 0, n2):
+                    r = np.sqrt((xyz2[b, 0] - xa)**2 + (xyz2[b, 1] - ya)**2 + (xyz2[b, 2] - za)**2)
+                    k = min(int(r*inv_width), n_bins - 1)
+                    w = wa*sld2[b]
+                    weights[t, section_pair_index[sa, section2[b]], k] += w
+                    distance_sum[t, k] += abs(w)*r
+                    distance_norm[t, k] += abs(w)
+else:
+    def _accumulate_pairs(weights, distance_sum, distance_norm,
+                          xyz1, sld1, section1, xyz2, sld2, section2,
+                          section_pair_index, diagonal, inv_width, max_memory):
+        # Rows of the block are taken a few at a time so that the pair
+        # temporaries fit in max_memory
+        n1, n2 = len(sld1), len(sld2)
+        _, n_section_pairs, n_bins = weights.shape
+        row_block = max(max_memory // (6*8*max(n2, 1)), 1)
+        for start in range(0, n1, row_block):
+            stop = min(start + row_block, n1)
+            r = cdist(xyz1[start:stop], xyz2)
+            w = np.multiply.outer(sld1[start:stop], sld2)
+            pair = section_pair_index[section1[start:stop, None], section2[None, :]]
+            if diagonal:
+                upper = np.arange(n2)[None, :] > np.arange(start, stop)[:, None]
+                r, w, pair = r[upper], w[upper], pair[upper]
+            else:
+                r, w, pair = r.reshape(-1), w.reshape(-1), pair.reshape(-1)
+            k = np.minimum((r*inv_width).astype(np.int64), n_bins - 1)
+            weights[0] += np.bincount(pair*n_bins + k, weights=w,
+                                      minlength=n_section_pairs*n_bins).reshape(n_section_pairs, n_bins)
+            distance_sum[0] += np.bincount(k, weights=np.abs(w)*r, minlength=n_bins)
+            distance_norm[0] += np.bincount(k, weights=np.abs(w), minlength=n_bins)
+_accumulate_pairs.__doc__ = """
+    Add the pairs of points of two chunks to the histogram of their pair of sections, and
+    their |w| weighted distances to the distance sums of the bins.
+
+    For a diagonal block (both chunks the same) only the pairs a < b are visited.
+    """
@@ -0,0 +1,57 @@
+""" Background thread for scattering calculations """
+import time
+import traceback
+
+from sas.sascalc.data_util.calcthread import CalcThread
+
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import ScatteringCalculation, CalculationProgress
+from sas.qtgui.Perspectives.ParticleEditor.calculations.calculate import calculate_scattering, CalculationCancelled
+
+
+class ScatteringThread(CalcThread):
+    """ Runs calculate_scattering away from the GUI thread
+
+    updatefn is called with progress=CalculationProgress as chunks of sample points finish,
+    at most once every update_interval seconds. completefn is called with the
+    calculation, and either output=ScatteringOutput, cancelled=True, or error=<traceback text>.
+
+    Start the calculation with queue(calculation), cancel it with stop().
+    """
+
+    def __init__(self, updatefn=None, completefn=None, update_interval: float = 0.2):
+        CalcThread.__init__(self, updatefn=updatefn, completefn=completefn)
+        self.update_interval = update_interval
+        self._last_update = 0.0
+
+    def check_if_cancelled(self) -> bool:
+        try:
+            self.isquit()
+        except KeyboardInterrupt:
+            return True
+        return False
+
+    def report_progress(self, progress: CalculationProgress):
+        now = time.perf_counter()
+        if now - self._last_update > self.update_interval or progress.points_done == progress.n_points:
+            self._last_update = now
+            self.ready(delay=0.0)
+            self.update(progress=progress)
+
+    def compute(self, calculation: ScatteringCalculation):
+        self._last_update = time.perf_counter()
+
+        try:
+            output = calculate_scattering(
+                calculation,
+                progress_callback=self.report_progress,
+                is_cancelled=self.check_if_cancelled)
+
+        except (CalculationCancelled, KeyboardInterrupt):
+            self.complete(calculation=calculation, cancelled=True)
+            return
+
+        except Exception:
+            self.complete(calculation=calculation, error=traceback.format_exc())
+            return
+
+        self.complete(calculation=calculation, output=output)
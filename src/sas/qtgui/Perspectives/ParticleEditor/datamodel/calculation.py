@@ -1,5 +1,6 @@
 from typing import Optional, Tuple, List
 import numpy as np
+from enum import Enum
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
@@ -60,6 +61,11 @@ class SpatialDistribution(ABC):
     def _bounding_surface_check_points(self) -> np.ndarray:
         """ Points used to check that the SLD/magnetism vector are zero outside the sample space"""
 
+    @property
+    @abstractmethod
+    def sample_volume(self) -> float:
+        """ Volume of the region the points are sampled from """
+
     def bounding_surface_check_points(self) -> VectorComponents3:
         pts = self._bounding_surface_check_points()
         return pts[:, 0], pts[:, 1], pts[:, 2]
@@ -78,6 +84,11 @@ class AngularDistribution(ABC):
     def name() -> str:
         """ Name of this distribution """
 
+    @property
+    def is_isotropic(self) -> bool:
+        """ Whether this distribution samples all orientations equally """
+        return False
+
 
     @staticmethod
     @abstractmethod
@@ -110,6 +121,13 @@ class ParticleDefinition:
     magnetism: Optional[MagnetismDefinition]
 
 
+class CalculationMethod(Enum):
+    """ Methods for calculating the scattering """
+    FQ = "Sum of Amplitudes"
+    DEBYE = "Debye"
+    HISTOGRAM = "Distance Histogram"
+
+
 @dataclass
 class ScatteringCalculation:
     """ Specification for a scattering calculation """
@@ -123,6 +141,7 @@ class ScatteringCalculation:
     bounding_surface_sld_check: bool
     bin_count = 1_000
     sample_chunk_size_hint: int = 100_000
+    calculation_method: CalculationMethod = CalculationMethod.FQ
 
 
 @dataclass
@@ -142,6 +161,8 @@ class QSpaceScattering:
 class RealSpaceScattering:
     abscissa: np.ndarray
     ordinate: np.ndarray
+    upper_error: np.ndarray | None = None
+    lower_error: np.ndarray | None = None
 
 
 @dataclass
@@ -149,5 +170,23 @@ class ScatteringOutput:
     q_space: Optional[QSpaceScattering]
     calculation_time: float
     seed_used: Optional[int]
+    radial_distribution: Optional[RealSpaceScattering] = None
+    correlation_function: Optional[RealSpaceScattering] = None
 
 
+@dataclass
+class CalculationProgress:
+    """ Progress of a running scattering calculation
+
+    points_done and n_points count sample points, or point pairs for the Debye method.
+    partial_result holds the scattering estimated from the points done so far,
+    scaled to the full number of points
+    """
+    points_done: int
+    n_points: int
+    elapsed_time: float
+    partial_result: Optional[ScatteringOutput]
+
+    @property
+    def fraction(self) -> float:
+        return self.points_done / self.n_points if self.n_points > 0 else 1.0
@@ -1,6 +1,7 @@
 from typing import Callable
 
 from io import StringIO
+from collections import OrderedDict
 
 import inspect
 from contextlib import redirect_stdout
@@ -22,6 +23,53 @@ class FunctionDefinitionFailed(Exception):
 
 parameter_sets = [["x", "y", "z"], ["r", "theta", "phi"]]
 
+# sld functions from previously processed code, keyed on the code and solvent sld, so that
+# rebuilding unchanged code gives the same function, and anything compiled from it is reused.
+# The code is still run each time, and the new function replaces the cached one if anything
+# it captures from the run (defaults, closures or globals) has changed, e.g. a reloaded file
+_sld_function_cache: OrderedDict = OrderedDict()
+_sld_function_cache_size = 16
+
+
+def _same_value(a, b) -> bool:
+    """ Are a and b the same value, comparing arrays and sequences element by element """
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return (isinstance(a, np.ndarray) and isinstance(b, np.ndarray)
+                and a.dtype == b.dtype and np.array_equal(a, b))
+    if isinstance(a, (tuple, list)) and type(a) is type(b):
+        return len(a) == len(b) and all(_same_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and type(a) is type(b):
+        return a.keys() == b.keys() and all(_same_value(a[k], b[k]) for k in a)
+    if callable(a) or callable(b):
+        # Functions from different runs of the code can't be compared
+        return False
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
+
+def _captured_state(function: Callable) -> list:
+    """ Values from the run of the code used by function: defaults, closures and globals """
+    code = function.__code__
+    closure = function.__closure__ or ()
+    return [function.__defaults__,
+            function.__kwdefaults__,
+            [cell.cell_contents for cell in closure],
+            [function.__globals__.get(name) for name in code.co_names]]
+
+
+def _same_state(cached: Callable, new: Callable) -> bool:
+    """ Does the cached function behave as the new one, from the same code """
+    try:
+        return (cached.__code__ == new.__code__
+                and _same_value(_captured_state(cached), _captured_state(new)))
+    except (AttributeError, ValueError):
+        # Not a plain python function, or an empty closure cell
+        return False
+
 
 def cartesian_converter(x,y,z):
     """ Converter from calculation coordinates to function definition
@@ -93,6 +141,16 @@ def process_code(input_text: str,
     if not isinstance(sld_function, Callable):
         raise FunctionDefinitionFailed("sld object exists, but is not Callable")
 
+    cache_key = (input_text, solvent_sld)
+    if cache_key in _sld_function_cache and _same_state(_sld_function_cache[cache_key], sld_function):
+        sld_function = _sld_function_cache[cache_key]
+        _sld_function_cache.move_to_end(cache_key)
+    else:
+        _sld_function_cache[cache_key] = sld_function
+        _sld_function_cache.move_to_end(cache_key)
+        if len(_sld_function_cache) > _sld_function_cache_size:
+            _sld_function_cache.popitem(last=False)
+
     # Check for acceptable signatures
     sig = inspect.signature(sld_function)
 
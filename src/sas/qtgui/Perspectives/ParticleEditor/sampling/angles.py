@@ -53,6 +53,10 @@ class Uniform(AngularDistribution):
     def sample_points_and_weights(self) -> Tuple[np.ndarray, np.ndarray]:
         return Geodesic.by_divisions(self.divisions)
 
+    @property
+    def is_isotropic(self) -> bool:
+        return True
+
     @property
     def n_points(self) -> int:
         return self._n_points
@@ -33,7 +33,7 @@ Something like this
 """
 
 
-from typing import Tuple, Sequence, Any
+from typing import Tuple, Sequence, Any, Iterator
 
 import math
 
@@ -58,10 +58,43 @@ class Chunker(ABC):
 class Chunks(Chunker):
     """ Class that takes a point generator, and produces all pairwise combinations in chunks
 
-    This trades off speed for space.
+    This trades off speed for space. Only the chunks on and above the diagonal are produced
+    (chunks 1, 2, 3, 4, 6, 7, 8, 11, 12 and 16 in the diagram above), as the pair matrix is symmetric,
+    and the points of each chunk are generated when they are needed rather than all at once.
     """
 
-    # TODO
+    def __init__(self, point_generator: SpatialDistribution, chunk_size: int = 1000):
+        super().__init__(point_generator)
+        self.chunk_size = chunk_size
+
+    @property
+    def n_chunks(self) -> int:
+        """ Number of chunks along each side of the pair matrix """
+        return max(math.ceil(self.point_generator.n_points / self.chunk_size), 1)
+
+    @property
+    def n_pairs(self) -> int:
+        """ Number of chunk pairs produced """
+        return self.n_chunks * (self.n_chunks + 1) // 2
+
+    def chunk(self, index: int) -> VectorComponents3:
+        """ Points in the index-th chunk """
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.point_generator.n_points)
+        return self.point_generator.generate(start, end)
+
+    def chunk_pairs(self) -> Iterator[Tuple[int, int]]:
+        """ Indices of the pairs of chunks on and above the diagonal, row by row """
+        for i in range(self.n_chunks):
+            for j in range(i, self.n_chunks):
+                yield i, j
+
+    def _iterator(self):
+        for i in range(self.n_chunks):
+            row_points = self.chunk(i)
+            yield row_points, row_points
+            for j in range(i + 1, self.n_chunks):
+                yield row_points, self.chunk(j)
 
 
 class SingleChunk(Chunker):
@@ -36,6 +36,10 @@ class BoundedByCube(SpatialDistribution):
     def _bounding_surface_check_points(self) -> VectorComponents3:
         return BoundedByCube._boundary_base_points * self.radius
 
+    @property
+    def sample_volume(self) -> float:
+        return (2 * self.radius)**3
+
 
 class Grid(BoundedByCube):
     """ Generate points on a grid within a cube with side length 2*radius """
@@ -57,9 +61,9 @@ class Grid(BoundedByCube):
         x_inds = (point_indices // (self.n_points_per_axis**2)) % self.n_points_per_axis
 
         return (
-            (((x_inds + 0.5) / self.n_points_per_axis) - 0.5) * self.radius,
-            (((y_inds + 0.5) / self.n_points_per_axis) - 0.5) * self.radius,
-            (((z_inds + 0.5) / self.n_points_per_axis) - 0.5) * self.radius)
+            (((x_inds + 0.5) / self.n_points_per_axis) - 0.5) * 2 * self.radius,
+            (((y_inds + 0.5) / self.n_points_per_axis) - 0.5) * 2 * self.radius,
+            (((z_inds + 0.5) / self.n_points_per_axis) - 0.5) * 2 * self.radius)
 
 
 
@@ -74,6 +78,7 @@ class RandomCube(BoundedByCube):
         # Accessing this will generate random seeds if they don't exist and store them to be accessed if they do
         self.seeds = defaultdict(lambda: self._seed_rng.integers(0, 0x7fff_ffff_ffff_ffff))
 
+    @property
     def allows_bootstrap(self) -> bool:
         return True
 
@@ -98,7 +103,7 @@ class PointGeneratorStepper:
     """ Generate batches of step_size points from a PointGenerator instance
     """
 
-    def __init__(self, point_generator: SpatialDistribution, step_size: int, bootstrap_sections: int):
+    def __init__(self, point_generator: SpatialDistribution, step_size: int, bootstrap_sections: int = 1):
         self.point_generator = point_generator
         self.step_size = step_size
 
@@ -0,0 +1,87 @@
+from pytest import mark, raises
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import (
+    QSample, SLDDefinition, ParticleDefinition, ScatteringCalculation, CalculationMethod)
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.parameters import CalculationParameters
+from sas.qtgui.Perspectives.ParticleEditor.sampling.chunking import Chunks
+from sas.qtgui.Perspectives.ParticleEditor.sampling.points import Grid, RandomCube
+from sas.qtgui.Perspectives.ParticleEditor.sampling.angles import Uniform, ZDelta
+from sas.qtgui.Perspectives.ParticleEditor.calculations.debye import debye
+from sas.qtgui.Perspectives.ParticleEditor.calculations.calculate import (
+    calculate_scattering, AnisotropicDebyeCalculation)
+
+
+def off_centre_sphere(x, y, z):
+    return ((x - 5)**2 + y**2 + z**2 < 30**2).astype(float) * (1 + x/100)
+
+
+def cartesian(x, y, z):
+    return x, y, z
+
+
+parameters = CalculationParameters(solvent_sld=0.5, background=0, scale=1, sld_parameters={}, magnetism_parameters={})
+
+
+@mark.parametrize("chunk_size", [7, 100, 1000])
+def test_chunks_upper_triangle(chunk_size):
+    """ Chunks should visit each pair of chunks once, on or above the diagonal"""
+    chunks = Chunks(RandomCube(10, 1000, seed=1), chunk_size)
+    pairs = list(chunks.chunk_pairs())
+
+    assert len(pairs) == chunks.n_pairs == len(list(chunks))
+    assert all(i <= j for i, j in pairs)
+    assert len(set(pairs)) == len(pairs)
+    assert sum(len(chunks.chunk(i)[0]) for i in range(chunks.n_chunks)) == 1000
+
+
+@mark.parametrize("chunk_size", [300, 1000, 2000])
+@mark.parametrize("n_workers", [1, 3])
+def test_against_pair_sum(chunk_size, n_workers):
+    """ The chunked Debye sum should match the sum over the full pair matrix"""
+    q_sample = QSample(1e-3, 0.5, 31, True)
+    point_generator = Grid(40, 1000)
+
+    intensity = debye(
+        sld_definition=SLDDefinition(off_centre_sphere, cartesian),
+        magnetism_definition=None,
+        parameters=parameters,
+        point_generator=point_generator,
+        q_sample=q_sample,
+        chunk_size=chunk_size,
+        n_workers=n_workers)
+
+    points = np.column_stack(point_generator.generate(0, point_generator.n_points))
+    sld = off_centre_sphere(*points.T) - 0.5
+    distances = cdist(points, points)
+    pair_sld = np.multiply.outer(sld, sld)
+    expected = np.array([np.sum(pair_sld * np.sinc(q * distances / np.pi)) for q in q_sample()])
+
+    assert np.allclose(intensity, expected, rtol=1e-9)
+
+
+def scattering_calculation(method, angular_distribution):
+    return ScatteringCalculation(
+        q_sampling=QSample(1e-3, 0.1, 21, True),
+        angular_sampling=angular_distribution,
+        spatial_sampling_method=Grid(40, 2000),
+        particle_definition=ParticleDefinition(SLDDefinition(off_centre_sphere, cartesian), None),
+        parameter_settings=parameters,
+        polarisation_vector=None,
+        seed=None,
+        bounding_surface_sld_check=False,
+        calculation_method=method)
+
+
+def test_matches_amplitude_sum():
+    """ Debye and the sum of amplitudes should agree for orientationally averaged scattering"""
+    debye_output = calculate_scattering(scattering_calculation(CalculationMethod.DEBYE, Uniform(6)))
+    fq_output = calculate_scattering(scattering_calculation(CalculationMethod.FQ, Uniform(6)))
+
+    assert np.allclose(debye_output.q_space.ordinate, fq_output.q_space.ordinate, rtol=1e-2)
+
+
+def test_debye_needs_isotropic():
+    with raises(AnisotropicDebyeCalculation):
+        calculate_scattering(scattering_calculation(CalculationMethod.DEBYE, ZDelta()))
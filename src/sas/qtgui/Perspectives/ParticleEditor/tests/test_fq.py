@@ -0,0 +1,63 @@
+from pytest import mark
+import numpy as np
+
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import QSample, SLDDefinition
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.parameters import CalculationParameters
+from sas.qtgui.Perspectives.ParticleEditor.sampling.geodesic import Geodesic
+from sas.qtgui.Perspectives.ParticleEditor.sampling.points import RandomCube
+from sas.qtgui.Perspectives.ParticleEditor.sampling.angles import Uniform, ZDelta
+from sas.qtgui.Perspectives.ParticleEditor.calculations.fq import scattering_via_fq, fold_opposite_directions
+
+
+def off_centre_sphere(x, y, z):
+    return ((x - 5)**2 + y**2 + z**2 < 30**2).astype(float) * (1 + x/100)
+
+
+def cartesian(x, y, z):
+    return x, y, z
+
+
+def complex_exponential_sum(points, sld, directions, weights, q):
+    """ Orientational average of |F(q)|^2 computed one direction at a time """
+    intensity = np.zeros_like(q)
+    for direction, weight in zip(directions, weights):
+        fq = np.sum(sld.reshape(-1, 1) * np.exp(1j * np.multiply.outer(points @ direction, q)), axis=0)
+        intensity += weight * np.abs(fq)**2
+    return intensity
+
+
+@mark.parametrize("n_divisions", [1, 2, 3, 4])
+def test_fold_geodesic(n_divisions):
+    """ The geodesic sphere is centrally symmetric, so folding should halve it and keep the total weight"""
+    directions, weights = Geodesic.by_divisions(n_divisions)
+    folded_directions, folded_weights = fold_opposite_directions(directions, weights)
+
+    assert 2 * len(folded_weights) == len(weights)
+    assert abs(np.sum(folded_weights) - np.sum(weights)) < 1e-9
+
+
+@mark.parametrize("angular_distribution", [ZDelta(), Uniform(2)])
+@mark.parametrize("max_memory", [100_000, 64*2**20])
+def test_against_complex_exponentials(angular_distribution, max_memory):
+    """ The blocked sin/cos sums should match the direct complex exponential sums"""
+    q_sample = QSample(1e-3, 0.5, 31, True)
+    point_generator = RandomCube(40, 3000, seed=1)
+    parameters = CalculationParameters(solvent_sld=0.5, background=0, scale=1, sld_parameters={}, magnetism_parameters={})
+
+    intensity = scattering_via_fq(
+        sld_definition=SLDDefinition(off_centre_sphere, cartesian),
+        magnetism_definition=None,
+        parameters=parameters,
+        point_generator=point_generator,
+        q_sample=q_sample,
+        angular_distribution=angular_distribution,
+        chunk_size=1000,
+        max_memory=max_memory)
+
+    # Same chunks as the calculation, so the random points are the same
+    points = np.vstack([np.column_stack(point_generator.generate(start, start + 1000)) for start in range(0, 3000, 1000)])
+    sld = off_centre_sphere(*points.T) - 0.5
+    directions, weights = angular_distribution.sample_points_and_weights()
+    expected = complex_exponential_sum(points, sld, directions, weights, q_sample())
+
+    assert np.allclose(intensity, expected, rtol=1e-9)
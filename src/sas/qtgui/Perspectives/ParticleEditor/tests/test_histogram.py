@@ -0,0 +1,92 @@
+from pytest import mark
+import numpy as np
+
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import (
+    QSample, SLDDefinition, ParticleDefinition, ScatteringCalculation, CalculationMethod)
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.parameters import CalculationParameters
+from sas.qtgui.Perspectives.ParticleEditor.sampling.points import Grid, RandomCube
+from sas.qtgui.Perspectives.ParticleEditor.sampling.angles import Uniform
+from sas.qtgui.Perspectives.ParticleEditor.calculations.histogram import pair_distance_histogram, histogram_scattering
+from sas.qtgui.Perspectives.ParticleEditor.calculations.calculate import calculate_scattering
+
+radius = 30
+
+
+def sphere(x, y, z):
+    return (x**2 + y**2 + z**2 < radius**2).astype(float)
+
+
+def cartesian(x, y, z):
+    return x, y, z
+
+
+parameters = CalculationParameters(solvent_sld=0.0, background=0, scale=1, sld_parameters={}, magnetism_parameters={})
+
+
+def scattering_calculation(method, point_generator):
+    return ScatteringCalculation(
+        q_sampling=QSample(1e-3, 0.2, 21, True),
+        angular_sampling=Uniform(3),
+        spatial_sampling_method=point_generator,
+        particle_definition=ParticleDefinition(SLDDefinition(sphere, cartesian), None),
+        parameter_settings=parameters,
+        polarisation_vector=None,
+        seed=1,
+        bounding_surface_sld_check=False,
+        sample_chunk_size_hint=1000,
+        calculation_method=method)
+
+
+@mark.parametrize("point_generator", [Grid(35, 3000), RandomCube(35, 3000, seed=2)])
+def test_matches_debye(point_generator):
+    """ The histogram method should match the Debye sum it bins"""
+    histogram_output = calculate_scattering(scattering_calculation(CalculationMethod.HISTOGRAM, point_generator))
+    debye_output = calculate_scattering(scattering_calculation(CalculationMethod.DEBYE, point_generator))
+
+    assert np.allclose(histogram_output.q_space.ordinate, debye_output.q_space.ordinate, rtol=1e-3)
+    assert histogram_output.radial_distribution is not None
+    assert debye_output.radial_distribution is None
+
+
+def test_bootstrap_errors():
+    """ Random points give bootstrap error bars, grids do not"""
+    random_output = calculate_scattering(scattering_calculation(CalculationMethod.HISTOGRAM, RandomCube(35, 3000, seed=2)))
+    grid_output = calculate_scattering(scattering_calculation(CalculationMethod.HISTOGRAM, Grid(35, 3000)))
+
+    q_space = random_output.q_space
+    assert np.all(q_space.upper_error > q_space.ordinate)
+    assert np.all(q_space.lower_error < q_space.ordinate)
+    assert random_output.correlation_function.upper_error is not None
+
+    assert grid_output.q_space.upper_error is None
+
+
+def test_sections_sum():
+    """ The histograms of the pairs of sections should add up to the histogram of all the pairs"""
+    point_generator = RandomCube(35, 2000, seed=3)
+    histogram = pair_distance_histogram(SLDDefinition(sphere, cartesian), None, parameters, point_generator,
+                                        bin_count=100, chunk_size=700, bootstrap_sections=5)
+    single = pair_distance_histogram(SLDDefinition(sphere, cartesian), None, parameters, point_generator,
+                                     bin_count=100, chunk_size=700, bootstrap_sections=1)
+
+    assert histogram.section_weights.shape == (15, 100)
+    assert np.allclose(histogram.pair_weights(), single.pair_weights())
+    assert np.allclose(histogram.pair_weights(np.ones(5, dtype=int)), single.pair_weights())
+
+    # Total pair weight is (sum sld)^2 less the self terms
+    x, y, z = np.hstack([point_generator.generate(start, min(start + 700, 2000)) for start in range(0, 2000, 700)])
+    sld = sphere(x, y, z)
+    assert np.isclose(np.sum(histogram.pair_weights()), np.sum(sld)**2 - np.sum(sld**2))
+
+
+def test_sphere_correlation():
+    """ The correlation function of a uniform sphere is 1 - 3x/4 + x^3/16, x = r/R"""
+    point_generator = RandomCube(35, 20000, seed=4)
+    histogram = pair_distance_histogram(SLDDefinition(sphere, cartesian), None, parameters, point_generator, bin_count=60)
+    output = histogram_scattering(histogram, np.array([0.01]))
+
+    x = output.correlation_function.abscissa / radius
+    inside = (x > 0.3) & (x < 1.5)
+    expected = 1 - 3 * x / 4 + x**3 / 16
+
+    assert np.allclose(output.correlation_function.ordinate[inside], expected[inside], atol=0.05)
@@ -0,0 +1,104 @@
+import time
+
+from PySide6 import QtCore
+
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.calculation import (
+    QSample, SLDDefinition, ParticleDefinition, ScatteringCalculation, CalculationProgress)
+from sas.qtgui.Perspectives.ParticleEditor.datamodel.parameters import CalculationParameters
+from sas.qtgui.Perspectives.ParticleEditor.sampling.points import Grid
+from sas.qtgui.Perspectives.ParticleEditor.sampling.angles import Uniform
+from sas.qtgui.Perspectives.ParticleEditor.calculations.scattering_thread import ScatteringThread
+
+radius = 30
+
+
+def sphere(x, y, z):
+    return (x**2 + y**2 + z**2 < radius**2).astype(float)
+
+
+def cartesian(x, y, z):
+    return x, y, z
+
+
+def scattering_calculation():
+    return ScatteringCalculation(
+        q_sampling=QSample(1e-3, 0.2, 21, True),
+        angular_sampling=Uniform(3),
+        spatial_sampling_method=Grid(35, 3000),
+        particle_definition=ParticleDefinition(SLDDefinition(sphere, cartesian), None),
+        parameter_settings=CalculationParameters(solvent_sld=0.0, background=0, scale=1,
+                                                 sld_parameters={}, magnetism_parameters={}),
+        polarisation_vector=None,
+        seed=1,
+        bounding_surface_sld_check=False,
+        sample_chunk_size_hint=500)
+
+
+class Receiver(QtCore.QObject):
+    """ Signals connected to the thread as in the design window """
+    progressSignal = QtCore.Signal(object)
+    completeSignal = QtCore.Signal(dict)
+
+    def __init__(self):
+        super().__init__()
+        self.progress = []
+        self.results = []
+        self.progressSignal.connect(self.progress.append)
+        self.completeSignal.connect(self.results.append)
+
+
+def wait_for(results, timeout=60.0):
+    end = time.perf_counter() + timeout
+    while not results and time.perf_counter() < end:
+        time.sleep(0.01)
+    assert results, "the scattering thread did not finish"
+    return results[0]
+
+
+def test_thread_signals():
+    """ Progress and completion reach the signals, so the calculation completes """
+    receiver = Receiver()
+    thread = ScatteringThread(
+        updatefn=lambda progress: receiver.progressSignal.emit(progress),
+        completefn=lambda **kwargs: receiver.completeSignal.emit(kwargs),
+        update_interval=0.0)
+
+    # Run in this thread so that the signals are delivered directly
+    thread.compute(scattering_calculation())
+
+    result, = receiver.results
+    assert "error" not in result and "cancelled" not in result
+    assert result["output"].q_space is not None
+    assert all(isinstance(progress, CalculationProgress) for progress in receiver.progress)
+    assert receiver.progress[-1].points_done == receiver.progress[-1].n_points
+
+
+def test_thread_complete():
+    updates = []
+    results = []
+    thread = ScatteringThread(updatefn=lambda progress: updates.append(progress),
+                              completefn=lambda **kwargs: results.append(kwargs),
+                              update_interval=0.0)
+
+    thread.queue(scattering_calculation())
+
+    result = wait_for(results)
+    assert "output" in result
+    assert updates[-1].fraction == 1.0
+
+
+def test_thread_cancel():
+    results = []
+
+    def stop(progress):
+        thread.stop()
+
+    thread = ScatteringThread(updatefn=stop,
+                              completefn=lambda **kwargs: results.append(kwargs),
+                              update_interval=0.0)
+
+    thread.queue(scattering_calculation())
+
+    result = wait_for(results)
+    assert result.get("cancelled") is True
+    assert "output" not in result and "error" not in result
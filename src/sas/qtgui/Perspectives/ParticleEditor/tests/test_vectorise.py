@@ -0,0 +1,77 @@
+from pytest import mark
+from fractions import Fraction
+
+import numpy as np
+
+from sas.qtgui.Perspectives.ParticleEditor.vectorise import vectorise_sld, jit_sld, USE_NUMBA
+from sas.qtgui.Perspectives.ParticleEditor.function_processor import process_code
+
+
+def branching_sld(x, y, z, radius=20.0, contrast=2.0):
+    if x**2 + y**2 + z**2 < radius**2:
+        return contrast
+    else:
+        return 0.0
+
+
+def unsupported_sld(x, y, z):
+    # Arbitrary python objects can't be compiled, so this has to fall back to a loop
+    return float(Fraction(1, 1)) if abs(x) < 10 else 0.0
+
+
+def expected(x, y, z, radius=20.0, contrast=2.0):
+    return np.where(x**2 + y**2 + z**2 < radius**2, contrast, 0.0)
+
+
+def test_vectorised_sld_results():
+    """ Non-vectorised functions should give the same values whether or not they are compiled"""
+    x, y, z = np.random.default_rng(1).uniform(-30, 30, (3, 1000))
+    warnings = []
+
+    sld = vectorise_sld(branching_sld, warning_callback=warnings.append, error_callback=warnings.append)
+
+    assert np.allclose(sld(x, y, z), expected(x, y, z))
+    assert np.allclose(sld(x, y, z, 10.0, contrast=3.0), expected(x, y, z, 10.0, 3.0))
+    assert len(warnings) == 1
+    assert ("numba" in warnings[0]) == USE_NUMBA
+
+
+@mark.skipif(not USE_NUMBA, reason="numba not available")
+def test_jit_fallback():
+    assert jit_sld(branching_sld) is not None
+    assert jit_sld(unsupported_sld) is None
+
+    x = np.linspace(-20, 20, 11)
+    warnings = []
+    sld = vectorise_sld(unsupported_sld, warning_callback=warnings.append, error_callback=warnings.append)
+    assert "numba" not in warnings[0]
+    assert np.allclose(sld(x, x, x), (np.abs(x) < 10).astype(float))
+
+
+def test_process_code_reuses_function():
+    """ Processing the same code twice should give the same function, so it is only compiled once"""
+    code = "def sld(x, y, z, a=1.0):\n    return a if x > 0 else 0.0\n"
+
+    first = process_code(code)[0]
+    second = process_code(code)[0]
+    other = process_code(code + "\n")[0]
+
+    assert first is second
+    assert first is not other
+
+
+def test_process_code_reloads_state(tmp_path):
+    """ The cached function is only reused if the values it takes from the run of the code are unchanged"""
+    path = tmp_path / "contrast.txt"
+    code = f"global contrast\ncontrast = np.loadtxt({str(path)!r})\ndef sld(x, y, z):\n    return contrast*x\n"
+
+    path.write_text("2.0")
+    first = process_code(code)[0]
+    second = process_code(code)[0]
+    path.write_text("3.0")
+    third = process_code(code)[0]
+
+    assert first is second
+    assert third is not first
+    assert third(1.0, 0.0, 0.0) == 3.0
+
@@ -1,9 +1,23 @@
+import os
+import inspect
 import traceback
-from typing import List, Union, Callable
+from typing import List, Union, Callable, Optional
 import numpy as np
 
+try:
+    if os.environ.get('SAS_NUMBA', '1').lower() in ('1', 'yes', 'true', 't'):
+        from numba import vectorize
+        USE_NUMBA = True
+    else:
+        raise ImportError("fail")
+except ImportError:
+    USE_NUMBA = False
+
 test_n = 7
 
+# Attribute holding the numba ufunc compiled from a function, or None if compilation failed
+_compiled_attribute = "_sas_compiled_sld"
+
 def clean_traceback(trace: str):
     """ Tracebacks from vectorise contain potentially confusing information from the
     vectorisation infrastructure. Clean it up and replace empty filename with something else"""
@@ -14,6 +28,62 @@ def clean_traceback(trace: str):
     return "".join(["Input data" + part for part in parts])
 
 
+def jit_sld(fun: Callable, *args, **kwargs) -> Optional[Callable]:
+    """ Compile a function that takes scalar coordinates into one that takes arrays, using numba
+
+    All the parameters are treated as floats. Returns None if numba is not available, the
+    function cannot be compiled, or the compiled function disagrees with the original on test values
+    (evaluated with the given args and kwargs). The compiled function is kept on the function object,
+    so it is only compiled once.
+    """
+
+    if not USE_NUMBA:
+        return None
+
+    try:
+        signature = inspect.signature(fun)
+    except (TypeError, ValueError):
+        return None
+
+    if hasattr(fun, _compiled_attribute):
+        ufunc = getattr(fun, _compiled_attribute)
+
+    else:
+        n_parameters = len(signature.parameters)
+        try:
+            ufunc = vectorize([f"f8({', '.join(['f8'] * n_parameters)})"])(fun)
+        except Exception:
+            ufunc = None
+
+        try:
+            setattr(fun, _compiled_attribute, ufunc)
+        except AttributeError:
+            pass
+
+    if ufunc is None:
+        return None
+
+    def compiled(x, y, z, *args, **kwargs):
+        # ufuncs only take positional arguments
+        bound = signature.bind(x, y, z, *args, **kwargs)
+        bound.apply_defaults()
+        return ufunc(*bound.arguments.values())
+
+    # Check against the original, which can differ in, e.g., integer arithmetic
+    try:
+        test_values = np.linspace(-1, 1, test_n)
+        expected = [fun(xi, yi, zi, *args, **kwargs) for xi, yi, zi in zip(test_values, test_values[::-1], -test_values)]
+        output = compiled(test_values, test_values[::-1], -test_values, *args, **kwargs)
+
+        if not np.allclose(output, np.array(expected, dtype=float), equal_nan=True):
+            return None
+
+    except Exception:
+        return None
+
+    return compiled
+
+
 def vectorise_sld(fun: Callable,
                   warning_callback: Callable[[str], None],
                   error_callback: Callable[[str], None],
@@ -45,6 +115,14 @@ def vectorise_sld(fun: Callable,
             try:
                 fun(0, 0, 0, *args, **kwargs)
 
+                compiled = jit_sld(fun, *args, **kwargs)
+
+                if compiled is not None:
+                    warning_callback("The specified SLD function does not handle vector values of coordinates, "
+                                     "it has been compiled with numba to run on each point. Using numpy (np.) "
+                                     "functions is more portable, see the vectorisation example for more details.")
+
+                    return compiled
 
                 def vectorised(x,y,z,*args,**kwargs):
                     out = np.zeros_like(x)
@@ -0,0 +1,92 @@
+import logging
+from typing import List
+
+from PySide6.QtGui import QStandardItem
+from twisted.internet import threads
+from twisted.internet import reactor
+
+import sas.qtgui.Utilities.GuiUtils as GuiUtils
+from sas.qtgui.Plotting.PlotterData import Data1D
+from sas.qtgui.Utilities.GridPanel import BatchResultsOutputPanel
+
+
+class BatchAnalysis(object):
+    """
+    Mixin for perspectives which analyse each data set of a batch with the
+    settings of the page, on a pool of processes, and show the results in
+    a table.  The page itself is left as it is.
+
+    The perspective defines :meth:`batchSettings` and :meth:`batchResults`,
+    and describes the table with the class attributes.
+    """
+    #: Name of the analysis in the messages
+    batch_analysis = "analysis"
+    #: Title of the table of results
+    batch_title = "Batch Results"
+    #: Keys of the results with the headers of the table columns
+    batch_columns = []
+    #: Help page of the table
+    batch_help = None
+    #: Table of the results of the last batch
+    batchResultsWindow = None
+
+    def batchSettings(self) -> dict:
+        """ Settings of the page, passed to :meth:`batchResults` """
+        raise NotImplementedError(f"Batch settings not implemented in {self.name}")
+
+    def batchResults(self, frames: List[Data1D], settings: dict) -> List[dict]:
+        """ Results of each of the frames, as dicts holding the keys of the columns """
+        raise NotImplementedError(f"Batch analysis not implemented in {self.name}")
+
+    def calculateBatch(self, data_items: List[QStandardItem]):
+        """
+        Analyse each of the data items with the current settings and show
+        the results in a table.
+        """
+        frames = []
+        for item in data_items:
+            data = GuiUtils.dataFromItem(item)
+            if not isinstance(data, Data1D):
+                logging.warning("The %s needs 1D data: %s skipped" % (self.batch_analysis, item.text()))
+                continue
+            frames.append(data)
+        if not frames:
+            return
+
+        # Send the calculations to separate thread, which runs the pool
+        d = threads.deferToThread(self.calculateBatchThread, frames, self.batchSettings())
+        d.addCallback(self.deferredBatchOutput)
+        d.addErrback(self.batchCalculationFailed)
+
+    def calculateBatchThread(self, frames, settings):
+        """
+        Perform the analysis of a batch on a pool of processes.
+
+        :return: list of (data name, result) pairs, in the order of frames
+        """
+        results = self.batchResults(frames, settings)
+        return [(data.name, result) for data, result in zip(frames, results)]
+
+    def deferredBatchOutput(self, results):
+        """
+        Show the results of the batch in the main thread
+        """
+        reactor.callFromThread(lambda: self.showBatchOutput(results))
+
+    def batchCalculationFailed(self, reason):
+        logging.error("Batch %s failed: %s" % (self.batch_analysis, reason.getErrorMessage()))
+
+    def showBatchOutput(self, results):
+        """
+        Display the batch output in tabular form, in one update
+
+        :param results: list of (data name, result) pairs
+        """
+        if self.batchResultsWindow is None:
+            self.batchResultsWindow = BatchResultsOutputPanel(
+                parent=self.parent, output_data=results, title=self.batch_title,
+                columns=self.batch_columns, help_url=self.batch_help)
+            self.batchResultsWindow.windowClosedSignal.connect(self.batchResultsWindow.hide)
+        else:
+            self.batchResultsWindow.setupTable(data=results)
+        self.batchResultsWindow.show()
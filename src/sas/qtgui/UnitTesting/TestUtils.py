@@ -4,6 +4,8 @@ from PySide6.QtWidgets import *
 from PySide6.QtTest import *
 import inspect
 
+from twisted.internet import threads
+
 def WarningTestNotImplemented(method_name=None):
     """
     Prints warning about a non-implemented test.
@@ -16,6 +18,21 @@ def WarningTestNotImplemented(method_name=None):
             function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
         print(("\nWARNING: %s needs implementing!"%function_name))
 
+def sendBatch(widget, data_item, mocker):
+    """
+    Send two copies of data_item to a batch analysis perspective in batch
+    mode and check that they go to the batch calculation.
+    Returns the settings of the page sent with them.
+    """
+    assert widget.allowBatch()
+    mocker.patch.object(threads, 'deferToThread')
+    widget.setData([data_item, data_item], is_batch=True)
+    assert threads.deferToThread.called
+    args = threads.deferToThread.call_args_list[0][0]
+    assert args[0].__name__ == 'calculateBatchThread'
+    assert len(args[1]) == 2
+    return args[2]
+
 class QtSignalSpy(QObject):
     """
     Helper class for testing Qt signals.
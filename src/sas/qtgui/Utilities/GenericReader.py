@@ -9,6 +9,7 @@ class GenReader(CalcThread):
     Load a sld data given a filename
     """
     def __init__(self, path, loader,
+                 cache=None,
                  completefn=None,
                  updatefn=None,
                  yieldtime=0.01,
@@ -21,6 +22,8 @@ class GenReader(CalcThread):
         self.path = path
         #Instantiate a loader 
         self.loader = loader
+        # optional SLDFileCache of previously parsed files
+        self.cache = cache
         self.starttime = 0
 
     def isquit(self):
@@ -39,7 +42,10 @@ class GenReader(CalcThread):
         """
         self.starttime = time.time()
         try:
-            data = self.loader.read(self.path)
+            if self.cache is not None:
+                data = self.cache.read(self.loader, self.path)
+            else:
+                data = self.loader.read(self.path)
             self.complete(data=[data])
         except:
             # Thread was interrupted, just proceed and re-raise.
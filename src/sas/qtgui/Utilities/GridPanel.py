@@ -501,3 +501,60 @@ class BatchInversionOutputPanel(BatchOutputPanel):
         """Tell the parent window the window closed"""
         self.parent.batchResultsWindow = None
         event.accept()
+
+
+class BatchResultsOutputPanel(BatchOutputPanel):
+    """
+        Class for stateless grid-like printout of the results of a batch
+        analysis, with a row for each data set and a column for each of
+        the given result keys
+    """
+    def __init__(self, parent=None, output_data=None, title="Batch Results",
+                 columns=(), help_url=None):
+
+        super(BatchResultsOutputPanel, self).__init__(parent)
+        _translate = QtCore.QCoreApplication.translate
+        self.setWindowTitle(_translate("GridPanelUI", title))
+        # Result keys with their headers
+        self.columns = list(columns)
+        self.help_url = help_url
+        self.cmdPlot.setVisible(False)
+        self.setupTable(data=output_data)
+
+    def setupTable(self, widget=None, data=None):
+        """
+        Create tablewidget items and show them, based on the results
+
+        :param data: list of (name, result) pairs, with the results as
+            dicts holding the keys of the columns
+        """
+        if data is None:
+            return
+        widget = self.tblParams if widget is None else widget
+        param_list = ['Filename'] + [header for _, header in self.columns]
+        widget.setColumnCount(len(param_list))
+        widget.setRowCount(len(data))
+        for i, param in enumerate(param_list):
+            widget.setHorizontalHeaderItem(i, QtWidgets.QTableWidgetItem(param))
+
+        for i_row, (name, result) in enumerate(data):
+            widget.setItem(i_row, 0, QtWidgets.QTableWidgetItem(str(name)))
+            for i_col, (key, _) in enumerate(self.columns):
+                value = result.get(key)
+                if value is None:
+                    text = ""
+                elif isinstance(value, str):
+                    text = value
+                else:
+                    text = GuiUtils.formatNumber(value, high=True)
+                widget.setItem(i_row, i_col+1, QtWidgets.QTableWidgetItem(text))
+        self.has_data = True
+
+        widget.resizeColumnsToContents()
+
+    def onHelp(self):
+        """
+        Open a local url in the default browser
+        """
+        if self.help_url is not None:
+            self.parent.showHelp(self.help_url)
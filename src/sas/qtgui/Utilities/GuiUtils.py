@@ -1142,6 +1142,8 @@ def saveData(fp, data):
         if isinstance(o, (Data1D, Data2D, FitData1D, FitData2D)):
             # don't store parent
             content = o.__dict__.copy()
+            # nor the residual buffers, which are rebuilt when needed
+            content.pop('_fit_index', None)
             return add_type(content, type(o))
 
         # ndarray
@@ -1354,96 +1356,12 @@ def convertFromSVS(datasets):
         params = dataset[1]
         content[params.data_id] = {}
         content[params.data_id]['fit_data'] = [data, {'checked': 2}, []]
-        param_dict = {}
-        param_dict['fitpage_category'] = [params.categorycombobox]
-        param_dict['fitpage_model'] = [params.formfactorcombobox]
-        param_dict['fitpage_structure'] = [params.structurecombobox]
-        param_dict['2D_params'] = [str(params.is_2D)]
-        param_dict['chainfit_params'] = ["False"]
-        param_dict['data_id'] = [params.data_id]
-        param_dict['data_name'] = [params.data_name]
-        param_dict['is_data'] = [str(params.is_data)]
-        param_dict['magnetic_params'] = [str(params.magnetic_on)]
-        param_dict['model_name'] = [params.formfactorcombobox]
-        param_dict['polydisperse_params'] = [str(params.enable_disp)]
-        param_dict['q_range_max'] = [str(params.qmax)]
-        param_dict['q_range_min'] = [str(params.qmin)]
-        # Smearing is a bit trickier. 4.x has multiple keywords,
-        # one for each combobox option
-        if params.enable_smearer:
-            if params.slit_smearer:
-                w = 1
-            elif params.pinhole_smearer:
-                w = 2
-            else:
-                w = 0
-            param_dict['smearing'] = [str(w)]
-        # weighting is also tricky. 4.x has multiple keywords,
-        # one for each radio box.
-        if params.dI_noweight:
-            w = 2
-        elif params.dI_didata:
-            w = 3
-        elif params.dI_sqrdata:
-            w = 4
-        elif params.dI_idata:
-            w = 5
-        else:
-            w = 2
-        param_dict['weighting'] = [str(w)]
-
-        # 4.x multi_factor is really the multiplicity
-        if params.multi_factor is not None:
-            param_dict['multiplicity'] = [str(int(params.multi_factor))]
-
         # playing with titles
         data.filename = params.file
         data.title = params.data_name
         data.name = params.data_name
 
-        # main parameters
-        for p in params.parameters:
-            p_name = p[1]
-            param_dict[p_name] = [str(p[0]), str(p[2]), None, str(p[5][1]), str(p[6][1]), []]
-        # orientation parameters
-        if params.is_2D:
-            for p in params.orientation_params:
-                p_name = p[1]
-                p_min = "-360.0"
-                p_max = "360.0"
-                if p[5][1] != "":
-                    p_min = p[5][1]
-                if p[6][1] != "":
-                    p_max = p[6][1]
-                param_dict[p_name] = [str(p[0]), str(p[2]), None, p_min, p_max, []]
-
-        # disperse parameters
-        if params.enable_disp:
-            for p in params.fittable_param:
-                p_name = p[1]
-                p_opt = str(p[0])
-                p_err = "0"
-                p_width = str(p[2])
-                p_min = str(0)
-                p_max = "inf"
-                param_npts = p_name.replace('.width','.npts')
-                param_nsigmas = p_name.replace('.width', '.nsigmas')
-                if params.is_2D and p_name in params.disp_obj_dict:
-                    lookup = params.orientation_params_disp
-                    p_min = "-360.0"
-                    p_max = "360.0"
-                else:
-                    lookup = params.fixed_param
-                p_npts = [s[2] for s in lookup if s[1] == param_npts][0]
-                p_nsigmas = [s[2] for s in lookup if s[1] == param_nsigmas][0]
-                if p_name in params.disp_obj_dict:
-                    p_disp = params.disp_obj_dict[p_name]
-                else:
-                    p_disp = "gaussian"
-                param_dict[p_name] = [p_opt, p_width, p_min, p_max, p_npts, p_nsigmas, p_disp]
-
-        param_dict['is_batch_fitting'] = ['False']
-        content[params.data_id]['fit_params'] = param_dict
+        content[params.data_id]['fit_params'] = params.to_fit_params()
 
     return content
 
@@ -17,7 +17,7 @@ from sas.qtgui.Plotting.PlotterData import Data1D
 
 import sas.qtgui.Utilities.GuiUtils as GuiUtils
 # Local
-from sas.qtgui.Utilities.GridPanel import BatchOutputPanel
+from sas.qtgui.Utilities.GridPanel import BatchOutputPanel, BatchResultsOutputPanel
 
 
 class BatchOutputPanelTest:
@@ -147,3 +147,40 @@ Chi2,Data,scale,background,radius_equat_core,x_core,thick_shell,x_polar_shell,sl
     def testSetupTableFromCSV(self, widget):
         '''Test generation of grid table rows from a CSV file'''
         pass
+
+
+class BatchResultsOutputPanelTest:
+    '''Test the table of the results of a batch analysis'''
+    @pytest.fixture(autouse=True)
+    def widget(self, qapp):
+        '''Create/Destroy the dialog'''
+        class dummy_manager(object):
+            _parent = QtWidgets.QWidget()
+            def showHelp(self, url):
+                self.url = url
+        results = [("frame 1", {'qstar': 1.5, 'error': None}),
+                   ("frame 2", {'qstar': None, 'error': "failed"})]
+        w = BatchResultsOutputPanel(parent=dummy_manager(), output_data=results,
+                                    title="Batch Invariant Results",
+                                    columns=[('qstar', 'Q*'), ('error', 'Error')],
+                                    help_url="invariant_help.html")
+
+        yield w
+
+        '''Destroy the GUI'''
+        w.close()
+
+    def testSetupTable(self, widget):
+        '''Test the columns and the rows of the table'''
+        assert widget.windowTitle() == "Batch Invariant Results"
+        table = widget.tblParams
+        assert (table.rowCount(), table.columnCount()) == (2, 3)
+        assert [table.horizontalHeaderItem(i).text() for i in range(3)] == ['Filename', 'Q*', 'Error']
+        assert table.item(0, 0).text() == "frame 1"
+        assert float(table.item(0, 1).text()) == 1.5
+        assert table.item(0, 2).text() == ""
+        assert table.item(1, 1).text() == ""
+        assert table.item(1, 2).text() == "failed"
+
+        widget.onHelp()
+        assert widget.parent.url == "invariant_help.html"
@@ -1,9 +1,12 @@
 import ctypes as ct
 import numpy as np
+import atexit
 import logging
+import threading
 import multiprocessing
 import importlib.resources as resources
 from enum import Enum
+from multiprocessing import shared_memory, resource_tracker
 from sas.sascalc.calculator.ausaxs.sasview_sans_debye import sasview_sans_debye
 
 # we need to be able to differentiate between being uninitialized and failing to load
@@ -63,7 +66,7 @@ def _prepare_invocation(q, coords, w):
 
 ausaxs = None
 ausaxs_state = lib_state.UNINITIALIZED
-def _invoke(q, coords, w):
+def _invoke(ausaxs, q, coords, w):
     """
     Invoke the AUSAXS library to compute I(q) for a set of points.
     """
@@ -71,20 +74,146 @@ def _invoke(q, coords, w):
     ausaxs.evaluate_sans_debye(q, x, y, z, w, nq, nc, ct.byref(status), Iq)
     return np.array(Iq), status.value
 
-def _invoke_independent(q, coords, w, queue):
+def _shared_arrays(buffer, nq, nc):
     """
-    Import and invoke the AUSAXS library to compute I(q) for a set of points.
-    This will redo the import every time it is called, and is only intended for use in a subprocess.
+    Views of the q, coords, w and Iq arrays packed in a shared memory block.
+    """
+    data = np.ndarray(2*nq + 4*nc, dtype='d', buffer=buffer)
+    q = data[:nq]
+    coords = data[nq:nq + 3*nc].reshape(3, nc)
+    w = data[nq + 3*nc:nq + 4*nc]
+    Iq = data[nq + 4*nc:]
+    return q, coords, w, Iq
+
+def _serve(conn):
+    """
+    Main loop of an AUSAXS worker process.
+    The library is loaded once and then used for every request sent through *conn*.
+    A request is the (name, nq, nc) of a shared memory block holding q, coords
+    and w; the result is written back into the block and the status is returned.
     """
     ausaxs, ausaxs_state = _attach_hooks()
-    if not ausaxs_state is lib_state.READY:
-        queue.put(None)
-        queue.put(-1)
+    conn.send(ausaxs_state is lib_state.READY)
+    if ausaxs_state is not lib_state.READY:
         return
-    Iq, nq, nc, q, x, y, z, w, status = _prepare_invocation(q, coords, w)
-    ausaxs.evaluate_sans_debye(q, x, y, z, w, nq, nc, ct.byref(status), Iq)
-    queue.put(np.array(Iq))
-    queue.put(status.value)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        name, nq, nc = request
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            q, coords, w, Iq = _shared_arrays(block.buf, nq, nc)
+            Iq[:], status = _invoke(ausaxs, q, coords, w)
+            del q, coords, w, Iq
+        finally:
+            block.close()
+        conn.send(status)
+
+class WorkerCrashed(RuntimeError):
+    """The AUSAXS worker process died while serving a request."""
+
+class _Worker:
+    """
+    A sandboxed process which keeps the AUSAXS library loaded between calls.
+    """
+    def __init__(self):
+        # start the resource tracker before forking so the worker shares it,
+        # otherwise the worker's own tracker reports our shared memory as leaked
+        resource_tracker.ensure_running()
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        try:
+            self.ready = self.conn.recv()
+        except EOFError:
+            self.ready = False
+        if not self.ready:
+            self.close()
+
+    def evaluate(self, q, coords, w):
+        """
+        Evaluate I(q) in the worker, returning (Iq, status).
+        Raises WorkerCrashed if the process dies during the call.
+        """
+        nq, nc = len(q), len(w)
+        block = shared_memory.SharedMemory(create=True, size=8*(2*nq + 4*nc))
+        try:
+            q_s, coords_s, w_s, Iq_s = _shared_arrays(block.buf, nq, nc)
+            q_s[:], coords_s[:], w_s[:] = q, coords, w
+            try:
+                self.conn.send((block.name, nq, nc))
+                status = self.conn.recv()
+            except (EOFError, OSError) as exc:
+                self.process.join(1)
+                raise WorkerCrashed(f"exit code \"{self.process.exitcode}\"") from exc
+            Iq = Iq_s.copy()
+            del q_s, coords_s, w_s, Iq_s
+        finally:
+            block.close()
+            block.unlink()
+        return Iq, status
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+class _WorkerPool:
+    """
+    Pool of AUSAXS worker processes serving concurrent calls.
+    Workers are started on demand up to *max_workers* and reused while
+    healthy; a worker that crashes is discarded and replaced on the next call.
+    """
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self.idle = []
+        self.count = 0
+        self.lock = threading.Condition()
+
+    def acquire(self):
+        with self.lock:
+            while not self.idle and self.count >= self.max_workers:
+                self.lock.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.count += 1
+        try:
+            return _Worker()
+        except Exception:
+            self.release(None)
+            raise
+
+    def release(self, worker):
+        """Return *worker* to the pool, or None to discard it."""
+        with self.lock:
+            if worker is not None and worker.ready:
+                self.idle.append(worker)
+            else:
+                self.count -= 1
+            self.lock.notify()
+
+    def shutdown(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+            self.count -= len(idle)
+        for worker in idle:
+            worker.close()
+
+_pool = _WorkerPool()
+atexit.register(_pool.shutdown)
+# state of the library in the worker processes; this is READY only once a
+# worker has completed a call, so that a crash before then disables AUSAXS
+worker_state = lib_state.UNINITIALIZED
 
 def ausaxs_available():
     """
@@ -95,44 +224,47 @@ def ausaxs_available():
         ausaxs, ausaxs_state = _attach_hooks()
     return ausaxs_state is lib_state.READY
 
-first_time = True
-def evaluate_sans_debye(q, coords, w):
+def evaluate_sans_debye(q, coords, w, n_workers=None, progress=None, abort=None):
     """
     Compute I(q) for a set of points using Debye sums.
     This uses AUSAXS if available, otherwise it uses the default implementation.
     *q* is the q values for the calculation.
     *coords* are the sample points.
     *w* is the weight associated with each point.
+    *n_workers*, *progress* and *abort* are passed to the default
+    implementation, see :func:`sasview_sans_debye`.
+
+    AUSAXS is called in a persistent worker process so that a crash in the
+    library, which is not checked for compatibility with the machine, cannot
+    take down SasView.  A crashed worker is replaced on the next call and the
+    default implementation is used for the failed one.
     """
+    def fallback():
+        return sasview_sans_debye(q, coords, w, n_workers=n_workers, progress=progress, abort=abort)
 
-    global ausaxs, ausaxs_state, first_time
-    # perform the first-time invocation in a separate process to avoid propagating segfaults
-    # this is necessary since we are not doing any sort of checking on the machine compatibility
-    if first_time:
-        queue = multiprocessing.Queue()
-        p = multiprocessing.Process(target=_invoke_independent, args=(q, coords, w, queue))
-        p.start()
-        p.join()
-        if p.exitcode == 0:
-            Iq = queue.get_nowait()
-            status = queue.get_nowait()
-            first_time = False
-        else:
-            logging.warning(f"AUSAXS calculator seems to have crashed (exit code \"{p.exitcode}\"). Using default Debye implementation instead.")
-            ausaxs_state = lib_state.FAILED
-            return sasview_sans_debye(q, coords, w)
+    global worker_state
+    if worker_state is lib_state.FAILED:
+        return fallback()
 
-    # after the first time, we assume that the library is safe to call from the main thread and use it directly
-    # to avoid the overhead of creating new processes and hooks every time
-    else:
-        if ausaxs_state is lib_state.UNINITIALIZED:
-            ausaxs, ausaxs_state = _attach_hooks()
-        if ausaxs_state is lib_state.FAILED:
-            return sasview_sans_debye(q, coords, w)
-        Iq, status = _invoke(q, coords, w)
+    worker = _pool.acquire()
+    if not worker.ready:
+        _pool.release(None)
+        worker_state = lib_state.FAILED
+        return fallback()
+    try:
+        Iq, status = worker.evaluate(q, coords, w)
+    except WorkerCrashed as exc:
+        _pool.release(None)
+        if worker_state is lib_state.UNINITIALIZED:
+            worker_state = lib_state.FAILED
+        logging.warning(f"AUSAXS calculator seems to have crashed ({exc}). Using default Debye implementation instead.")
+        return fallback()
+    _pool.release(worker)
+    if worker_state is lib_state.UNINITIALIZED:
+        worker_state = lib_state.READY
 
     if (status != 0):
         logging.warning(f"AUSAXS calculator terminated unexpectedly (error code \"{status}\"). Using default Debye implementation instead.")
-        return sasview_sans_debye(q, coords, w)
+        return fallback()
 
-    return Iq
\ No newline at end of file
+    return Iq
@@ -0,0 +1,149 @@
+"""
+Debye sums evaluated from a weighted pair-distance histogram.
+
+The O(n^2) pair distances are binned once into a weighted histogram, after
+which I(q) costs O(n_bins) per q value.  The histogram does not depend on q,
+scale or background, so it can be reused between evaluations.
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+try:
+    if os.environ.get('SAS_NUMBA', '1').lower() in ('1', 'yes', 'true', 't'):
+        from numba import njit, prange, get_num_threads
+        USE_NUMBA = True
+    else:
+        raise ImportError("fail")
+except ImportError:
+    USE_NUMBA = False
+
+#: Default histogram bin width [A].  The error in sinc(q r) from binning
+#: scales as (q dr)^2/24, so 0.1 A is well below 1e-3 relative for q < 1/A.
+DEFAULT_BIN_WIDTH = 0.1
+
+
+@dataclass
+class DistanceHistogram:
+    """
+    Weighted pair-distance histogram for a set of points.
+
+    I(q) = sum_k weight[k] sinc(q distance[k]), where the first bin holds the
+    self terms at distance 0 and the remaining bins hold twice the weighted
+    sum over the pairs i < j whose distance falls in the bin.
+    """
+    #: effective distance of each non-empty bin [A]
+    distance: np.ndarray
+    #: total weight w_i w_j of the pairs in each bin
+    weight: np.ndarray
+    #: width of the bins used to accumulate the histogram [A]
+    bin_width: float
+
+
+def histogram_sans_debye(q, coords, weight, bin_width=DEFAULT_BIN_WIDTH):
+    """
+    Compute I(q) for a set of points using a binned Debye formula.
+    *q* is the q values for the calculation.
+    *coords* are the sample points.
+    *weight* is the weight associated with each point.
+    *bin_width* is the width of the distance bins.
+    """
+    return histogram_Iq(q, distance_histogram(coords, weight, bin_width))
+
+
+def distance_histogram(coords, weight, bin_width=DEFAULT_BIN_WIDTH):
+    """
+    Bin the pair distances of the points into a :class:`DistanceHistogram`.
+    *coords* are the sample points as a 3 x n array.
+    *weight* is the weight associated with each point.
+    *bin_width* is the width of the distance bins.
+    """
+    if bin_width <= 0:
+        raise ValueError("bin_width must be positive, not %g" % bin_width)
+    x, y, z = (np.ascontiguousarray(v, dtype='d') for v in coords)
+    weight = np.ascontiguousarray(weight, dtype='d')
+    if len(weight) == 0:
+        return DistanceHistogram(np.zeros(0), np.zeros(0), bin_width)
+
+    # No pair can be further apart than the diagonal of the bounding box.
+    extent = np.sqrt(sum(np.ptp(v)**2 for v in (x, y, z)))
+    n_bins = int(extent/bin_width) + 2
+    hist, dist, norm = _pair_histogram(x, y, z, weight, bin_width, n_bins)
+
+    # Use the |w|-weighted mean distance within each bin rather than the bin
+    # centre; this removes most of the binning error for sparse structures.
+    keep = norm > 0
+    distance = dist[keep]/norm[keep]
+    distance = np.hstack((0., distance))
+    hist = np.hstack((np.sum(weight**2), 2*hist[keep]))
+    return DistanceHistogram(distance, hist, bin_width)
+
+
+def histogram_Iq(q, histogram, worksize=1000000):
+    """
+    Compute I(q) from a :class:`DistanceHistogram`.
+    *q* is the q values for the calculation.
+    *histogram* is the pair-distance histogram of the sample.
+    *worksize* is the number of q x bin terms to compute at once.
+    """
+    q = np.asarray(q, dtype='d')
+    Iq = np.zeros_like(q)
+    q_pi = q/np.pi  # Precompute q/pi since np.sinc = sin(pi x)/(pi x).
+    batch_size = max(worksize // max(len(histogram.distance), 1), 1)
+    for batch in range(0, len(q), batch_size):
+        bes = np.sinc(q_pi[batch:batch+batch_size, None]*histogram.distance[None, :])
+        Iq[batch:batch+batch_size] = bes @ histogram.weight
+    return Iq
+
+
+if USE_NUMBA:
+    @njit("UniTuple(f8[:], 3)(f8[:], f8[:], f8[:], f8[:], f8, i8)", parallel=True, fastmath=True)
+    def _pair_histogram(x, y, z, weight, bin_width, n_bins):
+        # Each thread accumulates into its own row so no locking is needed.
+        # Rows are dealt out round-robin to balance the triangular workload.
+        n = len(weight)
+        n_threads = get_num_threads()
+        hist = np.zeros((n_threads, n_bins))
+        dist = np.zeros((n_threads, n_bins))
+        norm = np.zeros((n_threads, n_bins))
+        inv_width = 1.0/bin_width
+        for t in prange(n_threads):
+            for j in range(t, n, n_threads):
+                xj, yj, zj, wj = x[j], y[j], z[j], weight[j]
+                for k in range(j+1, n):
+                    r = np.sqrt((x[k] - xj)**2 + (y[k] - yj)**2 + (z[k] - zj)**2)
+                    b = min(int(r*inv_width), n_bins - 1)
+                    w = wj*weight[k]
+                    hist[t, b] += w
+                    dist[t, b] += abs(w)*r
+                    norm[t, b] += abs(w)
+        return hist.sum(axis=0), dist.sum(axis=0), norm.sum(axis=0)
+else:
+    def _pair_histogram(x, y, z, weight, bin_width, n_bins, worksize=1000000):
+        n = len(weight)
+        hist = np.zeros(n_bins)
+        dist = np.zeros(n_bins)
+        norm = np.zeros(n_bins)
+        batch_size = max(worksize // n, 1)
+        for start in range(0, n, batch_size):
+            stop = min(start + batch_size, n)
+            # Rows j in [start, stop) against columns k > start, keeping k > j.
+            rows, cols = slice(start, stop), slice(start+1, n)
+            r = np.sqrt((x[rows, None] - x[None, cols])**2
+                        + (y[rows, None] - y[None, cols])**2
+                        + (z[rows, None] - z[None, cols])**2)
+            w = weight[rows, None]*weight[None, cols]
+            upper = np.arange(start+1, n)[None, :] > np.arange(start, stop)[:, None]
+            r, w = r[upper], w[upper]
+            b = np.minimum((r/bin_width).astype(int), n_bins - 1)
+            hist += np.bincount(b, weights=w, minlength=n_bins)
+            dist += np.bincount(b, weights=abs(w)*r, minlength=n_bins)
+            norm += np.bincount(b, weights=abs(w), minlength=n_bins)
+        return hist, dist, norm
+_pair_histogram.__doc__ = """
+    Accumulate the weighted pair-distance histogram over the pairs j < k.
+
+    Returns the summed weights w_j w_k, the |w|-weighted distance sum and the
+    |w| sum in each bin.
+    """
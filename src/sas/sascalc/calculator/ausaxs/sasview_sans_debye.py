@@ -1,32 +1,85 @@
-import numpy as np
+import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
 
-def sasview_sans_debye(q, coords, weight, worksize=100000):
+def sasview_sans_debye(q, coords, weight, worksize=100000, n_workers=None, progress=None, abort=None):
     """
     Compute I(q) for a set of points using the full Debye formula.
     *q* is the q values for the calculation.
     *coords* are the sample points.
     *weight* is the weight associated with each point.
     *worksize* is the number of q values to compute at once.
+    *n_workers* is the number of threads sharing the rows of the upper
+    triangle; numpy releases the GIL for the bulk of the work so the rows
+    run concurrently.  Defaults to the number of cores.
+    *progress* is called with the percentage complete as row blocks finish.
+    *abort* is polled as row blocks finish; if it returns True the remaining
+    blocks are cancelled and KeyboardInterrupt is raised.
     """
+    q = np.asarray(q, dtype='d')
     Iq = np.zeros_like(q)
     q_pi = q/np.pi  # Precompute q/pi since np.sinc = sin(pi x)/(pi x).
+    npoints = len(weight)
+    if npoints == 0:
+        return Iq
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    # Deal the rows out round-robin so each block has the same share of the
+    # triangle; use enough blocks to give ~1% progress resolution.
+    n_blocks = min(npoints, max(100, 4*n_workers))
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=max(int(n_workers), 1)) as pool:
+        pending = {pool.submit(_calc_Iq_rows, range(block, npoints, n_blocks),
+                               q_pi, coords, weight, worksize, stop)
+                   for block in range(n_blocks)}
+        complete = 0
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                Iq += future.result()
+            complete += len(done)
+            if progress is not None:
+                progress(100*complete/n_blocks)
+            elif complete*10//n_blocks != (complete - len(done))*10//n_blocks:
+                logging.info(f"\tprogress: {complete/n_blocks*100:.0f}%")
+            if pending and abort is not None and abort():
+                stop.set()
+                for future in pending:
+                    future.cancel()
+                raise KeyboardInterrupt("Debye calculation cancelled")
+    return Iq
+
+def _calc_Iq_rows(rows, q_pi, coords, weight, worksize, stop=None):
+    """
+    Helper function for sasview_sans_debye which sums the upper triangle
+    rows *rows* over all q values, returning their contribution to I(q).
+    *stop* is an optional threading.Event which ends the sum early.
+    """
+    Iq = np.zeros_like(q_pi)
     batch_size = worksize // coords.shape[0]
-    for batch in range(0, len(q), batch_size):
+    for batch in range(0, len(q_pi), batch_size):
         _calc_Iq_batch(Iq[batch:batch+batch_size], q_pi[batch:batch+batch_size],
-                        coords, weight)
+                       coords, weight, rows, stop)
     return Iq
 
-def _calc_Iq_batch(Iq, q_pi, coords, weight):
+def _calc_Iq_batch(Iq, q_pi, coords, weight, rows=None, stop=None):
     """
     Helper function for _calc_Iq which operates on a batch of q values.
     *Iq* is accumulated within each batch, and should be initialized to zero.
     *q_pi* is q/pi, needed because np.sinc computes sin(pi x)/(pi x).
     *coords* are the sample points.
     *weight* is the weight associated with each point.
+    *rows* are the rows of the upper triangle to sum, defaulting to all rows.
+    *stop* is an optional threading.Event which ends the sum early.
     """
-    for j in range(len(weight)):
-        if j % 100 == 0: logging.info(f"\tprogress: {j/len(weight)*100:.0f}%")
+    if rows is None:
+        rows = range(len(weight))
+    for j in rows:
+        if stop is not None and stop.is_set():
+            return
         # Compute dx for one row of the upper triangle matrix.
         dx = coords[:, j:] - coords[:, j:j+1]
         # Find the length of each dx vector.
@@ -36,4 +89,4 @@ def _calc_Iq_batch(Iq, q_pi, coords, weight):
         I_jk = (weight[j:] * weight[j])[None, :] * bes
         # Accumulate terms I(j,j), I(j, k+1..n) and by symmetry I(k+1..n, j).
         # Don't double-count the diagonal.
-        Iq += 2*np.sum(I_jk, axis=1) - I_jk[:, 0]
\ No newline at end of file
+        Iq += 2*np.sum(I_jk, axis=1) - I_jk[:, 0]
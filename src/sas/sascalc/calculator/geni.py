@@ -4,12 +4,18 @@ For 1-D scattering use *Iq(q, x, y, z, sld, vol, is_avg)*
 """
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
 import numpy as np
 import periodictable
 
 from typing import Union
 
 from sas.sascalc.calculator.sas_gen import MagSLD, OMF2SLD
+from sas.sascalc.calculator.ausaxs.histogram_sans_debye import (
+    DEFAULT_BIN_WIDTH, distance_histogram, histogram_Iq)
 
 
 try:
@@ -27,39 +33,110 @@ except ImportError:
             return args[0]
         # Otherwise we have @njit(...), so return the identity decorator.
         return lambda fn: fn
+    prange = range
+
+#: Default cap on the bytes of temporaries held at once by :func:`Iqxy`.
+DEFAULT_MAX_MEMORY = 256*2**20
+#: Minimum number of q points in a tile of the 2D calculation.
+TILE_MIN_Q = 16
+#: Number of q points and points per cache block in the 2D pixel kernel.
+TILE_Q = 32
+TILE_POINTS = 4096
+#: Seconds between progress and abort checks while a parallel kernel runs.
+POLL_INTERVAL = 0.1
+
 
-def Iq(q, x, y, z, sld, vol, is_avg=False):
+class CalculationCancelled(KeyboardInterrupt):
+    """
+    Raised when a 2D calculation is aborted.  *partial* holds I(qx, qy)
+    for the q points finished before the abort, with NaN elsewhere.
+    """
+    def __init__(self, message, partial=None):
+        super().__init__(message)
+        self.partial = partial
+
+#: Engines available for the full Debye sum in :func:`Iq`:
+#: 'ausaxs' uses the AUSAXS library if available, otherwise the exact sum;
+#: 'exact' always evaluates the exact O(n^2) sum for every q;
+#: 'histogram' bins the pair distances once and evaluates I(q) from the bins.
+DEBYE_ENGINES = ('ausaxs', 'exact', 'histogram')
+
+def Iq(q, x, y, z, sld, vol, is_avg=False, engine='ausaxs', bin_width=DEFAULT_BIN_WIDTH,
+       n_workers=None, progress=None, abort=None):
     """
     Computes 1D isotropic.
     Isotropic: Assumes all slds are real (no magnetic)
     Also assumes there is no polarization: No dependency on spin.
     All values must be numpy vectors of the correct size.
+    *engine* selects the Debye implementation from :data:`DEBYE_ENGINES`
+    and *bin_width* sets the distance resolution of the 'histogram' engine.
+    *n_workers*, *progress* and *abort* control the exact Debye sum, see
+    :func:`sasview_sans_debye`.
     Returns *I(q)*
     """
-    coords = np.vstack((x, y, z))
-    index = (sld != 0.)
-    if not index.all():
-        coords, sld, vol = (v[index] for v in (sld, coords, vol))
-    q, coords, sld, vol = [np.asarray(v, dtype='d') for v in (q, coords, sld, vol)]
-    w = sld * vol
+    if engine not in DEBYE_ENGINES:
+        raise ValueError("Unknown Debye engine %r" % engine)
+    if engine == 'histogram' and not is_avg:
+        return histogram_Iq(q, debye_histogram(x, y, z, sld, vol, bin_width))
 
+    q = np.asarray(q, dtype='d')
+    coords, w, vol = _debye_weights(x, y, z, sld, vol)
     if is_avg:
         r = np.linalg.norm(coords, axis=0)
         I_out = _calc_Iq_avg(q, r, w)
+    elif engine == 'exact':
+        from sas.sascalc.calculator.ausaxs.sasview_sans_debye import sasview_sans_debye
+        I_out = sasview_sans_debye(q, coords, w, n_workers=n_workers,
+                                   progress=progress, abort=abort)
     else:
         from sas.sascalc.calculator.ausaxs.ausaxs_sans_debye import evaluate_sans_debye
-        I_out = evaluate_sans_debye(q, coords, w)
+        I_out = evaluate_sans_debye(q, coords, w, n_workers=n_workers,
+                                    progress=progress, abort=abort)
     return I_out * (1.0E+8/np.sum(vol))
 
-def Iqxy(qx, qy, x, y, z, sld, vol, mx, my, mz, in_spin, out_spin, s_theta, s_phi, elements=None, is_elements=False):
+def debye_histogram(x, y, z, sld, vol, bin_width=DEFAULT_BIN_WIDTH):
+    """
+    Computes the pair-distance histogram used by the 'histogram' Debye engine.
+    The histogram weights include the 1/sum(vol) normalisation of :func:`Iq`,
+    so *histogram_Iq(q, debye_histogram(...))* gives the same result as
+    *Iq(..., engine='histogram')*.  The histogram does not depend on q and
+    may be reused for any number of q vectors.
+    """
+    coords, w, vol = _debye_weights(x, y, z, sld, vol)
+    histogram = distance_histogram(coords, w, bin_width)
+    histogram.weight *= 1.0E+8/np.sum(vol)
+    return histogram
+
+def _debye_weights(x, y, z, sld, vol):
+    """
+    Returns the coordinates, scattering weights and volumes of the points
+    which contribute to the isotropic scattering.
+    """
+    coords = np.vstack((x, y, z))
+    index = (sld != 0.)
+    if not index.all():
+        coords, sld, vol = coords[:, index], sld[index], vol[index]
+    coords, sld, vol = [np.asarray(v, dtype='d') for v in (coords, sld, vol)]
+    return coords, sld * vol, vol
+
+def Iqxy(qx, qy, x, y, z, sld, vol, mx, my, mz, in_spin, out_spin, s_theta, s_phi, elements=None, is_elements=False,
+         n_workers=None, max_memory=DEFAULT_MAX_MEMORY, progress=None, abort=None):
     """
     Computes 2D anisotropic.
     *in_spin* and *out_spin* indicate portion of polarizer and analyzer
     transmission that are spin up.  *s_theta* and *s_phi* are the polarization direction angles.
     All other values must be numpy vectors of the correct size.
+
+    The q grid is evaluated in tiles, see :func:`_calc_tiled`.  *n_workers*
+    is the number of threads (default all cores), *max_memory* caps the bytes
+    of temporaries held at once, *progress* is called with the percentage
+    complete and *abort* is polled as tiles finish; if it returns True then
+    :class:`CalculationCancelled` is raised, holding the finished part of
+    the result.
     Returns *I(qx, qy)*
     """
     qx, qy = np.broadcast_arrays(qx, qy)
+    tiling = dict(n_workers=n_workers, max_memory=max_memory, progress=progress, abort=abort)
     # if the mx provided to SasGen is None then _vec(mx) will be [nan]
     if mx is not None and my is not None and mz is not None:
         magnetic_index = (mx != 0.) | (my != 0.) | (mz != 0.)
@@ -71,29 +148,77 @@ def Iqxy(qx, qy, x, y, z, sld, vol, mx, my, mz, in_spin, out_spin, s_theta, s_ph
         if is_elements:
             if not index.all():
                 mx, my, mz, sld, elements, vol = (v[index] for v in (mx, my, mz, sld, elements, vol))
-            I_out = _calc_Iqxy_magnetic_elements(
+            kernel = lambda qx, qy: _calc_Iqxy_magnetic_elements(
                 qx, qy, x, y, z, sld, mx, my, mz, elements, vol,
                 in_spin, out_spin, s_theta, s_phi)
+            options = dict(symmetric=False, bytes_per_q=_element_bytes(elements))
         else:
             if not index.all():
                 x, y, mx, my, mz, sld, vol \
                     = (v[index] for v in (x, y, mx, my, mz, sld, vol))
-            I_out = _calc_Iqxy_magnetic(
+            kernel = lambda qx, qy, state=None: _calc_Iqxy_magnetic(
                 qx, qy, x, y, sld, vol, (mx, my, mz),
-                in_spin, out_spin, s_theta, s_phi)
+                in_spin, out_spin, s_theta, s_phi, state)
+            options = dict(symmetric=False, blocked=USE_NUMBA, bytes_per_q=16*len(x))
     else:
         index = (sld != 0.)
         if is_elements:
             if not index.all():
                 sld, elements, vol = (v[index] for v in (sld, elements, vol))
-            I_out = _calc_Iqxy_elements(sld, x, y, z, elements, vol, qx.flatten(), qy.flatten())
-            I_out = I_out.reshape(qx.shape)
+            kernel = lambda qx, qy: _calc_Iqxy_elements(sld, x, y, z, elements, vol, qx, qy)
+            options = dict(symmetric=True, bytes_per_q=_element_bytes(elements))
         else:
             if not index.all():
                 x, y, sld, vol = (v[index] for v in (x, y, sld, vol))
-            I_out = _calc_Iqxy(sld*vol, x, y, qx.flatten(), qy.flatten())
-            I_out = I_out.reshape(qx.shape)
-    return I_out * (1.0E+8/np.sum(vol))
+            scale, x, y = (np.ascontiguousarray(v, 'd') for v in (sld*vol, x, y))
+            kernel = lambda qx, qy, state=None: _calc_Iqxy(scale, x, y, qx, qy, max_memory, state)
+            options = dict(symmetric=True, blocked=USE_NUMBA)
+    norm = 1.0E+8/np.sum(vol)
+    try:
+        I_out = _calc_tiled(kernel, qx, qy, **options, **tiling)
+    except CalculationCancelled as exc:
+        exc.partial = exc.partial * norm
+        raise
+    return I_out * norm
+
+def Aqxy(qx, qy, x, y, sld, vol, max_memory=DEFAULT_MAX_MEMORY):
+    """
+    Computes the 2D scattering amplitude of a set of points without magnetism.
+    Returns *A(qx, qy)* = sum sld vol exp(i q.r), unnormalized.
+
+    Amplitudes add, so the amplitude of a structure can be accumulated one
+    piece at a time and I(q) = 1e8 |A(q)|^2 / sum(vol) formed at the end.
+    """
+    qx, qy = np.broadcast_arrays(qx, qy)
+    shape = qx.shape
+    index = (sld != 0.)
+    x, y, sld, vol = (np.asarray(v, 'd')[index] for v in (x, y, sld, vol))
+    scale, x, y = (np.ascontiguousarray(v, 'd') for v in (sld*vol, x, y))
+    qx, qy = (np.ascontiguousarray(v, 'd').flatten() for v in (qx, qy))
+    return _calc_Aqxy(scale, x, y, qx, qy, max_memory, _block_state(len(qx))).reshape(shape)
+
+def Aqxy_magnetic(qx, qy, x, y, rho, vol, rho_m, up_theta=0., up_phi=0.):
+    """
+    Computes the 2D scattering amplitudes of a set of magnetic points for
+    each of the polarization cross sections, in the order (dd, du, ud, uu).
+    Returns an array of shape (4,) + qx.shape, unnormalized.
+
+    As for :func:`Aqxy`, the amplitudes of the pieces of a structure add,
+    and *I(qx, qy)* = 1e8 sum_xs w_xs abs(A_xs)^2 / sum(vol), with the cross
+    section weights w_xs from the polarizer and analyzer efficiencies, as
+    in :func:`_calc_Iqxy_magnetic`.
+    """
+    qx, qy = np.broadcast_arrays(qx, qy)
+    shape = qx.shape
+    up_theta, up_phi = np.radians(up_theta), np.radians(up_phi)
+    x, y, rho, vol = (np.ascontiguousarray(v, 'd') for v in (x, y, rho, vol))
+    M = np.ascontiguousarray(np.array(rho_m, 'd'))
+    qx, qy = (np.ascontiguousarray(v, 'd').flatten() for v in (qx, qy))
+    A = np.zeros((4, len(qx)), dtype=complex)
+    _calc_Aqxy_magnetic_helper(
+        A, qx, qy, x, y, rho, vol, M,
+        np.cos(up_theta), np.sin(up_theta), np.cos(up_phi), np.sin(up_phi))
+    return A.reshape((4,) + shape)
 
 @njit('(f8[:], f8[:], f8[:])')
 def _calc_Iq_avg(q, r, w):
@@ -133,27 +258,221 @@ def _calc_Iq_numba(Iq, q, coords, sld, vol):
             # Accumulate terms I(j,j), I(j, k+1..n) and by symmetry I(k+1..n, j)
             Iq[i] += 2*np.sum(I_jk) - I_jk[0] # don't double-count the diagonal
 
+def _calc_tiled(kernel, qx, qy, symmetric=False, blocked=False, bytes_per_q=0,
+                n_workers=None, max_memory=DEFAULT_MAX_MEMORY, progress=None, abort=None):
+    """
+    Evaluate *kernel(qx, qy)* over tiles of the q grid.
+
+    If *symmetric* then I(qx, qy) = I(-qx, -qy), which holds whenever the
+    scattering amplitude is the transform of a real density, so only one of
+    each +/-q pair is evaluated.  The tiles are shared between *n_workers*
+    threads.  If *blocked* the kernel is instead a numba kernel which is
+    already parallel over blocks of q, and so is not safe to call
+    concurrently; it is given the whole q grid, see :func:`_run_blocked`.
+    *bytes_per_q* is the size of the temporaries needed for each q point,
+    used to keep the memory held by concurrent tiles below *max_memory*.
+    *progress* and *abort* are as for :func:`Iqxy`.
+    """
+    shape = qx.shape
+    qx, qy = (np.asarray(v, 'd').flatten() for v in (qx, qy))
+    if symmetric:
+        qx, qy, inverse = _fold_friedel_pairs(qx, qy)
+    nq = len(qx)
+    if nq == 0:
+        return np.empty(nq).reshape(shape)
+
+    def expand(Iq):
+        return (Iq[inverse] if symmetric else Iq).reshape(shape)
+
+    if blocked:
+        Iq, cancelled = _run_blocked(kernel, qx, qy, progress, abort)
+        if cancelled:
+            raise CalculationCancelled("Scattering calculation cancelled", expand(Iq))
+        return expand(Iq)
+
+    # unfinished tiles are left as NaN if the calculation is cancelled
+    Iq = np.full(nq, np.nan)
+    n_workers = max(int(n_workers or os.cpu_count() or 1), 1)
+    if bytes_per_q > 0:
+        n_workers = max(min(n_workers, max_memory // (bytes_per_q*TILE_MIN_Q)), 1)
+    # use enough tiles for ~1% progress steps while keeping the tiles
+    # within the memory budget of each worker
+    tile = max(-(-nq // max(100, 4*n_workers)), TILE_MIN_Q)
+    if bytes_per_q > 0:
+        tile = max(min(tile, max_memory // (n_workers*bytes_per_q)), 1)
+    tiles = [slice(start, min(start + tile, nq)) for start in range(0, nq, tile)]
+
+    def run(index):
+        Iq[index] = kernel(qx[index], qy[index])
+        return index.stop - index.start
+
+    stop = threading.Event()
+    def report(done):
+        if progress is not None:
+            progress(100*done/nq)
+        if abort is not None and done < nq and abort():
+            stop.set()
+            return True
+        return False
+
+    done = 0
+    cancelled = False
+    if n_workers == 1:
+        for index in tiles:
+            done += run(index)
+            if report(done):
+                cancelled = True
+                break
+    else:
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            pending = {pool.submit(lambda index: 0 if stop.is_set() else run(index), index)
+                       for index in tiles}
+            try:
+                while pending and not cancelled:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    done += sum(future.result() for future in finished)
+                    cancelled = report(done)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    if cancelled:
+        raise CalculationCancelled("Scattering calculation cancelled", expand(Iq))
+    return expand(Iq)
+
+def _block_state(nq):
+    """
+    Shared state of a blocked numba kernel over *nq* q points: an abort flag,
+    set by the caller, followed by a flag set by the kernel as it finishes
+    each block of :data:`TILE_Q` points.
+    """
+    return np.zeros(1 + (nq + TILE_Q - 1)//TILE_Q, dtype=np.int64)
+
+def _run_blocked(kernel, qx, qy, progress=None, abort=None):
+    """
+    Evaluate a blocked numba kernel, *kernel(qx, qy, state)*, over all of q.
+
+    The kernel runs in a helper thread (the numba kernels release the GIL)
+    while this thread reports progress and polls *abort* from the finished
+    blocks in the shared :func:`_block_state`.  On abort the kernel skips
+    the blocks it has not started.  Returns I(q), with NaN for the blocks
+    which were skipped, and whether the calculation was cancelled.
+    """
+    nq = len(qx)
+    state = _block_state(nq)
+    block_size = np.minimum(TILE_Q, nq - TILE_Q*np.arange(len(state) - 1))
+    # a calculation cancelled before it starts skips every block
+    cancelled = abort is not None and bool(abort())
+    state[0] = cancelled
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(kernel, qx, qy, state)
+        while not cancelled:
+            try:
+                Iq = future.result(timeout=POLL_INTERVAL)
+                break
+            except FuturesTimeoutError:
+                pass
+            done = np.sum(block_size[state[1:] != 0])
+            if progress is not None:
+                progress(100*done/nq)
+            if abort is not None and abort():
+                state[0] = 1
+                cancelled = True
+        if cancelled:
+            Iq = future.result()
+            Iq[np.repeat(state[1:] == 0, block_size)] = np.nan
+    if not cancelled and progress is not None:
+        progress(100)
+    return Iq, cancelled
+
+def _fold_friedel_pairs(qx, qy):
+    """
+    Reduce the q points to one of each (qx, qy), (-qx, -qy) pair.
+
+    Returns the reduced qx, qy and the indices which expand a result on the
+    reduced points back to the original points.  Points are matched to a
+    relative tolerance of 1e-12 so that grids built with linspace, which are
+    only symmetric to rounding, still fold.
+    """
+    flip = (qx < 0) | ((qx == 0) & (qy < 0))
+    fx, fy = np.where(flip, -qx, qx), np.where(flip, -qy, qy)
+    scale = max(np.max(np.abs(fx)), np.max(np.abs(fy)))
+    if scale == 0:
+        return qx[:1], qy[:1], np.zeros(len(qx), dtype=int)
+    key = np.round(np.column_stack((fx, fy)) * (1e12/scale)).astype(np.int64)
+    _, index, inverse = np.unique(key, axis=0, return_index=True, return_inverse=True)
+    return fx[index], fy[index], inverse.ravel()
+
+def _element_bytes(elements):
+    """Approximate size of the element_transform temporaries for a single q."""
+    # complex (elements x faces x vertices x coords) arrays, several at once
+    return 8 * 16 * np.asarray(elements).size * 3
+
 if USE_NUMBA:
-    sig = "f8[:](f8[:],f8[:],f8[:],f8[:],f8[:])"
-    @njit(sig, parallel=True, fastmath=True)
-    def _calc_Iqxy(scale, x, y, qx, qy):
-        #print("calling numba for geni")
-        Iq = np.empty_like(qx)
-        for j in prange(len(Iq)):
-            total = np.sum(scale * np.exp(1j*(qx[j]*x + qy[j]*y)))
-            Iq[j] = abs(total)**2
-        return Iq
+    sig = "c16[:](f8[:],f8[:],f8[:],f8[:],f8[:],i8,i8[:])"
+    @njit(sig, parallel=True, fastmath=True, nogil=True)
+    def _calc_Aqxy(scale, x, y, qx, qy, max_memory, state):
+        # Blocks of q are shared between threads.  Within a block the points
+        # are visited in cache-sized runs, accumulating the real and imaginary
+        # parts of the amplitude separately rather than forming exp(1j*phase).
+        # Blocks are skipped once state[0] is set, and state[1 + block] is
+        # set as each block finishes.
+        nq, npoints = len(qx), len(x)
+        Aq = np.empty(nq, dtype=np.complex128)
+        n_blocks = (nq + TILE_Q - 1) // TILE_Q
+        for block in prange(n_blocks):
+            if state[0] != 0:
+                continue
+            start = block*TILE_Q
+            stop = min(start + TILE_Q, nq)
+            real = np.zeros(stop - start)
+            imag = np.zeros(stop - start)
+            for p_start in range(0, npoints, TILE_POINTS):
+                p_stop = min(p_start + TILE_POINTS, npoints)
+                for j in range(start, stop):
+                    qxj, qyj = qx[j], qy[j]
+                    re, im = 0., 0.
+                    for p in range(p_start, p_stop):
+                        phase = qxj*x[p] + qyj*y[p]
+                        re += scale[p]*np.cos(phase)
+                        im += scale[p]*np.sin(phase)
+                    real[j - start] += re
+                    imag[j - start] += im
+            for j in range(start, stop):
+                Aq[j] = real[j - start] + 1j*imag[j - start]
+            state[1 + block] = 1
+        return Aq
 else:
-    def _calc_Iqxy(scale, x, y, qx, qy):
-        Iq = [abs(np.sum(scale*np.exp(1j*(qx_k*x + qy_k*y))))**2
-              for qx_k, qy_k in zip(qx.flat, qy.flat)]
-        return np.asarray(Iq).reshape(qx.shape)
-_calc_Iqxy.__doc__ = """
+    def _calc_Aqxy(scale, x, y, qx, qy, max_memory=DEFAULT_MAX_MEMORY, state=None):
+        # Blocks of points are limited so that the q x point phase matrix
+        # fits in max_memory, with a couple of temporaries of the same size.
+        block = max(int(max_memory // (3*8*max(len(qx), 1))), 1)
+        real = np.zeros(len(qx))
+        imag = np.zeros(len(qx))
+        for start in range(0, len(x), block):
+            phase = np.outer(qx, x[start:start+block]) + np.outer(qy, y[start:start+block])
+            real += np.cos(phase) @ scale[start:start+block]
+            imag += np.sin(phase) @ scale[start:start+block]
+        if state is not None:
+            state[1:] = 1
+        return real + 1j*imag
+_calc_Aqxy.__doc__ = r"""
+    Compute the amplitude A(q) = sum V(r) rho(r) e^(1j q.r) for a set of
+    points (x, y), with *scale* = V(r) rho(r).  *state* is the shared
+    abort and progress state of :func:`_block_state`.
+    """
+
+def _calc_Iqxy(scale, x, y, qx, qy, max_memory=DEFAULT_MAX_MEMORY, state=None):
+    r"""
     Compute I(q) for a set of points (x, y).
     
     Uses: I(q) = \|sum V(r) rho(r) e^(1j q.r)\|^2 / sum V(r)
     Since qz is zero for SAS, only need 2D vectors q = (qx, qy) and r = (x, y).
     """
+    if state is None:
+        state = _block_state(len(qx))
+    Aq = _calc_Aqxy(scale, x, y, qx, qy, max_memory, state)
+    return Aq.real**2 + Aq.imag**2
 
 def _calc_Iqxy_elements(sld, x, y, z, elements, vol, qx, qy):
     """
@@ -175,7 +494,7 @@ def _calc_Iqxy_elements(sld, x, y, z, elements, vol, qx, qy):
 
 def _calc_Iqxy_magnetic(
         qx, qy, x, y, rho, vol, rho_m,
-        up_frac_i=1, up_frac_f=1, up_theta=0., up_phi=0.):
+        up_frac_i=1, up_frac_f=1, up_theta=0., up_phi=0., state=None):
     """Compute I(q) for a set of points (x, y), with magnetism on each point.
 
     Uses: I(q) = sum_xs w_xs \|sum V(r) rho(q, r, xs) e^(1j q.r)\|^2 / sum V(r)
@@ -205,10 +524,12 @@ def _calc_Iqxy_magnetic(
     qx, qy = (np.asarray(v, 'd').flatten() for v in (qx, qy))
     Iq = np.zeros(shape=qx.shape, dtype='d')
     M = np.array([mx, my, mz])
+    if state is None:
+        state = _block_state(len(qx))
     #print("mag", [v.shape for v in (x, y, rho, vol, mx, my, mz)])
     _calc_Iqxy_magnetic_helper(
         Iq, qx, qy, x, y, rho, vol, M,
-        cos_spin, sin_spin, cos_phi, sin_phi, dd, du, ud, uu)
+        cos_spin, sin_spin, cos_phi, sin_phi, dd, du, ud, uu, state)
     return Iq.reshape(shape)
 
 @njit
@@ -216,11 +537,12 @@ def orth(A, b): # A = 3 x n, and b_hat unit vector
     return A - np.outer(b, b)@A
  
 
-@njit("(" + "f8[:], "*7 + "f8[:,::1], "+ "f8, "*8 + ")")
+@njit("(" + "f8[:], "*7 + "f8[:,::1], "+ "f8, "*8 + "i8[:])", parallel=True, nogil=True)
 def _calc_Iqxy_magnetic_helper(
         Iq, qx, qy, x, y, rho, vol, M, cos_spin, sin_spin, cos_phi, sin_phi,
-        dd, du, ud, uu):
-    # Process each qx, qy
+        dd, du, ud, uu, state):
+    # Process blocks of qx, qy, shared between threads.  Blocks are skipped
+    # once state[0] is set, and state[1 + block] is set as each finishes.
     # Note: enumerating a pair is slower than direct indexing in numba
 
     p_hat = np.array([sin_spin * cos_phi, sin_spin * sin_phi, cos_spin ])
@@ -228,35 +550,67 @@ def _calc_Iqxy_magnetic_helper(
     perpy_hat = np.array([-sin_phi, cos_phi, 0 ])
     perpz_hat = np.array([-cos_spin * cos_phi, -cos_spin * sin_phi, sin_spin ])    
 
-    for k in range(len(qx)):
-        qxk, qyk = qx[k], qy[k]
+    n_blocks = (len(qx) + TILE_Q - 1) // TILE_Q
+    for block in prange(n_blocks):
+        if state[0] != 0:
+            continue
+        for k in range(block*TILE_Q, min(block*TILE_Q + TILE_Q, len(qx))):
+            qxk, qyk = qx[k], qy[k]
+
+            if abs(qxk) > 1.e-16 or abs(qyk) > 1.e-16:
+                norm = 1/np.sqrt(qxk**2 + qyk**2)
+                q_hat = np.array([qxk, qyk, 0]) * norm
+            else:
+                # For homogeneously magnetised disc Mperp can be associated to the
+                # magnetsation corrected for demag factorfield q->0, i.e. M-Nij M
+                # with Nij the demagnetisation tensor (Belleggia JMMM 263, L1, 2003).
+                q_hat = np.sqrt(np.array([0.5, 0.5, 0]))
+
+            M_perp = orth(M, q_hat)
+
+            perpx = p_hat @ M_perp
+            # einsum is faster than sumsq in numpy but not supported in numba
+            #perpy = np.sqrt(np.einsum('ji,ji->i', M_perpP_perpQ, M_perpP_perpQ))
+            perpy = perpy_hat @ M_perp
+            perpz = perpz_hat @ M_perp
+
+            ephase = vol * np.exp(1j * (qxk * x + qyk * y))
+            if dd > 1e-10:
+                Iq[k] += dd * abs(np.sum((rho - perpx) * ephase))**2
+            if uu > 1e-10:
+                Iq[k] += uu * abs(np.sum((rho + perpx) * ephase))**2
+            if du > 1e-10:
+                Iq[k] += du * abs(np.sum((perpy - 1j * perpz) * ephase))**2
+            if ud > 1e-10:
+                Iq[k] += ud * abs(np.sum((perpy + 1j * perpz) * ephase))**2
+        state[1 + block] = 1
+
+@njit("(c16[:,::1], " + "f8[:], "*6 + "f8[:,::1], " + "f8, "*3 + "f8)", parallel=True, nogil=True)
+def _calc_Aqxy_magnetic_helper(
+        A, qx, qy, x, y, rho, vol, M, cos_spin, sin_spin, cos_phi, sin_phi):
+    # Amplitudes of each cross section, as summed in _calc_Iqxy_magnetic_helper
+    p_hat = np.array([sin_spin * cos_phi, sin_spin * sin_phi, cos_spin ])
+    perpy_hat = np.array([-sin_phi, cos_phi, 0 ])
+    perpz_hat = np.array([-cos_spin * cos_phi, -cos_spin * sin_phi, sin_spin ])
 
+    for k in prange(len(qx)):
+        qxk, qyk = qx[k], qy[k]
         if abs(qxk) > 1.e-16 or abs(qyk) > 1.e-16:
             norm = 1/np.sqrt(qxk**2 + qyk**2)
             q_hat = np.array([qxk, qyk, 0]) * norm
         else:
-            # For homogeneously magnetised disc Mperp can be associated to the
-            # magnetsation corrected for demag factorfield q->0, i.e. M-Nij M
-            # with Nij the demagnetisation tensor (Belleggia JMMM 263, L1, 2003).
             q_hat = np.sqrt(np.array([0.5, 0.5, 0]))
 
         M_perp = orth(M, q_hat)
-
         perpx = p_hat @ M_perp
-        # einsum is faster than sumsq in numpy but not supported in numba
-        #perpy = np.sqrt(np.einsum('ji,ji->i', M_perpP_perpQ, M_perpP_perpQ))
         perpy = perpy_hat @ M_perp
         perpz = perpz_hat @ M_perp
 
         ephase = vol * np.exp(1j * (qxk * x + qyk * y))
-        if dd > 1e-10:
-            Iq[k] += dd * abs(np.sum((rho - perpx) * ephase))**2
-        if uu > 1e-10:
-            Iq[k] += uu * abs(np.sum((rho + perpx) * ephase))**2
-        if du > 1e-10:
-            Iq[k] += du * abs(np.sum((perpy - 1j * perpz) * ephase))**2
-        if ud > 1e-10:
-            Iq[k] += ud * abs(np.sum((perpy + 1j * perpz) * ephase))**2
+        A[0, k] = np.sum((rho - perpx) * ephase)
+        A[1, k] = np.sum((perpy - 1j * perpz) * ephase)
+        A[2, k] = np.sum((perpy + 1j * perpz) * ephase)
+        A[3, k] = np.sum((rho + perpx) * ephase)
 
 def _get_normal_vec(geometry):
     """return array of normal vectors of elements
@@ -0,0 +1,130 @@
+"""
+Compare read times of the sas_gen coordinate file readers on generated files.
+
+The "read" column times the reader and the "chunks" column streams the file
+through iter_chunks.  To compare against an earlier version of the readers,
+pass a copy of its sas_gen.py, for example from
+``git show <rev>:src/sas/sascalc/calculator/sas_gen.py > old_sas_gen.py``,
+which adds a "baseline" column timing its readers on the same files.
+
+Usage::
+
+    python -m sas.sascalc.calculator.reader_benchmark [n_points] [old_sas_gen.py]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import importlib.util
+
+import numpy as np
+
+from sas.sascalc.calculator import sas_gen
+
+
+def write_pdb(path, n, rng):
+    names = [' N  ', ' CA ', ' C  ', ' O  ', ' CB ', 'FE  ', ' S  ']
+    pos = rng.normal(scale=100, size=(n, 3))
+    with open(path, 'w') as fid:
+        fid.write("HEADER    GENERATED\n")
+        for k, (x, y, z) in enumerate(pos):
+            fid.write("ATOM  %5d %4s ALA A%4d    %8.3f%8.3f%8.3f  1.00  0.00\n"
+                      % (k % 100000, names[k % len(names)], k % 10000, x, y, z))
+        fid.write("END\n")
+
+
+def write_omf(path, n, rng):
+    nodes = max(int(round(n ** (1/3))), 1)
+    m = rng.normal(scale=1e5, size=(nodes**3, 3))
+    with open(path, 'w') as fid:
+        fid.write("# OOMMF OVF 2.0\n# Segment count: 1\n# Begin: Segment\n# Begin: Header\n"
+                  "# Title: generated\n# meshtype: rectangular\n# meshunit: m\n"
+                  "# xbase: 1e-09\n# ybase: 1e-09\n# zbase: 1e-09\n"
+                  "# xstepsize: 2e-09\n# ystepsize: 2e-09\n# zstepsize: 2e-09\n"
+                  "# xnodes: %d\n# ynodes: %d\n# znodes: %d\n"
+                  "# xmin: 0\n# ymin: 0\n# zmin: 0\n"
+                  "# xmax: 1e-07\n# ymax: 1e-07\n# zmax: 1e-07\n"
+                  "# valuedim: 3\n# valueunit: A/m\n# valuemultiplier: 1\n"
+                  "# End: Header\n# Begin: Data Text\n" % (nodes, nodes, nodes))
+        np.savetxt(fid, m, fmt='%.15g')
+        fid.write("# End: Data Text\n# End: Segment\n")
+
+
+def write_sld(path, n, rng):
+    data = np.column_stack((rng.normal(size=(n, 3))*100, rng.random((n, 4))*1e-6))
+    with open(path, 'w') as fid:
+        fid.write("X Y Z SLDN SLDMx SLDMy SLDMz\n")
+        np.savetxt(fid, data, fmt='%.8g')
+
+
+def write_vtk(path, n, rng):
+    n_cells = max(n // 4, 1)
+    points = rng.random((4*n_cells, 3))
+    cells = np.arange(4*n_cells).reshape(n_cells, 4)
+    with open(path, 'w') as fid:
+        fid.write("# vtk DataFile Version 3.0\ngenerated\nASCII\nDATASET UNSTRUCTURED_GRID\n")
+        fid.write("POINTS %d float\n" % len(points))
+        np.savetxt(fid, points, fmt='%.8g')
+        fid.write("CELLS %d %d\n" % (n_cells, 5*n_cells))
+        np.savetxt(fid, np.column_stack((np.full(n_cells, 4), cells)), fmt='%d')
+        fid.write("CELL_TYPES %d\n" % n_cells)
+        np.savetxt(fid, np.full(n_cells, 10), fmt='%d')
+        fid.write("CELL_DATA %d\nSCALARS nuclear float 1\nLOOKUP_TABLE default\n" % n_cells)
+        np.savetxt(fid, rng.random(n_cells), fmt='%.8g')
+        fid.write("POINT_DATA %d\nVECTORS magnetic float\n" % len(points))
+        np.savetxt(fid, rng.random((len(points), 3)), fmt='%.8g')
+
+
+def best_time(fn, *args, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_baseline(path):
+    """Import an earlier sas_gen.py as a separate module"""
+    spec = importlib.util.spec_from_file_location("baseline_sas_gen", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main(n=200000, baseline=None):
+    rng = np.random.default_rng(1)
+    cases = [
+        ('pdb', write_pdb, 'PDBReader'),
+        ('omf', write_omf, 'OMFReader'),
+        ('sld', write_sld, 'SLDReader'),
+        ('vtk', write_vtk, 'VTKReader'),
+    ]
+    old = load_baseline(baseline) if baseline is not None else None
+    print("%-5s %8s %12s %10s %10s %8s"
+          % ("file", "MB", "baseline [s]", "read [s]", "chunks [s]", "speedup"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for ext, write, reader_name in cases:
+            path = os.path.join(tmpdir, "generated." + ext)
+            write(path, n, rng)
+            size = os.path.getsize(path) / 2**20
+            reader = getattr(sas_gen, reader_name)()
+            new = best_time(reader.read, path)
+            if hasattr(reader, 'iter_chunks'):
+                chunked = best_time(lambda p: sum(1 for _ in reader.iter_chunks(p, max(n//10, 1))), path)
+                chunked = "%10.3f" % chunked
+            else:
+                chunked = "%10s" % "-"
+            if old is not None:
+                before = best_time(getattr(old, reader_name)().read, path)
+                print("%-5s %8.1f %12.3f %10.3f %s %7.1fx"
+                      % (ext, size, before, new, chunked, before/new))
+            else:
+                print("%-5s %8.1f %12s %10.3f %s %8s" % (ext, size, "-", new, chunked, "-"))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+         sys.argv[2] if len(sys.argv) > 2 else None)
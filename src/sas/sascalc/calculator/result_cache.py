@@ -0,0 +1,222 @@
+"""
+Least recently used cache for expensive calculator results.
+
+Results are numpy arrays stored under a key hashed from the inputs of the
+calculation (see :func:`hash_key`).  Entries are held in memory up to a byte
+budget and may optionally be mirrored into a directory on disk, with its own
+byte budget, so that they survive between sessions.
+"""
+import os
+import logging
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+#: Default byte budget for results held in memory.
+DEFAULT_MAX_BYTES = 64*2**20
+#: Default byte budget for results held on disk.
+DEFAULT_MAX_DISK_BYTES = 512*2**20
+
+
+def hash_key(*parts):
+    """
+    Hash the inputs of a calculation into a cache key.
+
+    *parts* may be numpy arrays, numbers, strings, None or (nested) tuples
+    and lists of these.  Arrays are hashed by dtype, shape and contents, so
+    equal arrays give the same key regardless of where they are stored.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    _update_hash(digest, parts)
+    return digest.hexdigest()
+
+
+def _update_hash(digest, part):
+    if isinstance(part, np.ndarray):
+        part = np.ascontiguousarray(part)
+        digest.update(b"a%s%r" % (part.dtype.str.encode(), part.shape))
+        digest.update(memoryview(part).cast('B'))
+    elif isinstance(part, (tuple, list)):
+        digest.update(b"t%d" % len(part))
+        for item in part:
+            _update_hash(digest, item)
+    elif part is None or isinstance(part, (bool, int, float, str, np.generic)):
+        digest.update(b"s" + repr(part).encode() + b"\0")
+    else:
+        raise TypeError("cannot hash %s in cache key" % type(part).__name__)
+
+
+class ResultCache(object):
+    """
+    LRU cache of numpy arrays with a memory budget and an optional disk tier.
+
+    :Param max_bytes: memory budget; least recently used entries are evicted
+        once it is exceeded [int]
+    :Param cache_dir: directory for the disk tier, or None for memory only
+    :Param max_disk_bytes: disk budget for the files in *cache_dir* [int]
+
+    Lookups are counted in :attr:`hits` (including :attr:`disk_hits`) and
+    :attr:`misses`; :meth:`stats` returns these with the current usage.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, cache_dir=None,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        if key in self._entries:
+            return True
+        path = self._disk_path(key)
+        return path is not None and os.path.exists(path)
+
+    def get(self, key):
+        """
+        Return the result stored under *key*, or None if it is not cached.
+        The returned array is read only.
+        """
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        value = self._load(key)
+        if value is not None:
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, value)
+            return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """
+        Store a copy of *value* under *key*, evicting old entries as needed.
+        Returns the stored (read only) copy.
+        """
+        value = np.array(value)
+        value.setflags(write=False)
+        self._store(key, value)
+        self._save(key, value)
+        return value
+
+    def clear(self, disk=False):
+        """
+        Drop all entries from memory, and from disk if *disk* is True.
+        """
+        self._entries.clear()
+        self.nbytes = 0
+        if disk and self.cache_dir is not None:
+            for path in self._disk_files():
+                _remove(path)
+
+    def reset_stats(self):
+        """Set the hit, miss and eviction counters back to zero."""
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Return a dict with the hit, miss and eviction counts and the number
+        of entries and bytes currently held in memory.
+        """
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+        }
+
+    def _store(self, key, value):
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key).nbytes
+        if self.max_bytes is not None and value.nbytes > self.max_bytes:
+            # Too big to keep in memory; it may still live on disk.
+            return
+        self._entries[key] = value
+        self.nbytes += value.nbytes
+        while self.max_bytes is not None and self.nbytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.nbytes -= old.nbytes
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, key + '.npy')
+
+    def _disk_files(self):
+        return [os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir) if name.endswith('.npy')]
+
+    def _load(self, key):
+        path = self._disk_path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            value = np.load(path, allow_pickle=False)
+            # Touch the file so that disk eviction is least recently used.
+            os.utime(path)
+        except (OSError, ValueError) as exc:
+            logging.warning("Discarding unreadable cache file %s: %s", path, exc)
+            _remove(path)
+            return None
+        value.setflags(write=False)
+        return value
+
+    def _save(self, key, value):
+        path = self._disk_path(key)
+        if path is None:
+            return
+        if self.max_disk_bytes is not None and value.nbytes > self.max_disk_bytes:
+            return
+        try:
+            # Write to a temporary file and rename so readers never see a
+            # partial file, even with several processes sharing the cache.
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                np.save(fh, value, allow_pickle=False)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logging.warning("Could not write cache file %s: %s", path, exc)
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        if self.max_disk_bytes is None:
+            return
+        files = []
+        for path in self._disk_files():
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            files.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            _remove(path)
+            total -= size
+            self.evictions += 1
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
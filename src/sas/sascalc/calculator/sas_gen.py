@@ -8,13 +8,19 @@ Calculation checked by sampling from an ellipsoid and comparing Iq with the
 from __future__ import print_function
 
 import os
+import re
 import sys
 import logging
+import warnings
+from itertools import islice
 
 import numpy as np
 from scipy.spatial.transform import Rotation
 from periodictable import formula, nsf
 
+from sas.sascalc.calculator.ausaxs.histogram_sans_debye import DEFAULT_BIN_WIDTH
+from sas.sascalc.calculator.result_cache import ResultCache, hash_key
+
 if sys.version_info[0] < 3:
     def decode(s):
         return s
@@ -27,6 +33,8 @@ MFACTOR_MT = 2.3128E-9
 METER2ANG = 1.0E+10
 # Avogadro constant [1/mol]
 NA = 6.02214129e+23
+#: Number of points in each MagSLD yielded by the readers' iter_chunks
+DEFAULT_CHUNK_SIZE = 1000000
 
 def _vec(v):
     return np.ascontiguousarray(v, 'd') if v is not None else None
@@ -45,6 +53,34 @@ def mag2sld(mag, v_unit=None):
         raise ValueError("Invalid magnetism unit %r" % v_unit)
     return factor * mag
 
+def _parse_floats(text):
+    """
+    Parse whitespace separated numbers into a float array.
+    :raise ValueError: if any of the tokens is not a number
+    """
+    with warnings.catch_warnings():
+        # numpy stops at the first bad token with a warning rather than an error
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            return np.fromstring(text, sep=' ')
+        except DeprecationWarning as exc:
+            raise ValueError(str(exc)) from None
+
+def _parse_columns(text):
+    """
+    Parse lines of whitespace separated numbers into an array of columns.
+    The number of columns is taken from the first non-blank line.
+    :raise ValueError: if the lines are not all numbers or are ragged
+    """
+    first = re.search(r'\S.*', text)
+    if first is None:
+        return np.empty((0, 0))
+    ncols = len(first.group().split())
+    values = _parse_floats(text)
+    if len(values) % ncols:
+        raise ValueError("rows do not all have %d columns" % ncols)
+    return values.reshape(-1, ncols).T
+
 def transform_center(pos_x, pos_y, pos_z):
     """
     re-center
@@ -77,6 +113,21 @@ class GenSAS(object):
         self.data_vol = None # [A^3]
         self.is_avg = False
         self.is_elements = False
+        # Debye engine for 1D calculations; see geni.DEBYE_ENGINES
+        self.debye_engine = 'ausaxs'
+        self.histogram_bin_width = DEFAULT_BIN_WIDTH
+        # threads for the exact Debye sum and 2D tiles, None for all cores
+        self.n_workers = None
+        # cap on the temporaries held by the 2D calculation, None for default
+        self.max_memory = None
+        # optional progress(percentage) and abort() callbacks for long
+        # calculations; abort() returning True raises KeyboardInterrupt
+        self.progress = None
+        self.abort = None
+        # (solvent_SLD, bin_width, histogram) for the 'histogram' engine
+        self.debye_histogram = None
+        # kernel outputs keyed on the structure and q grid, None to disable
+        self.result_cache = ResultCache()
         ## Name of the model
         self.name = "GenSAS"
         ## Define parameters
@@ -116,12 +167,64 @@ class GenSAS(object):
         if self.data_vol is None:
             raise TypeError("data_vol is missing")
         self.data_vol = volume
+        self.debye_histogram = None
 
     def set_is_avg(self, is_avg=False):
         """
         Sets is_avg: [bool]
         """
         self.is_avg = bool(is_avg)
+
+    def set_debye_engine(self, engine='ausaxs', bin_width=None, n_workers=None):
+        """
+        Sets the engine used for the 1D Debye calculation.
+        :Param engine: one of 'ausaxs', 'exact' or 'histogram' [str]
+        :Param bin_width: pair distance bin width for 'histogram' [A]
+        :Param n_workers: number of threads for the exact sum [int]
+        """
+        from .geni import DEBYE_ENGINES
+        if engine not in DEBYE_ENGINES:
+            raise ValueError("Unknown Debye engine %r" % engine)
+        self.debye_engine = engine
+        if bin_width is not None:
+            if bin_width <= 0:
+                raise ValueError("bin_width must be positive")
+            self.histogram_bin_width = float(bin_width)
+        self.n_workers = n_workers
+
+    def set_max_memory(self, max_memory=None):
+        """
+        Sets the cap on temporary memory for 2D calculations.
+        :Param max_memory: bytes, or None for the default [int]
+        """
+        self.max_memory = max_memory
+
+    def set_result_cache(self, max_bytes=None, cache_dir=None, max_disk_bytes=None, enable=True):
+        """
+        Sets up the cache of I(q) kernel outputs.
+        :Param max_bytes: memory budget, or None for the default [int]
+        :Param cache_dir: directory to keep results between sessions [str]
+        :Param max_disk_bytes: disk budget, or None for the default [int]
+        :Param enable: False to turn off caching [bool]
+        """
+        if not enable:
+            self.result_cache = None
+            return
+        options = {}
+        if max_bytes is not None:
+            options['max_bytes'] = max_bytes
+        if max_disk_bytes is not None:
+            options['max_disk_bytes'] = max_disk_bytes
+        self.result_cache = ResultCache(cache_dir=cache_dir, **options)
+
+    def set_callbacks(self, progress=None, abort=None):
+        """
+        Sets the progress and abort callbacks for 1D Debye and 2D calculations.
+        :Param progress: called with the percentage complete
+        :Param abort: polled during the calculation, return True to cancel
+        """
+        self.progress = progress
+        self.abort = abort
     
     def reset_transformations(self):
         """Set previous transformations as invalid
@@ -129,6 +232,24 @@ class GenSAS(object):
         self.transformed_positions = None
         self.transformed_magnetic_slds = None
         self.transformed_angles = None
+        self.debye_histogram = None
+
+    def get_debye_histogram(self):
+        """Pair distance histogram for the 'histogram' Debye engine
+
+        The histogram is independent of q, scale and background, so it is
+        kept until the structure, rotations, volumes, solvent SLD or bin
+        width change.
+        """
+        from .geni import debye_histogram
+        key = (self.params['solvent_SLD'], self.histogram_bin_width)
+        if self.debye_histogram is None or self.debye_histogram[:2] != key:
+            x, y, z = self.transform_positions()
+            sld = self.data_sldn - self.params['solvent_SLD']
+            histogram = debye_histogram(x, y, z, sld, self.data_vol,
+                                        self.histogram_bin_width)
+            self.debye_histogram = key + (histogram,)
+        return self.debye_histogram[2]
     
     def transform_positions(self):
         """Transform position data"""
@@ -176,15 +297,132 @@ class GenSAS(object):
         :Param x: array of x-values
         :Param y: array of y-values
         :return: function value
+
+        The kernel output before scale and background is kept in
+        :attr:`result_cache`, so changing only the scale, background or
+        total volume, or repeating a calculation, does not rerun the kernel.
+        """
+        if qy is not None and len(qy) > 0:
+            qx, qy = _vec(qx), _vec(qy)
+        else:
+            qx, qy = _vec(qx), None
+        from .geni import CalculationCancelled
+        vol_correction = self.data_total_volume / self.params['total_volume']
+        def finish(I_out):
+            return ((self.params['scale'] * vol_correction) * I_out
+                    + self.params['background'])
+
+        key = self._result_key(qx, qy) if self.result_cache is not None else None
+        I_out = self.result_cache.get(key) if key is not None else None
+        if I_out is None:
+            try:
+                I_out = self._calculate_kernel(qx, qy)
+            except CalculationCancelled as exc:
+                # the partial result is not cached, but is scaled for display
+                exc.partial = finish(exc.partial)
+                raise
+            if key is not None:
+                I_out = self.result_cache.put(key, I_out)
+        return finish(I_out)
+
+    def calculate_Iqxy_chunks(self, chunks, qx, qy):
+        """
+        Evaluate the 2D scattering of a structure given in pieces
+        :Param chunks: iterable of MagSLD, such as a reader's iter_chunks
+        :Param qx: array of qx-values
+        :Param qy: array of qy-values
+        :return: function value
+
+        Only one chunk is held at a time, so structures which do not fit in
+        memory, such as large micromagnetic OMF meshes, can be used.  The
+        scattering amplitudes of the chunks are summed, for each spin cross
+        section if any chunk is magnetic, and the total volume is taken from
+        the chunks.  The current rotations, solvent SLD, polarization, scale
+        and background are applied.  The 1D Debye sum needs every pair of
+        points, so it is not available for chunks.
         """
-        from .geni import Iq, Iqxy
+        from .geni import Aqxy, Aqxy_magnetic, _spin_weights
+        qx, qy = _vec(qx), _vec(qy)
+        max_memory = self.max_memory
+        # nuclear amplitude of the non-magnetic chunks
+        amplitude = np.zeros(len(qx), dtype=complex)
+        # (dd, du, ud, uu) amplitudes of the magnetic chunks
+        magnetic = None
+        total_volume = 0.
+        for chunk in chunks:
+            if chunk.is_elements:
+                raise ValueError("Chunked calculation requires pixel or atom data, not elements")
+            position_data = np.column_stack((chunk.pos_x, chunk.pos_y, chunk.pos_z))
+            x, y, _ = np.transpose(self.xyz_to_UVW.apply(position_data))
+            vol = _vec(chunk.vol_pix)
+            sld = _vec(chunk.sld_n) - self.params['solvent_SLD']
+            m = (chunk.sld_mx, chunk.sld_my, chunk.sld_mz)
+            if any(v is not None and np.any(v != 0.) for v in m):
+                m = [_vec(v) if v is not None else np.zeros(len(x)) for v in m]
+                mx, my, mz = np.transpose(self.xyz_to_UVW.apply(np.column_stack(m)))
+                s_theta, s_phi = self.transform_angles()
+                chunk_amplitudes = Aqxy_magnetic(qx, qy, x, y, sld, vol, (mx, my, mz),
+                                                 s_theta, s_phi)
+                magnetic = chunk_amplitudes if magnetic is None else magnetic + chunk_amplitudes
+            elif max_memory is None:
+                amplitude += Aqxy(qx, qy, x, y, sld, vol)
+            else:
+                amplitude += Aqxy(qx, qy, x, y, sld, vol, max_memory)
+            total_volume += np.sum(vol)
+            # the number of chunks is not known up front, so there is no
+            # progress to report, but the calculation can be cancelled
+            if self.abort is not None and self.abort():
+                raise KeyboardInterrupt("Scattering calculation cancelled")
+        if total_volume == 0:
+            raise ValueError("No points in chunks")
+        if magnetic is None:
+            I_out = np.abs(amplitude)**2
+        else:
+            # non-magnetic points only scatter into the non spin-flip cross sections
+            magnetic[0] += amplitude
+            magnetic[3] += amplitude
+            weights = _spin_weights(self.params['Up_frac_in'], self.params['Up_frac_out'])
+            I_out = sum(w * np.abs(a)**2 for w, a in zip(weights, magnetic) if w > 1e-10)
+        I_out = I_out * (1.0E+8/total_volume)
+        return self.params['scale'] * I_out + self.params['background']
+
+    def _is_magnetic(self):
+        mx, my, mz = self.transform_magnetic_slds()
+        if mx is None or my is None or mz is None:
+            return False
+        return bool(np.any(mx != 0.) or np.any(my != 0.) or np.any(mz != 0.))
+
+    def _result_key(self, qx, qy):
+        """Hash of everything the kernel output depends on"""
+        x, y, z = self.transform_positions()
+        sld = self.data_sldn - self.params['solvent_SLD']
+        structure = (x, y, z, sld, self.data_vol)
+        if qy is None:
+            if self.is_avg:
+                method = ('avg',)
+            elif self.debye_engine == 'histogram':
+                method = ('histogram', self.histogram_bin_width)
+            else:
+                method = (self.debye_engine,)
+            return hash_key('1D', method, qx, structure)
+        if self._is_magnetic():
+            magnetism = (tuple(self.transform_magnetic_slds()),
+                         self.params['Up_frac_in'], self.params['Up_frac_out'],
+                         tuple(float(v) for v in self.transform_angles()))
+        else:
+            magnetism = None
+        elements = np.asarray(self.data_elements) if self.is_elements else None
+        return hash_key('2D', qx, qy, structure, magnetism, elements)
+
+    def _calculate_kernel(self, qx, qy=None):
+        """Evaluate I(q) before scale, volume correction and background"""
+        from .geni import Iq, Iqxy, histogram_Iq
         # transform position data from sample to beamline coords
         x, y, z = self.transform_positions()
         sld = self.data_sldn - self.params['solvent_SLD']
         vol = self.data_vol
-        if qy is not None and len(qy) > 0:
+        if qy is not None:
             # 2-D calculation
-            qx, qy = _vec(qx), _vec(qy)
             # MagSLD can have sld_m = None, although in practice usually a zero array
             # if all are None can continue as normal, otherwise set None to array of zeroes to allow rotations
             mx, my, mz = self.transform_magnetic_slds()
@@ -192,28 +430,33 @@ class GenSAS(object):
             out_spin = self.params['Up_frac_out']
             # transform angles from environment to beamline coords
             s_theta, s_phi = self.transform_angles()
+            tiling = dict(n_workers=self.n_workers, progress=self.progress, abort=self.abort)
+            if self.max_memory is not None:
+                tiling['max_memory'] = self.max_memory
 
             if self.is_elements:
                 I_out = Iqxy(
                     qx, qy, x, y, z, sld, vol, mx, my, mz,
                     in_spin, out_spin, s_theta, s_phi,
-                    self.data_elements, self.is_elements)
+                    self.data_elements, self.is_elements, **tiling)
             else:
                 I_out = Iqxy(
                     qx, qy, x, y, z, sld, vol, mx, my, mz,
                     in_spin, out_spin, s_theta, s_phi,
-                    )
+                    **tiling)
         else:
             # 1-D calculation
-            q = _vec(qx)
+            q = qx
             if self.is_avg:
                 x, y, z = transform_center(x, y, z)
-            I_out = Iq(q, x, y, z, sld, vol, is_avg=self.is_avg)
-
-        vol_correction = self.data_total_volume / self.params['total_volume']
-        result = ((self.params['scale'] * vol_correction) * I_out
-                  + self.params['background'])
-        return result
+                I_out = Iq(q, x, y, z, sld, vol, is_avg=True)
+            elif self.debye_engine == 'histogram':
+                I_out = histogram_Iq(q, self.get_debye_histogram())
+            else:
+                I_out = Iq(q, x, y, z, sld, vol, engine=self.debye_engine,
+                           n_workers=self.n_workers,
+                           progress=self.progress, abort=self.abort)
+        return I_out
 
     def set_rotations(self, uvw_to_UVW=Rotation.from_rotvec([0,0,0]), xyz_to_UVW=Rotation.from_rotvec([0,0,0])):
         """Set the rotations for the coordinate systems
@@ -496,6 +739,62 @@ class GenSAS(object):
 
 
 
+# Element types with faces of equal size, see VTKReader.get_faces
+_VTK_ARRAY_TYPES = (10, 11, 12)
+
+class _VTKLines:
+    """
+    Iterator over the non-empty lines of a vtk file which can also read a
+    run of numbers spanning many lines in one go.
+    """
+    def __init__(self, lines):
+        self.lines = lines
+        self.pos = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.pos >= len(self.lines):
+            raise StopIteration
+        self.pos += 1
+        return self.lines[self.pos - 1]
+
+    def peek(self):
+        """Return the next line without consuming it"""
+        return self.lines[self.pos]
+
+    def values(self, count):
+        """
+        Read the next *count* numbers, however they are split across lines.
+        :raise ValueError: if the lines do not hold exactly count numbers
+        """
+        start = self.pos
+        if count == 0:
+            return np.empty(0)
+        if start >= len(self.lines):
+            raise ValueError("unexpected end of file")
+        # Guess the layout from the first line, which holds for the usual
+        # one point/cell per line, and check the guess by the count.
+        per_line = max(len(self.lines[start].split()), 1)
+        stop = min(start - (-count // per_line), len(self.lines))
+        try:
+            values = _parse_floats(' '.join(self.lines[start:stop]))
+        except ValueError:
+            values = None
+        if values is None or len(values) != count:
+            stop, total = start, 0
+            while total < count:
+                if stop >= len(self.lines):
+                    raise ValueError("unexpected end of file")
+                total += len(self.lines[stop].split())
+                stop += 1
+            if total != count:
+                raise ValueError("expected %d values" % count)
+            values = _parse_floats(' '.join(self.lines[start:stop]))
+        self.pos = stop
+        return values
+
 class VTKReader:
     """
     Class to read and process .vtk files
@@ -518,12 +817,10 @@ class VTKReader:
         try:
             #load in the file
             # for standard see https://vtk.org/wp-content/uploads/2015/04/file-formats.pdf
-            input_f = open(path, 'rb')
-            buff = decode(input_f.read())
-            lines = buff.split('\n')
-            #remove blank lines - allowed in file standard - returns as an iterator
-            lines = filter(None, (line.rstrip(" \r") for line in lines))
-            input_f.close()
+            with open(path, 'rb') as input_f:
+                buff = decode(input_f.read())
+            #remove blank lines - allowed in file standard
+            lines = _VTKLines([line for line in (line.rstrip(" \r") for line in buff.split('\n')) if line])
             #first lines should be a file type of the form "# vtk DataFile Version x.x"
             header = next(lines)
             if len(header) < 23:
@@ -560,7 +857,7 @@ class VTKReader:
 
         :param lines: an iterator with the (non-empty) lines of the file, starting one line
                         after the DATASET marker
-        :type lines: iterator
+        :type lines: _VTKLines
         :param path: The filepath to be loaded
         :type path: string
         :return: A MagSLD instance containing the loaded data or None if loading failed
@@ -572,12 +869,8 @@ class VTKReader:
             logging.error("Expected POINTS as next section in vtk file format unstructured grid")
         num_points = int(point_data[1])
         # ignore datatype  - all can be read as float in python
-        # cannot read in with np as data not guaranteed to be on a grid with new lines after each point - although this is standard
-        points = []
-        while len(points) < 3*num_points:
-            #casting to int and float can handle whitespace - shouldn't need to strip()
-            points += [float(item) for item in next(lines).split()]
-        points = np.array(points).reshape((num_points, 3))
+        # data not guaranteed to be on a grid with new lines after each point - although this is standard
+        points = lines.values(3*num_points).reshape((num_points, 3))
         pos_x, pos_y, pos_z = np.hsplit(points, 3)
         # read in the element data
         element_data = next(lines).split()
@@ -587,18 +880,24 @@ class VTKReader:
         len_elements = int(element_data[2])
         # must load and store carfeully: filetype does not guarantee that elements are line by line
         # or all of the same type, cannot immediately cast to np array as cannot support potential jagged arrays
-        elements_raw = []
-        while len(elements_raw) < len_elements:
-            elements_raw += [int(item) for item in next(lines).split()]
+        elements_raw = lines.values(len_elements).astype(int)
         # convert element data from a list of integers into a list of lists of element vertices 
-        elements_sorted = []
-        elements_sizes = []
-        index = 0
-        while index < len(elements_raw):
-            element_size = elements_raw[index]
-            elements_sorted.append(elements_raw[index+1:(index+element_size+1)])
-            elements_sizes.append(element_size)
-            index+=element_size+1
+        element_size = elements_raw[0] if len(elements_raw) else 0
+        if (num_elements*(element_size+1) == len_elements
+                and np.all(elements_raw[::element_size+1] == element_size)):
+            # all elements have the same number of vertices: (elements x vertices) array
+            elements_sorted = elements_raw.reshape(num_elements, element_size+1)[:, 1:]
+            elements_sizes = np.full(num_elements, element_size)
+        else:
+            elements_raw = elements_raw.tolist()
+            elements_sorted = []
+            elements_sizes = []
+            index = 0
+            while index < len(elements_raw):
+                element_size = elements_raw[index]
+                elements_sorted.append(elements_raw[index+1:(index+element_size+1)])
+                elements_sizes.append(element_size)
+                index+=element_size+1
         #sanity check the file has the same number of elements as stated
         if num_elements != len(elements_sorted):
             logging.error("error while reading cells - specified number is inconsistent with data")
@@ -612,21 +911,27 @@ class VTKReader:
         if num_element_types != num_elements:
             logging.error("error while reading cell types - specified number is inconsistent with cells")
             return None
-        element_types = []
-        while len(element_types) < num_element_types:
-            element_types += [int(item) for item in next(lines).split()]
+        element_types = lines.values(num_element_types).astype(int)
         # rewrite elements as list of faces with vertices
         # elements has form elements x faces x vertex_indices
-        elements = [self.get_faces(elements_sorted[i], element_types[i]) for i in range(num_elements)]
-        # get the volumes of each element
-        vols = np.array([self.get_vols(elements_sorted[i], element_types[i], points) for i in range(num_elements)])
+        if (isinstance(elements_sorted, np.ndarray) and num_elements > 0
+                and element_types[0] in _VTK_ARRAY_TYPES and np.all(element_types == element_types[0])):
+            # one element type with equal sized faces: work on all elements at once,
+            # passing the vertex indices as (vertices x elements)
+            cells = elements_sorted.T
+            elements = np.array(self.get_faces(cells, element_types[0])).transpose(2, 0, 1)
+            vols = self.get_vols(cells, element_types[0], points)
+        else:
+            elements = [self.get_faces(elements_sorted[i], element_types[i]) for i in range(num_elements)]
+            # get the volumes of each element
+            vols = np.array([self.get_vols(elements_sorted[i], element_types[i], points) for i in range(num_elements)])
         # get the element attributes - nuclear/magnetic sld data
         attribute_data = self.load_data_attributes(lines, num_points, num_elements)
         if attribute_data is None:
             return None
         point_data, element_data = attribute_data
         # remove None type elements
-        if None in elements:
+        if isinstance(elements, list) and None in elements:
             i = 0
             while i < len(elements):
                 if elements[i] is None:
@@ -695,7 +1000,7 @@ class VTKReader:
         output.filename = os.path.basename(path)
         # check if elements can be written as np array - all elements have same number of faces - all faces have same number of vertices
         are_elements_array = False
-        if all(element_types[0] == x for x in element_types) and not (element_types[0] == 13) and not (element_types[0] == 14):
+        if np.all(element_types == element_types[0]) and not (element_types[0] == 13) and not (element_types[0] == 14):
             elements = np.array(elements)
             are_elements_array = True
         output.set_elements(elements, are_elements_array)
@@ -782,9 +1087,9 @@ class VTKReader:
                 else:
                     components = int(nextLineSplit[3]) # do not care about type - python can convert all to float
                 # check for lookup table
-                nextLine = next(lines)
-                if not nextLine.split()[0].strip().upper() == "LOOKUP_TABLE":
-                    attribute += [float(item) for item in nextLine.split()]
+                nextLine = lines.peek()
+                if nextLine.split()[0].strip().upper() == "LOOKUP_TABLE":
+                    next(lines)
             elif nextLineSplit[0].strip().upper() == "VECTORS":
                 dataType = "VECTOR"
                 dataName = nextLineSplit[1].strip()
@@ -792,10 +1097,7 @@ class VTKReader:
             else:
                 logging.error("Data type " + nextLineSplit[0].strip() + " is not currently accepted")
                 return None, None
-            while len(attribute) < size*components:
-                #casting to int and float can handle whitespace - shouldn't need to strip()
-                attribute += [float(item) for item in next(lines).split()]
-            attribute = np.reshape(np.array(attribute), (size, components))
+            attribute = np.reshape(lines.values(size*components), (size, components))
             data.append([attribute, dataName, components])
     
     def get_faces(self, e, element_type):
@@ -850,8 +1152,9 @@ class VTKReader:
         the real space volume of each element.
 
         :param e: the vertices (as indexes) of the element in the order as given in the .vtk file
-                    specification.
-        :type e: list of int
+                    specification, or an array of (vertices x elements) to find the volumes of
+                    several elements of the same type at once.
+        :type e: list of int or array
         :param element_type: The element_type (as given in the file specification).
         :type element_type: int
         :param v: A list of real space positions which are indexed by `e`.
@@ -860,9 +1163,9 @@ class VTKReader:
         :rtype: float
         """
         if element_type == 10: # tetrahedron
-            return np.abs(np.dot(v[e[0]]-v[e[3]], np.cross(v[e[1]]-v[e[3]], v[e[2]]-v[e[3]])))/6
+            return np.abs(np.sum((v[e[0]]-v[e[3]]) * np.cross(v[e[1]]-v[e[3]], v[e[2]]-v[e[3]]), axis=-1))/6
         elif element_type == 11: # voxel
-            return np.abs(np.dot(v[e[0]]-v[e[2]], np.cross(v[e[0]]-v[e[1]], v[e[0]]-v[e[4]])))
+            return np.abs(np.sum((v[e[0]]-v[e[2]]) * np.cross(v[e[0]]-v[e[1]], v[e[0]]-v[e[4]]), axis=-1))
         elif element_type == 12: # hexahedron
             vals = np.array([[e[2], e[4], e[7], e[1]],
                              [e[0], e[1], e[2], e[4]],
@@ -870,18 +1173,18 @@ class VTKReader:
                              [e[1], e[2], e[3], e[7]],
                              [e[2], e[4], e[6], e[7]]])
             vert = v[vals]
-            return np.sum(np.abs(np.sum(vert[:,0]-vert[:,3] * np.cross(vert[:,1]-vert[:,3], vert[:,2]-vert[:,3]), axis=-1)))/6
+            return np.sum(np.abs(np.sum(vert[:,0]-vert[:,3] * np.cross(vert[:,1]-vert[:,3], vert[:,2]-vert[:,3]), axis=-1)), axis=0)/6
         elif element_type == 13: # wedge
             vals = np.array([[e[0], e[1], e[2], e[5]],
                              [e[0], e[1], e[3], e[5]],
                              [e[1], e[3], e[4], e[5]]])
             vert = v[vals]
-            return np.sum(np.abs(np.sum(vert[:,0]-vert[:,3] * np.cross(vert[:,1]-vert[:,3], vert[:,2]-vert[:,3]), axis=-1)))/6
+            return np.sum(np.abs(np.sum(vert[:,0]-vert[:,3] * np.cross(vert[:,1]-vert[:,3], vert[:,2]-vert[:,3]), axis=-1)), axis=0)/6
         elif element_type == 14: # quadrilateral based pyramid
             vals = np.array([[e[0], e[1], e[2], e[4]],
                              [e[0], e[3], e[2], e[4]]])
             vert = v[vals]
-            return np.sum(np.abs(np.sum(vert[:,0]-vert[:,3] * np.cross(vert[:,1]-vert[:,3], vert[:,2]-vert[:,3]), axis=-1)))/6
+            return np.sum(np.abs(np.sum(vert[:,0]-vert[:,3] * np.cross(vert[:,1]-vert[:,3], vert[:,2]-vert[:,3]), axis=-1)), axis=0)/6
         else:
             return None
 
@@ -1011,6 +1314,25 @@ class OMF2SLD(object):
 
 
 
+# Comment (header) lines of an OMF file
+_OMF_COMMENT = re.compile(r'^[ \t]*#.*$', re.MULTILINE)
+# Start of a data line of a text OMF file
+_OMF_DATA = re.compile(r'^[ \t]*[^#\s]', re.MULTILINE)
+# Start of a binary data block, followed by the check value
+_OMF_BINARY = re.compile(rb'#[ \t]*Begin:[ \t]*Data[ \t]+Binary[ \t]+([48])[ \t]*\r?\n', re.IGNORECASE)
+_OMF_CHECK_VALUE = {4: 1234567.0, 8: 123456789012345.0}
+# Headers are far shorter than this; only used to find a binary block
+_OMF_MAX_HEADER = 2**20
+
+def _omf_positions(omfdata, start, stop):
+    """Positions of the nodes start:stop of an OMF grid, x varying fastest"""
+    index = np.arange(start, stop)
+    xnodes, ynodes = int(omfdata.xnodes), int(omfdata.ynodes)
+    pos_x = omfdata.xmin + (index % xnodes) * omfdata.xstepsize
+    pos_y = omfdata.ymin + (index // xnodes % ynodes) * omfdata.ystepsize
+    pos_z = omfdata.zmin + (index // (xnodes * ynodes)) * omfdata.zstepsize
+    return pos_x, pos_y, pos_z
+
 class OMFReader(object):
     """
     Class to load omf/ascii files (3 columns w/header).
@@ -1029,125 +1351,17 @@ class OMFReader(object):
         :param path: file path
         :return: x, y, z, sld_n, sld_mx, sld_my, sld_mz
         """
-        desc = ""
-        mx = []
-        my = []
-        mz = []
         try:
-            input_f = open(path, 'rb')
-            buff = decode(input_f.read())
-            lines = buff.split('\n')
-            input_f.close()
-            output = OMFData()
-            valueunit = None
-            for line in lines:
-                line = line.strip()
-                # Read data
-                if line and not line.startswith('#'):
-                    try:
-                        toks = line.split()
-                        _mx = float(toks[0])
-                        _my = float(toks[1])
-                        _mz = float(toks[2])
-                        _mx = mag2sld(_mx, valueunit)
-                        _my = mag2sld(_my, valueunit)
-                        _mz = mag2sld(_mz, valueunit)
-                        mx.append(_mx)
-                        my.append(_my)
-                        mz.append(_mz)
-                    except Exception as exc:
-                        # Skip non-data lines
-                        logging.error(str(exc)+" when processing %r"%line)
-                elif line:
-                # Reading Header; Segment count ignored
-                    s_line = line.split(":", 1)
-                    if s_line[0].lower().count("oommf") > 0:
-                        if len(s_line) < 2: s_line = line.split(" ",1)
-                        oommf = s_line[1].strip()                               
-
-                    if s_line[0].lower().count("title") > 0:
-                        title = s_line[1].strip()
-                    if s_line[0].lower().count("desc") > 0:
-                        desc += s_line[1].strip()
-                        desc += '\n'
-                    if s_line[0].lower().count("meshtype") > 0:
-                        meshtype = s_line[1].strip()
-                    if s_line[0].lower().count("meshunit") > 0:
-                        meshunit = s_line[1].strip()
-                        if meshunit.count("m") < 1:
-                            msg = "Error: \n"
-                            msg += "We accept only m as meshunit"
-                            logging.error(msg)
-                            return None
-                    if s_line[0].lower().count("xbase") > 0:
-                        xbase = s_line[1].strip()
-                    if s_line[0].lower().count("ybase") > 0:
-                        ybase = s_line[1].strip()
-                    if s_line[0].lower().count("zbase") > 0:
-                        zbase = s_line[1].strip()
-                    if s_line[0].lower().count("xstepsize") > 0:
-                        xstepsize = s_line[1].strip() 
-                    if s_line[0].lower().count("ystepsize") > 0:
-                        ystepsize = s_line[1].strip()   
-                    if s_line[0].lower().count("zstepsize") > 0:
-                        zstepsize = s_line[1].strip()
-                    if s_line[0].lower().count("xnodes") > 0:
-                        xnodes = s_line[1].strip()   
-                    if s_line[0].lower().count("ynodes") > 0:
-                        ynodes = s_line[1].strip()
-                    if s_line[0].lower().count("znodes") > 0:
-                        znodes = s_line[1].strip()  
-                    if s_line[0].lower().count("xmin") > 0:
-                        xmin = s_line[1].strip()
-                    if s_line[0].lower().count("ymin") > 0:
-                        ymin = s_line[1].strip()
-                    if s_line[0].lower().count("zmin") > 0:
-                        zmin = s_line[1].strip()
-                    if s_line[0].lower().count("xmax") > 0:
-                        xmax = s_line[1].strip()
-                    if s_line[0].lower().count("ymax") > 0:
-                        ymax = s_line[1].strip()
-                    if s_line[0].lower().count("zmax") > 0:
-                        zmax = s_line[1].strip()
-                    if s_line[0].lower().count("valueunit") > 0:
-                        valueunit = s_line[1].strip()
-                        if valueunit.count("mT") < 1 and valueunit.count("A/m") < 1: 
-                            msg = "Error: \n"
-                            msg += "We accept only mT or A/m as valueunit"
-                            logging.error(msg)    
-                            return None
-                        elif "mT" in valueunit or "A/m" in valueunit:    
-                            valueunit = valueunit.split(" ", 1)
-                            valueunit = valueunit[0].strip()
-                    if s_line[0].lower().count("valuemultiplier") > 0:
-                        valuemultiplier = s_line[1].strip()
-                    else: 
-                        valuemultiplier = 1
-                    if s_line[0].lower().count("end") > 0:
-                        output.filename = os.path.basename(path)
-                        output.oommf = oommf
-                        output.title = title
-                        output.desc = desc
-                        output.meshtype = meshtype
-                        output.xbase = float(xbase) * METER2ANG
-                        output.ybase = float(ybase) * METER2ANG
-                        output.zbase = float(zbase) * METER2ANG
-                        output.xstepsize = float(xstepsize) * METER2ANG
-                        output.ystepsize = float(ystepsize) * METER2ANG
-                        output.zstepsize = float(zstepsize) * METER2ANG
-                        output.xnodes = float(xnodes)
-                        output.ynodes = float(ynodes)
-                        output.znodes = float(znodes)
-                        output.xmin = float(xmin) * METER2ANG
-                        output.ymin = float(ymin) * METER2ANG
-                        output.zmin = float(zmin) * METER2ANG
-                        output.xmax = float(xmax) * METER2ANG
-                        output.ymax = float(ymax) * METER2ANG
-                        output.zmax = float(zmax) * METER2ANG
-                        output.valuemultiplier = valuemultiplier
-            mx = np.reshape(mx, (len(mx),))
-            my = np.reshape(my, (len(my),))
-            mz = np.reshape(mz, (len(mz),))
+            with open(path, 'rb') as input_f:
+                buff = input_f.read()
+            binary = _OMF_BINARY.search(buff)
+            if binary is None:
+                output, valueunit, values = self._read_text(decode(buff), path)
+            else:
+                output, valueunit, values = self._read_binary(buff, binary, path)
+            if output is None:
+                return None
+            mx, my, mz = self._to_sld_m(values, valueunit)
             output.set_m(mx, my, mz)
             omf2sld = OMF2SLD()
             omf2sld.set_data(output)
@@ -1155,10 +1369,258 @@ class OMFReader(object):
             return output
         except Exception:
             msg = "%s is not supported: \n" % path
-            msg += "We accept only Text format OMF file."
+            msg += "We accept only OMF files with Text or Binary 4/8 data."
             logging.warning(msg)
             return None
 
+    def iter_chunks(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Load data file in pieces of at most *chunk_size* nodes
+        :param path: file path
+        :return: iterator over MagSLD
+        :raise ValueError: when the file can't be loaded
+
+        Binary data is memory mapped and text data is read a block of lines
+        at a time, so the whole file is never held in memory.
+        """
+        with open(path, 'rb') as input_f:
+            head = input_f.read(_OMF_MAX_HEADER)
+        binary = _OMF_BINARY.search(head)
+        if binary is None:
+            chunks = self._iter_text(path, chunk_size)
+        else:
+            chunks = self._iter_binary(path, head, binary, chunk_size)
+        omfdata, valueunit = next(chunks)
+        if omfdata is None:
+            raise ValueError("%r is not a supported OMF file" % path)
+        start = 0
+        for values in chunks:
+            mx, my, mz = self._to_sld_m(values, valueunit)
+            stop = start + len(mx)
+            pos_x, pos_y, pos_z = _omf_positions(omfdata, start, stop)
+            vol = omfdata.xstepsize * omfdata.ystepsize * omfdata.zstepsize
+            chunk = MagSLD(pos_x, pos_y, pos_z, np.zeros(len(mx)), mx, my, mz,
+                           vol_pix=np.full(len(mx), vol))
+            chunk.set_pix_type('pixel')
+            chunk.set_pixel_symbols('pixel')
+            chunk.filename = omfdata.filename
+            start = stop
+            yield chunk
+
+    def _read_text(self, buff, path):
+        """Header, value unit and (n x columns) values of a text OMF file"""
+        # The data is normally one block of lines between the header and the
+        # trailing comments; data lines never contain '#'.
+        first = _OMF_DATA.search(buff)
+        start = first.start() if first is not None else len(buff)
+        stop = buff.find('#', start)
+        stop = buff.rfind('\n', start, stop) + 1 if stop >= 0 else len(buff)
+        data, trailer = buff[start:stop], buff[stop:]
+        if _OMF_DATA.search(trailer):
+            # data lines mixed in with comments, so pick the comments out
+            data = _OMF_COMMENT.sub('', buff)
+        header = _OMF_COMMENT.findall(buff[:start]) + _OMF_COMMENT.findall(trailer)
+        output, valueunit = self._parse_header(header, path)
+        if output is None:
+            return None, None, None
+        try:
+            values = _parse_columns(data).T
+        except ValueError:
+            # Fall back to reading line by line, skipping non-data lines.
+            values = []
+            for line in data.split('\n'):
+                toks = line.split()
+                if not toks:
+                    continue
+                try:
+                    values.append([float(v) for v in toks[:3]])
+                except Exception as exc:
+                    logging.error(str(exc)+" when processing %r"%line)
+            values = np.reshape(values, (-1, 3))
+        return output, valueunit, values
+
+    def _read_binary(self, buff, binary, path):
+        """Header, value unit and (n x 3) values of a binary OMF file"""
+        header = _OMF_COMMENT.findall(decode(buff[:binary.start()]))
+        output, valueunit = self._parse_header(header, path)
+        if output is None:
+            return None, None, None
+        start, dtype = self._binary_layout(buff, binary)
+        count = 3*int(output.xnodes*output.ynodes*output.znodes)
+        values = np.frombuffer(buff, dtype=dtype, count=count, offset=start)
+        return output, valueunit, values.astype('d').reshape(-1, 3)
+
+    def _binary_layout(self, buff, binary):
+        """Offset of the first value and dtype of a binary data block
+
+        OVF 1.0 files are big endian and OVF 2.0 files little endian; the
+        check value at the start of the block tells which.
+        """
+        width = int(binary.group(1))
+        offset = binary.end()
+        check = _OMF_CHECK_VALUE[width]
+        for order in '<>':
+            dtype = np.dtype('%sf%d' % (order, width))
+            if np.frombuffer(buff, dtype=dtype, count=1, offset=offset)[0] == check:
+                return offset + width, dtype
+        raise ValueError("OMF binary check value not found")
+
+    def _iter_text(self, path, chunk_size):
+        """Yields the header and then blocks of values from a text OMF file"""
+        with open(path, 'rb') as input_f:
+            header = []
+            for line in input_f:
+                line = decode(line)
+                if line.strip() and not line.lstrip().startswith('#'):
+                    break
+                header.append(line.strip())
+            else:
+                line = ''
+            yield self._parse_header(header, path)
+            pending = [line]
+            while True:
+                pending.extend(decode(v) for v in islice(input_f, chunk_size - len(pending)))
+                if not pending:
+                    break
+                block = ''.join(pending)
+                if '#' in block:
+                    # Comments (the end of data markers) are not values
+                    block = _OMF_COMMENT.sub('', block)
+                pending = []
+                values = _parse_columns(block).T
+                if len(values):
+                    yield values[:, :3]
+
+    def _iter_binary(self, path, head, binary, chunk_size):
+        """Yields the header and then blocks of values from a binary OMF file"""
+        header = _OMF_COMMENT.findall(decode(head[:binary.start()]))
+        output, valueunit = self._parse_header(header, path)
+        yield output, valueunit
+        if output is None:
+            return
+        start, dtype = self._binary_layout(head, binary)
+        count = 3*int(output.xnodes*output.ynodes*output.znodes)
+        values = np.memmap(path, dtype=dtype, mode='r', offset=start, shape=(count,))
+        for index in range(0, count, 3*chunk_size):
+            yield values[index:index+3*chunk_size].astype('d').reshape(-1, 3)
+
+    def _to_sld_m(self, values, valueunit):
+        """Convert the first three columns of values to magnetic SLD"""
+        values = np.asarray(values)
+        if values.size == 0:
+            return np.empty(0), np.empty(0), np.empty(0)
+        try:
+            m = mag2sld(values[:, :3], valueunit)
+        except ValueError as exc:
+            # Skip the values if the units are missing
+            logging.error(str(exc))
+            return np.empty(0), np.empty(0), np.empty(0)
+        return m[:, 0].copy(), m[:, 1].copy(), m[:, 2].copy()
+
+    def _parse_header(self, lines, path):
+        """
+        Read the OMF header from its comment lines
+        :return: OMFData without values and the unit of the values in the
+            file, or None, None if the units are not supported
+        """
+        desc = ""
+        output = OMFData()
+        valueunit = None
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            # Reading Header; Segment count ignored
+            s_line = line.split(":", 1)
+            if s_line[0].lower().count("oommf") > 0:
+                if len(s_line) < 2: s_line = line.split(" ",1)
+                oommf = s_line[1].strip()                               
+
+            if s_line[0].lower().count("title") > 0:
+                title = s_line[1].strip()
+            if s_line[0].lower().count("desc") > 0:
+                desc += s_line[1].strip()
+                desc += '\n'
+            if s_line[0].lower().count("meshtype") > 0:
+                meshtype = s_line[1].strip()
+            if s_line[0].lower().count("meshunit") > 0:
+                meshunit = s_line[1].strip()
+                if meshunit.count("m") < 1:
+                    msg = "Error: \n"
+                    msg += "We accept only m as meshunit"
+                    logging.error(msg)
+                    return None, None
+            if s_line[0].lower().count("xbase") > 0:
+                xbase = s_line[1].strip()
+            if s_line[0].lower().count("ybase") > 0:
+                ybase = s_line[1].strip()
+            if s_line[0].lower().count("zbase") > 0:
+                zbase = s_line[1].strip()
+            if s_line[0].lower().count("xstepsize") > 0:
+                xstepsize = s_line[1].strip() 
+            if s_line[0].lower().count("ystepsize") > 0:
+                ystepsize = s_line[1].strip()   
+            if s_line[0].lower().count("zstepsize") > 0:
+                zstepsize = s_line[1].strip()
+            if s_line[0].lower().count("xnodes") > 0:
+                xnodes = s_line[1].strip()   
+            if s_line[0].lower().count("ynodes") > 0:
+                ynodes = s_line[1].strip()
+            if s_line[0].lower().count("znodes") > 0:
+                znodes = s_line[1].strip()  
+            if s_line[0].lower().count("xmin") > 0:
+                xmin = s_line[1].strip()
+            if s_line[0].lower().count("ymin") > 0:
+                ymin = s_line[1].strip()
+            if s_line[0].lower().count("zmin") > 0:
+                zmin = s_line[1].strip()
+            if s_line[0].lower().count("xmax") > 0:
+                xmax = s_line[1].strip()
+            if s_line[0].lower().count("ymax") > 0:
+                ymax = s_line[1].strip()
+            if s_line[0].lower().count("zmax") > 0:
+                zmax = s_line[1].strip()
+            if s_line[0].lower().count("valueunit") > 0:
+                valueunit = s_line[1].strip()
+                if valueunit.count("mT") < 1 and valueunit.count("A/m") < 1: 
+                    msg = "Error: \n"
+                    msg += "We accept only mT or A/m as valueunit"
+                    logging.error(msg)    
+                    return None, None
+                elif "mT" in valueunit or "A/m" in valueunit:    
+                    valueunit = valueunit.split(" ", 1)
+                    valueunit = valueunit[0].strip()
+            if s_line[0].lower().count("valuemultiplier") > 0:
+                valuemultiplier = s_line[1].strip()
+            else: 
+                valuemultiplier = 1
+            if s_line[0].lower().count("end") > 0:
+                output.filename = os.path.basename(path)
+                output.oommf = oommf
+                output.title = title
+                output.desc = desc
+                output.meshtype = meshtype
+                output.xbase = float(xbase) * METER2ANG
+                output.ybase = float(ybase) * METER2ANG
+                output.zbase = float(zbase) * METER2ANG
+                output.xstepsize = float(xstepsize) * METER2ANG
+                output.ystepsize = float(ystepsize) * METER2ANG
+                output.zstepsize = float(zstepsize) * METER2ANG
+                output.xnodes = float(xnodes)
+                output.ynodes = float(ynodes)
+                output.znodes = float(znodes)
+                output.xmin = float(xmin) * METER2ANG
+                output.ymin = float(ymin) * METER2ANG
+                output.zmin = float(zmin) * METER2ANG
+                output.xmax = float(xmax) * METER2ANG
+                output.ymax = float(ymax) * METER2ANG
+                output.zmax = float(zmax) * METER2ANG
+                output.valuemultiplier = valuemultiplier
+        return output, valueunit
+
+#: PDB records holding atom positions
+_PDB_ATOM_RECORDS = (b'ATM   ', b'ATOM  ')
+
 class PDBReader(object):
     """
     PDB reader class: limited for reading the lines starting with 'ATOM'
@@ -1180,136 +1642,169 @@ class PDBReader(object):
         :return: MagSLD
         :raise RuntimeError: when the file can't be opened
         """
-        pos_x = []
-        pos_y = []
-        pos_z = []
-        sld_n = []
-        sld_mx = []
-        sld_my = []
-        sld_mz = []
-        vol_pix = []
-        pix_symbol = []
-        connected_pairs = set()
-
-        atom_value_dict = {}
-
         try:
-            input_f = open(path, 'rb')
-            buff = decode(input_f.read())
-            lines = buff.split('\n')
-            input_f.close()
-            num = 0
-            for line in lines:
-                try:
-                    # check if line starts with "ATOM"
-                    if line[0:6] in ('ATM   ', 'ATOM  '):
-                        # define fields of interest
-                        atom_name = line[12:16].strip()
-                        try:
-                            float(line[12])
-                            atom_name = atom_name[1].upper()
-                        except Exception:
-                            if len(atom_name) == 4:
-                                atom_name = atom_name[0].upper()
-                            elif line[12] != ' ':
-                                atom_name = atom_name[0].upper() + \
-                                        atom_name[1].lower()
-                            else:
-                                atom_name = atom_name[0].upper()
-                        _pos_x = float(line[30:38].strip())
-                        _pos_y = float(line[38:46].strip())
-                        _pos_z = float(line[46:54].strip())
-                        pos_x.append(_pos_x)
-                        pos_y.append(_pos_y)
-                        pos_z.append(_pos_z)
-                        try:
-                            if atom_name in atom_value_dict:
-                                sld_n.append(atom_value_dict[atom_name][0])
-                                vol_pix.append(atom_value_dict[atom_name][1])
-                            else:
-                                val = nsf.neutron_sld(atom_name)[0]
-                                # sld in Ang^-2 unit
-                                val *= 1.0e-6
-                                sld_n.append(val)
-                                atom = formula(atom_name)
-                                # # cm to A units
-                                vol = 1.0e+24 * atom.mass / atom.density / NA
-                                vol_pix.append(vol)
-                                atom_value_dict[atom_name] = [val, vol]
-
-                        except Exception:
-                            self.logger.warning("Warning: set the sld of %s to zero"% atom_name)
-                            sld_n.append(0.0)
-
-                        sld_mx.append(0)
-                        sld_my.append(0)
-                        sld_mz.append(0)
-                        pix_symbol.append(atom_name)
-
-                    elif line[0:6] == 'CONECT':
-                        # Interpret the bonding section of the PDB
-
-                        # split remainder of line into 5 character sections
-                        rest = line[6:]
-                        parts = [rest[i:i+5] for i in range(0, len(rest), 5)]
-
-                        # Convert to indices
-                        bonded_indices = []
-                        for part in parts:
-
-                            try:
-                                index = int(part) - 1
-                                bonded_indices.append(index)
-
-                            except ValueError as ve:
-                                pass
-
-                        # Store pairs in canonical order
-                        a = bonded_indices[0]
-                        for b in bonded_indices[1:]:
-                            if a > b:
-                                a, b = b, a
-                            connected_pairs.add((a, b))
-
-                except Exception as exc:
-                    self.logger.error(f"Failed to read line: {line}")
-                    self.logger.exception(exc)
+            with open(path, 'rb') as input_f:
+                lines = input_f.read().splitlines()
+            atoms = [line for line in lines if line[0:6] in _PDB_ATOM_RECORDS]
+            conect = [line for line in lines if line[0:6] == b'CONECT']
 
-            # Reshape stuff for file
-
-            pos_x = np.reshape(pos_x, (-1, ))
-            pos_y = np.reshape(pos_y, (-1, ))
-            pos_z = np.reshape(pos_z, (-1, ))
+            output = self._atoms_to_sld(atoms, path)
+            connected_pairs = self._parse_conect(conect)
 
+            pos_x, pos_y, pos_z = output.pos_x, output.pos_y, output.pos_z
             n_atoms = len(pos_x)
             ordered_pairs = sorted([(a, b) for a, b in connected_pairs if a < n_atoms and b < n_atoms])  # Why *not* sort
-            x_lines = [(pos_x[a], pos_x[b]) for a, b in ordered_pairs]
-            y_lines = [(pos_y[a], pos_y[b]) for a, b in ordered_pairs]
-            z_lines = [(pos_z[a], pos_z[b]) for a, b in ordered_pairs]
-
-            sld_n = np.reshape(sld_n, (-1, ))
-
-            sld_mx = np.reshape(sld_mx, (-1, ))
-            sld_my = np.reshape(sld_my, (-1, ))
-            sld_mz = np.reshape(sld_mz, (-1, ))
-
-            vol_pix = np.reshape(vol_pix, (-1, ))
-            pix_symbol = np.reshape(pix_symbol, (-1, ))
-
-            output = MagSLD(pos_x, pos_y, pos_z, sld_n, sld_mx, sld_my, sld_mz)
+            a, b = np.reshape(np.asarray(ordered_pairs, dtype=int), (-1, 2)).T
+            x_lines = list(zip(pos_x[a], pos_x[b]))
+            y_lines = list(zip(pos_y[a], pos_y[b]))
+            z_lines = list(zip(pos_z[a], pos_z[b]))
             output.set_conect_lines(x_lines, y_lines, z_lines)
-            output.filename = os.path.basename(path)
-            output.set_pix_type('atom')
-            output.set_pixel_symbols(pix_symbol)
-            output.set_nodes()
-            output.set_pixel_volumes(vol_pix)
-            output.sld_unit = '1/A^(2)'
             return output
 
         except Exception as e:
             self.logger.exception(e)
             return None
 
+    def iter_chunks(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Load data file in pieces of at most *chunk_size* atoms
+
+        Bonds (CONECT records) are not read.
+
+        :param path: file path
+        :return: iterator over MagSLD
+        """
+        with open(path, 'rb') as input_f:
+            atoms = []
+            for line in input_f:
+                if line[0:6] in _PDB_ATOM_RECORDS:
+                    atoms.append(line.rstrip(b'\r\n'))
+                    if len(atoms) == chunk_size:
+                        yield self._atoms_to_sld(atoms, path)
+                        atoms = []
+            if atoms:
+                yield self._atoms_to_sld(atoms, path)
+
+    def _atoms_to_sld(self, atoms, path):
+        """Build MagSLD from the ATOM records, given as bytes"""
+        atoms, (pos_x, pos_y, pos_z) = self._atom_positions(atoms)
+        # Look up the element of each distinct name field only once.
+        fields, inverse = np.unique(
+            np.array([line[12:16] for line in atoms], dtype='S4'), return_inverse=True)
+        names, sld, vol = [], [], []
+        for field in fields:
+            atom_name, atom_sld, atom_vol = self._atom_properties(decode(field).ljust(4))
+            names.append(atom_name)
+            sld.append(atom_sld)
+            vol.append(atom_vol)
+        inverse = inverse.ravel()
+        keep = np.array([name is not None for name in names], dtype=bool)[inverse]
+        if not keep.all():
+            pos_x, pos_y, pos_z, inverse = (v[keep] for v in (pos_x, pos_y, pos_z, inverse))
+            names = [name if name is not None else '' for name in names]
+
+        sld_n = np.asarray(sld, dtype='d')[inverse]
+        vol_pix = np.asarray(vol, dtype='d')[inverse]
+        pix_symbol = np.asarray(names)[inverse]
+        sld_mx = np.zeros(len(pos_x))
+        sld_my = np.zeros(len(pos_x))
+        sld_mz = np.zeros(len(pos_x))
+
+        output = MagSLD(pos_x, pos_y, pos_z, sld_n, sld_mx, sld_my, sld_mz)
+        output.filename = os.path.basename(path)
+        output.set_pix_type('atom')
+        output.set_pixel_symbols(pix_symbol)
+        output.set_nodes()
+        output.set_pixel_volumes(vol_pix)
+        output.sld_unit = '1/A^(2)'
+        return output
+
+    def _atom_positions(self, atoms):
+        """Parse the fixed width x, y, z columns of the ATOM records
+
+        Returns the records which could be read along with the positions.
+        """
+        # Columns 31-54 hold x, y and z as three 8 character fields which may
+        # run together, so slice them out rather than splitting on spaces.
+        fields = b''.join(line[30:54].ljust(24) for line in atoms)
+        try:
+            pos = np.frombuffer(fields, dtype='S8').astype('d').reshape(-1, 3)
+            return atoms, tuple(pos.T)
+        except ValueError:
+            pass
+        good = []
+        for line in atoms:
+            try:
+                [float(line[k:k+8]) for k in (30, 38, 46)]
+                good.append(line)
+            except ValueError as exc:
+                self.logger.error(f"Failed to read line: {decode(line)}")
+                self.logger.error(exc)
+        return self._atom_positions(good)
+
+    def _atom_properties(self, field):
+        """Element symbol, sld and volume for the atom name field (columns 13-16)
+
+        Returns None for the symbol if it can't be interpreted.
+        """
+        atom_name = field.strip()
+        try:
+            try:
+                float(field[0])
+                atom_name = atom_name[1].upper()
+            except Exception:
+                if len(atom_name) == 4:
+                    atom_name = atom_name[0].upper()
+                elif field[0] != ' ':
+                    atom_name = atom_name[0].upper() + \
+                            atom_name[1].lower()
+                else:
+                    atom_name = atom_name[0].upper()
+        except Exception as exc:
+            self.logger.error(f"Failed to read atom name {field!r}")
+            self.logger.error(exc)
+            return None, 0.0, 0.0
+        try:
+            val = nsf.neutron_sld(atom_name)[0]
+            # sld in Ang^-2 unit
+            val *= 1.0e-6
+            atom = formula(atom_name)
+            # # cm to A units
+            vol = 1.0e+24 * atom.mass / atom.density / NA
+        except Exception:
+            self.logger.warning("Warning: set the sld of %s to zero"% atom_name)
+            val, vol = 0.0, 0.0
+        return atom_name, val, vol
+
+    def _parse_conect(self, conect):
+        """Bonded pairs (a, b), a < b, from the CONECT records"""
+        connected_pairs = set()
+        for line in conect:
+            try:
+                # split remainder of line into 5 character sections
+                rest = line[6:]
+                parts = [rest[i:i+5] for i in range(0, len(rest), 5)]
+
+                # Convert to indices
+                bonded_indices = []
+                for part in parts:
+                    try:
+                        bonded_indices.append(int(part) - 1)
+                    except ValueError:
+                        pass
+
+                # Store pairs in canonical order
+                a = bonded_indices[0]
+                for b in bonded_indices[1:]:
+                    if a > b:
+                        a, b = b, a
+                    connected_pairs.add((a, b))
+
+            except Exception as exc:
+                self.logger.error(f"Failed to read line: {decode(line)}")
+                self.logger.exception(exc)
+        return connected_pairs
+
     def write(self, path, data):
         """
         Write
@@ -1348,12 +1843,43 @@ class SLDReader(object):
         """
         try:
             data = np.loadtxt(path, dtype='float', skiprows=1,
-                              ndmin=1, unpack=True)
+                              ndmin=2, unpack=True)
         except Exception:
             data = None
         if data is None or data.shape[0] not in (4, 6, 7, 8):
             logging.error("%r is not an sld file" % path)
             return None
+        return self._to_sld(data, path)
+
+    def iter_chunks(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Load data file in pieces of at most *chunk_size* points
+        :param path: file path
+        :return: iterator over MagSLD
+        :raise ValueError: when the file can't be loaded
+
+        Files without a volume column take the pixel volume found from the
+        first chunk for all of the chunks.
+        """
+        vol = None
+        with open(path, 'rb') as input_f:
+            input_f.readline()  # header
+            while True:
+                lines = list(islice(input_f, chunk_size))
+                if not lines:
+                    break
+                data = np.loadtxt(lines, dtype='float', ndmin=2, unpack=True)
+                if data.shape[0] not in (4, 6, 7, 8):
+                    raise ValueError("%r is not an sld file" % path)
+                output = self._to_sld(data, path)
+                if data.shape[0] < 8:
+                    if vol is None:
+                        vol = output.vol_pix[0] if output.vol_pix is not None else None
+                    elif vol is not None:
+                        output.set_pixel_volumes(vol)
+                yield output
+
+    def _to_sld(self, data, path):
         if data.shape[0] == 4:
             x, y, z, sld = data[:4]
             mx = np.zeros_like(sld)
@@ -1478,6 +2004,11 @@ class OMFData:
         self.my = my
         self.mz = mz
 
+def _first_step(pos):
+    """Distance from the first position to the first one which differs"""
+    index = np.flatnonzero(pos != pos[0])
+    return np.fabs(pos[index[0]] - pos[0]) if len(index) else None
+
 class MagSLD(object):
     """
     Magnetic SLD.
@@ -1668,9 +2199,9 @@ class MagSLD(object):
         self.set_stepsize()
         if self.pix_type == 'pixel':
             try:
-                xdist = (max(self.pos_x) - min(self.pos_x)) / self.xstepsize
-                ydist = (max(self.pos_y) - min(self.pos_y)) / self.ystepsize
-                zdist = (max(self.pos_z) - min(self.pos_z)) / self.zstepsize
+                xdist = np.ptp(self.pos_x) / self.xstepsize
+                ydist = np.ptp(self.pos_y) / self.ystepsize
+                zdist = np.ptp(self.pos_z) / self.zstepsize
                 self.xnodes = int(xdist) + 1
                 self.ynodes = int(ydist) + 1
                 self.znodes = int(zdist) + 1
@@ -1690,21 +2221,16 @@ class MagSLD(object):
         """
         if self.pix_type == 'pixel':
             try:
-                xpos_pre = self.pos_x[0]
-                ypos_pre = self.pos_y[0]
-                zpos_pre = self.pos_z[0]
-                for x_pos in self.pos_x:
-                    if xpos_pre != x_pos:
-                        self.xstepsize = np.fabs(x_pos - xpos_pre)
-                        break
-                for y_pos in self.pos_y:
-                    if ypos_pre != y_pos:
-                        self.ystepsize = np.fabs(y_pos - ypos_pre)
-                        break
-                for z_pos in self.pos_z:
-                    if zpos_pre != z_pos:
-                        self.zstepsize = np.fabs(z_pos - zpos_pre)
-                        break
+                # step is the distance to the first position which differs
+                # from the first point along each axis
+                xstep, ystep, zstep = (
+                    _first_step(pos) for pos in (self.pos_x, self.pos_y, self.pos_z))
+                if xstep is not None:
+                    self.xstepsize = xstep
+                if ystep is not None:
+                    self.ystepsize = ystep
+                if zstep is not None:
+                    self.zstepsize = zstep
                 # default pix volume
                 self.vol_pix = np.ones(len(self.pos_x))
                 vol = self.xstepsize * self.ystepsize * self.zstepsize
@@ -0,0 +1,280 @@
+"""
+Binary container for :class:`MagSLD` structures, opened with numpy.memmap.
+
+Parsing a large OMF, PDB, SLD or VTK file can take much longer than the
+calculation itself, so :class:`SLDFileCache` keeps each loaded structure in
+a cache directory, keyed on the source path, size and modification time.
+Reopening the file maps the stored arrays rather than parsing the text
+again, and only the pages that are actually used are read from disk.
+
+The container starts with an 8 byte magic string and the length of a JSON
+header, which holds the scalar attributes of the structure and the dtype,
+shape and offset of each array.  The arrays follow, each aligned to 64 bytes.
+"""
+import os
+import json
+import struct
+import logging
+import tempfile
+
+import numpy as np
+
+from sas.sascalc.calculator.result_cache import hash_key
+from sas.sascalc.calculator.sas_gen import MagSLD
+
+MAGIC = b'SASSLD\x00\x01'
+FORMAT_VERSION = 1
+#: Extension of the container files in the cache directory.
+CACHE_EXT = '.sldc'
+#: Default byte budget for the cache directory, enough for a few of the
+#: multi-GB structures that are slow to parse; the Generic Scattering
+#: Calculator takes its budget from the GSC_SLD_CACHE_MB config setting.
+DEFAULT_MAX_DISK_BYTES = 8*2**30
+
+_ALIGN = 64
+_PREFIX = struct.Struct('<8sQ')
+_SCALAR_TYPES = (type(None), bool, int, float, str)
+_LINES = ('line_x', 'line_y', 'line_z')
+
+
+def _layout(data):
+    """
+    Return the header, the (offset, array) blocks and the start of the
+    arrays in the container file for the structure *data*.
+
+    :raise TypeError: if an attribute of *data* can't be stored
+    """
+    attrs, arrays = {}, {}
+    for name, value in vars(data).items():
+        if name == 'elements':
+            continue
+        if name in _LINES and value is not None:
+            arrays[name] = np.asarray(value, 'd').reshape(-1, 2)
+        elif isinstance(value, np.ndarray):
+            arrays[name] = value
+        elif isinstance(value, np.generic):
+            attrs[name] = value.item()
+        elif isinstance(value, _SCALAR_TYPES):
+            attrs[name] = value
+        else:
+            raise TypeError("cannot store %s.%s of type %s"
+                            % (type(data).__name__, name, type(value).__name__))
+    elements = getattr(data, 'elements', [])
+    if isinstance(elements, np.ndarray):
+        layout = 'array'
+        arrays['elements'] = elements
+    elif len(elements):
+        # Jagged element lists are stored flat, with the number of faces in
+        # each element and the number of vertices in each face.
+        layout = 'jagged'
+        faces = [face for element in elements for face in element]
+        arrays['elements'] = np.fromiter((v for face in faces for v in face), np.int64)
+        arrays['element_faces'] = np.array([len(element) for element in elements], np.int64)
+        arrays['face_vertices'] = np.array([len(face) for face in faces], np.int64)
+    else:
+        layout = None
+
+    header = {'version': FORMAT_VERSION, 'attrs': attrs, 'elements': layout, 'arrays': {}}
+    blocks, offset = [], 0
+    for name, value in arrays.items():
+        if value.dtype.hasobject:
+            value = value.astype(str)
+        value = np.ascontiguousarray(value)
+        offset = -(-offset // _ALIGN) * _ALIGN
+        header['arrays'][name] = {
+            'dtype': value.dtype.str, 'shape': list(value.shape), 'offset': offset}
+        blocks.append((offset, value))
+        offset += value.nbytes
+    text = json.dumps(header).encode('utf-8')
+    start = -(-(_PREFIX.size + len(text)) // _ALIGN) * _ALIGN
+    return text, blocks, start
+
+
+def sld_file_size(data):
+    """
+    Return the size in bytes of the container file for the structure *data*.
+
+    :raise TypeError: if an attribute of *data* can't be stored
+    """
+    _, blocks, start = _layout(data)
+    return start + max((offset + value.nbytes for offset, value in blocks), default=0)
+
+
+def save_sld(path, data):
+    """
+    Write the structure *data* to the container file *path*.
+
+    :raise TypeError: if an attribute of *data* can't be stored
+    """
+    text, blocks, start = _layout(data)
+    with open(path, 'wb') as fid:
+        fid.write(_PREFIX.pack(MAGIC, len(text)))
+        fid.write(text)
+        for offset, value in blocks:
+            if not value.nbytes:
+                continue
+            fid.seek(start + offset)
+            fid.write(memoryview(value).cast('B'))
+
+
+def load_sld(path, mode='c'):
+    """
+    Open the container file *path* as a :class:`MagSLD`.
+
+    The arrays are memory mapped with *mode* 'c' (copy on write) by default,
+    so changes to them are never written back to the file.
+
+    :raise ValueError: if *path* is not a container of this version
+    """
+    with open(path, 'rb') as fid:
+        prefix = fid.read(_PREFIX.size)
+        magic, length = _PREFIX.unpack(prefix) if len(prefix) == _PREFIX.size else (None, 0)
+        if magic != MAGIC:
+            raise ValueError("%r is not an SLD container" % path)
+        header = json.loads(fid.read(length).decode('utf-8'))
+    if header.get('version') != FORMAT_VERSION:
+        raise ValueError("%r has unsupported version %r" % (path, header.get('version')))
+    start = -(-(_PREFIX.size + length) // _ALIGN) * _ALIGN
+    arrays = {}
+    for name, info in header['arrays'].items():
+        shape = tuple(info['shape'])
+        if np.prod(shape) == 0:
+            # mmap can't map an empty range
+            arrays[name] = np.empty(shape, info['dtype'])
+        else:
+            arrays[name] = np.memmap(path, dtype=info['dtype'], mode=mode,
+                                     offset=start + info['offset'], shape=shape)
+
+    # Restore the attributes directly; MagSLD.__init__ would scan every
+    # position to work out the step sizes, touching the whole file.
+    data = MagSLD.__new__(MagSLD)
+    vars(data).update(header['attrs'])
+    for name in _LINES:
+        if name in arrays:
+            setattr(data, name, [tuple(line) for line in arrays.pop(name).tolist()])
+    if header['elements'] == 'jagged':
+        vertices = arrays.pop('elements').tolist()
+        face_vertices = arrays.pop('face_vertices').tolist()
+        element_faces = arrays.pop('element_faces').tolist()
+        faces, k = [], 0
+        for n in face_vertices:
+            faces.append(vertices[k:k+n])
+            k += n
+        elements, k = [], 0
+        for n in element_faces:
+            elements.append(faces[k:k+n])
+            k += n
+        data.elements = elements
+    elif header['elements'] is None:
+        data.elements = []
+    vars(data).update(arrays)
+    return data
+
+
+class SLDFileCache(object):
+    """
+    Cache of loaded structures in a directory of container files.
+
+    :Param cache_dir: directory for the container files; defaults to
+        *sld_cache* in the SasView user directory
+    :Param max_disk_bytes: byte budget for the directory, after which the
+        least recently used files are removed [int]
+
+    Entries are keyed on the absolute path, size and modification time of
+    the source file and the reader class, so an edited file is parsed again.
+    """
+    def __init__(self, cache_dir=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        if cache_dir is None:
+            from sas.system.user import get_user_dir
+            cache_dir = os.path.join(get_user_dir(), 'sld_cache')
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_path(self, loader, path):
+        """Return the container file used for *path* read with *loader*"""
+        path = os.path.abspath(path)
+        info = os.stat(path)
+        key = hash_key(FORMAT_VERSION, type(loader).__name__, path, info.st_size, info.st_mtime_ns)
+        return os.path.join(self.cache_dir, key + CACHE_EXT)
+
+    def read(self, loader, path):
+        """
+        Return ``loader.read(path)``, from the cache if the file is unchanged.
+
+        Freshly parsed structures are added to the cache.  Failures to read
+        or write the cache are logged and fall back to parsing the file.
+        """
+        cached = self.cache_path(loader, path)
+        if os.path.exists(cached):
+            try:
+                data = load_sld(cached)
+                # Touch the file so that eviction is least recently used.
+                os.utime(cached)
+                return data
+            except (OSError, ValueError, KeyError) as exc:
+                logging.warning("Discarding unreadable SLD cache file %s: %s", cached, exc)
+                _remove(cached)
+        data = loader.read(path)
+        if isinstance(data, MagSLD):
+            self._save(cached, data)
+        return data
+
+    def clear(self):
+        """Remove all container files from the cache directory"""
+        for path in self._files():
+            _remove(path)
+
+    def _files(self):
+        return [os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir) if name.endswith(CACHE_EXT)]
+
+    def _save(self, cached, data):
+        try:
+            size = sld_file_size(data)
+        except TypeError as exc:
+            logging.warning("Could not write SLD cache file %s: %s", cached, exc)
+            return
+        if self.max_disk_bytes is not None and size > self.max_disk_bytes:
+            # It would be removed again by _trim, so don't pay for the write
+            logging.debug("Not caching %s: %d bytes is over the %d byte budget",
+                          cached, size, self.max_disk_bytes)
+            return
+        try:
+            # Write to a temporary file and rename so readers never see a
+            # partial file.
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            os.close(fd)
+            try:
+                save_sld(tmp, data)
+                os.replace(tmp, cached)
+            finally:
+                _remove(tmp)
+        except (OSError, TypeError) as exc:
+            logging.warning("Could not write SLD cache file %s: %s", cached, exc)
+            return
+        self._trim()
+
+    def _trim(self):
+        if self.max_disk_bytes is None:
+            return
+        files = []
+        for path in self._files():
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            files.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            _remove(path)
+            total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
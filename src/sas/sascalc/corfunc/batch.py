@@ -0,0 +1,211 @@
+"""
+Correlation function analysis of a series of data sets.
+
+Time-resolved measurements of crystallising polymers give thousands of
+frames, which are analysed with the same settings.  :func:`batch_corfunc`
+runs :class:`CorfuncCalculator` on each of them and returns a
+:class:`BatchResult` per frame, holding the lamellar and supplementary
+parameters and, on request, the transforms.  The extrapolation points can
+be shared by all the frames or given for each of them.  :func:`tabulate`
+turns the results into columns of numbers.
+
+:func:`iter_corfunc` spreads the frames over a pool of processes and yields
+the results as they complete.  Only the arrays of each frame are sent to
+the workers.
+"""
+import math
+import logging
+from dataclasses import dataclass, fields
+from typing import Optional
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data1D
+
+from sas.sascalc.corfunc.calculation_data import (TransformedData,
+                                                  LamellarParameters,
+                                                  SupplementaryParameters,
+                                                  SettableExtrapolationParameters,
+                                                  GuinierData,
+                                                  PorodData)
+from sas.sascalc.corfunc.corfunc_calculator import CorfuncCalculator
+from sas.sascalc.data_util.process_pool import iter_pool
+
+logger = logging.getLogger(__name__)
+
+#: Scalar fields of SupplementaryParameters; the z and gamma ranges only
+#: set the limits of the diagram, so they are left out of the table.
+SUPPLEMENTARY_COLUMNS = tuple(field.name for field in fields(SupplementaryParameters)
+                              if field.name not in ('z_range', 'gamma_range'))
+
+#: Keys of the columns returned by :func:`tabulate`
+COLUMNS = (('background', 'guinier_A', 'guinier_B', 'porod_K', 'porod_sigma')
+           + tuple(field.name for field in fields(LamellarParameters))
+           + SUPPLEMENTARY_COLUMNS)
+
+
+@dataclass
+class BatchResult:
+    """ Result of the correlation function analysis of one frame
+
+    Values which could not be computed are None, and error holds the message
+    of the failure.
+    """
+    background: Optional[float] = None
+    guinier: Optional[GuinierData] = None
+    porod: Optional[PorodData] = None
+    lamellar: Optional[LamellarParameters] = None
+    supplementary: Optional[SupplementaryParameters] = None
+    transformed: Optional[TransformedData] = None
+    error: Optional[str] = None
+
+    def row(self) -> dict:
+        """ Values of the result for each of the keys in :data:`COLUMNS` """
+        row = dict.fromkeys(COLUMNS)
+        row['background'] = self.background
+        if self.guinier is not None:
+            row['guinier_A'], row['guinier_B'] = self.guinier.A, self.guinier.B
+        if self.porod is not None:
+            row['porod_K'], row['porod_sigma'] = self.porod.K, self.porod.sigma
+        if self.lamellar is not None:
+            for field in fields(LamellarParameters):
+                row[field.name] = getattr(self.lamellar, field.name)
+        if self.supplementary is not None:
+            for name in SUPPLEMENTARY_COLUMNS:
+                row[name] = getattr(self.supplementary, name)
+        return row
+
+
+def default_extrapolation_parameters(q: np.ndarray) -> SettableExtrapolationParameters:
+    """
+    Extrapolation points placed at 20%, 70% and 80% of the q range of the
+    data on a log scale, as the Corfunc perspective does for new data.
+    """
+    log_q_min = math.log(np.min(q))
+    log_q_max = math.log(np.max(q))
+
+    def fractional_position(f):
+        return math.exp(f*log_q_max + (1-f)*log_q_min)
+
+    return SettableExtrapolationParameters(fractional_position(0.2),
+                                           fractional_position(0.7),
+                                           fractional_position(0.8))
+
+
+def compute_corfunc(data, extrapolation_parameters=None, background=None,
+                    guinier=None, porod=None, tangent_method=None,
+                    long_period_method=None, extrapolation_grid=None,
+                    keep_transforms=False) -> BatchResult:
+    """
+    Run the correlation function analysis of *data*.
+
+    :param data: Data1D
+    :param extrapolation_parameters: SettableExtrapolationParameters, or None
+        for :func:`default_extrapolation_parameters`
+    :param background: background level, or None to fit it
+    :param guinier: GuinierData, or None to fit it
+    :param porod: PorodData, or None to fit it
+    :param tangent_method: TangentMethod, or None to choose it from the data
+    :param long_period_method: LongPeriodMethod, or None to choose it from the data
+    :param extrapolation_grid: ExtrapolationGrid, or None for the default
+    :param keep_transforms: return the transforms as well as the parameters
+
+    :return: BatchResult; a failure is reported in its *error* with the
+        values computed up to that point
+    """
+    if extrapolation_parameters is None:
+        extrapolation_parameters = default_extrapolation_parameters(data.x)
+    calculator = CorfuncCalculator(data, extrapolation_parameters,
+                                   long_period_method=long_period_method,
+                                   tangent_method=tangent_method,
+                                   extrapolation_grid=extrapolation_grid)
+    for name, value in (('background', background), ('guinier', guinier), ('porod', porod)):
+        if value is not None:
+            setattr(calculator, 'fit_' + name, False)
+            setattr(calculator, name, value)
+
+    error = None
+    try:
+        calculator.run()
+    except Exception as exc:
+        logger.debug("Correlation function analysis failed: %s", exc)
+        error = str(exc) or type(exc).__name__
+
+    return BatchResult(background=calculator.background,
+                       guinier=calculator.guinier,
+                       porod=calculator.porod,
+                       lamellar=calculator.lamellar_parameters,
+                       supplementary=calculator.supplementary_parameters,
+                       transformed=calculator.transformed if keep_transforms else None,
+                       error=error)
+
+
+def _frame(data):
+    """
+    Return a Data1D holding only the arrays of *data* used by corfunc
+    """
+    return Data1D(x=np.asarray(data.x), y=np.asarray(data.y),
+                  dy=None if data.dy is None else np.asarray(data.dy))
+
+
+def _run(data, extrapolation_parameters, kwargs):
+    return compute_corfunc(data, extrapolation_parameters, **kwargs)
+
+
+def iter_corfunc(frames, extrapolation_parameters=None, n_workers=None, **kwargs):
+    """
+    Run the correlation function analysis of each of *frames*, yielding the
+    results as they complete.
+
+    :param frames: sequence of Data1D
+    :param extrapolation_parameters: SettableExtrapolationParameters shared
+        by all the frames, a sequence with one for each frame, or None for
+        the defaults of each frame
+    :param n_workers: number of processes; 0 or None for one per CPU.
+        With a single worker the frames are processed in the calling process.
+    :param kwargs: settings passed to :func:`compute_corfunc`
+
+    :return: iterator over (index, BatchResult) pairs, in order of
+        completion, where index is the position of the frame in *frames*
+    """
+    if extrapolation_parameters is None or hasattr(extrapolation_parameters, 'point_1'):
+        extrapolation_parameters = [extrapolation_parameters] * len(frames)
+    elif len(extrapolation_parameters) != len(frames):
+        raise ValueError("Expected extrapolation parameters for %d frames, got %d"
+                         % (len(frames), len(extrapolation_parameters)))
+
+    jobs = [(_frame(data), parameters, kwargs)
+            for data, parameters in zip(frames, extrapolation_parameters)]
+    return iter_pool(_run, jobs, n_workers=n_workers)
+
+
+def batch_corfunc(frames, extrapolation_parameters=None, n_workers=1, **kwargs):
+    """
+    Run the correlation function analysis of each of *frames*.
+
+    :param frames: sequence of Data1D
+    :param extrapolation_parameters: shared or per frame, see :func:`iter_corfunc`
+    :param n_workers: number of processes, see :func:`iter_corfunc`
+    :param kwargs: settings passed to :func:`compute_corfunc`
+
+    :return: list of BatchResult, in the order of *frames*
+    """
+    results = [None] * len(frames)
+    for index, result in iter_corfunc(frames, extrapolation_parameters,
+                                      n_workers=n_workers, **kwargs):
+        results[index] = result
+    return results
+
+
+def tabulate(results):
+    """
+    Collect the parameters of *results* in columns.
+
+    :param results: sequence of BatchResult
+    :return: dict of arrays, one for each key in :data:`COLUMNS`, with NaN
+        where a value was not computed
+    """
+    rows = [result.row() for result in results]
+    return {key: np.array([np.nan if row[key] is None else row[key] for row in rows],
+                          dtype=float)
+            for key in COLUMNS}
@@ -1,5 +1,7 @@
 from typing import Tuple, Optional, TypeVar, Generic, NamedTuple
 
+import numpy as np
+
 from sasdata.dataloader.data_info import Data1D
 
 from enum import Enum
@@ -97,6 +99,41 @@ class SettableExtrapolationParameters:
     point_3: float
 
 
+@dataclass
+class ExtrapolationGrid:
+    """ Settings of the uniform q grid on which the extrapolated data are transformed
+
+    The grid runs from 0 to at least q_max_factor times the largest q of the
+    data.  Its extent sets the spacing of the real space points, pi/extent,
+    and its step sets their range, pi/step.  The step is that of the data
+    unless more than max_points would be needed, in which case the step is
+    increased, keeping the real space spacing but shortening the range.
+    """
+    #: Extent of the grid, relative to the largest q of the data
+    q_max_factor: float = 100.0
+    #: Largest number of points in the grid, None for no limit
+    max_points: Optional[int] = 2**16
+    #: Round the number of points up to a power of two, for the FFTs
+    power_of_two: bool = True
+    #: Floating point type of the transforms, np.float32 or np.float64
+    dtype: type = np.float64
+    #: Add the analytic Porod tail beyond the grid to the 1D correlation function
+    tail_correction: bool = True
+
+    def q_values(self, step: float, q_max: float) -> np.ndarray:
+        """ Points of the grid for data with the given q step and largest q """
+        extent = self.q_max_factor * q_max
+        n = int(np.ceil(extent / step))
+        if self.power_of_two:
+            # Padding to a power of two extends the grid at the same step
+            n = 1 << (n - 1).bit_length()
+        if self.max_points is not None and n > self.max_points:
+            n = self.max_points
+            if self.power_of_two:
+                n = 1 << (n.bit_length() - 1)
+            step = extent / n
+        return step * np.arange(n, dtype=np.float64)
+
 
 class ExtrapolationParameters(NamedTuple):
     """ Represents the parameters defining extrapolation"""
@@ -11,8 +11,6 @@ import numpy as np
 import scipy.optimize
 from scipy.interpolate import interp1d
 from scipy.signal import argrelextrema
-from scipy.fftpack import dct
-from scipy.integrate import trapezoid, cumulative_trapezoid
 
 from sas.sascalc.corfunc.calculation_data import (TransformedData,
                                                   LamellarParameters,
@@ -20,6 +18,7 @@ from sas.sascalc.corfunc.calculation_data import (TransformedData,
                                                   TangentMethod,
                                                   LongPeriodMethod,
                                                   ExtrapolationParameters,
+                                                  ExtrapolationGrid,
                                                   SettableExtrapolationParameters,
                                                   Fittable,
                                                   PorodData,
@@ -27,8 +26,7 @@ from sas.sascalc.corfunc.calculation_data import (TransformedData,
 
 
 from sasdata.dataloader.data_info import Data1D
-from sas.sascalc.corfunc.transform_thread import FourierThread
-from sas.sascalc.corfunc.transform_thread import HilbertThread
+from sas.sascalc.corfunc.transform import CorfuncTransform, default_transform
 from sas.sascalc.corfunc.smoothing import SmoothJoin
 
 
@@ -44,13 +42,17 @@ class CorfuncCalculator:
                  data: Optional[Data1D] = None,
                  extrapolation_parameters: Optional[SettableExtrapolationParameters] = None,
                  long_period_method: Optional[LongPeriodMethod] = None,
-                 tangent_method: Optional[TangentMethod] = None):
+                 tangent_method: Optional[TangentMethod] = None,
+                 extrapolation_grid: Optional[ExtrapolationGrid] = None,
+                 transform: Optional[CorfuncTransform] = None):
 
         """
         Back-end for corfunc calculations
 
         :param data: Input data (Data1D)
         :param extrapolation_parameters: SettableExtrapolationParameters object containing the q values use to extrapolate
+        :param extrapolation_grid: ExtrapolationGrid object setting the q grid of the transforms, the default if None
+        :param transform: CorfuncTransform computing the transforms, a shared one if None
         """
 
         # Input data
@@ -60,6 +62,9 @@ class CorfuncCalculator:
         self._extrapolation_parameters: Optional[SettableExtrapolationParameters] = extrapolation_parameters
         self.tangent_method: Optional[TangentMethod] = tangent_method
         self.long_period_method: Optional[LongPeriodMethod] = long_period_method
+        self.extrapolation_grid: ExtrapolationGrid = \
+            ExtrapolationGrid() if extrapolation_grid is None else extrapolation_grid
+        self.transform: CorfuncTransform = default_transform if transform is None else transform
 
         # Fittable parameters
         self._background: Fittable[float] = Fittable()
@@ -224,15 +229,22 @@ class CorfuncCalculator:
     #
 
 
-    def run(self):
-        """ Execute the calculation"""
+    def run(self,
+            progress: Optional[Callable[[float, str], None]] = None,
+            is_cancelled: Optional[Callable[[], bool]] = None):
+        """ Execute the calculation
+
+        :param progress: called with the fraction of the transforms done and a message
+        :param is_cancelled: polled during the transforms, which raise
+            TransformCancelled when it returns True
+        """
         self._calculate_background()
         self._calculate_background_subtracted()
         self._calculate_porod_parameters()
         self._calculate_guinier_parameters()
         self._calculate_extrapolation_function()
         self._calculate_extrapolation_data()
-        self._calculate_transforms()
+        self._calculate_transforms(progress, is_cancelled)
         self._calculate_parameters()
 
 
@@ -380,12 +392,12 @@ class CorfuncCalculator:
 
         q = self.data.x
 
-        extrapolated_q = np.arange(0, q[-1]*100, (q[1]-q[0]))
+        extrapolated_q = self.extrapolation_grid.q_values(q[1] - q[0], q[-1])
         extrapolated_I = self._extrapolation_function(extrapolated_q)
 
         self._extrapolation_data = Data1D(extrapolated_q, extrapolated_I)
 
-    def _calculate_transforms(self):
+    def _calculate_transforms(self, progress=None, is_cancelled=None):
 
         """ Calculate the transforms """
 
@@ -399,43 +411,15 @@ class CorfuncCalculator:
             raise ValueError("Extrapolation data not set")
 
 
-        qs = self._extrapolation_data.x
-        iqs = self._extrapolation_data.y
-        q = self.data.x
-        background = self._background.data
-
-        xs = np.pi * np.arange(len(qs), dtype=np.float32) / (q[1] - q[0]) / len(qs)
-
-        # 1D Correlation Function
-        gamma1 = dct((iqs - background) * (qs ** 2))
-        Q = np.max(gamma1)
-        gamma1 /= Q
-
-        # 3D Correlation Function
-        # gamma3(R) = 1/R int_{0}^{R} gamma1(x) dx
-        # numerical approximation for increasing R using the trapezium rule
-        # Note: SasView 4.x series limited the range to xs <= 1000.0
-
-        gamma3 = cumulative_trapezoid(gamma1, xs) / xs[1:]
-        gamma3 = np.hstack((1.0, gamma3))  # gamma3(0) is defined as 1
-
-        # Interface Distribution function
-        idf = dct(-qs ** 4 * (iqs - background))
-
-        # Manually calculate IDF(0.0), since scipy DCT tends to give us a
-        # very large negative value.
-
-        #    IDF(x) = int_0^inf q^4 * I(q) * cos(q*x) * dq
-        # => IDF(0) = int_0^inf q^4 * I(q) * dq
-
-        idf[0] = trapezoid(-qs ** 4 * (iqs - background), qs)
-        idf /= Q  # Normalise using scattering invariant
-
-        transform1d = Data1D(xs, gamma1)
-        transform3d = Data1D(xs, gamma3)
-        idf = Data1D(xs, idf)
+        grid = self.extrapolation_grid
+        qs = self._extrapolation_data.x.astype(grid.dtype)
+        # Subtract the background before any rounding to single precision,
+        # since the intensity tends to the background at high q
+        iqs = (self._extrapolation_data.y - self._background.data).astype(grid.dtype)
 
-        self._transformed_data = TransformedData(transform1d, transform3d, idf)
+        porod = self._porod.data if grid.tail_correction else None
+        self._transformed_data = self.transform.transform(
+            qs, iqs, porod=porod, progress=progress, is_cancelled=is_cancelled)
 
 
     def _calculate_parameters(self):
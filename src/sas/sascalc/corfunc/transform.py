@@ -0,0 +1,203 @@
+"""
+Fourier transforms of the extrapolated intensity: the 1D and 3D correlation
+functions and the interface distribution function.
+
+:class:`CorfuncTransform` is used by :class:`CorfuncCalculator` and by the
+transform thread of the GUI.  It reports its progress, can be cancelled
+between steps and between the chunks of the 3D correlation function, and
+keeps what only depends on the grid from one call to the next: the real
+space points, the shape of the Porod tail transform and the work buffers.
+Series of frames on the same grid pay for these once.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Callable
+
+import numpy as np
+from scipy.fft import dct
+from scipy.special import sici
+from scipy.integrate import trapezoid, cumulative_trapezoid
+
+from sasdata.dataloader.data_info import Data1D
+
+from sas.sascalc.corfunc.calculation_data import TransformedData, PorodData
+
+#: Default number of points of the 3D correlation function computed at once
+DEFAULT_GAMMA3_CHUNK = 2**16
+
+
+class TransformCancelled(Exception):
+    """ The transform was cancelled before it completed """
+
+
+def porod_tail_transform(x, K, sigma, q_cut):
+    """
+    Cosine transform of the Porod region beyond q_cut, ::
+
+        int_{q_cut}^inf K q^-2 exp(-q^2 sigma^2) cos(q x) dq
+
+    with the Gaussian factor taken at q_cut, which is exact for sigma = 0.
+    """
+    return K * np.exp(-(q_cut * sigma) ** 2) * _porod_tail_shape(x, q_cut)
+
+
+def _porod_tail_shape(x, q_cut):
+    """ Porod tail transform for K = 1 and sigma = 0 """
+    qx = q_cut * x
+    si, _ = sici(qx)
+    return np.cos(qx) / q_cut - x * (np.pi / 2 - si)
+
+
+class _Grid:
+    """ Values which only depend on the q grid """
+    def __init__(self, n: int, step: float):
+        self.step = step
+        self.xs = np.pi * np.arange(n, dtype=np.float32) / step / n
+        self._tail = None
+
+    def tail(self):
+        """ Porod tail shape beyond the grid, scaled to match the DCT """
+        if self._tail is None:
+            n = len(self.xs)
+            # The DCT sums over the grid points, so the integral beyond the
+            # grid is scaled by 2/step to match
+            x = np.pi * np.arange(n) / self.step / n
+            self._tail = (2 / self.step) * _porod_tail_shape(x, self.step * n)
+        return self._tail
+
+
+class CorfuncTransform:
+    """
+    Transforms of the extrapolated intensity on a uniform q grid starting at 0.
+
+    :param gamma3_chunk: number of points of the 3D correlation function
+        integrated at once, or None for all of them.  Chunks bound the
+        memory of the integration and are the points at which long
+        transforms can be cancelled.
+    :param workers: number of threads of the DCTs, see scipy.fft.dct
+    :param max_grids: number of q grids whose values are kept
+
+    The instance can be shared between threads.
+    """
+    def __init__(self, gamma3_chunk: Optional[int] = DEFAULT_GAMMA3_CHUNK,
+                 workers: Optional[int] = None, max_grids: int = 4):
+        self.gamma3_chunk = gamma3_chunk
+        self.workers = workers
+        self.max_grids = max_grids
+        self._grids = OrderedDict()
+        self._lock = threading.Lock()
+        # Work buffers are not shared between threads
+        self._local = threading.local()
+
+    def _grid(self, qs: np.ndarray) -> _Grid:
+        key = (len(qs), float(qs[1] - qs[0]))
+        with self._lock:
+            grid = self._grids.get(key)
+            if grid is not None:
+                self._grids.move_to_end(key)
+                return grid
+        grid = _Grid(len(qs), qs[1] - qs[0])
+        with self._lock:
+            self._grids[key] = grid
+            while len(self._grids) > self.max_grids:
+                self._grids.popitem(last=False)
+        return grid
+
+    def _buffer(self, n: int, dtype) -> np.ndarray:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape != (n,) or buffer.dtype != dtype:
+            buffer = self._local.buffer = np.empty(n, dtype=dtype)
+        return buffer
+
+    def transform(self,
+                  qs: np.ndarray,
+                  iqs: np.ndarray,
+                  porod: Optional[PorodData] = None,
+                  progress: Optional[Callable[[float, str], None]] = None,
+                  is_cancelled: Optional[Callable[[], bool]] = None) -> TransformedData:
+        """
+        Compute the correlation functions and the interface distribution
+        function of the extrapolated data.
+
+        :param qs: uniform grid of q values starting at 0
+        :param iqs: intensity on the grid, less the background; the
+            transforms are computed in its floating point type
+        :param porod: Porod parameters of the data, to add the transform of
+            the Porod tail beyond the grid to gamma_1, or None
+        :param progress: called with the fraction done and a message
+        :param is_cancelled: polled between the steps; the transform stops
+            with TransformCancelled when it returns True
+        """
+        def report(fraction, msg):
+            if is_cancelled is not None and is_cancelled():
+                raise TransformCancelled(msg)
+            if progress is not None:
+                progress(fraction, msg)
+
+        grid = self._grid(qs)
+        xs = grid.xs.copy()
+        work = self._buffer(len(qs), iqs.dtype)
+
+        # 1D Correlation Function
+        report(0.0, "Computing the 1D correlation function")
+        np.multiply(qs, qs, out=work, casting='unsafe')
+        work *= iqs
+        gamma1 = dct(work, workers=self.workers)
+        if porod is not None:
+            gamma1 += porod.K * np.exp(-(grid.step * len(qs) * porod.sigma) ** 2) * grid.tail()
+        Q = np.max(gamma1)
+        gamma1 /= Q
+
+        # 3D Correlation Function
+        # gamma3(R) = 1/R int_{0}^{R} gamma1(x) dx
+        # numerical approximation for increasing R using the trapezium rule
+        # Note: SasView 4.x series limited the range to xs <= 1000.0
+        report(0.3, "Computing the 3D correlation function")
+        gamma3 = self._gamma3(gamma1, xs, lambda fraction: report(
+            0.3 + 0.4 * fraction, "Computing the 3D correlation function"))
+
+        # Interface Distribution function
+        report(0.7, "Computing the interface distribution function")
+        np.power(qs, 4, out=work, casting='unsafe')
+        work *= iqs
+        np.negative(work, out=work)
+
+        # Manually calculate IDF(0.0), since scipy DCT tends to give us a
+        # very large negative value.
+
+        #    IDF(x) = int_0^inf q^4 * I(q) * cos(q*x) * dq
+        # => IDF(0) = int_0^inf q^4 * I(q) * dq
+
+        idf0 = trapezoid(work, qs)
+        idf = dct(work, workers=self.workers)
+        idf[0] = idf0
+        idf /= Q  # Normalise using scattering invariant
+
+        report(1.0, "Transforms completed")
+        return TransformedData(Data1D(xs, gamma1), Data1D(xs, gamma3), Data1D(xs, idf))
+
+    def _gamma3(self, gamma1, xs, report):
+        """ Running trapezium integral of gamma1 over xs, divided by xs """
+        n = len(gamma1)
+        chunk = self.gamma3_chunk
+        if chunk is None or chunk >= n - 1:
+            gamma3 = cumulative_trapezoid(gamma1, xs) / xs[1:]
+            return np.hstack((1.0, gamma3))  # gamma3(0) is defined as 1
+
+        gamma3 = np.empty(n, dtype=np.result_type(gamma1, xs))
+        gamma3[0] = 1.0  # gamma3(0) is defined as 1
+        total = 0.0
+        for start in range(1, n, chunk):
+            stop = min(start + chunk, n)
+            areas = np.diff(xs[start-1:stop]) * (gamma1[start:stop] + gamma1[start-1:stop-1]) / 2.0
+            part = gamma3[start:stop]
+            np.cumsum(areas, out=part)
+            part += total
+            total = part[-1]
+            part /= xs[start:stop]
+            report(stop / n)
+        return gamma3
+
+
+#: Transform shared by the calculators which are not given one
+default_transform = CorfuncTransform()
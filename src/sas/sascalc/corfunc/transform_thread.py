@@ -1,65 +1,48 @@
 from sas.sascalc.data_util.calcthread import CalcThread
-from sasdata.dataloader.data_info import Data1D
-from scipy.fftpack import dct
-from scipy.integrate import trapezoid, cumulative_trapezoid
+from sas.sascalc.corfunc.transform import TransformCancelled, default_transform
 import numpy as np
 
 class FourierThread(CalcThread):
     def __init__(self, raw_data, extrapolated_data, bg, updatefn=None,
-                 completefn=None):
+                 completefn=None, porod=None, transform=None):
         CalcThread.__init__(self, updatefn=updatefn, completefn=completefn)
         self.data = raw_data
         self.background = bg
         self.extrapolation = extrapolated_data
+        # Porod parameters for the tail correction, None for none
+        self.porod = porod
+        self.transform = default_transform if transform is None else transform
 
     def check_if_cancelled(self):
-        if self.isquit():
-            self.update("Fourier transform cancelled.") # TODO: This doesn't fit the signature of the function being called
-            self.complete(transforms=None)
+        try:
+            self.isquit()
+        except KeyboardInterrupt:
             return True
         return False
 
+    def report_progress(self, fraction, msg):
+        self.ready(delay=0.0)
+        self.update(msg="%s (%d%%)" % (msg, 100*fraction))
+
     def compute(self):
         qs = self.extrapolation.x
-        iqs = self.extrapolation.y
-        q = self.data.x
-        background = self.background
+        iqs = np.asarray(self.extrapolation.y) - self.background
 
-        xs = np.pi*np.arange(len(qs),dtype=np.float32)/(q[1]-q[0])/len(qs)
-
-        self.ready(delay=0.0)
-        self.update(msg="Fourier transform in progress.")
-        self.ready(delay=0.0)
-
-        if self.check_if_cancelled(): return
         try:
-            # ----- 1D Correlation Function -----
-            gamma1 = dct((iqs-background)*(qs**2))
-            Q = gamma1.max()
-            gamma1 /= Q
-
-            if self.check_if_cancelled(): return
-
-            # ----- 3D Correlation Function -----
-            # gamma3(R) = 1/R int_{0}^{R} gamma1(x) dx
-            # numerical approximation for increasing R using the trapezium rule
-            # Note: SasView 4.x series limited the range to xs <= 1000.0
-            gamma3 = cumulative_trapezoid(gamma1, xs)/xs[1:]
-            gamma3 = np.hstack((1.0, gamma3)) # gamma3(0) is defined as 1
-
-            if self.check_if_cancelled(): return
-
-            # ----- Interface Distribution function -----
-            idf = dct(-qs**4 * (iqs-background))
-
-            if self.check_if_cancelled(): return
-
-            # Manually calculate IDF(0.0), since scipy DCT tends to give us a
-            # very large negative value.
-            # IDF(x) = int_0^inf q^4 * I(q) * cos(q*x) * dq
-            # => IDF(0) = int_0^inf q^4 * I(q) * dq
-            idf[0] = trapezoid(-qs**4 * (iqs-background), qs)
-            idf /= Q # Normalise using scattering invariant
+            self.ready(delay=0.0)
+            self.update(msg="Fourier transform in progress.")
+            self.ready(delay=0.0)
+            transformed = self.transform.transform(
+                qs, iqs, porod=self.porod, progress=self.report_progress,
+                is_cancelled=self.check_if_cancelled)
+            self.isquit()
+            self.update(msg="Fourier transform completed.")
+
+        except (TransformCancelled, KeyboardInterrupt):
+            # update() and isquit() raise KeyboardInterrupt once the thread
+            # is interrupted, so the cancellation is only sent to completefn
+            self.complete(transforms=None)
+            return
 
         except Exception as e:
             import logging
@@ -69,18 +52,48 @@ class FourierThread(CalcThread):
             self.update(msg="Fourier transform failed.")
             self.complete(transforms=None)
             return
-        if self.isquit():
-            return
-        self.update(msg="Fourier transform completed.")
-
-        transform1 = Data1D(xs, gamma1)
-        transform3 = Data1D(xs, gamma3)
-        idf = Data1D(xs, idf)
 
-        transformed_data = (transform1, transform3, idf)
+        transformed_data = (transformed.gamma_1, transformed.gamma_3, transformed.idf)
 
         self.complete(transform_result=transformed_data)
 
+class CorfuncThread(CalcThread):
+    """
+    Run a CorfuncCalculator, reporting the progress of the transforms to
+    updatefn(fraction=..., msg=...).
+
+    completefn gets the calculator, with the error raised by the
+    calculation if any, or cancelled=True when the thread is stopped.
+    """
+    def __init__(self, calculator, updatefn=None, completefn=None):
+        CalcThread.__init__(self, updatefn=updatefn, completefn=completefn)
+        self.calculator = calculator
+
+    def check_if_cancelled(self):
+        try:
+            self.isquit()
+        except KeyboardInterrupt:
+            return True
+        return False
+
+    def report_progress(self, fraction, msg):
+        self.ready(delay=0.0)
+        self.update(fraction=fraction, msg=msg)
+
+    def compute(self):
+        try:
+            self.calculator.run(progress=self.report_progress,
+                                is_cancelled=self.check_if_cancelled)
+            self.isquit()
+        except (TransformCancelled, KeyboardInterrupt):
+            self.complete(cancelled=True)
+            return
+        except Exception as e:
+            self.complete(calculator=self.calculator, error=e)
+            return
+
+        self.complete(calculator=self.calculator, error=None)
+
 class HilbertThread(CalcThread):
     def __init__(self, raw_data, extrapolated_data, bg, updatefn=None,
                  completefn=None):
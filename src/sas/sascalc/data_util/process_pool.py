@@ -0,0 +1,83 @@
+"""
+Run independent jobs on a pool of worker processes.
+
+The batch calculations of fitting, P(r) inversion, the invariant and the
+correlation function spread their data sets over the CPUs with
+:func:`iter_pool`, and handle the results as the jobs complete.
+
+The workers are spawned rather than forked, as the GUI process is
+multi-threaded, so the function and the arguments of the jobs must be
+picklable and the function must be importable from its module.
+"""
+import os
+import multiprocessing
+
+#: Seconds between checks for cancellation while waiting on the workers.
+POLL_INTERVAL = 0.1
+
+#: Context of the worker processes, for creating queues shared with them.
+context = multiprocessing.get_context('spawn')
+
+
+def pool_size(n_workers, n_jobs):
+    """
+    Return the number of processes to use for *n_jobs* independent jobs.
+
+    :param n_workers: requested number of processes; 0 or None for one per CPU.
+    """
+    if not n_workers:
+        n_workers = os.cpu_count() or 1
+    return max(1, min(int(n_workers), n_jobs))
+
+
+def iter_pool(function, jobs, n_workers=None, initializer=None, initargs=(),
+              isquit=None, poll=None):
+    """
+    Call ``function(*args)`` for each *args* in *jobs*, yielding the results
+    as the jobs complete.
+
+    :param function: function run by the workers.
+    :param jobs: sequence of argument tuples.
+    :param n_workers: number of processes; 0 or None for one per CPU.
+        With a single worker the jobs run in the calling process, without
+        calling the initializer.
+    :param initializer: function called as ``initializer(*initargs)`` when
+        each worker starts.
+    :param isquit: function called while waiting on the workers, which
+        raises KeyboardInterrupt to stop the jobs.
+    :param poll: function called while waiting on the workers, before the
+        jobs found to be complete are yielded.
+
+    :return: iterator over (index, result) pairs, in order of completion,
+        where index is the position of the job in *jobs*
+
+    The workers are stopped if the jobs are cancelled, one of them fails or
+    the caller stops early, and the exception is raised again.
+    """
+    jobs = list(jobs)
+    n_workers = pool_size(n_workers, len(jobs))
+    if n_workers == 1:
+        for index, args in enumerate(jobs):
+            if isquit is not None:
+                isquit()
+            yield index, function(*args)
+        return
+    pool = context.Pool(n_workers, initializer=initializer, initargs=initargs)
+    try:
+        pending = dict((index, pool.apply_async(function, args))
+                       for index, args in enumerate(jobs))
+        while pending:
+            if isquit is not None:
+                isquit()
+            finished = [index for index, job in pending.items() if job.ready()]
+            if poll is not None:
+                poll()
+            for index in finished:
+                yield index, pending.pop(index).get()
+            if pending:
+                next(iter(pending.values())).wait(POLL_INTERVAL)
+        pool.close()
+    finally:
+        # Kills the jobs still running after a cancellation or failure
+        pool.terminate()
+        pool.join()
@@ -10,6 +10,57 @@ from sasdata.dataloader.data_info import Data1D
 from sasdata.dataloader.data_info import Data2D
 _SMALLVALUE = 1.0e-10
 
+
+def _index_of(mask):
+    """
+    Return a slice selecting the True elements of *mask* if they are
+    contiguous, or else the array of their indices.
+    """
+    index = np.flatnonzero(mask)
+    if index.size == 0:
+        return slice(0, 0)
+    if index[-1] - index[0] + 1 == index.size:
+        return slice(int(index[0]), int(index[-1]) + 1)
+    return index
+
+
+def _take(values, index, out=None):
+    """
+    Return the elements of *values* selected by *index*, a slice or an
+    array of indices, writing them to *out* if given.
+    """
+    if isinstance(index, slice):
+        if out is None:
+            return values[index].copy()
+        out[...] = values[index]
+        return out
+    return np.take(values, index, out=out)
+
+
+class _FitIndex(object):
+    """
+    Selection of the fitted points of a data set and its intensities
+    scaled by the errors, computed once per fit range so that each step
+    of the fit only evaluates the theory.
+    """
+    def __init__(self, mask, values, errors):
+        ## Slice or indices of the fitted points
+        self.fitted = _index_of(mask)
+        ## Number of fitted points
+        self.size = int(np.count_nonzero(mask))
+        with np.errstate(divide='ignore'):
+            ## Inverse errors of the fitted points
+            self.inv_err = 1.0 / _take(np.asarray(errors, dtype=float), self.fitted)
+        ## Intensities of the fitted points divided by their errors
+        self.scaled = _take(np.asarray(values, dtype=float), self.fitted) * self.inv_err
+
+    def residuals(self, theory, out):
+        """
+        Write the residuals (data - theory)/error of the fitted points to *out*.
+        """
+        np.multiply(theory, self.inv_err, out=out)
+        return np.subtract(self.scaled, out, out=out)
+
 class FitHandler(object):
     """
     Abstract interface for fit thread handler.
@@ -183,6 +234,7 @@ class FitData1D(Data1D):
         self.idx = (self.x >= self.qmin) & (self.x <= self.qmax)
         self.idx_unsmeared = (self.x >= self._qmin_unsmeared) \
                             & (self.x <= self._qmax_unsmeared)
+        self._fit_index = None
 
     def set_fit_range(self, qmin=None, qmax=None):
         """ to set the fit range"""
@@ -214,6 +266,7 @@ class FitData1D(Data1D):
         self.idx = self.idx & (self.dy != 0)
         self.idx_unsmeared = (self.x >= self._qmin_unsmeared) \
                             & (self.x <= self._qmax_unsmeared)
+        self._fit_index = None
 
     def get_fit_range(self):
         """
@@ -227,6 +280,22 @@ class FitData1D(Data1D):
         """
         return len(self.x)
 
+    def fit_index(self):
+        """
+            Return the selection of the fitted points, the scaled data and
+            the theory buffer for the current fit range, computing them
+            after the range has changed.
+        """
+        index = getattr(self, '_fit_index', None)
+        if index is None:
+            index = _FitIndex(self.idx, self.y, self.dy)
+            index.unsmeared = _index_of(self.idx_unsmeared)
+            index.x_unsmeared = _take(np.asarray(self.x), index.unsmeared)
+            # Zero outside the unsmeared range, which is all that is written
+            index.theory = np.zeros(len(self.x))
+            self._fit_index = index
+        return index
+
     def residuals(self, fn):
         """
             Compute residuals.
@@ -238,9 +307,23 @@ class FitData1D(Data1D):
 
             :return: residuals
         """
+        size = self.fit_index().size
+        return self.residuals_into(fn, np.empty(size), np.empty(size))
+
+    def residuals_into(self, fn, out, theory):
+        """
+            Compute residuals into caller-provided arrays.
+
+            :param fn: function that return model value
+            :param out: array for the residuals of the fitted points
+            :param theory: array for the theory at the fitted points
+
+            :return: out, theory
+        """
+        index = self.fit_index()
         # Compute theory data f(x)
-        fx = np.zeros(len(self.x))
-        fx[self.idx_unsmeared] = fn(self.x[self.idx_unsmeared])
+        fx = index.theory
+        fx[index.unsmeared] = fn(index.x_unsmeared)
 
         ## Smear theory data
         if self.smearer is not None:
@@ -249,9 +332,10 @@ class FitData1D(Data1D):
         ## Sanity check
         if np.size(self.dy) != np.size(fx):
             msg = "FitData1D: invalid error array "
-            msg += "%d <> %d" % (np.shape(self.dy), np.size(fx))
+            msg += "%d <> %d" % (np.size(self.dy), np.size(fx))
             raise RuntimeError(msg)
-        return (self.y[self.idx] - fx[self.idx]) / self.dy[self.idx], fx[self.idx]
+        _take(fx, index.fitted, out=theory)
+        return index.residuals(theory, out), theory
 
     def residuals_deriv(self, model, pars=[]):
         """
@@ -313,6 +397,7 @@ class FitData2D(Data2D):
         self.idx = (self.idx) & (self.mask)
         self.idx = (self.idx) & (np.isfinite(self.data))
         self.num_points = np.sum(self.idx)
+        self._fit_index = None
 
     def set_smearer(self, smearer):
         """
@@ -340,6 +425,7 @@ class FitData2D(Data2D):
         self.idx = (self.idx) & (self.mask)
         self.idx = (self.idx) & (np.isfinite(self.data))
         self.idx = (self.idx) & (self.res_err_data != 0)
+        self._fit_index = None
 
     def get_fit_range(self):
         """
@@ -353,20 +439,46 @@ class FitData2D(Data2D):
         """
         return np.sum(self.idx)
 
+    def fit_index(self):
+        """
+        Return the selection of the fitted points and the scaled data for
+        the current fit range, computing them after the range has changed.
+        """
+        index = getattr(self, '_fit_index', None)
+        if index is None:
+            index = _FitIndex(self.idx, self.data, self.res_err_data)
+            index.qx = _take(np.asarray(self.qx_data), index.fitted)
+            index.qy = _take(np.asarray(self.qy_data), index.fitted)
+            self._fit_index = index
+        return index
+
     def residuals(self, fn):
         """
         return the residuals
         """
+        size = self.fit_index().size
+        return self.residuals_into(fn, np.empty(size), np.empty(size))
+
+    def residuals_into(self, fn, out, theory):
+        """
+        Compute the residuals into caller-provided arrays.
+
+        :param fn: function that return model value
+        :param out: array for the residuals of the fitted points
+        :param theory: array for the theory at the fitted points
+
+        :return: out, theory
+        """
+        index = self.fit_index()
         if self.smearer is not None:
             fn.set_index(self.idx)
             gn = fn.get_value()
         else:
-            gn = fn([self.qx_data[self.idx],
-                     self.qy_data[self.idx]])
+            gn = fn([index.qx, index.qy])
         # use only the data point within ROI range
-        res = (self.data[self.idx] - gn) / self.res_err_data[self.idx]
+        theory[...] = gn
 
-        return res, gn
+        return index.residuals(theory, out), theory
 
     def residuals_deriv(self, model, pars=[]):
         """
@@ -5,6 +5,7 @@ import logging
 import os
 from datetime import timedelta, datetime
 import traceback
+from functools import partial
 import uncertainties
 
 import numpy as np
@@ -17,6 +18,14 @@ try:
     FIT_CONFIG.selected_id = fitters.MPFit.id
     def get_fitter():
         return FIT_CONFIG.selected_fitter, FIT_CONFIG.selected_values
+    def get_fit_config():
+        """Return the selected optimizer and its settings, to send to another process"""
+        return FIT_CONFIG.selected_id, dict(FIT_CONFIG.selected_values)
+    def set_fit_config(fit_config):
+        """Select the optimizer and settings returned by get_fit_config"""
+        fit_id, values = fit_config
+        FIT_CONFIG.selected_id = fit_id
+        FIT_CONFIG.values[fit_id].update(values)
 except ImportError:
     # CRUFT: Bumps changed its handling of fit options around 0.7.5.6
     # Default bumps to use the Levenberg-Marquardt optimizer
@@ -24,6 +33,12 @@ except ImportError:
     def get_fitter():
         fitopts = fitters.FIT_OPTIONS[fitters.FIT_DEFAULT]
         return fitopts.fitclass, fitopts.options.clipboard_copy()
+    def get_fit_config():
+        return fitters.FIT_DEFAULT, fitters.FIT_OPTIONS[fitters.FIT_DEFAULT].options
+    def set_fit_config(fit_config):
+        fit_id, options = fit_config
+        fitters.FIT_DEFAULT = fit_id
+        fitters.FIT_OPTIONS[fit_id].options = options
 
 
 from bumps.mapper import SerialMapper, MPMapper
@@ -34,6 +49,7 @@ from bumps.fitproblem import FitProblem
 from sas.sascalc.fit.AbstractFitEngine import FitEngine
 from sas.sascalc.fit.AbstractFitEngine import FResult
 from sas.sascalc.fit.expression import compile_constraints
+from sas.sascalc.fit.model_cache import evalDistribution
 
 class Progress(object):
     def __init__(self, history, max_step, pars, dof):
@@ -189,7 +205,7 @@ class SasFitness(object):
     def _recalculate(self):
         if self._dirty:
             self._residuals, self._theory \
-                = self.data.residuals(self.model.evalDistribution)
+                = self.data.residuals(partial(evalDistribution, self.model))
             self._dirty = False
 
     def numpoints(self):
@@ -317,7 +333,8 @@ class BumpsFit(FitEngine):
         uncertainty_warning = False
 
         for fitting_module in problem.models:
-            fitness = fitting_module.fitness
+            # Newer bumps releases list the fitness objects themselves
+            fitness = getattr(fitting_module, 'fitness', fitting_module)
             pars = fitness.fitted_pars + fitness.computed_pars
             par_names = fitness.fitted_par_names + fitness.computed_par_names
 
@@ -332,13 +349,14 @@ class BumpsFit(FitEngine):
             if result['uncertainty'] is not None:
                 fitting_result.uncertainty_state = result['uncertainty']
 
-            fitting_result.pvec = np.array([getattr(p.value, 'n', p.value) for p in pars])
-            fitting_result.stderr = np.array([getattr(p.value, 's', 0) for p in pars])
+            values = [_uvalue(p) for p in pars]
+            fitting_result.pvec = np.array([getattr(v, 'n', v) for v in values])
+            fitting_result.stderr = np.array([getattr(v, 's', 0) for v in values])
             DOF = max(1, fitness.numpoints() - len(fitness.fitted_pars))
             fitting_result.fitness = np.sum(fitting_result.residuals ** 2) / DOF
 
             # Warn user about any parameter that is not an uncertainty object
-            miss_uncertainty = [p for p in pars if not isinstance(p.value,
+            miss_uncertainty = [p for p, v in zip(pars, values) if not isinstance(v,
                               (uncertainties.core.Variable, uncertainties.core.AffineScalarFunc))]
             if miss_uncertainty:
                 uncertainty_warning = True
@@ -363,6 +381,14 @@ class BumpsFit(FitEngine):
         else:
             return all_results
 
+def _uvalue(par):
+    """
+    Return the value of *par*, which is an uncertainties object after a fit.
+    """
+    # Newer bumps releases keep the value in a slot, and convert it to float
+    # when it is read from the parameter
+    return getattr(par, 'slot', par).value
+
 def run_bumps(problem, handler, curr_thread):
     def abort_test():
         if curr_thread is None: return False
@@ -412,8 +438,11 @@ def run_bumps(problem, handler, curr_thread):
     success = best is not None
     try:
         stderr = fitdriver.stderr() if success else None
-        cov = (fitdriver.cov() if not hasattr(fitdriver.fitter, 'state') else
-               np.cov(fitdriver.fitter.state.draw().points.T))
+        # Newer bumps releases give every fitter a state, which is None or
+        # has no draw method unless the fitter samples the posterior
+        state = getattr(fitdriver.fitter, 'state', None)
+        cov = (fitdriver.cov() if not hasattr(state, 'draw') else
+               np.cov(state.draw().points.T))
     except Exception as exc:
         errors.append(str(exc))
         errors.append(traceback.format_exc())
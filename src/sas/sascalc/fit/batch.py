@@ -0,0 +1,161 @@
+"""
+Run the fits of a batch on a pool of worker processes.
+
+In a batch fit each data set has its own fitter and FitProblem, so the fits
+are independent and can run in separate processes.  The fitters are sent to
+the workers with cloudpickle, as bumps does for its own process mapper,
+since sasmodels creates the model classes at run time and they can't be
+pickled by reference.  Chain fits start each fit from the result of the
+previous one, so they must run in order in a single process.
+
+The workers are started with the optimizer and settings selected in this
+process, and send the progress of each fit back through a queue.
+"""
+import os
+import pickle
+import logging
+
+import cloudpickle
+
+from sas.sascalc.data_util.process_pool import context, iter_pool, pool_size
+from sas.sascalc.fit.AbstractFitEngine import FitHandler
+from sas.sascalc.fit.BumpsFitting import get_fit_config, set_fit_config
+
+logger = logging.getLogger(__name__)
+
+
+def batch_workers(n_workers, n_fits):
+    """
+    Return the number of processes to use for *n_fits* independent fits.
+
+    :param n_workers: requested number of processes; 0 or None for one per CPU.
+
+    With OMP_NUM_THREADS=1 bumps evaluates each fit on its own process pool,
+    which can't be started from a pool worker, so the fits run in the
+    calling process.
+    """
+    if int(os.environ.get('OMP_NUM_THREADS', '0')) == 1:
+        return 1
+    return pool_size(n_workers, n_fits)
+
+
+class _ProgressHandler(FitHandler):
+    """
+    Fit handler which passes the progress of fit *index* to *report* as
+    ``report(index, current, expected)``, whenever the percentage changes.
+    """
+    def __init__(self, index, report):
+        self.index = index
+        self.report = report
+        self.percent = None
+
+    def progress(self, current, expected):
+        percent = int(100*current//expected) if expected else 0
+        if percent != self.percent:
+            self.percent = percent
+            self.report(self.index, current, expected)
+
+
+# Queue for the progress of the fits, set in each worker process
+_progress_queue = None
+
+
+def _init_worker(fit_config, progress_queue):
+    global _progress_queue
+    set_fit_config(fit_config)
+    _progress_queue = progress_queue
+
+
+def _fit(index, payload, reset_flag):
+    fitter = pickle.loads(payload)
+    handler = _ProgressHandler(index, lambda *args: _progress_queue.put(args))
+    return cloudpickle.dumps(fitter.fit(handler=handler, reset_flag=reset_flag))
+
+
+def iter_fits(fitters, n_workers=None, reset_flag=False, isquit=None, step_progress=None):
+    """
+    Run ``fitter.fit()`` for each of *fitters*, yielding the results as the
+    fits complete.
+
+    :param fitters: sequence of independent fit engines.
+    :param n_workers: number of processes; 0 or None for one per CPU.
+        With a single worker the fits run in the calling process.
+    :param reset_flag: start each fit from the initial parameter values.
+    :param isquit: function called while waiting on the workers, which
+        raises KeyboardInterrupt to stop the fits.
+    :param step_progress: function called as ``step_progress(index, current,
+        expected)`` as fit *index* progresses, with *current* equal to
+        *expected* when it is complete.
+
+    :return: iterator over (index, result) pairs, in order of completion,
+        where index is the position of the fitter in *fitters*
+
+    The fits use the optimizer and settings selected in this process.
+    The workers are stopped if the fits are cancelled, one of them fails or
+    the caller stops early, and the exception is raised again.
+    """
+    n_fits = len(fitters)
+    if batch_workers(n_workers, n_fits) == 1:
+        for k, fitter in enumerate(fitters):
+            if isquit is not None:
+                isquit()
+            handler = _ProgressHandler(k, step_progress) if step_progress is not None else None
+            result = fitter.fit(handler=handler, reset_flag=reset_flag)
+            if step_progress is not None:
+                step_progress(k, 1, 1)
+            yield k, result
+        return
+    jobs = [(k, cloudpickle.dumps(fitter), reset_flag) for k, fitter in enumerate(fitters)]
+    # The workers write to a SimpleQueue without a feeder thread, so the
+    # progress of a fit is in the queue before its result is returned.
+    progress_queue = context.SimpleQueue()
+
+    def drain():
+        while not progress_queue.empty():
+            args = progress_queue.get()
+            if step_progress is not None:
+                step_progress(*args)
+
+    results = iter_pool(_fit, jobs, n_workers=batch_workers(n_workers, n_fits),
+                        initializer=_init_worker, initargs=(get_fit_config(), progress_queue),
+                        isquit=isquit, poll=drain)
+    try:
+        for k, payload in results:
+            if step_progress is not None:
+                step_progress(k, 1, 1)
+            yield k, pickle.loads(payload)
+    finally:
+        # Stops the workers before closing their queue
+        results.close()
+        progress_queue.close()
+
+
+def fit_batch(fitters, n_workers=None, reset_flag=False, isquit=None, progress=None,
+              step_progress=None):
+    """
+    Run ``fitter.fit()`` for each of *fitters* on a pool of processes.
+
+    :param fitters: sequence of independent fit engines.
+    :param n_workers: number of processes; 0 or None for one per CPU.
+    :param reset_flag: start each fit from the initial parameter values.
+    :param isquit: function called while waiting on the workers, which
+        raises KeyboardInterrupt to stop the fits.
+    :param progress: function called as ``progress(k, n)`` when k of the
+        n fits are complete.
+    :param step_progress: function called as the individual fits progress,
+        see :func:`iter_fits`.
+
+    :return: list with the results of each fit, in the order of *fitters*
+
+    The workers are stopped if the fits are cancelled or one of them fails,
+    and the exception is raised again.
+    """
+    n_fits = len(fitters)
+    results = [None]*n_fits
+    fits = iter_fits(fitters, n_workers=n_workers, reset_flag=reset_flag, isquit=isquit,
+                     step_progress=step_progress)
+    for done, (k, result) in enumerate(fits, 1):
+        results[k] = result
+        if progress is not None:
+            progress(done, n_fits)
+    return results
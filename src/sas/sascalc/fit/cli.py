@@ -0,0 +1,544 @@
+"""
+Headless batch fitting, run as ``sasview fit``.
+
+The model is taken from a fit page saved by SasView, either a 4.x fit
+(.fitv) or project (.svs) file or a 5.x analysis or project file, or it is
+given on the command line::
+
+    sasview fit -p page.fitv --workers 4 -o results.csv data/*.xml
+    sasview fit -m sphere --param radius=60:10:200 --fit radius --fit scale data/*.dat
+    sasview fit -p page.fitv --optimizer de --fit-option steps=500 data/*.xml
+
+Each data file is fitted independently with bumps, on a pool of processes,
+and a row of the results table is written to the output as each fit
+finishes.  The rows are CSV by default, or JSON lines with ``--format json``
+or an output file ending in .json.
+"""
+import os
+import sys
+import csv
+import copy
+import glob
+import json
+import logging
+import argparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#: Smearing choices, in the order of the fit page combobox.
+SMEARING = ('none', 'data', 'pinhole', 'slit')
+#: Weighting choices, keyed on the flag stored in the fit page.
+WEIGHTING = ('none', 'di', 'sqrti', 'i')
+#: Columns of the results table before the fitted parameters.
+COLUMNS = ('index', 'file', 'name', 'success', 'chi2', 'npts', 'error')
+
+
+def parse_args(argv):
+    """
+    Parse the arguments of ``sasview fit``, returning an argparse.Namespace.
+    """
+    parser = argparse.ArgumentParser(
+        prog="sasview fit",
+        description="Fit a model to each of a set of data files.")
+    parser.add_argument("data", nargs="+",
+        help="data files, or glob patterns such as 'data/*.xml'")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-p", "--page", type=str,
+        help="fit page, analysis or project file holding the model")
+    source.add_argument("-m", "--model", type=str,
+        help="name of the model to fit")
+    parser.add_argument("--page-index", type=int, default=0,
+        help="fit page to use when the file holds more than one")
+    parser.add_argument("--structure", type=str,
+        help="structure factor to multiply the model by")
+    parser.add_argument("--multiplicity", type=int,
+        help="multiplicity of a multi-shell model")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE[:MIN:MAX]",
+        help="set the value and optionally the range of a parameter")
+    parser.add_argument("--fit", action="append", default=[], metavar="NAME",
+        help="fit this parameter")
+    parser.add_argument("--fix", action="append", default=[], metavar="NAME",
+        help="do not fit this parameter")
+    parser.add_argument("--qmin", type=float, help="minimum q of the fit")
+    parser.add_argument("--qmax", type=float, help="maximum q of the fit")
+    parser.add_argument("--smearing", choices=('page',) + SMEARING, default='page',
+        help="resolution function; 'page' uses the fit page setting, "
+             "or the resolution of the data without a page")
+    parser.add_argument("--dq", type=float,
+        help="dQ/Q in percent for custom pinhole smearing")
+    parser.add_argument("--slit-height", type=float,
+        help="slit height for custom slit smearing")
+    parser.add_argument("--slit-width", type=float, default=0.0,
+        help="slit width for custom slit smearing")
+    parser.add_argument("--weighting", choices=WEIGHTING,
+        help="weighting of the residuals; defaults to the fit page setting or dI")
+    parser.add_argument("--optimizer", type=str,
+        help="bumps optimizer, such as lm, amoeba, de, newton or dream; "
+             "defaults to Levenberg-Marquardt")
+    parser.add_argument("--fit-option", action="append", default=[], metavar="NAME=VALUE",
+        help="set an option of the optimizer, such as steps=500")
+    parser.add_argument("-w", "--workers", type=int, default=0,
+        help="number of fits to run at once; 0 for one per CPU")
+    parser.add_argument("-o", "--output", type=str,
+        help="results file; defaults to standard output")
+    parser.add_argument("--format", choices=('csv', 'json'),
+        help="format of the results; defaults to json for a .json output")
+    opts = parser.parse_args(argv)
+    if opts.format is None:
+        is_json = opts.output is not None and opts.output.lower().endswith('.json')
+        opts.format = 'json' if is_json else 'csv'
+    return opts
+
+
+def _first(page, key, default=None):
+    value = page.get(key)
+    if isinstance(value, list):
+        value = value[0] if value else default
+    return default if value is None else value
+
+
+def read_pages(path):
+    """
+    Return the fit pages saved in *path*, as dictionaries of lists of
+    strings keyed on the property or parameter name.
+
+    SasView 5 analysis and project files are JSON; 4.x fit and project
+    files are read with :class:`sas.sascalc.fit.pagestate.Reader`.
+    """
+    try:
+        with open(path) as fid:
+            content = json.load(fid)
+    except (UnicodeDecodeError, ValueError):
+        content = None
+    if isinstance(content, dict):
+        pages = []
+        for value in content.values():
+            if not isinstance(value, dict) or 'fit_params' not in value:
+                continue
+            params = value['fit_params']
+            if not isinstance(params, list):
+                params = [params]
+            pages.extend(page for page in params if isinstance(page, dict))
+        return pages
+
+    from sas.sascalc.fit.pagestate import PageState, Reader
+    states = []
+    def collect(state=None, datainfo=None, format=None):
+        if isinstance(state, PageState):
+            states.append(state)
+    Reader(call_back=collect).read(path)
+    return [state.to_fit_params() for state in states]
+
+
+def _float(text, default):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return default
+
+
+def make_model(name, structure=None, multiplicity=None):
+    """
+    Return an instance of the model *name*, multiplied by the *structure*
+    factor if given.
+
+    :raise ValueError: if a model name is unknown
+    """
+    from sasmodels.sasview_model import MultiplicationModel
+    from sas.sascalc.fit.models import ModelManager
+
+    models = ModelManager().get_model_dictionary()
+    for model_name in (name, structure):
+        if model_name is not None and model_name not in models:
+            raise ValueError("unknown model %r" % model_name)
+    model = models[name]()
+    if model.is_multiplicity_model:
+        if multiplicity is None:
+            multiplicity = model.multiplicity_info.number
+        model = models[name](multiplicity=multiplicity)
+    if structure is not None:
+        model = MultiplicationModel(model, models[structure]())
+    return model
+
+
+def model_from_page(page):
+    """
+    Return the model of the fit page *page* with the saved parameter values,
+    ranges and dispersions, and the list of parameters to fit.
+    """
+    from sasmodels.weights import MODELS as POLYDISPERSITY_MODELS
+
+    structure = _first(page, 'fitpage_structure')
+    if structure in ('', 'None'):
+        structure = None
+    multiplicity = _first(page, 'multiplicity')
+    if multiplicity is not None:
+        multiplicity = int(str(multiplicity), 0)
+    model = make_model(_first(page, 'fitpage_model', _first(page, 'model_name')),
+                       structure, multiplicity)
+    polydisperse = str(_first(page, 'polydisperse_params')) == 'True'
+    magnetic = str(_first(page, 'magnetic_params')) == 'True'
+    available = model.getParamList()
+
+    params_to_fit = []
+    for name, entry in page.items():
+        if not isinstance(entry, list) or len(entry) <= 3 or name not in available:
+            continue
+        if name.endswith('.width'):
+            if not polydisperse:
+                continue
+            # [checked, width, (error,) min, max, npts, nsigmas, function]
+            p_min, p_max, npts, nsigmas, function = entry[-5:]
+            base = name[:-len('.width')]
+            if function not in POLYDISPERSITY_MODELS or function == 'array':
+                logger.warning("Using a gaussian dispersion for %s rather than %r",
+                               base, function)
+                function = 'gaussian'
+            model.set_dispersion(base, POLYDISPERSITY_MODELS[function]())
+            model.setParam(base + '.npts', _float(npts, model.getParam(base + '.npts')))
+            model.setParam(base + '.nsigmas', _float(nsigmas, model.getParam(base + '.nsigmas')))
+        else:
+            if name in model.magnetic_params and not magnetic:
+                continue
+            # [checked, value, error, min, max, constraint]
+            p_min, p_max = entry[3], entry[4]
+            if len(entry) > 5 and entry[5]:
+                logger.warning("Ignoring the constraint %r on %s", entry[5], name)
+        value = _float(entry[1], None)
+        if value is None:
+            continue
+        model.setParam(name, value)
+        if name in model.details:
+            details = model.details[name]
+            details[1] = _float(p_min, details[1])
+            details[2] = _float(p_max, details[2])
+        if str(entry[0]) == 'True':
+            params_to_fit.append(name)
+    return model, params_to_fit
+
+
+def set_parameters(model, params_to_fit, settings, fit=(), fix=()):
+    """
+    Apply the command line parameter *settings* to *model*, and add the
+    names in *fit* to and remove those in *fix* from *params_to_fit*.
+
+    :param settings: strings of the form NAME=VALUE or NAME=VALUE:MIN:MAX.
+
+    :raise ValueError: if a setting can't be parsed or names an unknown parameter
+    """
+    available = model.getParamList()
+    for setting in settings:
+        name, sep, text = setting.partition('=')
+        name = name.strip()
+        values = text.split(':')
+        if not sep or len(values) not in (1, 3):
+            raise ValueError("expected NAME=VALUE or NAME=VALUE:MIN:MAX, not %r" % setting)
+        if name not in available:
+            raise ValueError("%r is not a parameter of %s" % (name, model.name))
+        model.setParam(name, float(values[0]))
+        if len(values) == 3:
+            if name not in model.details:
+                raise ValueError("can't set the range of %r" % name)
+            model.details[name][1] = float(values[1]) if values[1] else -np.inf
+            model.details[name][2] = float(values[2]) if values[2] else np.inf
+    for name in fit:
+        if name not in available:
+            raise ValueError("%r is not a parameter of %s" % (name, model.name))
+        if name not in params_to_fit:
+            params_to_fit.append(name)
+    params_to_fit[:] = [name for name in params_to_fit if name not in fix]
+    return params_to_fit
+
+
+def _setting(text, default):
+    if isinstance(default, bool):
+        if text.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError("expected true or false, not %r" % text)
+        return text.lower() in ('true', '1')
+    if isinstance(default, (int, float)):
+        try:
+            return int(text) if isinstance(default, int) else float(text)
+        except ValueError:
+            # Options such as jump and alpha default to 0 but take floats
+            return float(text)
+    return text
+
+
+def set_optimizer(optimizer=None, settings=()):
+    """
+    Select the bumps *optimizer* and apply the option *settings* to it, as
+    the fit options dialog does.  The fit workers are started with the
+    selected optimizer and options.
+
+    :param optimizer: id of the optimizer, or None to keep the current one.
+    :param settings: strings of the form NAME=VALUE.
+
+    :return: the optimizer id and a dictionary of the options that were set
+    :raise ValueError: if the optimizer or an option is unknown, or a value
+        can't be parsed
+    """
+    from bumps.options import FIT_CONFIG
+    from sas.sascalc.fit.BumpsFitting import set_fit_config
+
+    fit_id = FIT_CONFIG.selected_id if optimizer is None else optimizer
+    if fit_id not in FIT_CONFIG.ids:
+        raise ValueError("unknown optimizer %r; choose from %s"
+                         % (fit_id, ", ".join(FIT_CONFIG.active_ids)))
+    defaults = dict(FIT_CONFIG.settings[fit_id])
+    values = {}
+    for setting in settings:
+        name, sep, text = setting.partition('=')
+        name = name.strip()
+        if not sep:
+            raise ValueError("expected NAME=VALUE, not %r" % setting)
+        if name not in defaults:
+            raise ValueError("%r is not an option of %s; choose from %s"
+                             % (name, FIT_CONFIG.names[fit_id], ", ".join(defaults)))
+        try:
+            values[name] = _setting(text.strip(), defaults[name])
+        except ValueError:
+            raise ValueError("can't set the option %s to %r" % (name, text))
+    set_fit_config((fit_id, values))
+    return fit_id, values
+
+
+def load_data(patterns):
+    """
+    Load the data sets in the files matching *patterns*.
+
+    :return: list of (path, data) pairs
+    :raise ValueError: if a pattern matches no file
+    """
+    from sasdata.dataloader.loader import Loader
+
+    loader = Loader()
+    datasets = []
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern)) or ([pattern] if os.path.isfile(pattern) else [])
+        if not paths:
+            raise ValueError("no data files match %r" % pattern)
+        for path in paths:
+            for data in loader.load(path):
+                datasets.append((path, data))
+    return datasets
+
+
+def is_2d(data):
+    """Return True if *data* is a Data2D"""
+    return data.__class__.__name__ == 'Data2D'
+
+
+def add_weighting(data, flag):
+    """
+    Return a copy of *data* with the errors replaced by the weights of the
+    residuals, as the fit page does.
+
+    :param flag: 0 for no weighting, 1 for dI, 2 for sqrt(I) and 3 for I.
+    """
+    if is_2d(data):
+        intensity, error = data.data, data.err_data
+    else:
+        intensity, error = data.y, data.dy
+    if flag == 0 or error is None:
+        weight = np.ones_like(intensity)
+    elif flag == 1:
+        weight = error
+    elif flag == 2:
+        weight = np.sqrt(np.abs(intensity))
+    else:
+        weight = np.abs(intensity)
+    new_data = copy.deepcopy(data)
+    if is_2d(data):
+        new_data.err_data = weight
+    else:
+        new_data.dy = weight
+    return new_data
+
+
+def page_smearing(data, model, index):
+    """
+    Return the smearing choice for the fit page combobox *index*, which
+    only offers 'data' if *data* has resolution information.
+    """
+    from sas.sascalc.fit.qsmearing import smear_selection
+
+    choices = ['none']
+    if smear_selection(data, model) is not None:
+        choices.append('data')
+    choices.extend(['pinhole'] if is_2d(data) else ['pinhole', 'slit'])
+    return choices[index] if 0 <= index < len(choices) else 'none'
+
+
+def make_smearer(data, model, smearing, dq=None, slit_height=None, slit_width=None):
+    """
+    Return the smearer for fitting *model* to *data*.
+
+    :param smearing: one of :data:`SMEARING`.
+    :param dq: dQ/Q in percent for 'pinhole'.
+    :param slit_height, slit_width: slit size for 'slit'.
+    """
+    from sas.sascalc.fit.qsmearing import smear_selection
+
+    if smearing == 'none':
+        return None
+    if smearing == 'data':
+        return smear_selection(data, model)
+    data = copy.deepcopy(data)
+    if smearing == 'pinhole':
+        if not dq:
+            return None
+        percent = dq/100.0
+        if is_2d(data):
+            q = np.sqrt(data.qx_data**2 + data.qy_data**2)
+            data.dqx_data = data.dqy_data = percent*q
+        else:
+            data.dx = percent*data.x
+            data.dxl = None
+            data.dxw = None
+    elif smearing == 'slit':
+        if is_2d(data):
+            raise ValueError("slit smearing is not available for 2D data")
+        height, width = slit_height or 0.0, slit_width or 0.0
+        # The larger dimension is the slit height
+        height, width = max(height, width), min(height, width)
+        data.dx = None
+        data.dxl = height*np.ones(len(data.x))
+        data.dxw = width*np.ones(len(data.x))
+    return smear_selection(data, model)
+
+
+def make_fitter(model, params_to_fit, data, smearer=None, qmin=None, qmax=None):
+    """
+    Return a fit engine for fitting *params_to_fit* of *model* to *data*,
+    set up as the fit page does for each data set of a batch.
+    """
+    from sas.sascalc.fit.BumpsFitting import BumpsFit as Fit
+
+    fitter = Fit()
+    fitter.set_model(model, 0, params_to_fit, data=data)
+    fitter.set_data(data=data, id=0, smearer=smearer, qmin=qmin, qmax=qmax)
+    fitter.select_problem_for_fit(id=0, value=1)
+    fitter.set_weight_increase(0, 1)
+    return fitter
+
+
+class _Guarded(object):
+    """
+    Fit engine that returns the exception raised by a fit rather than
+    raising it, so that one bad data set doesn't stop the batch.
+    """
+    def __init__(self, fitter):
+        self.fitter = fitter
+
+    def fit(self, handler=None, reset_flag=False):
+        try:
+            return self.fitter.fit(handler=handler, reset_flag=reset_flag)
+        except Exception as exc:
+            return exc
+
+
+def result_row(index, path, data, params_to_fit, result):
+    """
+    Return the row of the results table for the fit of *data*, as a
+    dictionary keyed on :data:`COLUMNS` and the parameter names.
+    """
+    row = dict((name, None) for name in COLUMNS)
+    row.update(index=index, file=path, name=getattr(data, 'title', None) or os.path.basename(path))
+    if isinstance(result, Exception):
+        row.update(success=False, error=str(result) or type(result).__name__)
+        return row
+    result = result[0]
+    row.update(success=bool(result.success), chi2=float(result.fitness),
+               npts=int(np.sum(result.data.idx)) if result.data is not None else None)
+    if not result.success and result.mesg:
+        row['error'] = str(result.mesg)
+    values = dict(zip(result.param_list, zip(result.pvec, result.stderr)))
+    for name in params_to_fit:
+        value, error = values.get(name, (None, None))
+        row[name] = None if value is None else float(value)
+        row[name + '_err'] = None if error is None else float(error)
+    return row
+
+
+def main(argv=None):
+    """
+    Run ``sasview fit`` with the arguments *argv*, returning the exit status.
+    """
+    from sas.sascalc.fit.batch import iter_fits
+
+    opts = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        if opts.page is not None:
+            pages = read_pages(opts.page)
+            if not 0 <= opts.page_index < len(pages):
+                raise ValueError("%s has %d fit pages" % (opts.page, len(pages)))
+            page = pages[opts.page_index]
+            model, params_to_fit = model_from_page(page)
+        else:
+            page = {}
+            model = make_model(opts.model, opts.structure, opts.multiplicity)
+            params_to_fit = []
+        set_parameters(model, params_to_fit, opts.param, opts.fit, opts.fix)
+        if not params_to_fit:
+            raise ValueError("Fitting requires at least one parameter to optimize.")
+        set_optimizer(opts.optimizer, opts.fit_option)
+        datasets = load_data(opts.data)
+    except (OSError, ValueError) as exc:
+        logger.error(str(exc))
+        return 2
+
+    qmin = opts.qmin if opts.qmin is not None else _float(_first(page, 'q_range_min'), None)
+    qmax = opts.qmax if opts.qmax is not None else _float(_first(page, 'q_range_max'), None)
+    if opts.weighting is not None:
+        weighting = WEIGHTING.index(opts.weighting)
+    else:
+        weighting = int(_float(_first(page, 'weighting'), 1))
+    dq = opts.dq if opts.dq is not None else _float(_first(page, 'smearing_max'), None)
+    slit_height = opts.slit_height
+    slit_width = opts.slit_width
+    if slit_height is None:
+        slit_height = _float(_first(page, 'smearing_max'), None)
+        slit_width = _float(_first(page, 'smearing_min'), None)
+
+    fitters = []
+    for path, data in datasets:
+        smearing = opts.smearing
+        if smearing == 'page':
+            index = _first(page, 'smearing')
+            smearing = page_smearing(data, model, int(index)) if index is not None else 'data'
+        # Each fit has its own copy of the model, as the fits update it
+        fit_model = copy.deepcopy(model)
+        smearer = make_smearer(data, fit_model, smearing, dq, slit_height, slit_width)
+        weighted_data = add_weighting(data, weighting)
+        fitters.append(_Guarded(make_fitter(fit_model, params_to_fit, weighted_data,
+                                            smearer, qmin, qmax)))
+
+    columns = list(COLUMNS)
+    for name in params_to_fit:
+        columns += [name, name + '_err']
+    fid = open(opts.output, 'w', newline='') if opts.output else sys.stdout
+    failed = 0
+    try:
+        writer = None
+        if opts.format == 'csv':
+            writer = csv.DictWriter(fid, fieldnames=columns)
+            writer.writeheader()
+        for done, (k, result) in enumerate(iter_fits(fitters, n_workers=opts.workers), 1):
+            path, data = datasets[k]
+            row = result_row(k, path, data, params_to_fit, result)
+            if isinstance(result, Exception):
+                failed += 1
+                logger.error("Fit of %s failed: %s", path, row['error'])
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                fid.write(json.dumps(row) + "\n")
+            # Stream the rows as the fits complete
+            fid.flush()
+            logger.info("Completed fit %d of %d: %s", done, len(fitters), path)
+    finally:
+        if fid is not sys.stdout:
+            fid.close()
+    return 1 if failed else 0
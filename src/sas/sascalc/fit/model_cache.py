@@ -0,0 +1,131 @@
+"""
+Memo of model evaluations keyed on the parameters and the q points.
+
+Redrawing a fit page, refreshing chi2 and smearing the theory evaluate the
+same model at the same q points with the same parameters over and over,
+for instance while editing fields of the page that do not change the model.
+:class:`ModelCache` keeps the last few results of ``calculate_Iq`` for each
+model, keyed on a hash of the parameter values, the dispersion settings,
+the cutoff and the q points, so that these repeats are served from memory.
+
+Entries are held per model instance and dropped with the model.  Results
+are returned read only since they may be shared between callers.
+"""
+import logging
+import weakref
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from sas.sascalc.calculator.result_cache import hash_key
+
+logger = logging.getLogger(__name__)
+
+#: Default number of evaluations kept for each model.
+DEFAULT_MAX_ENTRIES = 8
+#: Default byte budget for the evaluations kept for each model.
+DEFAULT_MAX_BYTES = 16*2**20
+
+
+def model_state(model):
+    """
+    Return the inputs of *model* other than q that determine its value:
+    the parameters, the dispersion settings and the cutoff.
+    """
+    dispersion = [(name, sorted(pars.items()))
+                  for name, pars in getattr(model, 'dispersion', {}).items()]
+    return (type(model).__name__, list(model.params.items()), dispersion,
+            getattr(model, 'cutoff', None))
+
+
+class ModelCache(object):
+    """
+    Least recently used memo of ``model.calculate_Iq`` for each model.
+
+    :Param max_entries: number of evaluations kept for each model [int]
+    :Param max_bytes: byte budget for the evaluations of each model [int]
+
+    Lookups are counted in :attr:`hits` and :attr:`misses`.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._models = weakref.WeakKeyDictionary()
+        # Models are evaluated from the GUI thread and the calculation threads
+        self._lock = threading.Lock()
+
+    def calculate_Iq(self, model, qx, qy=None):
+        """
+        Return ``model.calculate_Iq(qx, qy)``, from the cache if the model
+        was already evaluated at these q with the same parameters.
+        """
+        if not self.enabled:
+            return model.calculate_Iq(qx, qy)
+        try:
+            key = hash_key(model_state(model), np.asarray(qx),
+                           None if qy is None else np.asarray(qy))
+            with self._lock:
+                entries = self._models.setdefault(model, OrderedDict())
+        except (TypeError, AttributeError) as exc:
+            # Models holding state that can't be hashed are not cached
+            logger.debug("Not caching %s: %s", type(model).__name__, exc)
+            return model.calculate_Iq(qx, qy)
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        result, intermediate = model.calculate_Iq(qx, qy)
+        result = np.array(result)
+        result.setflags(write=False)
+        entry = (result, intermediate)
+        with self._lock:
+            entries[key] = entry
+            nbytes = sum(value[0].nbytes for value in entries.values())
+            while len(entries) > 1 and (len(entries) > self.max_entries
+                                        or nbytes > self.max_bytes):
+                _, old = entries.popitem(last=False)
+                nbytes -= old[0].nbytes
+        return entry
+
+    def evalDistribution(self, model, qdist):
+        """
+        Return ``model.evalDistribution(qdist)`` through the cache.
+
+        :param qdist: array of q or a list of arrays [qx, qy]
+        """
+        if not hasattr(model, 'calculate_Iq'):
+            # BaseComponent models only provide evalDistribution
+            return model.evalDistribution(qdist)
+        elif isinstance(qdist, (list, tuple)):
+            qx, qy = qdist
+            return self.calculate_Iq(model, qx, qy)[0]
+        elif isinstance(qdist, np.ndarray):
+            return self.calculate_Iq(model, qdist)[0]
+        # Let the model report the unexpected input
+        return model.evalDistribution(qdist)
+
+    def clear(self):
+        """Drop all the cached evaluations"""
+        with self._lock:
+            self._models.clear()
+
+
+#: Cache shared by the fit engine, the smearers and the model calculations.
+model_cache = ModelCache()
+
+
+def calculate_Iq(model, qx, qy=None):
+    """Cached ``model.calculate_Iq(qx, qy)``, using :data:`model_cache`"""
+    return model_cache.calculate_Iq(model, qx, qy)
+
+
+def evalDistribution(model, qdist):
+    """Cached ``model.evalDistribution(qdist)``, using :data:`model_cache`"""
+    return model_cache.evalDistribution(model, qdist)
@@ -485,6 +485,99 @@ class PageState(object):
         self.parameters = []
         self.parameters = self.param_remap_from_sasmodels_convert(params)
 
+    def to_fit_params(self):
+        """
+        Convert the state to the dictionary of fit page properties used by
+        SasView 5 project files, keyed on property or parameter name.
+
+        :return: dictionary of lists of strings
+        """
+        param_dict = {}
+        param_dict['fitpage_category'] = [self.categorycombobox]
+        param_dict['fitpage_model'] = [self.formfactorcombobox]
+        param_dict['fitpage_structure'] = [self.structurecombobox]
+        param_dict['2D_params'] = [str(self.is_2D)]
+        param_dict['chainfit_params'] = ["False"]
+        param_dict['data_id'] = [self.data_id]
+        param_dict['data_name'] = [self.data_name]
+        param_dict['is_data'] = [str(self.is_data)]
+        param_dict['magnetic_params'] = [str(self.magnetic_on)]
+        param_dict['model_name'] = [self.formfactorcombobox]
+        param_dict['polydisperse_params'] = [str(self.enable_disp)]
+        param_dict['q_range_max'] = [str(self.qmax)]
+        param_dict['q_range_min'] = [str(self.qmin)]
+        # Smearing is a bit trickier. 4.x has multiple keywords,
+        # one for each combobox option
+        if self.enable_smearer:
+            if self.slit_smearer:
+                w = 1
+            elif self.pinhole_smearer:
+                w = 2
+            else:
+                w = 0
+            param_dict['smearing'] = [str(w)]
+        # weighting is also tricky. 4.x has multiple keywords,
+        # one for each radio box.
+        if self.dI_noweight:
+            w = 0
+        elif self.dI_didata:
+            w = 1
+        elif self.dI_sqrdata:
+            w = 2
+        elif self.dI_idata:
+            w = 3
+        else:
+            w = 0
+        param_dict['weighting'] = [str(w)]
+
+        # 4.x multi_factor is really the multiplicity
+        if self.multi_factor is not None:
+            param_dict['multiplicity'] = [str(int(self.multi_factor))]
+
+        # main parameters
+        for p in self.parameters:
+            p_name = p[1]
+            param_dict[p_name] = [str(p[0]), str(p[2]), None, str(p[5][1]), str(p[6][1]), []]
+        # orientation parameters
+        if self.is_2D:
+            for p in self.orientation_params:
+                p_name = p[1]
+                p_min = "-360.0"
+                p_max = "360.0"
+                if p[5][1] != "":
+                    p_min = p[5][1]
+                if p[6][1] != "":
+                    p_max = p[6][1]
+                param_dict[p_name] = [str(p[0]), str(p[2]), None, p_min, p_max, []]
+
+        # disperse parameters
+        if self.enable_disp:
+            for p in self.fittable_param:
+                p_name = p[1]
+                p_opt = str(p[0])
+                p_err = "0"
+                p_width = str(p[2])
+                p_min = str(0)
+                p_max = "inf"
+                param_npts = p_name.replace('.width','.npts')
+                param_nsigmas = p_name.replace('.width', '.nsigmas')
+                if self.is_2D and p_name in self.disp_obj_dict:
+                    lookup = self.orientation_params_disp
+                    p_min = "-360.0"
+                    p_max = "360.0"
+                else:
+                    lookup = self.fixed_param
+                p_npts = [s[2] for s in lookup if s[1] == param_npts][0]
+                p_nsigmas = [s[2] for s in lookup if s[1] == param_nsigmas][0]
+                if p_name in self.disp_obj_dict:
+                    p_disp = self.disp_obj_dict[p_name]
+                else:
+                    p_disp = "gaussian"
+                param_dict[p_name] = [p_opt, p_width, p_min, p_max, p_npts, p_nsigmas, p_disp]
+
+        param_dict['is_batch_fitting'] = ['False']
+        return param_dict
+
     def _repr_helper(self, list, rep):
         """
         Helper method to print a state
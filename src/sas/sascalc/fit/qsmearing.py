@@ -21,6 +21,8 @@ from sasmodels.resolution2d import Pinhole2D
 
 from sasdata.data_util.nxsunit import Converter
 
+from sas.sascalc.fit.model_cache import evalDistribution
+
 
 def smear_selection(data, model=None):
     """
@@ -117,9 +119,9 @@ class PySmear(object):
         q_calc = self.resolution.q_calc
         iq_calc = np.empty_like(q_calc)
         if start > 0:
-            iq_calc[:start] = self.model.evalDistribution(q_calc[:start])
+            iq_calc[:start] = evalDistribution(self.model, q_calc[:start])
         if end+1 < len(q_calc):
-            iq_calc[end+1:] = self.model.evalDistribution(q_calc[end+1:])
+            iq_calc[end+1:] = evalDistribution(self.model, q_calc[end+1:])
         iq_calc[start:end+1] = iq_in[first_bin:last_bin+1]
         smeared = self.resolution.apply(iq_calc)
         return smeared
@@ -155,6 +157,11 @@ def pinhole_smear(data, model=None):
 class PySmear2D(object):
     """
     Q smearing class for SAS 2d pinhole data
+
+    The resolution operator, that is the oversampled q points and their
+    Gaussian weights, only depends on the data, the index, the accuracy and
+    the number of sigmas, so it is kept between calls to :meth:`get_value`
+    and only rebuilt when one of them changes.
     """
 
     def __init__(self, data=None, model=None):
@@ -165,6 +172,8 @@ class PySmear2D(object):
         self.index = None
         self.coords = 'polar'
         self.smearer = True
+        self._operator = None
+        self._operator_key = None
 
     def set_accuracy(self, accuracy='Low'):
         """
@@ -190,6 +199,7 @@ class PySmear2D(object):
         :param data: DataLoader.Data_info type
         """
         self.data = data
+        self._operator = None
 
     def set_model(self, model=None):
         """
@@ -207,22 +217,51 @@ class PySmear2D(object):
         """
         self.index = index
 
+    def _operator_matches(self):
+        key = self._operator_key
+        if self._operator is None or key[0] is not self.data:
+            return False
+        if key[1:-1] != (bool(self.smearer), self.accuracy, self.limit, self.coords):
+            return False
+        index, cached = self.index, key[-1]
+        if isinstance(cached, np.ndarray):
+            return isinstance(index, np.ndarray) and np.array_equal(index, cached)
+        return index is cached
+
+    def get_operator(self):
+        """
+        Return the q points to evaluate the model at and the normalised
+        weights of the oversampled bins, or None if the model values are
+        used directly.
+        """
+        if not self._operator_matches():
+            index = self.index if self.index is not None else slice(None)
+            weights = None
+            if self.smearer:
+                res = Pinhole2D(data=self.data, index=index,
+                                nsigma=self.limit, accuracy=self.accuracy,
+                                coords=self.coords)
+                q_calc = res.q_calc
+                if res.q_calc_weights is not None:
+                    weights = res.q_calc_weights / np.sum(res.q_calc_weights)
+            else:
+                q_calc = [self.data.qx_data[index], self.data.qy_data[index]]
+            cached = self.index.copy() if isinstance(self.index, np.ndarray) else self.index
+            self._operator = (q_calc, weights)
+            self._operator_key = (self.data, bool(self.smearer), self.accuracy,
+                                  self.limit, self.coords, cached)
+        return self._operator
+
     def get_value(self):
         """
         Over sampling of r_nbins times phi_nbins, calculate Gaussian weights,
         then find smeared intensity
         """
-        if self.smearer:
-            res = Pinhole2D(data=self.data, index=self.index,
-                            nsigma=3.0, accuracy=self.accuracy,
-                            coords=self.coords)
-            val = self.model.evalDistribution(res.q_calc)
-            return res.apply(val)
-        else:
-            index = self.index if self.index is not None else slice(None)
-            qx_data = self.data.qx_data[index]
-            qy_data = self.data.qy_data[index]
-            q_calc = [qx_data, qy_data]
-            val = self.model.evalDistribution(q_calc)
+        q_calc, weights = self.get_operator()
+        val = self.model.evalDistribution(q_calc)
+        if weights is None:
             return val
+        # The bins are stored one after the other, so the weighted average
+        # over the bins of each q point is a single product.
+        return np.dot(weights, np.reshape(val, (len(weights), -1)))
 
@@ -0,0 +1,99 @@
+"""
+Time the per-step overhead of the FitData1D and FitData2D residuals.
+
+The theory is a cheap function so that the times are dominated by the
+selection of the fitted points, the allocations and the scaling by the
+errors rather than by the model.  The "baseline" column repeats the
+residual calculation as it was done before the fit index was precomputed,
+"residuals" calls :meth:`FitData1D.residuals`, which allocates the output
+arrays, and "into" calls :meth:`FitData1D.residuals_into` with buffers
+reused between calls, as an optimizer step could.
+
+Usage::
+
+    python -m sas.sascalc.fit.residual_benchmark [n_steps]
+"""
+import sys
+import time
+import logging
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data2D
+
+from sas.sascalc.fit.AbstractFitEngine import FitData1D, FitData2D
+
+
+def theory_1d(q):
+    return 1.0/(1.0 + q*q)
+
+
+def theory_2d(qxy):
+    return 1.0/(1.0 + qxy[0]*qxy[0] + qxy[1]*qxy[1])
+
+
+def baseline_1d(data, fn):
+    fx = np.zeros(len(data.x))
+    fx[data.idx_unsmeared] = fn(data.x[data.idx_unsmeared])
+    return (data.y[data.idx] - fx[data.idx]) / data.dy[data.idx], fx[data.idx]
+
+
+def baseline_2d(data, fn):
+    gn = fn([data.qx_data[data.idx], data.qy_data[data.idx]])
+    return (data.data[data.idx] - gn) / data.res_err_data[data.idx], gn
+
+
+def per_step(fn, n_steps, repeat=3):
+    """Return the best time of *fn* per call, in microseconds"""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(n_steps):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return 1e6*best/n_steps
+
+
+def make_1d(n, rng):
+    x = np.linspace(1e-3, 0.5, n)
+    dy = 0.01 + rng.random(n)
+    data = FitData1D(x=x, y=theory_1d(x), dy=dy)
+    data.set_fit_range(qmin=0.01, qmax=0.45)
+    return data
+
+
+def make_2d(n, rng):
+    side = int(np.sqrt(n))
+    qx, qy = np.meshgrid(np.linspace(-0.3, 0.3, side), np.linspace(-0.3, 0.3, side))
+    qx, qy = qx.ravel(), qy.ravel()
+    q = np.sqrt(qx**2 + qy**2)
+    sas_data = Data2D(data=theory_2d([qx, qy]), err_data=0.01 + rng.random(len(q)),
+                      qx_data=qx, qy_data=qy, q_data=q, mask=rng.random(len(q)) > 0.1)
+    sas_data.xmin, sas_data.xmax = -0.3, 0.3
+    sas_data.ymin, sas_data.ymax = -0.3, 0.3
+    data = FitData2D(sas_data2d=sas_data, data=sas_data.data, err_data=sas_data.err_data)
+    data.set_fit_range(qmin=0.01, qmax=0.25)
+    return data
+
+
+def main(n_steps=2000):
+    rng = np.random.default_rng(1)
+    print("%-4s %8s %14s %14s %10s %8s"
+          % ("data", "fitted", "baseline [us]", "residuals [us]", "into [us]", "speedup"))
+    cases = [('1D', make_1d, theory_1d, baseline_1d),
+             ('2D', make_2d, theory_2d, baseline_2d)]
+    for label, make, fn, baseline in cases:
+        for n in (1000, 10000, 100000):
+            data = make(n, rng)
+            size = data.fit_index().size
+            out, theory = np.empty(size), np.empty(size)
+            before = per_step(lambda: baseline(data, fn), n_steps)
+            after = per_step(lambda: data.residuals(fn), n_steps)
+            into = per_step(lambda: data.residuals_into(fn, out, theory), n_steps)
+            print("%-4s %8d %14.1f %14.1f %10.1f %7.1fx"
+                  % (label, size, before, after, into, before/into))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,165 @@
+"""
+Compute the invariant and the derived quantities for a series of data sets.
+
+Time-resolved measurements give hundreds of frames which are analysed with
+the same background, scale, contrast and extrapolation settings.
+:func:`batch_invariant` runs the calculation of the Invariant perspective on
+each of them and returns one row of results per frame.  The integration
+weights are cached by q grid (see :func:`.invariant.integration_weights`),
+so frames measured on the same q values share them.
+
+:func:`iter_invariants` spreads the frames over a pool of processes and
+yields the rows as they complete.  Only the arrays of each frame are sent
+to the workers.
+"""
+import math
+import logging
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data1D
+
+from sas.sascalc.data_util.process_pool import iter_pool
+from sas.sascalc.invariant.invariant import InvariantCalculator
+from sas.sascalc.invariant.invariant import volume_fraction, volume_fraction_error
+
+logger = logging.getLogger(__name__)
+
+#: Keys of the rows returned by :func:`compute_invariant`.
+COLUMNS = ('qstar', 'qstar_err', 'qstar_data', 'qstar_data_err',
+           'qstar_low', 'qstar_low_err', 'qstar_high', 'qstar_high_err',
+           'power_low', 'power_high', 'volume_fraction', 'volume_fraction_err',
+           'surface', 'surface_err', 'error')
+
+
+def compute_invariant(data, background=0, scale=1, contrast=None, porod_const=None,
+                      low=None, high=None):
+    """
+    Compute the invariant of *data*, with its extrapolations, the volume
+    fraction and the specific surface.
+
+    :param data: Data1D
+    :param background: background subtracted from the data
+    :param scale: scale applied to the data
+    :param contrast: contrast between the phases, in 1/A^(2), or None to
+        skip the volume fraction
+    :param porod_const: Porod constant, in cm^-1 A^-4, or None to skip the
+        specific surface
+    :param low: low-q extrapolation settings as a dict with the arguments
+        of :meth:`InvariantCalculator.set_extrapolation` (npts, function,
+        power) and optionally q_limit, the lowest q of the extrapolation;
+        None for no extrapolation
+    :param high: high-q extrapolation settings, as for *low*, with q_limit
+        the highest q of the extrapolation
+
+    A q_limit inside the q range of the data is ignored, as in the
+    Invariant perspective, so the same settings apply to frames with
+    different q ranges.
+
+    :return: dict with the keys in :data:`COLUMNS`; values which were not
+        computed are None and *error* holds the failure messages
+
+    The invariant includes the extrapolations which succeeded, as in the
+    Invariant perspective, and a failed extrapolation is reported in *error*
+    without stopping the calculation.
+    """
+    row = dict.fromkeys(COLUMNS)
+    errors = []
+    try:
+        calculator = InvariantCalculator(data, background=background, scale=scale)
+        qstar, qstar_err = calculator.get_qstar_with_error()
+    except Exception as exc:
+        row['error'] = str(exc) or type(exc).__name__
+        return row
+    row['qstar_data'], row['qstar_data_err'] = qstar, qstar_err
+    variance = qstar_err**2 if qstar_err is not None else 0.0
+
+    for name, settings in (('low', low), ('high', high)):
+        if settings is None:
+            continue
+        settings = dict(settings)
+        q_limit = settings.pop('q_limit', None)
+        if q_limit is not None and (q_limit > data.x[0] if name == 'low'
+                                    else q_limit < data.x[-1]):
+            q_limit = None
+        settings.setdefault('function', 'guinier' if name == 'low' else 'power_law')
+        try:
+            calculator.set_extrapolation(range=name, **settings)
+            if name == 'low':
+                value, err = calculator.get_qstar_low(q_limit)
+            else:
+                value, err = calculator.get_qstar_high(q_limit)
+        except Exception as exc:
+            logger.debug("%s-q extrapolation failed: %s", name, exc)
+            errors.append("%s-q extrapolation: %s" % (name, exc))
+            continue
+        row['qstar_' + name], row['qstar_%s_err' % name] = value, err
+        row['power_' + name] = calculator.get_extrapolation_power(range=name)
+        qstar += value
+        variance += err**2
+
+    row['qstar'], row['qstar_err'] = qstar, math.sqrt(variance)
+    if contrast is not None:
+        try:
+            row['volume_fraction'] = volume_fraction(qstar, contrast)
+            row['volume_fraction_err'] = volume_fraction_error(
+                qstar, row['qstar_err'], contrast)
+        except Exception as exc:
+            errors.append(str(exc))
+    if contrast is not None and porod_const:
+        try:
+            row['surface'], row['surface_err'] = calculator.get_surface_with_error(
+                contrast, porod_const)
+        except Exception as exc:
+            errors.append(str(exc))
+    if errors:
+        row['error'] = "; ".join(errors)
+    return row
+
+
+def _frame(data):
+    """
+    Return a Data1D holding only the arrays of *data* used by the invariant
+    """
+    frame = Data1D(x=np.asarray(data.x), y=np.asarray(data.y),
+                   dy=None if data.dy is None else np.asarray(data.dy))
+    if getattr(data, 'dxl', None) is not None:
+        frame.dxl = np.asarray(data.dxl)
+    return frame
+
+
+def _run(data, kwargs):
+    return compute_invariant(data, **kwargs)
+
+
+def iter_invariants(frames, n_workers=None, **kwargs):
+    """
+    Compute the invariant of each of *frames*, yielding the results as they
+    complete.
+
+    :param frames: sequence of Data1D
+    :param n_workers: number of processes; 0 or None for one per CPU.
+        With a single worker the frames are processed in the calling process.
+    :param kwargs: settings passed to :func:`compute_invariant`
+
+    :return: iterator over (index, row) pairs, in order of completion,
+        where index is the position of the frame in *frames*
+    """
+    jobs = [(_frame(data), kwargs) for data in frames]
+    return iter_pool(_run, jobs, n_workers=n_workers)
+
+
+def batch_invariant(frames, n_workers=1, **kwargs):
+    """
+    Compute the invariant of each of *frames* with the same settings.
+
+    :param frames: sequence of Data1D
+    :param n_workers: number of processes, see :func:`iter_invariants`
+    :param kwargs: settings passed to :func:`compute_invariant`
+
+    :return: list of result dicts, in the order of *frames*
+    """
+    rows = [None] * len(frames)
+    for index, row in iter_invariants(frames, n_workers=n_workers, **kwargs):
+        rows[index] = row
+    return rows
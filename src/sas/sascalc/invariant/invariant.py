@@ -18,6 +18,8 @@ This module implements invariant and its related computations.
 from __future__ import division
 
 import math
+import functools
+
 import numpy as np
 
 from sasdata.dataloader.data_info import Data1D as LoaderData1D
@@ -31,6 +33,93 @@ Q_MAXIMUM = 10
 # Number of steps in the extrapolation
 INTEGRATION_NSTEPS = 1000
 
+@functools.lru_cache(maxsize=32)
+def _integration_weights(x_bytes):
+    """
+    Compute the weights of :func:`integration_weights` for the q values
+    held in *x_bytes*.
+    """
+    x = np.frombuffer(x_bytes, dtype=float)
+    n = len(x) - 1
+    dx = np.zeros(len(x))
+    dx[0] = (x[1] - x[0]) / 2
+    dx[n] = (x[n] - x[n - 1]) / 2
+    # The point before the last one is not part of the sum
+    dx[1:n - 1] = (x[2:n] - x[:n - 2]) / 2
+    dx.setflags(write=False)
+    return dx
+
+def integration_weights(x):
+    """
+    Return the weights dx of the sum approximating an integral over the
+    q values x, such that the integral of f is ``np.dot(f(x), dx)``. ::
+
+        dx0 = (x1 - x0)/2
+        dxi = (xi+1 - xi-1)/2
+        dxn = (xn - xn-1)/2
+
+    The weights are cached for the last few q grids since the same data
+    and extrapolation grids are integrated again for each quantity and
+    each frame of a series.
+
+    :param x: array of q values, of length greater than 1
+
+    :return: read only array of weights, of the same length as x
+    """
+    return _integration_weights(np.ascontiguousarray(x, dtype=float).tobytes())
+
+def volume_fraction(qstar, contrast):
+    """
+    Compute the volume fraction from the invariant.
+    See :meth:`InvariantCalculator.get_volume_fraction`.
+
+    :param qstar: invariant, including the extrapolations
+    :param contrast: contrast value, in 1/A^(2)
+
+    :return: volume fraction, 0 <= volume <= 1
+    """
+    if qstar <= 0:
+        msg = "Invalid invariant: Invariant Q* must be greater than zero\n"
+        msg += "Please check if scale and background values are correct"
+        raise RuntimeError(msg)
+
+    # Compute intermediate constant
+    k = 1.e-8 * qstar / (2 * (math.pi * math.fabs(float(contrast))) ** 2)
+    # Check discriminant value
+    discrim = 1 - 4 * k
+
+    # Compute volume fraction
+    if discrim < 0:
+        msg = "Could not compute the volume fraction: negative discriminant"
+        raise RuntimeError(msg)
+    elif discrim == 0:
+        return 1 / 2
+    else:
+        volume1 = 0.5 * (1 - math.sqrt(discrim))
+        volume2 = 0.5 * (1 + math.sqrt(discrim))
+
+        if 0 <= volume1 and volume1 <= 1:
+            return volume1
+        elif 0 <= volume2 and volume2 <= 1:
+            return volume2
+        msg = "Could not compute the volume fraction: inconsistent results"
+        raise RuntimeError(msg)
+
+def volume_fraction_error(qstar, qstar_err, contrast):
+    """
+    Compute the uncertainty on the volume fraction.
+    See :meth:`InvariantCalculator.get_volume_fraction_with_error`.
+
+    :return: dV, or -1 if it can't be computed
+    """
+    k = 1.e-8 * qstar / (2 * (math.pi * math.fabs(float(contrast)))** 2)
+    # Check value inside the sqrt function
+    value = 1 - k * qstar
+    if (value) <= 0:
+        return -1
+    # Compute uncertainty
+    return math.fabs((k * qstar_err) / (qstar * math.sqrt(1 - 4 * k)))
+
 class Transform(object):
     """
     Define interface that need to compute a function or an inverse
@@ -162,12 +251,11 @@ class Guinier(Transform):
 
         :param x: array of q-values
         """
-        p1 = np.array([self.dscale * math.exp(-((self.radius * q) ** 2 / 3)) \
-                          for q in x])
-        p2 = np.array([self.scale * math.exp(-((self.radius * q) ** 2 / 3))\
-                     * (-(q ** 2 / 3)) * 2 * self.radius * self.dradius for q in x])
-        diq2 = p1 * p1 + p2 * p2
-        return np.array([math.sqrt(err) for err in diq2])
+        x = np.asarray(x, dtype=float)
+        value = np.exp(-((self.radius * x) ** 2 / 3))
+        p1 = self.dscale * value
+        p2 = self.scale * value * (-(x ** 2 / 3)) * 2 * self.radius * self.dradius
+        return np.sqrt(p1 * p1 + p2 * p2)
 
     def _guinier(self, x):
         r"""
@@ -188,7 +276,7 @@ class Guinier(Transform):
         if self.radius <= 0:
             msg = "Rg expected positive value, but got %s" % self.radius
             raise ValueError(msg)
-        value = np.array([math.exp(-((self.radius * i) ** 2 / 3)) for i in x])
+        value = np.exp(-((self.radius * np.asarray(x, dtype=float)) ** 2 / 3))
         return self.scale * value
 
 class PowerLaw(Transform):
@@ -238,11 +326,10 @@ class PowerLaw(Transform):
         Returns the error on I(q) for the given array of q-values
         :param x: array of q-values
         """
-        p1 = np.array([self.dscale * math.pow(q, -self.power) for q in x])
-        p2 = np.array([self.scale * self.power * math.pow(q, -self.power - 1)\
-                           * self.dpower for q in x])
-        diq2 = p1 * p1 + p2 * p2
-        return np.array([math.sqrt(err) for err in diq2])
+        x = np.asarray(x, dtype=float)
+        p1 = self.dscale * np.power(x, -self.power)
+        p2 = self.scale * self.power * np.power(x, -self.power - 1) * self.dpower
+        return np.sqrt(p1 * p1 + p2 * p2)
 
     def _power_law(self, x):
         """
@@ -265,7 +352,7 @@ class PowerLaw(Transform):
             msg = "scale expected positive value, but got %s" % self.scale
             raise ValueError(msg)
 
-        value = np.array([math.pow(i, -self.power) for i in x])
+        value = np.power(np.asarray(x, dtype=float), -self.power)
         return self.scale * value
 
 class Extrapolator(object):
@@ -521,24 +608,8 @@ class InvariantCalculator(object):
             else:
                 gx = data.dxl * data.x
 
-            n = len(data.x) - 1
-            #compute the first delta q
-            dx0 = (data.x[1] - data.x[0]) / 2
-            #compute the last delta q
-            dxn = (data.x[n] - data.x[n - 1]) / 2
-            total = 0
-            total += gx[0] * data.y[0] * dx0
-            total += gx[n] * data.y[n] * dxn
-
-            if len(data.x) == 2:
-                return total
-            else:
-                #iterate between for element different
-                #from the first and the last
-                for i in range(1, n - 1):
-                    dxi = (data.x[i + 1] - data.x[i - 1]) / 2
-                    total += gx[i] * data.y[i] * dxi
-                return total
+            dx = integration_weights(data.x)
+            return np.dot(gx * data.y, dx)
 
     def _get_qstar_uncertainty(self, data):
         """
@@ -578,23 +649,9 @@ class InvariantCalculator(object):
             else:
                 gx = data.dxl * data.x
 
-            n = len(data.x) - 1
-            #compute the first delta
-            dx0 = (data.x[1] - data.x[0]) / 2
-            #compute the last delta
-            dxn = (data.x[n] - data.x[n - 1]) / 2
-            total = 0
-            total += (gx[0] * dy[0] * dx0) ** 2
-            total += (gx[n] * dy[n] * dxn) ** 2
-            if len(data.x) == 2:
-                return math.sqrt(total)
-            else:
-                #iterate between for element different
-                #from the first and the last
-                for i in range(1, n - 1):
-                    dxi = (data.x[i + 1] - data.x[i - 1]) / 2
-                    total += (gx[i] * dy[i] * dxi) ** 2
-                return math.sqrt(total)
+            dx = integration_weights(data.x)
+            terms = gx * dy * dx
+            return math.sqrt(np.dot(terms, terms))
 
     def _get_extrapolated_data(self, model, npts=INTEGRATION_NSTEPS,
                                q_start=Q_MINIMUM, q_end=Q_MAXIMUM):
@@ -913,32 +970,7 @@ class InvariantCalculator(object):
         # Make sure Q star is up to date
         self.get_qstar(extrapolation)
 
-        if self._qstar <= 0:
-            msg = "Invalid invariant: Invariant Q* must be greater than zero\n"
-            msg += "Please check if scale and background values are correct"
-            raise RuntimeError(msg)
-
-        # Compute intermediate constant
-        k = 1.e-8 * self._qstar / (2 * (math.pi * math.fabs(float(contrast))) ** 2)
-        # Check discriminant value
-        discrim = 1 - 4 * k
-
-        # Compute volume fraction
-        if discrim < 0:
-            msg = "Could not compute the volume fraction: negative discriminant"
-            raise RuntimeError(msg)
-        elif discrim == 0:
-            return 1 / 2
-        else:
-            volume1 = 0.5 * (1 - math.sqrt(discrim))
-            volume2 = 0.5 * (1 + math.sqrt(discrim))
-
-            if 0 <= volume1 and volume1 <= 1:
-                return volume1
-            elif 0 <= volume2 and volume2 <= 1:
-                return volume2
-            msg = "Could not compute the volume fraction: inconsistent results"
-            raise RuntimeError(msg)
+        return volume_fraction(self._qstar, contrast)
 
     def get_qstar_with_error(self, extrapolation=None):
         """
@@ -982,19 +1014,7 @@ class InvariantCalculator(object):
         :return: V, dV = volume fraction, error on volume fraction
         """
         volume = self.get_volume_fraction(contrast, extrapolation)
-
-        # Compute error
-        k = 1.e-8 * self._qstar / (2 * (math.pi * \
-                                        math.fabs(float(contrast)))** 2)
-        # Check value inside the sqrt function
-        value = 1 - k * self._qstar
-        if (value) <= 0:
-            uncertainty = -1
-        else:
-            # Compute uncertainty
-            uncertainty = math.fabs((k * self._qstar_err)
-                                    / (self._qstar * math.sqrt(1 - 4 * k)))
-
+        uncertainty = volume_fraction_error(self._qstar, self._qstar_err, contrast)
         return volume, uncertainty
 
     def get_surface_with_error(self, contrast, porod_const, extrapolation=None):
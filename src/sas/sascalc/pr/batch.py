@@ -0,0 +1,178 @@
+"""
+Batch P(r) inversion of many data sets, such as the frames of a
+time-resolved experiment.
+
+:func:`invert_batch` applies the settings of a template :class:`Invertor`
+to each data set, runs the inversions on a pool of processes and yields a
+:class:`BatchResult` as each one completes.  :func:`write_table` writes the
+Rg, I(0), chi2, positivity and oscillation of all the results to one file.
+"""
+import csv
+import time
+import logging
+
+import numpy as np
+
+from sas.sascalc.data_util.process_pool import iter_pool
+
+logger = logging.getLogger(__name__)
+
+#: Columns written by :func:`write_table`, in order.
+COLUMNS = ('index', 'name', 'd_max', 'nfunc', 'alpha', 'rg', 'iq0', 'chi2',
+           'background', 'positive', 'pos_err', 'oscillations', 'elapsed', 'error')
+
+
+class BatchResult(object):
+    """
+    Outcome of the inversion of one data set in a batch
+    """
+    def __init__(self, index, name, invertor=None, error=None):
+        ## Position of the data set in the batch
+        self.index = index
+        ## Name of the data set
+        self.name = name
+        ## Invertor holding the data and the solution, None if it failed
+        self.invertor = invertor
+        ## Message of the exception raised by the inversion, None if it succeeded
+        self.error = error
+        ## Summary values of the solution, keyed on the names in COLUMNS
+        self.values = {}
+        if invertor is not None:
+            self.values = summarize(invertor)
+
+    def row(self):
+        """
+        Return the values of the table columns for this data set
+        """
+        row = dict((name, '') for name in COLUMNS)
+        row.update(self.values)
+        row.update(index=self.index, name=self.name, error=self.error or '')
+        return [row[name] for name in COLUMNS]
+
+
+def summarize(pr):
+    """
+    Return the summary values of an invertor holding a solution
+    """
+    out, cov = pr.out, pr.cov
+    chi2 = pr.chi2[0] if isinstance(pr.chi2, np.ndarray) else pr.chi2
+    return {
+        'd_max': pr.d_max,
+        'nfunc': pr.nfunc,
+        'alpha': pr.alpha,
+        'rg': pr.rg(out),
+        'iq0': pr.iq0(out),
+        'chi2': float(chi2),
+        'background': float(pr.background),
+        'positive': pr.get_positive(out),
+        'pos_err': pr.get_pos_err(out, cov),
+        'oscillations': pr.oscillations(out),
+        'elapsed': pr.elapsed,
+    }
+
+
+def data_name(data, index):
+    """
+    Return a name for *data*, the *index* th data set of a batch
+    """
+    for attr in ('name', 'filename', 'title'):
+        name = getattr(data, attr, None)
+        if name:
+            return str(name)
+    return "data %d" % index
+
+
+def prepare(template, x, y, dy):
+    """
+    Return a copy of *template* set up to invert the data x, y, dy.
+
+    As in the Inversion perspective, points at q = 0 are dropped and
+    missing or zero errors are replaced by 5% of the intensity.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if dy is None or np.size(dy) == 0 or np.all(dy) == 0:
+        dy = 0.05 * np.fabs(y)
+    dy = np.asarray(dy, dtype=np.float64)
+    keep = x != 0.0
+    pr = template.clone()
+    pr.x = x[keep]
+    pr.y = y[keep]
+    pr.err = dy[keep]
+    return pr
+
+
+def invert_one(template, x, y, dy, estimate=True):
+    """
+    Invert one data set with the settings of *template*.
+
+    :param estimate: estimate alpha and the number of terms before the
+        inversion, as the Inversion perspective does in batch mode;
+        otherwise use those of *template*.
+
+    :return: the invertor holding the solution
+    """
+    pr = prepare(template, x, y, dy)
+    t_0 = time.time()
+    nfunc = pr.nfunc
+    if estimate:
+        alpha, message, _ = pr.estimate_alpha(nfunc)
+        if message:
+            logger.info(message)
+        pr.alpha = alpha
+        # Skip the slit settings for the estimation, as the perspective does
+        estimator = pr.clone()
+        estimator.slit_height = 0.0
+        estimator.slit_width = 0.0
+        nfunc, alpha, message = estimator.estimate_numterms()
+        if message:
+            logger.info(message)
+        pr.alpha = alpha
+    pr.invert(nfunc)
+    pr.nfunc = nfunc
+    pr.elapsed = time.time() - t_0
+    return pr
+
+
+def _run(index, name, template, x, y, dy, estimate):
+    try:
+        return BatchResult(index, name, invert_one(template, x, y, dy, estimate))
+    except Exception as exc:
+        return BatchResult(index, name, error=str(exc))
+
+
+def invert_batch(datasets, template, estimate=True, n_workers=None):
+    """
+    Invert each of *datasets* with the settings of *template*, yielding the
+    results as they complete.
+
+    :param datasets: sequence of Data1D, or of objects with x, y and dy arrays.
+    :param template: Invertor holding d_max, alpha, nfunc, the q range, the
+        slit and the background settings; it is not modified.
+    :param estimate: estimate alpha and the number of terms for each data set.
+    :param n_workers: number of processes; 0 or None for one per CPU.
+        With a single worker the inversions run in the calling process.
+
+    :return: iterator over :class:`BatchResult`, in order of completion;
+        use :attr:`BatchResult.index` to match them to *datasets*.
+    """
+    jobs = [(index, data_name(data, index), template, data.x, data.y,
+             getattr(data, 'dy', None), estimate)
+            for index, data in enumerate(datasets)]
+    for _, result in iter_pool(_run, jobs, n_workers=n_workers):
+        yield result
+
+
+def write_table(results, path):
+    """
+    Write the summary of each of *results* to the CSV file *path*, in the
+    order of the data sets in the batch.
+
+    :param results: iterable of :class:`BatchResult`
+    """
+    results = sorted(results, key=lambda result: result.index)
+    with open(path, 'w', newline='') as fid:
+        writer = csv.writer(fid)
+        writer.writerow(COLUMNS)
+        for result in results:
+            writer.writerow(result.row())
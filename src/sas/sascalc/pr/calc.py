@@ -11,8 +11,9 @@ import copy
 import os
 import re
 import logging
-import time
+import threading
 
+from collections import OrderedDict
 from functools import reduce
 import numpy as np
 from numpy import pi
@@ -24,7 +25,7 @@ except ImportError:
     #Identity decorator for njit which ignores type signature.
     njit = lambda *args, **kw: (lambda x: x)
 
-@njit('f8[:](f8, u8, f8[:])')
+@njit('f8[:](f8, u8, f8[:])', cache=True)
 def ortho(d_max, n, r):
     """
     Orthogonal Functions:
@@ -38,7 +39,7 @@ def ortho(d_max, n, r):
     return (2.0 * r) * np.sin((pi*n/d_max)*r)
 
 #TODO: unused?
-@njit('f8[:](f8, u8, f8[:])')
+@njit('f8[:](f8, u8, f8[:])', cache=True)
 def ortho_derived(d_max, n, r):
     """
     First derivative in of the orthogonal function dB(r)/dr.
@@ -51,7 +52,7 @@ def ortho_derived(d_max, n, r):
     pinr = (pi * n / d_max) * r
     return 2.0 * np.sin(pinr) + 2.0 * r * np.cos(pinr)
 
-@njit('f8[:](f8[:], f8, f8[:])')
+@njit('f8[:](f8[:], f8, f8[:])', cache=True)
 def pr(pars, d_max, r):
     """
     P(r) calculated from the expansion
@@ -67,7 +68,7 @@ def pr(pars, d_max, r):
         total += pars_i * ortho(d_max, i+1, r)
     return total
 
-@njit('f8[:, :](f8[:], f8[:,:], f8, f8[:])')
+@njit('f8[:, :](f8[:], f8[:,:], f8, f8[:])', cache=True)
 def pr_err(pars, err, d_max, r):
     """
     P(r) calculated from the expansion,
@@ -101,11 +102,11 @@ def pr_err(pars, err, d_max, r):
     ret[1, :] = pr_value_err
     return ret
 
-@njit('f8[:](f8, f8, f8[:])')
+@njit('f8[:](f8, f8, f8[:])', cache=True)
 def dprdr_calc(i, d_max, r):
     return 2.0*(np.sin(pi*(i+1)*r/d_max) + pi*(i+1)*r/d_max * np.cos(pi*(i+1)*r/d_max))
 
-@njit('f8[:](f8[:], f8, f8[:])')
+@njit('f8[:](f8[:], f8, f8[:])', cache=True)
 def dprdr(pars, d_max, r):
     """
     dP(r)/dr calculated from the expansion.
@@ -122,7 +123,7 @@ def dprdr(pars, d_max, r):
     return total
 
 
-@njit('f8[:](f8[:], f8, i8)')
+@njit('f8[:](f8[:], f8, i8)', cache=True)
 def ortho_transformed(q, d_max, n):
     """
     Fourier transform of the nth orthogonal function.
@@ -136,38 +137,85 @@ def ortho_transformed(q, d_max, n):
     qd = q * (d_max/pi)
     return ( 8.0 * d_max**2 * n * (-1.0)**(n+1) ) * np.sinc(qd) / (n**2 - qd**2)
 
-@njit('f8[:](f8[:], f8, i8, f8, f8, u8)')
-def ortho_transformed_smeared(q, d_max, n, height, width, npts):
+@njit('f8[:, :](f8[:], f8, i8[:])', cache=True)
+def ortho_transformed_basis(q, d_max, n):
     """
-    Slit-smeared Fourier transform of the nth orthogonal function.
+    Fourier transforms of several orthogonal functions.
+
+    :param q: q (vector).
+    :param d_max: d_max.
+    :param n: indices of the orthogonal functions (vector).
+
+    :return: Matrix of transforms with shape [len(q), len(n)].
+    """
+    qd = q * (d_max/pi)
+    sinc_qd = np.sinc(qd)
+    qd_sq = qd**2
+    total = np.empty((len(q), len(n)), dtype=np.float64)
+    for k in range(len(n)):
+        n_k = n[k]
+        total[:, k] = ( 8.0 * d_max**2 * n_k * (-1.0)**(n_k+1) ) * sinc_qd / (n_k**2 - qd_sq)
+    return total
+
+@njit('f8[:, :](f8[:], f8, i8[:], f8, f8, u8)', cache=True)
+def ortho_transformed_smeared_basis(q, d_max, n, height, width, npts):
+    """
+    Slit-smeared Fourier transforms of several orthogonal functions.
     Smearing follows Lake, Acta Cryst. (1967) 23, 191.
 
+    All slit quadrature nodes are evaluated in one array operation, and
+    the sinc term, which does not depend on n, is shared by all functions.
+
     :param q: q (vector).
     :param d_max: d_max.
-    :param n: n.
+    :param n: indices of the orthogonal functions (vector).
     :param height: slit_height.
     :param width: slit_width.
     :param npts: npts.
 
-    :return: Slit-smeared Fourier transform of nth orthogonal function across all q.
+    :return: Matrix of slit-smeared transforms with shape [len(q), len(n)].
     """
-    n_width = npts if width > 0 else 1
-    n_height = npts if height > 0 else 1
+    n_width = np.int64(npts) if width > 0 else np.int64(1)
+    n_height = np.int64(npts) if height > 0 else np.int64(1)
     dz = height/(npts-1)
     y0, dy = -0.5*width, width/(npts-1)
-    total = np.zeros(len(q), dtype=np.float64)
+    y = y0 + dy*np.arange(n_width)
+    zsq = (dz*np.arange(n_height))**2
+
+    # qd at every quadrature node, with shape [len(q), n_width*n_height]
+    ysq = (np.ascontiguousarray(q).reshape(-1, 1) - y.reshape(1, -1))**2
+    qsq = ysq.reshape(-1, 1) + zsq.reshape(1, -1)
+    qd = np.sqrt(qsq.reshape(len(q), n_width*n_height)) * (d_max/pi)
+    sinc_qd = np.sinc(qd)
+    qd_sq = qd**2
+
+    total = np.empty((len(q), len(n)), dtype=np.float64)
+    for k in range(len(n)):
+        n_k = n[k]
+        terms = np.sum(sinc_qd / (n_k**2 - qd_sq), axis=1)
+        total[:, k] = (8.0 * d_max**2 * n_k * (-1.0)**(n_k+1) / (n_width*n_height)) * terms
+    return total
 
+@njit('f8[:](f8[:], f8, i8, f8, f8, u8)', cache=True)
+def ortho_transformed_smeared(q, d_max, n, height, width, npts):
+    """
+    Slit-smeared Fourier transform of the nth orthogonal function.
+    Smearing follows Lake, Acta Cryst. (1967) 23, 191.
 
-    for j in range(n_height):
-        zsq = (j * dz)**2
-        for i in range(n_width):
-            y = y0 + i*dy
-            qsq = (q - y)**2 + zsq
-            total += ortho_transformed(np.sqrt(qsq), d_max, n)
+    :param q: q (vector).
+    :param d_max: d_max.
+    :param n: n.
+    :param height: slit_height.
+    :param width: slit_width.
+    :param npts: npts.
 
-    return total / (n_width*n_height)
+    :return: Slit-smeared Fourier transform of nth orthogonal function across all q.
+    """
+    basis = ortho_transformed_smeared_basis(q, d_max, np.array([n], dtype=np.int64),
+                                            height, width, npts)
+    return basis[:, 0].copy()
 
-@njit('f8[:](f8[:], f8[:], f8, f8, f8, u8)')
+@njit('f8[:](f8[:], f8[:], f8, f8, f8, u8)', cache=True)
 def iq_smeared(p, q, d_max, height, width, npts):
     """
     Scattering intensity calculated from the expansion, slit-smeared.
@@ -180,15 +228,55 @@ def iq_smeared(p, q, d_max, height, width, npts):
 
     :return: Scattering intensity from the expansion slit-smeared across all q.
     """
-    size_q = len(q)
-    total = np.zeros(size_q, dtype=np.float64)
-
+    n = np.arange(1, len(p)+1)
+    basis = ortho_transformed_smeared_basis(q, d_max, n, height, width, npts)
+    total = np.zeros(len(q), dtype=np.float64)
     for i, p_i in enumerate(p):
-        total += p_i * ortho_transformed_smeared(q, d_max, i+1, height, width, npts)
+        total += p_i * basis[:, i]
 
     return total
 
-@njit('f8[:](f8[:], f8, f8[:])')
+_SMEARED_CACHE_SIZE = 16
+_smeared_cache = OrderedDict()
+_smeared_cache_lock = threading.Lock()
+
+def smeared_basis(q, d_max, nfunc, height, width, npts):
+    """
+    Slit-smeared transforms of the first *nfunc* orthogonal functions,
+    cached on (q, d_max, slit geometry).
+
+    Repeated inversions of the same data, such as the scan over the number
+    of terms, reuse the stored matrix and only compute any extra columns.
+
+    :param q: q (vector).
+    :param d_max: d_max.
+    :param nfunc: number of orthogonal functions, n = 1..nfunc.
+    :param height: slit_height.
+    :param width: slit_width.
+    :param npts: npts.
+
+    :return: Read only matrix with shape [len(q), nfunc].
+    """
+    q = np.ascontiguousarray(q, dtype=np.float64)
+    key = (q.tobytes(), float(d_max), float(height), float(width), int(npts))
+    with _smeared_cache_lock:
+        basis = _smeared_cache.get(key)
+        if basis is not None:
+            _smeared_cache.move_to_end(key)
+    have = 0 if basis is None else basis.shape[1]
+    if basis is None or have < nfunc:
+        extra = ortho_transformed_smeared_basis(
+            q, d_max, np.arange(have+1, nfunc+1, dtype=np.int64), height, width, npts)
+        basis = extra if basis is None else np.hstack((basis, extra))
+        basis.setflags(write=False)
+        with _smeared_cache_lock:
+            _smeared_cache[key] = basis
+            _smeared_cache.move_to_end(key)
+            while len(_smeared_cache) > _SMEARED_CACHE_SIZE:
+                _smeared_cache.popitem(last=False)
+    return basis[:, :nfunc]
+
+@njit('f8[:](f8[:], f8, f8[:])', cache=True)
 def iq(pars, d_max, q):
     """
     Scattering intensity calculated from the expansion.
@@ -206,7 +294,7 @@ def iq(pars, d_max, q):
 
     return total
 
-@njit('f8(f8[:], f8, u8)')
+@njit('f8(f8[:], f8, u8)', cache=True)
 def reg_term(pars, d_max, nslice):
     """
     Regularization term calculated from the expansion.
@@ -224,7 +312,7 @@ def reg_term(pars, d_max, nslice):
 
     return total*dx
 
-@njit('f8(f8[:], f8, u8)')
+@njit('f8(f8[:], f8, u8)', cache=True)
 def int_pr_square(pars, d_max, nslice):
     """
     Regularization term calculated from the expansion.
@@ -242,7 +330,7 @@ def int_pr_square(pars, d_max, nslice):
 
     return total * dx
 
-@njit('f8(f8[:], f8, u8)')
+@njit('f8(f8[:], f8, u8)', cache=True)
 def int_pr(pars, d_max, nslice):
     """
     Integral of P(r).
@@ -261,7 +349,7 @@ def int_pr(pars, d_max, nslice):
 
     return total * dx
 
-@njit('u8(f8[:], f8, u8)')
+@njit('u8(f8[:], f8, u8)', cache=True)
 def npeaks(pars, d_max, nslice):
     """
     Get the number of P(r) peaks.
@@ -285,7 +373,7 @@ def npeaks(pars, d_max, nslice):
 
     return count
 
-@njit('f8(f8[:], f8, u8)')
+@njit('f8(f8[:], f8, u8)', cache=True)
 def positive_integral(pars, d_max, nslice):
     """
     Get the fraction of the integral of P(r) over the whole
@@ -308,7 +396,7 @@ def positive_integral(pars, d_max, nslice):
 
     return total_pos / total  # dx cancels
 
-@njit('f8(f8[:], f8[:,:], f8, u8)')
+@njit('f8(f8[:], f8[:,:], f8, u8)', cache=True)
 def positive_errors(pars, err, d_max, nslice):
     """
     Get the fraction of the integral of P(r) over the whole range
@@ -336,7 +424,7 @@ def positive_errors(pars, err, d_max, nslice):
 
     return total_pos / total  # dx cancels
 
-@njit('f8(f8[:], f8, u8)')
+@njit('f8(f8[:], f8, u8)', cache=True)
 def rg(pars, d_max, nslice):
     """
     R_g radius of gyration calculation
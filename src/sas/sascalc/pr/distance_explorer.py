@@ -17,6 +17,8 @@ over that range.
 """
 import sys
 
+from .inversion_scan import scan_dmax
+
 
 class Results(object):
     """
@@ -57,13 +59,17 @@ class DistExplorer(object):
         self._default_min = 0.8 * self.pr_state.d_max
         self._default_max = 1.2 * self.pr_state.d_max
 
-    def __call__(self, dmin=None, dmax=None, npts=10):
+    def __call__(self, dmin=None, dmax=None, npts=10, n_workers=None):
         """
         Compute the outputs as a function of D_max.
 
+        The D_max points are independent and are inverted in parallel on
+        copies of the invertor, which is left unchanged.
+
         :param dmin: minimum value for D_max
         :param dmax: maximum value for D_max
         :param npts: number of points for D_max
+        :param n_workers: number of threads; defaults to the number of CPUs
 
         """
         # Take care of the defaults if needed
@@ -76,23 +82,27 @@ class DistExplorer(object):
         # Results object to store the computation outputs.
         results = Results()
 
+        d_values = [dmin + i * (dmax - dmin) / max(npts - 1.0, 1.0) for i in range(npts)]
+        outputs = scan_dmax(self.pr_state, d_values, self.pr_state.nfunc,
+                            n_workers=n_workers)
+
         # Loop over d_max values
-        for i in range(npts):
-            d = dmin + i * (dmax - dmin) / (npts - 1.0)
-            self.pr_state.d_max = d
+        for d, pr in zip(d_values, outputs):
             try:
-                out, cov = self.pr_state.invert(self.pr_state.nfunc)
+                if isinstance(pr, Exception):
+                    raise pr
+                out, cov = pr.out, pr.cov
 
                 # Store results
-                iq0 = self.pr_state.iq0(out)
-                rg = self.pr_state.rg(out)
-                pos = self.pr_state.get_positive(out)
-                pos_err = self.pr_state.get_pos_err(out, cov)
-                osc = self.pr_state.oscillations(out)
-
-                results.d_max.append(self.pr_state.d_max)
-                results.bck.append(self.pr_state.background)
-                results.chi2.append(self.pr_state.chi2)
+                iq0 = pr.iq0(out)
+                rg = pr.rg(out)
+                pos = pr.get_positive(out)
+                pos_err = pr.get_pos_err(out, cov)
+                osc = pr.oscillations(out)
+
+                results.d_max.append(pr.d_max)
+                results.bck.append(pr.background)
+                results.chi2.append(pr.chi2)
                 results.iq0.append(iq0)
                 results.rg.append(rg)
                 results.pos.append(pos)
@@ -0,0 +1,264 @@
+"""
+Scan engine for P(r) inversions over alpha, number of terms and D_max.
+
+For fixed D_max the least squares problem solved by :meth:`Invertor.lstsq`
+stacks the data block A_d of the matrix over the regularisation block
+sqrt(alpha)*R, and the columns of both blocks do not depend on the number
+of terms.  :class:`InversionScan` therefore builds A_d and R once for the
+largest number of terms and reduces A_d with a QR decomposition.  Each
+(nfunc, alpha) problem is then a small system of nfunc + nr rows, and many
+alphas are solved at once with a batched SVD.  The solutions, chi2 and
+covariances match those of :meth:`Invertor.invert` to rounding error.
+
+:func:`scan_dmax` runs independent D_max points on a thread pool.
+"""
+import os
+import math
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ScanResult(object):
+    """
+    Output of one inversion in a scan, as returned by :meth:`Invertor.invert`
+    """
+    def __init__(self, alpha, out, cov, chi2, background, suggested_alpha):
+        ## Regularization constant used
+        self.alpha = alpha
+        ## Coefficients of the base functions
+        self.out = out
+        ## Covariance matrix of the coefficients
+        self.cov = cov
+        ## Chisqr of the fit
+        self.chi2 = chi2
+        ## Background value
+        self.background = background
+        ## Alpha to get the reg term the same size as the signal
+        self.suggested_alpha = suggested_alpha
+
+
+class InversionScan(object):
+    """
+    Solve the inversion of one data set at one D_max for many values of
+    alpha and of the number of terms, sharing the basis matrices.
+
+    :param invertor: Invertor holding the data, D_max, q range, slit and
+        background settings; it is not modified.
+    :param nfunc_max: largest number of terms that will be solved for.
+    :param nr: number of r points to evaluate the 2nd derivative at for the reg. term.
+    """
+    def __init__(self, invertor, nfunc_max, nr=20):
+        if invertor.is_valid() < 0:
+            msg = "Invertor: invalid data; incompatible data lengths."
+            raise RuntimeError(msg)
+        self.est_bck = bool(invertor.est_bck)
+        self.nfunc_max = int(nfunc_max)
+        self.nr = int(nr)
+        self.npts = len(invertor.x)
+        self.alpha = invertor.alpha
+        self.background = invertor.background
+
+        # Build the matrix with alpha=1 so that the regularisation rows
+        # hold R, and remove a fixed background as Invertor.invert does.
+        self.invertor = invertor.clone()
+        self.invertor.alpha = 1.0
+        if not self.est_bck:
+            self.invertor.y = invertor.y - invertor.background
+        ncol = self.nfunc_max + self.est_bck
+        try:
+            a_obj, b_obj = self.invertor._get_matrix(ncol, self.nr)
+        except Exception as exc:
+            raise RuntimeError("Invertor: could not invert I(Q)\n  %s" % str(exc))
+        self.a_data = a_obj[:self.npts]
+        self.a_reg = a_obj[self.npts:]
+        self.b_data = b_obj[:self.npts]
+
+        # A_d = Q T; the leading columns of T give the reduction for fewer terms
+        q_data, self.t_data = np.linalg.qr(self.a_data)
+        self.g_data = q_data.T @ self.b_data
+        # Column sums of squares for the suggested alpha
+        self._sum_sig = np.cumsum(np.sum(self.a_data**2, axis=0))
+        self._sum_reg = np.cumsum(np.sum(self.a_reg**2, axis=0))
+
+    def _ncol(self, nfunc):
+        nfunc = self.nfunc_max if nfunc is None else int(nfunc)
+        if nfunc > self.nfunc_max:
+            raise ValueError("InversionScan: nfunc=%d is larger than nfunc_max=%d"
+                             % (nfunc, self.nfunc_max))
+        return nfunc + self.est_bck
+
+    def suggested_alpha(self, nfunc=None):
+        """
+        Returns the alpha that makes the reg term the same size as the
+        signal, which does not depend on the current alpha.
+        """
+        ncol = self._ncol(nfunc)
+        if self._sum_reg[ncol-1] == 0:
+            return 0.0
+        return self._sum_sig[ncol-1] / self._sum_reg[ncol-1]
+
+    def solve(self, alphas, nfunc=None):
+        """
+        Perform the inversion for each alpha in *alphas*.
+
+        :param alphas: regularization constant, or sequence of them.
+        :param nfunc: number of base functions to use; defaults to nfunc_max.
+
+        :return: list of :class:`ScanResult`, one per alpha
+        """
+        ncol = self._ncol(nfunc)
+        alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+        nalpha, nr = len(alphas), self.nr
+        nrow = min(self.t_data.shape[0], ncol)
+        t_data = self.t_data[:nrow, :ncol]
+        a_reg = self.a_reg[:, :ncol]
+        sqrt_alpha = np.sqrt(np.fabs(alphas))
+
+        # Reduced problem [T; sqrt(alpha) R] c = [g; 0] for every alpha
+        stacked = np.empty((nalpha, nrow + nr, ncol))
+        stacked[:, :nrow] = t_data
+        stacked[:, nrow:] = sqrt_alpha[:, None, None] * a_reg
+        rhs = np.zeros(nrow + nr)
+        rhs[:nrow] = self.g_data[:nrow]
+
+        # Pseudo-inverse with the cutoff numpy.linalg.lstsq uses in Invertor.lstsq;
+        # the singular values are those of the full matrix since Q is orthonormal.
+        u_mat, s_val, vt_mat = np.linalg.svd(stacked, full_matrices=False)
+        rcond = np.finfo(float).eps * max(self.npts + nr, ncol)
+        keep = s_val > rcond * s_val[:, :1]
+        inv_s = np.zeros_like(s_val)
+        inv_s[keep] = 1.0 / s_val[keep]
+        coeffs = np.einsum('kji,kj->ki', vt_mat, inv_s * np.einsum('kmj,m->kj', u_mat, rhs))
+
+        # chi2 is only defined by lstsq for full rank, overdetermined problems
+        resid_data = coeffs @ self.a_data[:, :ncol].T - self.b_data
+        resid_reg = coeffs @ a_reg.T
+        chi2 = np.sum(resid_data**2, axis=1) + alphas * np.sum(resid_reg**2, axis=1)
+        full_rank = (np.sum(keep, axis=1) == ncol) & (self.npts + nr > ncol)
+        chi2[~full_rank] = -1.0
+
+        inv_cov = (t_data.T @ t_data)[None] + alphas[:, None, None] * (a_reg.T @ a_reg)[None]
+        covs = np.linalg.pinv(inv_cov)
+        suggested = self.suggested_alpha(ncol - self.est_bck)
+
+        results = []
+        for k, alpha in enumerate(alphas):
+            err = math.fabs(chi2[k] / (self.npts - ncol)) * covs[k]
+            c = coeffs[k]
+            if not self.est_bck:
+                out, cov, background = c, err, self.background
+            else:
+                # Same layout as Invertor.lstsq: background removed, zero padded
+                out = np.zeros(ncol)
+                cov = np.zeros([ncol, ncol])
+                out[:-1] = c[1:]
+                cov[:-1, :-1] = err[1:, 1:]
+                background = c[0]
+            results.append(ScanResult(float(alpha), out, cov, float(chi2[k]), background,
+                                      suggested if alpha != 0 else 0.0))
+        return results
+
+    def estimate_alpha(self, nfunc=None, alpha=None):
+        """
+        Returns a reasonable guess for the regularization constant alpha,
+        following the same search as :meth:`Invertor.estimate_alpha` but
+        solving all the candidate alphas together.
+
+        :param nfunc: number of terms to use in the expansion.
+        :param alpha: starting alpha; defaults to that of the invertor.
+
+        :return: alpha, message
+        """
+        pr = self.invertor
+        alpha = self.alpha if alpha is None else alpha
+        initial_alpha = alpha if alpha > 0 else 0.0001
+        suggested = self.suggested_alpha(nfunc)
+        smaller = [0.33 ** (i + 1) * suggested for i in range(10)]
+        results = self.solve([initial_alpha, suggested] + smaller, nfunc)
+        peaks = [pr.get_peaks(result.out) for result in results]
+
+        # if more than one peak to start with
+        # just return the estimate
+        if peaks[1] > 1:
+            return suggested, None
+
+        # Look at smaller values
+        # We assume that for the suggested alpha, we have 1 peak
+        # if not, send a message to change parameters
+        best_alpha = suggested
+        found = False
+        for alpha, npeaks in zip(smaller, peaks[2:]):
+            if npeaks > 1:
+                found = True
+                break
+            best_alpha = alpha
+
+        # If we didn't find a turning point for alpha and
+        # the initial alpha already had only one peak,
+        # just return that
+        if not found and peaks[0] == 1 and initial_alpha < best_alpha:
+            best_alpha = initial_alpha
+
+        # Check whether the size makes sense
+        message = ''
+        if not found:
+            message = None
+        elif best_alpha >= 0.5 * suggested:
+            # best alpha is too big, return a
+            # reasonable value
+            message = "The estimated alpha for your system is too "
+            message += "large. "
+            message += "Try increasing your maximum distance."
+        return best_alpha, message
+
+
+def _invert_at(invertor, d_max, nfunc, nr):
+    pr = invertor.clone()
+    pr.d_max = d_max
+    t_0 = time.time()
+    result = InversionScan(pr, nfunc, nr).solve(pr.alpha, nfunc)[0]
+    pr.out, pr.cov = result.out, result.cov
+    pr.chi2 = result.chi2
+    pr.background = result.background
+    pr.suggested_alpha = result.suggested_alpha
+    pr.nfunc = nfunc
+    pr.elapsed = time.time() - t_0
+    return pr
+
+
+def scan_dmax(invertor, d_max_values, nfunc=None, nr=20, n_workers=None):
+    """
+    Perform the inversion of *invertor* at each D_max in *d_max_values*,
+    running the points on a pool of *n_workers* threads.
+
+    :param invertor: Invertor holding the data and settings; it is not modified.
+    :param d_max_values: sequence of D_max values.
+    :param nfunc: number of base functions to use; defaults to invertor.nfunc.
+    :param nr: number of r points to evaluate the 2nd derivative at for the reg. term.
+    :param n_workers: number of threads; defaults to the number of CPUs.
+
+    :return: list with, for each D_max, a copy of the invertor holding the
+        solution (out, cov, chi2, background) or the exception raised by
+        the inversion at that point.
+    """
+    nfunc = invertor.nfunc if nfunc is None else nfunc
+    d_max_values = list(d_max_values)
+
+    def invert_one(d_max):
+        try:
+            return _invert_at(invertor, d_max, nfunc, nr)
+        except Exception as exc:
+            return exc
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(d_max_values)))
+    if n_workers == 1:
+        return [invert_one(d_max) for d_max in d_max_values]
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(invert_one, d_max_values))
@@ -6,6 +6,7 @@ import copy
 import sys
 import logging
 from sas.sascalc.pr.invertor import Invertor
+from sas.sascalc.pr.inversion_scan import InversionScan
 
 logger = logging.getLogger(__name__)
 
@@ -67,12 +68,20 @@ class NTermEstimator(object):
         self.osc_list = []
         self.err_list = []
         self.alpha_list = []
+        scan = None
         for k in range(self.nterm_min, self.nterm_max, 1):
             if self.isquit_func is not None:
                 self.isquit_func()
-            best_alpha, message, _ = inver.estimate_alpha(k)
+            if scan is None:
+                # One matrix serves every number of terms
+                scan = InversionScan(inver, self.nterm_max - 1)
+            try:
+                best_alpha, message = scan.estimate_alpha(k, inver.alpha)
+            except Exception as exc:
+                best_alpha, message = 0, "Invertor.estimate_alpha: %s" % exc
             inver.alpha = best_alpha
-            inver.out, inver.cov = inver.lstsq(k)
+            result = scan.solve(best_alpha, k)[0]
+            inver.out, inver.cov = result.out, result.cov
             osc = inver.oscillations(inver.out)
             err = inver.get_pos_err(inver.out, inver.cov)
             if osc > 10.0:
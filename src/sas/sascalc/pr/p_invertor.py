@@ -591,26 +591,26 @@ class Pinvertor(object):
         x_use = self.x[q_accept_x]
         a_use = a_obj[0:self.npoints, :]
 
-        for j in range(nfunc):
-            if self.est_bck == 1 and j == 0:
-                a_use[q_accept_x, j] = 1.0/self.err[q_accept_x]
-            elif smeared:
-                a_use[q_accept_x, j] = calc.ortho_transformed_smeared(x_use, self.d_max, j+offset,
-                                                                      self.slit_height, self.slit_width, npts)/self.err[q_accept_x]
-            else:
-                a_use[q_accept_x, j] = calc.ortho_transformed(x_use, self.d_max, j+offset)/self.err[q_accept_x]
+        #All basis functions at once, n = 1..nfunc-1+offset in columns 1-offset..nfunc-1
+        n_basis = np.arange(1, nfunc + offset, dtype=np.int64)
+        if smeared:
+            basis = calc.smeared_basis(x_use, self.d_max, len(n_basis),
+                                       self.slit_height, self.slit_width, npts)
+        else:
+            basis = calc.ortho_transformed_basis(x_use, self.d_max, n_basis)
 
-        a_obj[0:self.npoints, :] = a_use
+        if self.est_bck == 1:
+            a_use[q_accept_x, 0] = 1.0/self.err[q_accept_x]
+        a_use[q_accept_x, 1-offset:] = basis/self.err[q_accept_x, None]
 
-        for j in range(nfunc):
-            i_r = np.arange(nr, dtype=np.float64)
+        a_obj[0:self.npoints, :] = a_use
 
-            #Implementing second stage A as a python vector operation with shape = [nr]
-            r = (self.d_max / nr) * i_r
-            tmp = pi * (j+offset) / self.d_max
-            res = (2.0 * sqrt_alpha * self.d_max/nr * tmp) * (2.0 * np.cos(tmp*r) + tmp * r * np.sin(tmp*r))
-            #Res should now be np vector size i_r.
-            a_obj[self.npoints:self.npoints+nr, j] = res
+        #Implementing second stage A as a python vector operation with shape = [nr, nfunc]
+        i_r = np.arange(nr, dtype=np.float64)
+        r = ((self.d_max / nr) * i_r)[:, None]
+        tmp = pi * (np.arange(nfunc) + offset) / self.d_max
+        res = (2.0 * sqrt_alpha * self.d_max/nr * tmp) * (2.0 * np.cos(tmp*r) + tmp * r * np.sin(tmp*r))
+        a_obj[self.npoints:self.npoints+nr, :] = res
 
         #Compute B
         x_accept_index = self.accept_q(self.x)
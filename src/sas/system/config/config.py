@@ -208,6 +208,15 @@ class Config(ConfigBase, metaclass=ConfigMeta):
         # Default fitting optimizer
         self.FITTING_DEFAULT_OPTIMIZER = 'lm'
 
+        # Number of processes used for the independent fits of a batch fit;
+        # 0 uses one per CPU and 1 runs the fits one after another.
+        self.FITTING_BATCH_WORKERS = 0
+
+        # Disk space in MB used by the Generic Scattering Calculator to keep
+        # parsed structure files for fast reloading; 0 disables the cache.
+        # Structures bigger than this are not cached.
+        self.GSC_SLD_CACHE_MB = 8192
+
         # What's New variables
         self.LAST_WHATS_NEW_HIDDEN_VERSION = "5.0.0"
 
@@ -0,0 +1,92 @@
+"""
+Unit tests for the batch correlation function analysis
+"""
+
+import os.path
+import unittest
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data1D
+
+from sas.sascalc.corfunc.calculation_data import SettableExtrapolationParameters, PorodData
+from sas.sascalc.corfunc.corfunc_calculator import CorfuncCalculator
+from sas.sascalc.corfunc.batch import (COLUMNS, batch_corfunc, compute_corfunc,
+                                       default_extrapolation_parameters, tabulate)
+
+
+def find(filename):
+    return os.path.join(os.path.dirname(__file__), 'data', filename)
+
+
+def load_data(filename="98929.txt"):
+    data = np.loadtxt(find(filename), dtype=np.float64)
+    return Data1D(x=data[:, 0], y=data[:, 1])
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.data = load_data()
+        self.parameters = SettableExtrapolationParameters(0.013, 0.15, 0.24)
+
+    def test_compute(self):
+        result = compute_corfunc(self.data, self.parameters, keep_transforms=True)
+        self.assertIsNone(result.error)
+        calculator = CorfuncCalculator(self.data, self.parameters)
+        calculator.run()
+        self.assertEqual(result.lamellar, calculator.lamellar_parameters)
+        self.assertEqual(result.supplementary, calculator.supplementary_parameters)
+        np.testing.assert_array_equal(result.transformed.gamma_1.y,
+                                      calculator.transformed.gamma_1.y)
+        self.assertIsNone(compute_corfunc(self.data, self.parameters).transformed)
+
+        # Fixed values are not fitted
+        porod = PorodData(K=calculator.porod.K, sigma=0.0)
+        result = compute_corfunc(self.data, self.parameters, background=0.3, porod=porod)
+        self.assertEqual((result.background, result.porod), (0.3, porod))
+        self.assertIsNotNone(result.guinier)
+
+    def test_batch(self):
+        frames = [self.data, Data1D(x=self.data.x, y=2 * self.data.y)]
+        shared = batch_corfunc(frames, self.parameters)
+        per_frame = batch_corfunc(frames, [self.parameters, self.parameters], n_workers=2)
+        self.assertEqual(len(shared), 2)
+        for first, second in zip(shared, per_frame):
+            self.assertIsNone(first.error)
+            self.assertEqual(first.lamellar, second.lamellar)
+        # The correlation function is normalised, so the scale only changes
+        # the fitted intensities
+        self.assertAlmostEqual(shared[1].lamellar.long_period, shared[0].lamellar.long_period)
+        self.assertAlmostEqual(shared[1].porod.K, 2 * shared[0].porod.K)
+
+        with self.assertRaises(ValueError):
+            batch_corfunc(frames, [self.parameters])
+
+    def test_defaults(self):
+        parameters = default_extrapolation_parameters(self.data.x)
+        q_min, q_max = self.data.x[0], self.data.x[-1]
+        self.assertAlmostEqual(parameters.point_1, q_min**0.8 * q_max**0.2)
+        self.assertLess(parameters.point_2, parameters.point_3)
+        self.assertLess(parameters.point_3, q_max)
+        result, = batch_corfunc([self.data])
+        self.assertEqual(result.lamellar, compute_corfunc(self.data, parameters).lamellar)
+
+    def test_table(self):
+        bad = Data1D(x=self.data.x[:10], y=self.data.y[:10])
+        results = batch_corfunc([self.data, bad], self.parameters)
+        self.assertIsNone(results[0].error)
+        self.assertIsNotNone(results[1].error)
+        self.assertIsNone(results[1].lamellar)
+
+        table = tabulate(results)
+        self.assertEqual(tuple(table), COLUMNS)
+        self.assertEqual(table['long_period'][0], results[0].lamellar.long_period)
+        self.assertTrue(np.isnan(table['long_period'][1]))
+        self.assertEqual(table['porod_K'][0], results[0].porod.K)
+        self.assertEqual(table['tangent_gradient'][0], results[0].supplementary.tangent_gradient)
+        self.assertTrue(np.isnan(table['core_z'][1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,7 @@ import time
 
 import numpy as np
 
-from sas.sascalc.corfunc.calculation_data import SettableExtrapolationParameters
+from sas.sascalc.corfunc.calculation_data import SettableExtrapolationParameters, ExtrapolationGrid
 from sas.sascalc.corfunc.corfunc_calculator import CorfuncCalculator, extract_lamellar_parameters
 from sasdata.dataloader.data_info import Data1D
 
@@ -72,6 +72,62 @@ class TestCalculator(unittest.TestCase):
 
         self.assertLess(abs(params.long_period-75), 2.5) # L_p ~= 75
 
+    def run_grid(self, grid, data=None):
+        calculator = CorfuncCalculator(self.data if data is None else data, self.parameters,
+                                       extrapolation_grid=grid)
+        calculator.run()
+        return calculator
+
+    def assert_transforms_close(self, calculator, reference, atol,
+                                names=("gamma_1", "gamma_3", "idf")):
+        x = reference.transformed.gamma_1.x
+        x = x[x < 300]
+        for name in names:
+            value = getattr(calculator.transformed, name)
+            expected = getattr(reference.transformed, name)
+            np.testing.assert_allclose(np.interp(x, value.x, value.y), expected.y[:len(x)],
+                                       atol=atol, err_msg=name)
+
+    def test_grid(self):
+        grid = ExtrapolationGrid(max_points=1000)
+        q = grid.q_values(0.002, 0.285)
+        self.assertEqual(len(q), 512)
+        self.assertAlmostEqual(q[1] * len(q), 28.5)
+        self.assertEqual(len(ExtrapolationGrid().q_values(0.002, 0.285)), 2**14)
+        grid = ExtrapolationGrid(power_of_two=False, max_points=None)
+        self.assertEqual(len(grid.q_values(0.002, 0.285)), 14250)
+
+    def test_tail_correction(self):
+        """
+        Test that the Porod tail makes the transforms independent of the grid extent
+        """
+        full = ExtrapolationGrid(q_max_factor=1000, power_of_two=False, max_points=None,
+                                 tail_correction=False)
+        reference = self.run_grid(full)
+        for tail_correction, atol in ((False, 5e-3), (True, 5e-4)):
+            grid = ExtrapolationGrid(power_of_two=False, max_points=None,
+                                     tail_correction=tail_correction)
+            # IDF(0) grows with the extent of the grid, so only the correlation
+            # functions are compared
+            self.assert_transforms_close(self.run_grid(grid), reference, atol,
+                                         names=("gamma_1", "gamma_3"))
+
+    def test_bounded_grid(self):
+        """
+        Test that finely binned data give the same results on a bounded grid
+        """
+        q = np.arange(self.data.x[0], self.data.x[-1], 2e-5)
+        data = Data1D(x=q, y=np.interp(q, self.data.x, self.data.y))
+        unbounded = self.run_grid(ExtrapolationGrid(max_points=None, power_of_two=False), data)
+        for dtype in (np.float64, np.float32):
+            calculator = self.run_grid(ExtrapolationGrid(max_points=2**16, dtype=dtype), data)
+            self.assertEqual(len(calculator.extrapolated.x), 2**16)
+            self.assertEqual(calculator.transformed.gamma_1.y.dtype, dtype)
+            self.assert_transforms_close(calculator, unbounded, 3e-3)
+            long_period = unbounded.lamellar_parameters.long_period
+            self.assertAlmostEqual(calculator.lamellar_parameters.long_period, long_period,
+                                   delta=0.005 * long_period)
+
 
 def load_data(filename="98929.txt"):
     data = np.loadtxt(find(filename), dtype=np.float64)
@@ -0,0 +1,124 @@
+"""
+Unit tests for the corfunc transform engine
+"""
+
+import os.path
+import unittest
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data1D
+
+from sas.sascalc.corfunc.calculation_data import SettableExtrapolationParameters, PorodData
+from sas.sascalc.corfunc.corfunc_calculator import CorfuncCalculator
+from sas.sascalc.corfunc.transform import CorfuncTransform, TransformCancelled
+from sas.sascalc.corfunc.transform_thread import CorfuncThread, FourierThread
+
+
+def find(filename):
+    return os.path.join(os.path.dirname(__file__), 'data', filename)
+
+
+class TestTransform(unittest.TestCase):
+
+    def setUp(self):
+        data = np.loadtxt(find("98929.txt"))
+        self.calculator = CorfuncCalculator(Data1D(x=data[:, 0], y=data[:, 1]),
+                                            SettableExtrapolationParameters(0.013, 0.15, 0.24))
+        self.calculator.run()
+        extrapolated = self.calculator.extrapolated
+        self.qs = extrapolated.x
+        self.iqs = extrapolated.y - self.calculator.background
+
+    def test_chunks(self):
+        messages = []
+        whole = CorfuncTransform(gamma3_chunk=None).transform(self.qs, self.iqs)
+        chunked = CorfuncTransform(gamma3_chunk=1000).transform(
+            self.qs, self.iqs, progress=lambda fraction, msg: messages.append(fraction))
+        np.testing.assert_array_equal(chunked.gamma_1.y, whole.gamma_1.y)
+        np.testing.assert_allclose(chunked.gamma_3.y, whole.gamma_3.y, rtol=1e-12, atol=1e-15)
+        np.testing.assert_array_equal(chunked.idf.y, whole.idf.y)
+        # Progress is reported for each chunk
+        self.assertGreater(len(messages), len(self.qs) // 1000)
+        self.assertEqual(messages, sorted(messages))
+        self.assertEqual(messages[-1], 1.0)
+
+    def test_reuse(self):
+        transform = CorfuncTransform()
+        porod = self.calculator.porod
+        first = transform.transform(self.qs, self.iqs, porod=porod)
+        second = transform.transform(self.qs, 2 * self.iqs,
+                                     porod=PorodData(K=2 * porod.K, sigma=porod.sigma))
+        self.assertEqual(len(transform._grids), 1)
+        # Results do not share the work buffers or the grid
+        self.assertFalse(np.shares_memory(first.gamma_1.x, second.gamma_1.x))
+        self.assertFalse(np.shares_memory(first.gamma_1.y, first.idf.y))
+        np.testing.assert_allclose(second.gamma_1.y, first.gamma_1.y)
+        np.testing.assert_array_equal(first.gamma_1.y, self.calculator.transformed.gamma_1.y)
+
+    def test_cancel(self):
+        polls = []
+
+        def is_cancelled():
+            polls.append(1)
+            return len(polls) > 3
+
+        transform = CorfuncTransform(gamma3_chunk=1000)
+        with self.assertRaises(TransformCancelled):
+            transform.transform(self.qs, self.iqs, is_cancelled=is_cancelled)
+        self.assertEqual(len(polls), 4)
+
+    def test_thread(self):
+        results = []
+        thread = FourierThread(self.calculator.data, self.calculator.extrapolated,
+                               self.calculator.background, porod=self.calculator.porod,
+                               completefn=lambda **kwargs: results.append(kwargs))
+        thread.compute()
+        gamma_1, gamma_3, idf = results[0]['transform_result']
+        np.testing.assert_array_equal(gamma_1.y, self.calculator.transformed.gamma_1.y)
+        np.testing.assert_array_equal(idf.y, self.calculator.transformed.idf.y)
+
+        thread.interrupt()
+        thread.compute()
+        self.assertEqual(results[1], {'transforms': None})
+
+        # With an update function the progress reports stop the transform
+        updates = []
+        thread = FourierThread(self.calculator.data, self.calculator.extrapolated,
+                               self.calculator.background, porod=self.calculator.porod,
+                               updatefn=lambda **kwargs: updates.append(kwargs),
+                               completefn=lambda **kwargs: results.append(kwargs))
+        thread.interrupt()
+        thread.compute()
+        self.assertEqual(results[2], {'transforms': None})
+        self.assertEqual(len(updates), 1)
+
+    def test_corfunc_thread(self):
+        results = []
+        updates = []
+        parameters = SettableExtrapolationParameters(0.013, 0.15, 0.24)
+        calculator = CorfuncCalculator(self.calculator.data, parameters)
+        thread = CorfuncThread(calculator,
+                               updatefn=lambda **kwargs: updates.append(kwargs),
+                               completefn=lambda **kwargs: results.append(kwargs))
+        thread.compute()
+        self.assertEqual(results[0], {'calculator': calculator, 'error': None})
+        self.assertEqual(calculator.lamellar_parameters, self.calculator.lamellar_parameters)
+        self.assertEqual(updates[0]['fraction'], 0.0)
+
+        # Stopping the thread from its progress reports cancels the calculation
+        thread = CorfuncThread(CorfuncCalculator(self.calculator.data, parameters),
+                               updatefn=lambda **kwargs: thread.stop(),
+                               completefn=lambda **kwargs: results.append(kwargs))
+        thread.compute()
+        self.assertEqual(results[1], {'cancelled': True})
+
+        # Failures are sent with the calculator
+        thread = CorfuncThread(CorfuncCalculator(),
+                               completefn=lambda **kwargs: results.append(kwargs))
+        thread.compute()
+        self.assertIsInstance(results[2]['error'], ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Unit tests for running the fits of a batch on a process pool
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+import cloudpickle
+
+from bumps.options import FIT_CONFIG
+
+from sas.sascalc.fit.BumpsFitting import get_fitter
+from sas.sascalc.fit.batch import batch_workers, fit_batch, iter_fits
+
+# The worker processes can't import the test modules, so send the fake
+# fitters by value.
+cloudpickle.register_pickle_by_value(sys.modules[__name__])
+
+
+class FakeFitter(object):
+    """Stands in for a fit engine, returning its id and the worker pid"""
+    def __init__(self, fitter_id, delay=0.0, fail=False):
+        self.fitter_id = fitter_id
+        self.delay = delay
+        self.fail = fail
+
+    def fit(self, msg_q=None, q=None, handler=None, curr_thread=None,
+            ftol=1.49012e-8, reset_flag=False):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("fit %d failed" % self.fitter_id)
+        return [(self.fitter_id, reset_flag, os.getpid())]
+
+
+class OptionsFitter(object):
+    """Returns the optimizer and settings seen by the fit, and reports progress"""
+    def fit(self, msg_q=None, q=None, handler=None, curr_thread=None,
+            ftol=1.49012e-8, reset_flag=False):
+        for step in range(4):
+            if handler is not None:
+                handler.progress(step, 4)
+        fitclass, options = get_fitter()
+        return fitclass.id, options.get('steps'), os.getpid()
+
+
+class fit_batch_test(unittest.TestCase):
+
+    def test_batch_workers(self):
+        with mock.patch.dict(os.environ, {'OMP_NUM_THREADS': '4'}):
+            self.assertEqual(batch_workers(3, 10), 3)
+            self.assertEqual(batch_workers(8, 2), 2)
+            self.assertEqual(batch_workers(0, 10), min(os.cpu_count() or 1, 10))
+        # bumps runs its own process pool for each fit
+        with mock.patch.dict(os.environ, {'OMP_NUM_THREADS': '1'}):
+            self.assertEqual(batch_workers(3, 10), 1)
+
+    def test_fit_batch(self):
+        """
+        Test that the results come back in order, with per-fit progress
+        """
+        # Later fits finish first
+        fitters = [FakeFitter(k, delay=0.3*(3-k)) for k in range(4)]
+        progress = []
+        results = fit_batch(fitters, n_workers=2, reset_flag=True,
+                            progress=lambda k, n: progress.append((k, n)))
+        self.assertEqual([result[0][0] for result in results], [0, 1, 2, 3])
+        self.assertTrue(all(result[0][1] for result in results))
+        self.assertNotIn(os.getpid(), [result[0][2] for result in results])
+        self.assertEqual(progress, [(1, 4), (2, 4), (3, 4), (4, 4)])
+
+    def test_iter_fits(self):
+        """
+        Test that the results are yielded as the fits complete
+        """
+        fitters = [FakeFitter(k, delay=0.3*(2-k)) for k in range(3)]
+        results = list(iter_fits(fitters, n_workers=3))
+        self.assertEqual([k for k, _ in results], [2, 1, 0])
+        self.assertEqual([result[0][0] for _, result in results], [2, 1, 0])
+        # A single worker runs the fits in order in this process
+        results = list(iter_fits(fitters, n_workers=1))
+        self.assertEqual([k for k, _ in results], [0, 1, 2])
+        self.assertEqual(set(result[0][2] for _, result in results), {os.getpid()})
+
+    def test_fit_options(self):
+        """
+        Test that the workers use the selected optimizer and settings, and report progress
+        """
+        selected_id = FIT_CONFIG.selected_id
+        steps = FIT_CONFIG.values['de']['steps']
+        try:
+            FIT_CONFIG.selected_id = 'de'
+            FIT_CONFIG.values['de']['steps'] = 123
+            for n_workers in (1, 2):
+                steps_seen = []
+                results = fit_batch([OptionsFitter(), OptionsFitter()], n_workers=n_workers,
+                                    step_progress=lambda *args: steps_seen.append(args))
+                self.assertEqual([result[:2] for result in results], [('de', 123)]*2)
+                for k in range(2):
+                    self.assertEqual([args[1:] for args in steps_seen if args[0] == k],
+                                     [(0, 4), (1, 4), (2, 4), (3, 4), (1, 1)])
+            self.assertNotEqual(results[0][2], os.getpid())
+        finally:
+            FIT_CONFIG.selected_id = selected_id
+            FIT_CONFIG.values['de']['steps'] = steps
+
+    def test_cancel_and_fail(self):
+        """
+        Test that cancellation and failed fits stop the batch
+        """
+        def isquit():
+            raise KeyboardInterrupt("stop")
+        fitters = [FakeFitter(k, delay=10.0) for k in range(2)]
+        start = time.time()
+        with self.assertRaises(KeyboardInterrupt):
+            fit_batch(fitters, n_workers=2, isquit=isquit)
+        self.assertLess(time.time() - start, 10.0)
+
+        fitters = [FakeFitter(0), FakeFitter(1, fail=True)]
+        with self.assertRaisesRegex(RuntimeError, "fit 1 failed"):
+            fit_batch(fitters, n_workers=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+"""
+Unit tests for the headless batch fitting command
+"""
+
+import os
+import csv
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data1D
+
+from sas.sascalc.fit import cli
+
+
+def sphere_page():
+    """Fit page as saved by SasView 5, for a polydisperse sphere*hardsphere"""
+    return {
+        'fitpage_model': ['sphere'],
+        'fitpage_structure': ['hardsphere'],
+        'model_name': ['sphere'],
+        'polydisperse_params': ['True'],
+        'magnetic_params': ['False'],
+        'q_range_min': ['0.005'],
+        'q_range_max': ['0.4'],
+        'smearing': ['2'],
+        'smearing_min': ['0.0'],
+        'smearing_max': ['5.0'],
+        'weighting': ['2'],
+        'is_batch_fitting': ['False'],
+        'scale': ['True', '0.5', None, '0.0', 'inf', []],
+        'radius': ['True', '60.0', None, '10.0', '200.0', []],
+        'sld': ['False', '2.0', None, '-inf', 'inf', []],
+        'volfraction': ['False', '0.1', None, '0.0', '0.74', []],
+        'radius.width': ['True', '0.1', None, '0.0', 'inf', '21', '2', 'schulz'],
+        # Not used: magnetism is off
+        'sld_M0': ['True', '1.0', None, '-inf', 'inf', []],
+    }
+
+
+class FakeResult(object):
+    """Stands in for FResult"""
+    def __init__(self):
+        self.success = True
+        self.fitness = 1.5
+        self.mesg = None
+        self.param_list = ['radius', 'scale']
+        self.pvec = np.array([61.0, 0.4])
+        self.stderr = np.array([0.5, 0.01])
+        self.data = None
+
+
+class fit_cli_test(unittest.TestCase):
+
+    def test_parse_args(self):
+        opts = cli.parse_args(['-m', 'sphere', 'a.xml', 'b*.xml'])
+        self.assertEqual(opts.data, ['a.xml', 'b*.xml'])
+        self.assertEqual((opts.smearing, opts.format, opts.workers), ('page', 'csv', 0))
+        opts = cli.parse_args(['-p', 'page.json', '-o', 'out.JSON', 'a.xml'])
+        self.assertEqual(opts.format, 'json')
+        with self.assertRaises(SystemExit):
+            cli.parse_args(['a.xml'])
+
+    def test_read_pages(self):
+        """
+        Test that the fit pages are found in a 5.x project file
+        """
+        project = {
+            'is_batch': 'False',
+            'data1': {'fit_data': None, 'fit_params': [sphere_page()]},
+            'data2': {'fit_data': None, 'fit_params': sphere_page()},
+        }
+        fd, path = tempfile.mkstemp(suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as fid:
+                json.dump(project, fid)
+            pages = cli.read_pages(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(pages[0]['radius'], sphere_page()['radius'])
+
+    def test_model_from_page(self):
+        model, params_to_fit = cli.model_from_page(sphere_page())
+        self.assertEqual(sorted(params_to_fit), ['radius', 'radius.width', 'scale'])
+        self.assertIn('volfraction', model.getParamList())
+        self.assertEqual(model.getParam('radius'), 60.0)
+        self.assertEqual(model.getParam('volfraction'), 0.1)
+        self.assertEqual(model.details['radius'][1:3], [10.0, 200.0])
+        self.assertEqual(model.dispersion['radius']['type'], 'schulz')
+        self.assertEqual(model.getParam('radius.npts'), 21)
+        self.assertEqual(model.getParam('radius.width'), 0.1)
+
+        page = sphere_page()
+        page['polydisperse_params'] = ['False']
+        page['magnetic_params'] = ['True']
+        _, params_to_fit = cli.model_from_page(page)
+        self.assertEqual(sorted(params_to_fit), ['radius', 'scale', 'sld_M0'])
+
+        page['fitpage_model'] = ['no_such_model']
+        with self.assertRaises(ValueError):
+            cli.model_from_page(page)
+
+    def test_set_parameters(self):
+        model = cli.make_model('sphere')
+        params_to_fit = cli.set_parameters(
+            model, ['radius'], ['radius=70:20:', 'sld=3'], fit=['scale'], fix=['radius'])
+        self.assertEqual(params_to_fit, ['scale'])
+        self.assertEqual(model.getParam('radius'), 70.0)
+        self.assertEqual(model.details['radius'][1:3], [20.0, np.inf])
+        self.assertEqual(model.getParam('sld'), 3.0)
+        for setting in ['radius', 'radius=1:2', 'length=3']:
+            with self.assertRaises(ValueError):
+                cli.set_parameters(model, [], [setting])
+
+    def test_set_optimizer(self):
+        from bumps.options import FIT_CONFIG
+        from sas.sascalc.fit.BumpsFitting import get_fit_config, set_fit_config
+
+        opts = cli.parse_args(['-m', 'sphere', '--optimizer', 'de',
+                               '--fit-option', 'steps=50', '--fit-option', 'CR=0.5', 'a.xml'])
+        self.assertEqual((opts.optimizer, opts.fit_option), ('de', ['steps=50', 'CR=0.5']))
+        saved = get_fit_config()
+        saved_values = dict(FIT_CONFIG.values['de'])
+        try:
+            self.assertEqual(cli.set_optimizer(opts.optimizer, opts.fit_option),
+                             ('de', {'steps': 50, 'CR': 0.5}))
+            # The workers are started with this configuration
+            fit_id, values = get_fit_config()
+            self.assertEqual((fit_id, values['steps'], values['CR'], values['pop']),
+                             ('de', 50, 0.5, 10))
+            for optimizer, settings in [('simplex', []), ('de', ['steps']),
+                                        ('de', ['samples=10']), ('de', ['steps=many'])]:
+                with self.assertRaises(ValueError):
+                    cli.set_optimizer(optimizer, settings)
+        finally:
+            FIT_CONFIG.values['de'] = saved_values
+            set_fit_config(saved)
+
+    def test_weighting_and_smearing(self):
+        x = np.linspace(0.01, 0.2, 20)
+        data = Data1D(x=x, y=4*np.ones_like(x), dy=0.1*np.ones_like(x))
+        model = cli.make_model('sphere')
+        for flag, weight in enumerate([1.0, 0.1, 2.0, 4.0]):
+            np.testing.assert_allclose(cli.add_weighting(data, flag).dy, weight)
+        np.testing.assert_allclose(data.dy, 0.1)
+
+        # Without dQ the combobox has no 'Use dQ Data' entry
+        self.assertEqual(cli.page_smearing(data, model, 1), 'pinhole')
+        self.assertEqual(cli.page_smearing(data, model, 2), 'slit')
+        self.assertIsNone(cli.make_smearer(data, model, 'data'))
+        smearer = cli.make_smearer(data, model, 'pinhole', dq=5.0)
+        np.testing.assert_allclose(smearer.resolution.q_width, 0.05*x)
+        self.assertIsNone(data.dx)
+        smearer = cli.make_smearer(data, model, 'slit', slit_height=0.0, slit_width=0.05)
+        self.assertEqual(type(smearer.resolution).__name__, 'Slit1D')
+
+    def test_result_row(self):
+        data = Data1D(x=np.arange(1, 4), y=np.ones(3))
+        row = cli.result_row(3, 'a/b.xml', data, ['scale', 'radius'], [FakeResult()])
+        self.assertEqual((row['index'], row['name'], row['success'], row['chi2']),
+                         (3, 'b.xml', True, 1.5))
+        self.assertEqual((row['radius'], row['radius_err']), (61.0, 0.5))
+        self.assertEqual((row['scale'], row['scale_err']), (0.4, 0.01))
+        row = cli.result_row(0, 'a.xml', data, ['scale'], RuntimeError("bad data"))
+        self.assertEqual((row['success'], row['error']), (False, "bad data"))
+
+    def test_main(self):
+        """
+        Test fitting data files from the command line, serially and on a pool
+        """
+        x = np.linspace(0.005, 0.2, 40)
+        model = cli.make_model('sphere')
+        model.setParam('radius', 60.0)
+        y = model.evalDistribution(x)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for k in range(2):
+                path = os.path.join(tmpdir, "sphere_%d.txt" % k)
+                np.savetxt(path, np.column_stack((x, (k+1)*y, 0.01*(k+1)*y)))
+            output = os.path.join(tmpdir, "fits.csv")
+            for workers in ['1', '2']:
+                status = cli.main(['-m', 'sphere', '--param', 'radius=50:10:200',
+                                   '--fit', 'radius', '--fit', 'scale', '-w', workers,
+                                   '-o', output, os.path.join(tmpdir, "sphere_*.txt")])
+                self.assertEqual(status, 0)
+                with open(output, newline='') as fid:
+                    rows = sorted(csv.DictReader(fid), key=lambda row: row['index'])
+                self.assertEqual([row['index'] for row in rows], ['0', '1'])
+                for k, row in enumerate(rows):
+                    self.assertEqual(row['success'], 'True')
+                    self.assertAlmostEqual(float(row['radius']), 60.0, delta=1.0)
+                    self.assertAlmostEqual(float(row['scale']), k+1, delta=0.05*(k+1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Unit tests for the residuals of the fit data wrappers
+"""
+
+import unittest
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data1D, Data2D
+
+from sas.sascalc.fit.AbstractFitEngine import FitData1D, FitData2D
+from sas.sascalc.fit.qsmearing import smear_selection
+
+
+def theory(q):
+    return 10.0/(1.0 + (50.0*q)**2) + 0.1
+
+
+class TheoryModel(object):
+    """Model evaluated by the smearer outside the fitted range"""
+    def evalDistribution(self, q):
+        return 1.1*theory(q)
+
+
+class fit_data_test(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.x = np.linspace(0.001, 0.3, 200)
+        self.dy = 0.05*theory(self.x)
+        self.y = theory(self.x) + rng.normal(scale=self.dy)
+
+    def reference_1d(self, data, fn):
+        """Residuals as computed before the fit index was precomputed"""
+        fx = np.zeros(len(data.x))
+        fx[data.idx_unsmeared] = fn(data.x[data.idx_unsmeared])
+        if data.smearer is not None:
+            fx = data.smearer(fx, data._first_unsmeared_bin, data._last_unsmeared_bin)
+        return (data.y[data.idx] - fx[data.idx]) / data.dy[data.idx], fx[data.idx]
+
+    def check_1d(self, data):
+        fn = lambda q: 1.1*theory(q)
+        res, fx = data.residuals(fn)
+        ref_res, ref_fx = self.reference_1d(data, fn)
+        np.testing.assert_allclose(fx, ref_fx, rtol=1e-14)
+        np.testing.assert_allclose(res, ref_res, rtol=1e-12, atol=1e-12)
+        self.assertEqual(len(res), np.sum(data.idx))
+
+    def test_residuals_1d(self):
+        dy = self.dy.copy()
+        # Zero errors leave gaps in the fitted points
+        dy[[60, 61, 90]] = 0.0
+        data = FitData1D(x=self.x, y=self.y, dy=dy)
+        data.set_fit_range(qmin=0.01, qmax=0.2)
+        self.assertIsInstance(data.fit_index().fitted, np.ndarray)
+        self.check_1d(data)
+
+        data.set_fit_range(qmin=0.14, qmax=0.25)
+        self.assertIsInstance(data.fit_index().fitted, slice)
+        self.check_1d(data)
+
+    def test_residuals_1d_smeared(self):
+        sas_data = Data1D(x=self.x, y=self.y, dx=0.05*self.x, dy=self.dy)
+        smearer = smear_selection(sas_data, TheoryModel())
+        data = FitData1D(x=self.x, y=self.y, dx=sas_data.dx, dy=self.dy, smearer=smearer)
+        data.set_fit_range(qmin=0.02, qmax=0.25)
+        self.check_1d(data)
+
+    def test_residuals_into(self):
+        data = FitData1D(x=self.x, y=self.y, dy=self.dy)
+        data.set_fit_range(qmin=0.01, qmax=0.2)
+        size = data.fit_index().size
+        out, fx = np.empty(size), np.empty(size)
+        res, theory_out = data.residuals_into(theory, out, fx)
+        self.assertIs(res, out)
+        self.assertIs(theory_out, fx)
+        # The residuals returned by residuals() are not reused between calls
+        first, _ = data.residuals(theory)
+        second, _ = data.residuals(lambda q: 2*theory(q))
+        self.assertFalse(np.shares_memory(first, second))
+        np.testing.assert_allclose(first, out)
+
+    def test_residuals_2d(self):
+        qx, qy = np.meshgrid(np.linspace(-0.2, 0.2, 30), np.linspace(-0.2, 0.2, 30))
+        qx, qy = qx.ravel(), qy.ravel()
+        q = np.sqrt(qx**2 + qy**2)
+        err = 0.05*theory(q)
+        mask = np.ones(len(q), dtype=bool)
+        mask[::7] = False
+        sas_data = Data2D(data=theory(q)*1.05, err_data=err, qx_data=qx, qy_data=qy,
+                          q_data=q, mask=mask)
+        sas_data.xmin, sas_data.xmax = -0.2, 0.2
+        sas_data.ymin, sas_data.ymax = -0.2, 0.2
+        data = FitData2D(sas_data2d=sas_data, data=sas_data.data, err_data=err)
+        data.set_fit_range(qmin=0.02, qmax=0.15)
+        fn = lambda qxy: theory(np.sqrt(qxy[0]**2 + qxy[1]**2))
+        res, gn = data.residuals(fn)
+        idx = data.idx
+        np.testing.assert_allclose(gn, fn([qx[idx], qy[idx]]))
+        np.testing.assert_allclose(res, (sas_data.data[idx] - gn)/err[idx], rtol=1e-12)
+        self.assertEqual(len(res), data.size())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Unit tests for the memo of model evaluations
+"""
+
+import gc
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from sas.sascalc.fit.model_cache import ModelCache
+from sas.sascalc.fit.cli import make_model
+
+
+class model_cache_test(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ModelCache(max_entries=3)
+        self.model = make_model('sphere')
+        self.q = np.linspace(0.001, 0.5, 100)
+
+    def test_hits(self):
+        expected = self.model.evalDistribution(self.q)
+        with mock.patch.object(self.model, 'calculate_Iq',
+                               wraps=self.model.calculate_Iq) as calc:
+            first = self.cache.evalDistribution(self.model, self.q)
+            np.testing.assert_allclose(first, expected)
+            self.assertFalse(first.flags.writeable)
+            # Same parameters and q, in a new array
+            self.assertIs(self.cache.evalDistribution(self.model, self.q.copy()), first)
+            self.assertEqual(calc.call_count, 1)
+
+            self.model.setParam('radius', 30.0)
+            self.cache.evalDistribution(self.model, self.q)
+            self.cache.evalDistribution(self.model, self.q[:50])
+            self.model.dispersion['radius']['npts'] = 11
+            self.model.setParam('radius.width', 0.1)
+            self.cache.evalDistribution(self.model, self.q)
+            self.assertEqual(calc.call_count, 4)
+            self.assertEqual((self.cache.hits, self.cache.misses), (1, 4))
+
+            # The 2D form keys on both qx and qy
+            self.cache.evalDistribution(self.model, [self.q, self.q])
+            self.cache.evalDistribution(self.model, [self.q, -self.q])
+            self.assertEqual(calc.call_count, 6)
+
+    def test_bounds(self):
+        for radius in (10.0, 20.0, 30.0, 40.0):
+            self.model.setParam('radius', radius)
+            self.cache.evalDistribution(self.model, self.q)
+        self.assertEqual(len(self.cache._models[self.model]), 3)
+        self.model.setParam('radius', 10.0)
+        self.cache.evalDistribution(self.model, self.q)
+        self.assertEqual(self.cache.misses, 5)
+
+        self.cache.max_bytes = self.q.nbytes
+        self.cache.evalDistribution(self.model, self.q[:10])
+        self.assertEqual(len(self.cache._models[self.model]), 1)
+
+        # Entries go away with the model
+        del self.model
+        gc.collect()
+        self.assertEqual(len(self.cache._models), 0)
+
+    def test_fallback(self):
+        class Model(object):
+            def evalDistribution(self, q):
+                return 2*q
+        np.testing.assert_allclose(self.cache.evalDistribution(Model(), self.q), 2*self.q)
+        self.cache.enabled = False
+        self.cache.evalDistribution(self.model, self.q)
+        self.assertEqual(self.cache.misses, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
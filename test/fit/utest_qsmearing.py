@@ -0,0 +1,91 @@
+"""
+Unit tests for the 2D pinhole smearer
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data2D
+from sasmodels.resolution2d import Pinhole2D
+
+from sas.sascalc.fit import qsmearing
+from sas.sascalc.fit.qsmearing import PySmear2D
+
+
+class GaussianModel(object):
+    """Model counting its evaluations"""
+    calls = 0
+
+    def evalDistribution(self, qxy):
+        self.calls += 1
+        qx, qy = qxy
+        return np.exp(-50.0*(qx**2 + 2*qy**2))
+
+
+def make_data(n=20):
+    qx, qy = np.meshgrid(np.linspace(-0.2, 0.2, n), np.linspace(-0.2, 0.2, n))
+    qx, qy = qx.ravel(), qy.ravel()
+    q = np.sqrt(qx**2 + qy**2)
+    return Data2D(data=np.ones_like(q), err_data=np.ones_like(q), qx_data=qx, qy_data=qy,
+                  q_data=q, dqx_data=0.05*q + 1e-3, dqy_data=0.02*q + 1e-3,
+                  mask=np.ones(len(q), dtype=bool))
+
+
+class pysmear2d_test(unittest.TestCase):
+
+    def setUp(self):
+        self.data = make_data()
+        self.model = GaussianModel()
+        self.smearer = PySmear2D(self.data, self.model)
+        q = self.data.q_data
+        self.index = (q > 0.02) & (q < 0.18)
+
+    def reference(self, index, accuracy='Low'):
+        """Smeared values computed with a new Pinhole2D, as get_value used to"""
+        res = Pinhole2D(data=self.data, index=index, nsigma=3.0, accuracy=accuracy)
+        return res.apply(self.model.evalDistribution(res.q_calc))
+
+    def test_value(self):
+        self.smearer.set_index(self.index)
+        np.testing.assert_allclose(self.smearer.get_value(), self.reference(self.index),
+                                   rtol=1e-12)
+        self.smearer.set_accuracy('High')
+        np.testing.assert_allclose(self.smearer.get_value(),
+                                   self.reference(self.index, 'High'), rtol=1e-12)
+        self.smearer.set_smearer(False)
+        value = self.smearer.get_value()
+        np.testing.assert_allclose(value, self.model.evalDistribution(
+            [self.data.qx_data[self.index], self.data.qy_data[self.index]]))
+
+    def test_cache(self):
+        """
+        Test that the operator is only rebuilt when its inputs change
+        """
+        with mock.patch.object(qsmearing, 'Pinhole2D', wraps=Pinhole2D) as pinhole:
+            self.smearer.set_index(self.index)
+            first = self.smearer.get_value()
+            # A new mask with the same points, as the model thread sends
+            self.smearer.set_index(self.index.copy())
+            self.smearer.get_value()
+            self.assertEqual(pinhole.call_count, 1)
+
+            # Changing the mask in place is noticed
+            index = self.index.copy()
+            self.smearer.set_index(index)
+            index[np.flatnonzero(index)[:5]] = False
+            self.assertEqual(len(self.smearer.get_value()), len(first) - 5)
+            self.assertEqual(pinhole.call_count, 2)
+
+            self.smearer.set_accuracy('med')
+            self.smearer.get_value()
+            self.smearer.limit = 2.5
+            self.smearer.get_value()
+            self.smearer.set_data(make_data())
+            self.smearer.get_value()
+            self.assertEqual(pinhole.call_count, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+    Unit tests for the batch P(r) inversion
+"""
+
+import os.path
+import csv
+import tempfile
+import unittest
+
+import numpy as np
+
+from sasdata.dataloader.data_info import Data1D
+
+from sas.sascalc.pr.invertor import Invertor
+from sas.sascalc.pr.batch import COLUMNS, invert_batch, write_table
+
+try:
+    from utest_invertor import load
+except ImportError:
+    from .utest_invertor import load
+
+
+def find(filename):
+    return os.path.join(os.path.dirname(__file__), 'data', filename)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.template = Invertor()
+        self.template.d_max = 160.0
+        self.template.alpha = .0007
+        self.template.nfunc = 10
+        x, y, err = load(find('sphere_80.txt'))
+        # Frames of a fake time series, scaled copies of the same sphere
+        self.datasets = []
+        for k in range(3):
+            data = Data1D(x=x, y=y*(k+1), dy=err*(k+1))
+            data.filename = "frame_%d.txt" % k
+            self.datasets.append(data)
+
+    def test_serial(self):
+        """
+        Test that each result matches a separate inversion of its data set
+        """
+        results = list(invert_batch(self.datasets, self.template, estimate=False, n_workers=1))
+        self.assertEqual([result.index for result in results], [0, 1, 2])
+        for result, data in zip(results, self.datasets):
+            self.assertIsNone(result.error)
+            self.assertEqual(result.name, data.filename)
+            pr = self.template.clone()
+            pr.x, pr.y, pr.err = data.x, data.y, data.dy
+            out, _ = pr.invert(10)
+            np.testing.assert_allclose(result.invertor.out, out)
+            self.assertAlmostEqual(result.values['rg'], pr.rg(out))
+            self.assertAlmostEqual(result.values['iq0'], pr.iq0(out))
+        # The template is left unchanged
+        self.assertIsNone(self.template.out)
+
+    def test_estimate(self):
+        """
+        Test that alpha and the number of terms are estimated for each data set
+        """
+        data = self.datasets[0]
+        data = Data1D(x=data.x[::4], y=data.y[::4], dy=data.dy[::4])
+        result = next(invert_batch([data], self.template, n_workers=1))
+        pr = self.template.clone()
+        pr.x, pr.y, pr.err = data.x, data.y, data.dy
+        nterms, alpha, _ = pr.estimate_numterms()
+        self.assertEqual(result.values['nfunc'], nterms)
+        self.assertAlmostEqual(result.values['alpha'], alpha)
+
+    def test_process_pool(self):
+        """
+        Test that the inversions on a process pool match the serial ones,
+        and the summary table
+        """
+        # Short data sets, as the time is spent starting the workers
+        datasets = [Data1D(x=data.x[::5], y=data.y[::5], dy=data.dy[::5])
+                    for data in self.datasets[:2]]
+        bad = Data1D(x=np.array([0.01, 0.02]), y=np.array([1.0, 1.0]), dy=np.array([1.0, 1.0, 1.0]))
+        datasets.append(bad)
+        results = list(invert_batch(datasets, self.template, estimate=False, n_workers=2))
+        serial = list(invert_batch(datasets, self.template, estimate=False, n_workers=1))
+        self.assertEqual(sorted(result.index for result in results), [0, 1, 2])
+        by_index = dict((result.index, result) for result in results)
+        for expected in serial[:2]:
+            result = by_index[expected.index]
+            self.assertIsNone(result.error)
+            np.testing.assert_allclose(result.invertor.out, expected.invertor.out)
+            self.assertAlmostEqual(result.values['rg'], expected.values['rg'])
+        self.assertIsNotNone(by_index[2].error)
+        self.assertIsNone(by_index[2].invertor)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "batch.csv")
+            write_table(results, path)
+            with open(path, newline='') as fid:
+                rows = list(csv.reader(fid))
+        self.assertEqual(tuple(rows[0]), COLUMNS)
+        self.assertEqual([row[0] for row in rows[1:]], ['0', '1', '2'])
+        rg = COLUMNS.index('rg')
+        self.assertAlmostEqual(float(rows[2][rg]), by_index[1].values['rg'])
+        self.assertEqual(rows[3][rg], '')
+        self.assertNotEqual(rows[3][COLUMNS.index('error')], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
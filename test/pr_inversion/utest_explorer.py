@@ -39,6 +39,19 @@ class TestExplorer(unittest.TestCase):
         results = self.explo(120, 200, 25)
         self.assertEqual(len(results.errors), 0)
         self.assertEqual(len(results.chi2), 25)
+        # the points are inverted on copies of the invertor
+        self.assertEqual(self.invertor.d_max, 160.0)
+
+    def test_exploration_serial(self):
+        parallel = self.explo(120, 200, 5, n_workers=2)
+        serial = self.explo(120, 200, 5, n_workers=1)
+        self.assertEqual(parallel.d_max, serial.d_max)
+        numpy.testing.assert_allclose(parallel.chi2, serial.chi2)
+
+        self.invertor.d_max = 120.0
+        out, cov = self.invertor.invert(self.invertor.nfunc)
+        self.assertAlmostEqual(serial.chi2[0] / float(self.invertor.chi2), 1.0, 6)
+        self.assertAlmostEqual(serial.rg[0], self.invertor.rg(out), 6)
 
 if __name__ == '__main__':
     unittest.main()
@@ -191,6 +191,64 @@ class TestBasicComponent(unittest.TestCase):
         self.invertor.slit_height = 2.0
         self.assertEqual(self.invertor.slit_height, 2.0)
 
+    def test_smeared_basis(self):
+        """
+            Test the batched slit-smeared basis against smearing one function at a time
+        """
+        from sas.sascalc.pr import calc
+        q = numpy.linspace(0.001, 0.3, 50)
+        npts = 21
+        for height, width in ((0.05, 0.01), (0.05, 0.0), (0.0, 0.02)):
+            basis = calc.smeared_basis(q, 120.0, 8, height, width, npts)
+            self.assertEqual(basis.shape, (50, 8))
+            for n in range(1, 9):
+                expected = numpy.zeros(len(q))
+                for z in (numpy.linspace(0, height, npts) if height > 0 else [0.0]):
+                    for y in (numpy.linspace(-0.5*width, 0.5*width, npts) if width > 0 else [0.0]):
+                        expected += calc.ortho_transformed(numpy.sqrt((q - y)**2 + z**2), 120.0, n)
+                expected /= (npts if height > 0 else 1)*(npts if width > 0 else 1)
+                numpy.testing.assert_allclose(basis[:, n-1], expected, rtol=1e-10, atol=1e-12*abs(expected).max())
+            # extending the cached matrix reuses the existing columns
+            more = calc.smeared_basis(q, 120.0, 12, height, width, npts)
+            numpy.testing.assert_array_equal(more[:, :8], basis)
+
+        pars = numpy.linspace(1.0, 2.0, 8)
+        basis = calc.smeared_basis(q, 120.0, 8, 0.05, 0.01, npts)
+        numpy.testing.assert_allclose(calc.iq_smeared(pars, q, 120.0, 0.05, 0.01, npts), basis @ pars, rtol=1e-12)
+
+    def test_scan(self):
+        """
+            Test that the alpha scan engine reproduces single inversions
+        """
+        from sas.sascalc.pr.inversion_scan import InversionScan
+        x, y, err = load(find("sphere_80.txt"))
+        self.invertor.d_max = 160.0
+        self.invertor.x   = x
+        self.invertor.y   = y
+        self.invertor.err = err
+        for est_bck in (False, True):
+            self.invertor.est_bck = est_bck
+            scan = InversionScan(self.invertor, 15)
+            alphas = [0.0, 1e-4, 0.01]
+            for nfunc in (8, 15):
+                results = scan.solve(alphas, nfunc)
+                for alpha, result in zip(alphas, results):
+                    self.invertor.alpha = alpha
+                    out, cov = self.invertor.invert(nfunc)
+                    numpy.testing.assert_allclose(result.out, out, rtol=1e-6, atol=1e-8*abs(out).max())
+                    numpy.testing.assert_allclose(result.cov, cov, rtol=1e-5, atol=1e-6*abs(cov).max())
+                    self.assertAlmostEqual(result.chi2/float(self.invertor.chi2), 1.0, 6)
+                    numpy.testing.assert_allclose(result.background, self.invertor.background, rtol=1e-8)
+                    self.assertAlmostEqual(result.suggested_alpha, self.invertor.suggested_alpha, 12)
+            for alpha in (0.0, 0.0007):
+                self.invertor.alpha = alpha
+                scan = InversionScan(self.invertor, 10)
+                expected_alpha, expected_message = serial_estimate_alpha(self.invertor, 10)
+                alpha, message = scan.estimate_alpha(10)
+                self.assertAlmostEqual(alpha / expected_alpha, 1.0, 8)
+                self.assertEqual(message, expected_message)
+                self.assertAlmostEqual(self.invertor.estimate_alpha(10)[0] / expected_alpha, 1.0, 8)
+
 
     def test_inversion(self):
         """
@@ -569,6 +627,45 @@ class TestErrorConditions(unittest.TestCase):
         out, cov = self.invertor.lstsq(10)
 
 
+def serial_estimate_alpha(invertor, nfunc):
+    """
+    Reference alpha estimate, one inversion at a time, as Invertor.estimate_alpha
+    did before it used the scan engine.
+    """
+    pr = invertor.clone()
+    if pr.alpha <= 0:
+        pr.alpha = 0.0001
+    out, _ = pr.invert(nfunc)
+    initial_alpha = pr.alpha
+    initial_peaks = pr.get_peaks(out)
+
+    pr.alpha = pr.suggested_alpha
+    out, _ = pr.invert(nfunc)
+    if pr.get_peaks(out) > 1:
+        return pr.suggested_alpha, None
+
+    alpha = pr.suggested_alpha
+    best_alpha = pr.suggested_alpha
+    found = False
+    for i in range(10):
+        pr.alpha = (0.33) ** (i + 1) * alpha
+        out, _ = pr.invert(nfunc)
+        if pr.get_peaks(out) > 1:
+            found = True
+            break
+        best_alpha = pr.alpha
+    if not found and initial_peaks == 1 and initial_alpha < best_alpha:
+        best_alpha = initial_alpha
+
+    message = ''
+    if not found:
+        message = None
+    elif best_alpha >= 0.5 * pr.suggested_alpha:
+        message = "The estimated alpha for your system is too large. "
+        message += "Try increasing your maximum distance."
+    return best_alpha, message
+
+
 def pr_theory(r, R):
     """
        P(r) for a sphere
@@ -4,6 +4,7 @@ Unit tests for the sas_gen
 
 import os.path
 import warnings
+import time
 warnings.simplefilter("ignore")
 
 import unittest
@@ -96,6 +97,92 @@ class sas_gen_test(unittest.TestCase):
         self.assertEqual(f.pos_y[0], 0.0)
         self.assertEqual(f.pos_z[0], 0.0)        
     
+    def test_omfreader_binary(self):
+        """
+        Test binary .omf data, in either byte order, matches the text version
+        """
+        import tempfile
+        text = self.omfloader.read(find("isolated_skyrmion_V2.omf"))
+        with open(find("isolated_skyrmion_V2.omf"), 'rb') as fid:
+            buff = fid.read()
+        header = buff[:buff.index(b'# Begin: Data Text')]
+        values = np.loadtxt(find("isolated_skyrmion_V2.omf"), comments='#')
+        for dtype, check in (('<f8', 123456789012345.0), ('>f4', 1234567.0)):
+            data = np.hstack((check, values.flatten())).astype(dtype).tobytes()
+            width = np.dtype(dtype).itemsize
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, "binary.omf")
+                with open(path, 'wb') as fid:
+                    fid.write(header + b"# Begin: Data Binary %d\n" % width + data
+                              + b"\n# End: Data Binary %d\n# End: Segment\n" % width)
+                f = self.omfloader.read(path)
+                chunks = list(self.omfloader.iter_chunks(path, chunk_size=1000))
+            self.assertTrue(np.allclose(f.sld_mx, text.sld_mx, rtol=1e-7, atol=0))
+            self.assertTrue(np.array_equal(f.pos_y, text.pos_y))
+            self.assertEqual(len(chunks), 7)
+            self.assertTrue(np.array_equal(np.hstack([c.sld_mz for c in chunks]), f.sld_mz))
+
+    def test_chunked_readers(self):
+        """
+        Test that reading in chunks gives the same points as reading the whole file
+        """
+        for loader, filename in ((self.sldloader, "sld_file.sld"), (self.pdbloader, "c60.pdb"),
+                                 (self.omfloader, "A_Raw_Example-1.omf")):
+            f = loader.read(find(filename))
+            chunks = list(loader.iter_chunks(find(filename), chunk_size=25))
+            self.assertEqual(len(chunks), -(-len(f.pos_x) // 25))
+            for attr in ('pos_x', 'pos_y', 'pos_z', 'sld_n', 'sld_mx', 'vol_pix'):
+                self.assertTrue(np.array_equal(np.hstack([getattr(c, attr) for c in chunks]),
+                                               np.asarray(getattr(f, attr), 'd')), (filename, attr))
+
+    def test_calculate_chunks(self):
+        """
+        Test that summing the 2D amplitudes of chunks matches the calculation on the whole structure
+        """
+        f = self.pdbloader.read(find("c60.pdb"))
+        model = sas_gen.GenSAS()
+        model.set_sld_data(f)
+        model.set_rotations(xyz_to_UVW=Rotation.from_euler('ZYX', [30, 20, 10], degrees=True))
+        model.params['solvent_SLD'] = 1e-6
+        model.params['scale'] = 3.0
+        qx, qy = np.linspace(-0.5, 0.5, 21), np.linspace(0.3, -0.2, 21)
+        full = model.runXY([qx, qy])
+        chunked = model.calculate_Iqxy_chunks(self.pdbloader.iter_chunks(find("c60.pdb"), chunk_size=7), qx, qy)
+        self.assertTrue(np.allclose(chunked, full, rtol=1e-10))
+
+    def test_calculate_chunks_magnetic(self):
+        """
+        Test that streaming a micromagnetic OMF file matches the magnetic calculation on the whole mesh
+        """
+        path = find("A_Raw_Example-1.omf")
+        f = self.omfloader.read(path)
+        model = sas_gen.GenSAS()
+        model.set_sld_data(f)
+        model.set_rotations(xyz_to_UVW=Rotation.from_euler('ZYX', [30, 20, 10], degrees=True))
+        model.params['solvent_SLD'] = 1e-6
+        model.params['Up_frac_in'] = 0.9
+        model.params['Up_frac_out'] = 0.3
+        model.params['Up_theta'] = 40.0
+        model.params['Up_phi'] = 20.0
+        qx, qy = np.linspace(-0.05, 0.05, 11), np.linspace(0.03, -0.02, 11)
+        full = model.runXY([qx, qy])
+        chunked = model.calculate_Iqxy_chunks(self.omfloader.iter_chunks(path, chunk_size=100), qx, qy)
+        self.assertTrue(np.allclose(chunked, full, rtol=1e-8))
+
+        # Non-magnetic chunks of a mixed structure only add to the non spin-flip cross sections
+        chunks = list(self.omfloader.iter_chunks(path, chunk_size=100))
+        for chunk in chunks[1::2]:
+            chunk.sld_mx = chunk.sld_my = chunk.sld_mz = None
+        def stack(attr):
+            return np.hstack([getattr(c, attr) if getattr(c, attr) is not None
+                              else np.zeros(len(c.pos_x)) for c in chunks])
+        model.set_sld_data(sas_gen.MagSLD(
+            *(stack(attr) for attr in ('pos_x', 'pos_y', 'pos_z', 'sld_n', 'sld_mx', 'sld_my', 'sld_mz')),
+            vol_pix=stack('vol_pix')))
+        full = model.runXY([qx, qy])
+        chunked = model.calculate_Iqxy_chunks(chunks, qx, qy)
+        self.assertTrue(np.allclose(chunked, full, rtol=1e-8))
+
     def test_rotations(self):
         pos_x = np.array([1, 0, 0])
         pos_y = np.array([0, 1, 0])
@@ -275,6 +362,247 @@ class sas_gen_test(unittest.TestCase):
         for val in np.abs(errs):
             self.assertLessEqual(val, 0.01)
 
+    def test_histogram_debye(self):
+        """
+        Test that the distance histogram Debye engine agrees with the exact Debye sum.
+        """
+        from sas.sascalc.calculator.ausaxs import sasview_sans_debye
+        from sas.sascalc.calculator.ausaxs import histogram_sans_debye
+
+        rng = np.random.default_rng(1984)
+        f = self.pdbloader.read(find("debye_test_files/diamond.pdb"))
+        coords = np.vstack([f.pos_x, f.pos_y, f.pos_z])
+        q = np.linspace(0.001, 1, 100)
+        w = rng.random(coords.shape[1]) # random weights
+
+        exact = sasview_sans_debye.sasview_sans_debye(q, coords, w)
+        binned = histogram_sans_debye.histogram_sans_debye(q, coords, w, bin_width=0.1)
+        errs = (binned - exact)/exact
+        for val in np.abs(errs):
+            self.assertLessEqual(val, 1e-3)
+
+        # the histogram engine is selectable from the model and reused across q
+        sld = sas_gen.MagSLD(f.pos_x, f.pos_y, f.pos_z, sld_n=w, vol_pix=np.ones_like(w))
+        model = sas_gen.GenSAS()
+        model.set_sld_data(sld)
+        model.set_debye_engine('exact')
+        exact = model.run([q, []])
+        model.set_debye_engine('histogram', bin_width=0.1)
+        binned = model.run([q, []])
+        histogram = model.debye_histogram[2]
+        self.assertTrue(np.allclose(binned, exact, rtol=1e-3))
+        model.params['scale'] = 2.0
+        model.params['background'] = 1.0
+        rescaled = model.run([q[::2], []])
+        self.assertIs(model.debye_histogram[2], histogram)
+        self.assertTrue(np.allclose(rescaled, 2*binned[::2] + 1))
+        # changing the solvent sld invalidates the histogram
+        model.params['solvent_SLD'] = 0.1
+        model.run([q, []])
+        self.assertIsNot(model.debye_histogram[2], histogram)
+        self.assertRaises(ValueError, model.set_debye_engine, 'fast')
+
+    def test_ausaxs_worker_crash(self):
+        """
+        Test that a crash in the AUSAXS worker process falls back to the default implementation
+        and that the worker is replaced for the next call.
+        """
+        import multiprocessing
+        from unittest import mock
+        from sas.sascalc.calculator.ausaxs import sasview_sans_debye
+        from sas.sascalc.calculator.ausaxs import ausaxs_sans_debye
+
+        if multiprocessing.get_start_method() != 'fork':
+            self.skipTest("library substitution requires forked workers")
+
+        class FakeLibrary:
+            crash = False
+            def evaluate_sans_debye(self, q, x, y, z, w, nq, nc, status, Iq):
+                if FakeLibrary.crash:
+                    os._exit(3)
+                for i in range(nq.value):
+                    Iq[i] = 42.0
+
+        rng = np.random.default_rng(1984)
+        coords = rng.random((3, 100))
+        w = rng.random(100)
+        q = np.linspace(0.001, 1, 10)
+        pool = ausaxs_sans_debye._WorkerPool()
+        with mock.patch.object(ausaxs_sans_debye, '_attach_hooks', lambda: (FakeLibrary(), ausaxs_sans_debye.lib_state.READY)), \
+             mock.patch.object(ausaxs_sans_debye, '_pool', pool), \
+             mock.patch.object(ausaxs_sans_debye, 'worker_state', ausaxs_sans_debye.lib_state.UNINITIALIZED):
+            self.assertTrue(np.all(ausaxs_sans_debye.evaluate_sans_debye(q, coords, w) == 42.0))
+            self.assertEqual(ausaxs_sans_debye.worker_state, ausaxs_sans_debye.lib_state.READY)
+            # the warm worker is reused
+            worker = pool.idle[0]
+            ausaxs_sans_debye.evaluate_sans_debye(q, coords, w)
+            self.assertIs(pool.idle[0], worker)
+            pool.shutdown()
+
+            FakeLibrary.crash = True
+            Iq = ausaxs_sans_debye.evaluate_sans_debye(q, coords, w)
+            self.assertTrue(np.allclose(Iq, sasview_sans_debye.sasview_sans_debye(q, coords, w)))
+            self.assertEqual(pool.count, 0)
+
+            FakeLibrary.crash = False
+            self.assertTrue(np.all(ausaxs_sans_debye.evaluate_sans_debye(q, coords, w) == 42.0))
+            pool.shutdown()
+
+    def test_parallel_debye(self):
+        """
+        Test that the threaded Debye sum matches the serial sum, reports progress and can be aborted.
+        """
+        from sas.sascalc.calculator.ausaxs import sasview_sans_debye
+
+        rng = np.random.default_rng(1984)
+        coords = rng.random((3, 500)) * 50
+        w = rng.random(500)
+        q = np.linspace(0.001, 1, 50)
+        serial = np.zeros_like(q)
+        sasview_sans_debye._calc_Iq_batch(serial, q/np.pi, coords, w)
+
+        steps = []
+        parallel = sasview_sans_debye.sasview_sans_debye(q, coords, w, n_workers=4, progress=steps.append)
+        self.assertTrue(np.allclose(parallel, serial, rtol=1e-12))
+        self.assertTrue(np.all(np.diff(steps) > 0))
+        self.assertAlmostEqual(steps[-1], 100)
+
+        with self.assertRaises(KeyboardInterrupt):
+            sasview_sans_debye.sasview_sans_debye(q, coords, w, n_workers=2, abort=lambda: True)
+
+    def test_tiled_2D(self):
+        """
+        Test that the tiled 2D calculation matches a direct sum, folding +/-q pairs only when non-magnetic.
+        """
+        from sas.sascalc.calculator import geni
+
+        rng = np.random.default_rng(1984)
+        n = 300
+        x, y, z = rng.random((3, n)) * 50
+        sld, vol = rng.random(n), np.ones(n)
+        qx, qy = np.meshgrid(np.linspace(-0.3, 0.3, 25), np.linspace(-0.3, 0.3, 17))
+        zero = np.zeros(n)
+
+        direct = np.abs(np.exp(1j*(np.outer(qx.flatten(), x) + np.outer(qy.flatten(), y))) @ sld)**2
+        direct = direct.reshape(qx.shape) * 1e8/n
+        steps = []
+        tiled = geni.Iqxy(qx, qy, x, y, z, sld, vol, zero, zero, zero, 1.0, 1.0, 0.0, 0.0,
+                          n_workers=3, max_memory=2**16, progress=steps.append)
+        self.assertEqual(tiled.shape, qx.shape)
+        self.assertTrue(np.allclose(tiled, direct, rtol=1e-10))
+        self.assertAlmostEqual(steps[-1], 100)
+        # only one of each +/-q pair is evaluated
+        fx, fy, inverse = geni._fold_friedel_pairs(qx.flatten(), qy.flatten())
+        self.assertEqual(len(fx), (qx.size + 1)//2)
+        self.assertTrue(np.allclose(fx[inverse], np.abs(qx.flatten())))
+
+        # magnetic scattering has no +/-q symmetry, check against a single untiled evaluation
+        mx, my, mz = rng.random((3, n)) * 0.1
+        untiled = geni._calc_Iqxy_magnetic(qx, qy, x, y, sld, vol, (mx, my, mz), 0.3, 0.7, 45.0, 30.0)
+        tiled = geni.Iqxy(qx, qy, x, y, z, sld, vol, mx, my, mz, 0.3, 0.7, 45.0, 30.0, n_workers=2)
+        self.assertTrue(np.allclose(tiled, untiled * 1e8/n, rtol=1e-10))
+
+        with self.assertRaises(geni.CalculationCancelled) as cm:
+            geni.Iqxy(qx, qy, x, y, z, sld, vol, zero, zero, zero, 1.0, 1.0, 0.0, 0.0, abort=lambda: True)
+        self.assertEqual(cm.exception.partial.shape, qx.shape)
+
+    def test_tiled_2D_cancel(self):
+        """
+        Test that cancelling a 2D calculation keeps the finished tiles and blocks.
+        """
+        from sas.sascalc.calculator import geni
+
+        qx = np.linspace(0.01, 0.3, 20*geni.TILE_Q)
+        qy = np.zeros_like(qx)
+        kernel = lambda qx, qy: qx + qy
+        polls = []
+        def abort():
+            polls.append(1)
+            return len(polls) > 2
+        with self.assertRaises(KeyboardInterrupt) as cm:
+            geni._calc_tiled(kernel, qx, qy, n_workers=1, abort=abort)
+        partial = cm.exception.partial
+        finished = np.isfinite(partial)
+        self.assertTrue(0 < np.sum(finished) < len(qx))
+        self.assertTrue(np.all(partial[finished] == qx[finished]))
+
+        # blocked kernels see the whole q grid and skip blocks after an abort
+        def blocked_kernel(qx, qy, state):
+            Iq = np.empty_like(qx)
+            for block in range(len(state) - 1):
+                if state[0]:
+                    continue
+                index = slice(block*geni.TILE_Q, (block + 1)*geni.TILE_Q)
+                Iq[index] = qx[index]
+                state[1 + block] = 1
+                time.sleep(0.05)
+            return Iq
+        polls.clear()
+        Iq, cancelled = geni._run_blocked(blocked_kernel, qx, qy, abort=abort)
+        finished = np.isfinite(Iq)
+        self.assertTrue(cancelled)
+        self.assertTrue(0 < np.sum(finished) < len(qx))
+        self.assertTrue(np.all(Iq[finished] == qx[finished]))
+
+        steps = []
+        Iq, cancelled = geni._run_blocked(blocked_kernel, qx[:3*geni.TILE_Q], qy[:3*geni.TILE_Q],
+                                          progress=steps.append)
+        self.assertFalse(cancelled)
+        self.assertTrue(np.all(Iq == qx[:3*geni.TILE_Q]))
+        self.assertEqual(steps[-1], 100)
+
+    def test_result_cache(self):
+        """
+        Test that repeated and scale/background-only evaluations reuse the cached kernel output.
+        """
+        import tempfile
+        from sas.sascalc.calculator.result_cache import ResultCache, hash_key
+
+        f = sas_gen.OMFData()
+        omf2sld = sas_gen.OMF2SLD()
+        omf2sld.set_data(f)
+        sld = omf2sld.output
+        sld.set_sldn(0.1, False)
+        model = sas_gen.GenSAS()
+        model.set_sld_data(sld)
+        qx, qy = np.array([0.01, 0.05, 0.1]), np.array([0.02, 0.0, -0.1])
+        cache = model.result_cache
+
+        first = model.runXY([qx, qy])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        model.params['scale'] = 2.0
+        model.params['background'] = 0.5
+        scaled = model.runXY([qx, qy])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertTrue(np.allclose(scaled, 2*first + 0.5))
+        # reloading the same structure still hits; changing the solvent or q misses
+        model.set_sld_data(sld)
+        model.runXY([qx, qy])
+        model.params['solvent_SLD'] = 0.05
+        model.runXY([qx, qy])
+        model.runXY([qx[:2], qy[:2]])
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+        # polarisation only matters for magnetic structures
+        model.params['Up_theta'] = 45.0
+        model.set_sld_data(sld)
+        model.runXY([qx[:2], qy[:2]])
+        self.assertEqual((cache.hits, cache.misses), (3, 3))
+
+        # eviction by byte budget, and the disk tier surviving a new cache
+        a, b = np.arange(10.), np.arange(10.) + 1
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ResultCache(max_bytes=100, cache_dir=cache_dir)
+            cache.put(hash_key('a'), a)
+            cache.put(hash_key('b'), b)
+            self.assertEqual(cache.stats()['entries'], 1)
+            self.assertEqual(cache.evictions, 1)
+            cache = ResultCache(max_bytes=100, cache_dir=cache_dir)
+            self.assertTrue(np.array_equal(cache.get(hash_key('a')), a))
+            self.assertEqual(cache.disk_hits, 1)
+            self.assertIsNone(cache.get(hash_key('c')))
+            self.assertEqual(cache.stats()['misses'], 1)
+        self.assertNotEqual(hash_key(a), hash_key(a.astype('f')))
+
     def test_calculator_elements(self):
         """
         Test that the calculator correctly calculates scattering for element type data.
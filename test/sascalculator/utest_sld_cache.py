@@ -0,0 +1,122 @@
+"""
+Unit tests for the memory mapped MagSLD container and file cache
+"""
+
+import os.path
+import tempfile
+import unittest
+
+import numpy as np
+
+from sas.sascalc.calculator import sas_gen
+from sas.sascalc.calculator.sld_cache import (
+    SLDFileCache, load_sld, save_sld, sld_file_size)
+
+
+def find(filename):
+    return os.path.join(os.path.dirname(__file__), 'data', filename)
+
+
+class CountingReader(sas_gen.SLDReader):
+    """SLD reader which counts how often it parses a file"""
+    calls = 0
+
+    def read(self, path):
+        self.calls += 1
+        return super().read(path)
+
+
+class sld_cache_test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def assertSameSLD(self, loaded, data):
+        self.assertEqual(sorted(vars(loaded)), sorted(vars(data)))
+        for name, value in vars(data).items():
+            other = getattr(loaded, name)
+            if isinstance(value, np.ndarray):
+                self.assertIsInstance(other, np.ndarray, name)
+                self.assertTrue(np.array_equal(other, value), name)
+            else:
+                self.assertEqual(other, value, name)
+
+    def test_roundtrip(self):
+        """
+        Test that structures from each reader survive saving and loading
+        """
+        path = os.path.join(self.tmpdir.name, "data.sldc")
+        for loader, filename in ((sas_gen.SLDReader(), "sld_file.sld"),
+                                 (sas_gen.PDBReader(), "c60.pdb"),
+                                 (sas_gen.OMFReader(), "A_Raw_Example-1.omf"),
+                                 (sas_gen.VTKReader(), "five_tetrahedra_cube.vtk")):
+            data = loader.read(find(filename))
+            save_sld(path, data)
+            self.assertEqual(os.path.getsize(path), sld_file_size(data))
+            loaded = load_sld(path)
+            self.assertSameSLD(loaded, data)
+            self.assertIsInstance(loaded.pos_x, np.memmap)
+            # copy on write: changes never reach the file
+            loaded.pos_x[0] += 1.0
+            self.assertEqual(load_sld(path).pos_x[0], data.pos_x[0])
+            del loaded
+
+    def test_jagged_elements(self):
+        """
+        Test that element lists with differing numbers of faces are restored
+        """
+        data = sas_gen.MagSLD(np.zeros(5), np.zeros(5), np.zeros(5), np.ones(2))
+        elements = [[[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]],
+                     [[0, 1, 2, 3], [0, 1, 4], [1, 2, 4], [2, 3, 4], [3, 0, 4]]]
+        data.set_elements(elements, False)
+        path = os.path.join(self.tmpdir.name, "jagged.sldc")
+        save_sld(path, data)
+        self.assertEqual(load_sld(path).elements, elements)
+
+    def test_file_cache(self):
+        """
+        Test that the cache only parses a file again when it changes
+        """
+        source = os.path.join(self.tmpdir.name, "source.sld")
+        with open(find("sld_file.sld")) as fid:
+            text = fid.read()
+        with open(source, 'w') as fid:
+            fid.write(text)
+        cache = SLDFileCache(os.path.join(self.tmpdir.name, "cache"))
+        loader = CountingReader()
+        first = cache.read(loader, source)
+        second = cache.read(loader, source)
+        self.assertEqual(loader.calls, 1)
+        self.assertSameSLD(second, first)
+
+        stat = os.stat(source)
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        cache.read(loader, source)
+        self.assertEqual(loader.calls, 2)
+
+        # corrupt cache files are discarded and the source parsed again
+        for name in os.listdir(cache.cache_dir):
+            with open(os.path.join(cache.cache_dir, name), 'wb') as fid:
+                fid.write(b'garbage')
+        self.assertSameSLD(cache.read(loader, source), first)
+        self.assertEqual(loader.calls, 3)
+        cache.clear()
+        self.assertEqual(os.listdir(cache.cache_dir), [])
+
+    def test_over_budget(self):
+        """
+        Test that structures bigger than the cache budget are not written
+        """
+        source = find("sld_file.sld")
+        size = sld_file_size(sas_gen.SLDReader().read(source))
+        cache = SLDFileCache(os.path.join(self.tmpdir.name, "cache"), max_disk_bytes=size - 1)
+        loader = CountingReader()
+        cache.read(loader, source)
+        self.assertEqual(os.listdir(cache.cache_dir), [])
+        cache.read(loader, source)
+        self.assertEqual(loader.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Unit tests for the integration weights and the batch invariant calculation
+"""
+
+import os.path
+import math
+import unittest
+
+import numpy as np
+
+from sasdata.dataloader.loader import Loader
+from sasdata.dataloader.data_info import Data1D
+
+from sas.sascalc.invariant import invariant
+from sas.sascalc.invariant.batch import batch_invariant, compute_invariant
+
+
+def find(filename):
+    return os.path.join(os.path.dirname(__file__), 'data', filename)
+
+
+def loop_qstar(x, y, dy):
+    """Invariant and uncertainty summed point by point, as they used to be"""
+    n = len(x) - 1
+    dx0, dxn = (x[1] - x[0]) / 2, (x[n] - x[n - 1]) / 2
+    total = x[0]**2 * y[0] * dx0 + x[n]**2 * y[n] * dxn
+    total_err = (x[0]**2 * dy[0] * dx0)**2 + (x[n]**2 * dy[n] * dxn)**2
+    for i in range(1, n - 1):
+        dxi = (x[i + 1] - x[i - 1]) / 2
+        total += x[i]**2 * y[i] * dxi
+        total_err += (x[i]**2 * dy[i] * dxi)**2
+    return total, math.sqrt(total_err)
+
+
+class TestIntegration(unittest.TestCase):
+
+    def test_weights(self):
+        x = np.array([0.1, 0.2, 0.4, 0.5, 0.8])
+        np.testing.assert_allclose(invariant.integration_weights(x),
+                                   [0.05, 0.15, 0.15, 0.0, 0.15])
+        np.testing.assert_allclose(invariant.integration_weights(x[:2]), [0.05, 0.05])
+        # Weights are shared between calls for the same q values
+        self.assertIs(invariant.integration_weights(list(x)),
+                      invariant.integration_weights(x))
+
+    def test_qstar(self):
+        data = Loader().load(find("100nmSpheresNodQ.txt"))[0]
+        calculator = invariant.InvariantCalculator(data)
+        qstar, qstar_err = calculator.get_qstar_with_error()
+        expected, expected_err = loop_qstar(data.x, data.y, calculator.get_data().dy)
+        self.assertAlmostEqual(qstar / expected, 1.0, places=12)
+        self.assertAlmostEqual(qstar_err / expected_err, 1.0, places=12)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.data = Loader().load(find("100nmSpheresNodQ.txt"))[0]
+
+    def test_batch(self):
+        frames = [self.data, 2 * self.data]
+        low = dict(npts=10, function='guinier')
+        high = dict(npts=10, function='power_law', power=4)
+        rows = batch_invariant(frames, scale=2.0, contrast=2.6e-6,
+                               porod_const=0.08, low=low, high=high)
+        self.assertEqual(len(rows), 2)
+        for data, row in zip(frames, rows):
+            self.assertIsNone(row['error'])
+            calculator = invariant.InvariantCalculator(data, scale=2.0)
+            calculator.set_extrapolation('low', **low)
+            calculator.set_extrapolation('high', **high)
+            qstar, qstar_err = calculator.get_qstar_with_error('both')
+            self.assertAlmostEqual(row['qstar'] / qstar, 1.0, places=10)
+            self.assertAlmostEqual(row['qstar_err'] / qstar_err, 1.0, places=10)
+            volume, volume_err = calculator.get_volume_fraction_with_error(2.6e-6, 'both')
+            self.assertAlmostEqual(row['volume_fraction'], volume, places=10)
+            self.assertAlmostEqual(row['volume_fraction_err'], volume_err, places=10)
+            self.assertAlmostEqual(row['surface'], calculator.get_surface(2.6e-6, 0.08))
+            self.assertEqual(row['power_high'], 4)
+        self.assertGreater(rows[1]['qstar'], rows[0]['qstar'])
+
+    def test_workers(self):
+        frames = [self.data, 2 * self.data, 3 * self.data]
+        high = dict(npts=10, power=4, q_limit=0.0)
+        rows = batch_invariant(frames, n_workers=2, high=high)
+        for data, row in zip(frames, rows):
+            self.assertEqual(row, compute_invariant(data, high=high))
+        # A high-q limit within the data is ignored
+        row = compute_invariant(self.data, high=dict(npts=10, power=4))
+        self.assertEqual(rows[0]['qstar'], row['qstar'])
+
+    def test_errors(self):
+        row = compute_invariant(Data1D(x=np.array([0.1]), y=np.array([1.0])))
+        self.assertIsNone(row['qstar'])
+        self.assertIn("greater than 1", row['error'])
+
+        # A failed extrapolation leaves the invariant of the data
+        row = compute_invariant(self.data, contrast=2.6e-6,
+                                low=dict(npts=4, function='power_law', power=-1))
+        self.assertIn("low-q extrapolation", row['error'])
+        self.assertIsNone(row['qstar_low'])
+        self.assertEqual(row['qstar'], row['qstar_data'])
+        self.assertIsNotNone(row['volume_fraction'])
+
+
+if __name__ == '__main__':
+    unittest.main()